@@ -0,0 +1,400 @@
+#!/usr/bin/env python3
+"""
+Ability-Targeted Question Selection
+Online per-student ability estimates and a bucketed difficulty index over the question bank
+"""
+
+import math
+import os
+import random
+import sqlite3
+import threading
+import time
+import logging
+from bisect import bisect_left, bisect_right, insort
+from collections import OrderedDict
+from typing import Dict, Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+from question_bank import DATA_DIR
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join(DATA_DIR, 'abilities.db')
+
+# Starting difficulty (logit scale) of a question that has no learned rating yet
+DIFFICULTY_RATINGS: Dict[str, float] = {'beginner': -1.0, 'intermediate': 0.0, 'advanced': 1.0}
+
+# Chance of a correct answer the selector aims for
+TARGET_SUCCESS = float(os.getenv('TUTOR_TARGET_SUCCESS', '0.7'))
+
+# Width of a difficulty bucket in the index, in logits
+BUCKET_WIDTH = 0.25
+
+# Random draws inside a bucket before keeping a per-student set of its unseen questions
+PROBES = 8
+
+# Students whose per-bucket unseen sets an index keeps (least recently used are dropped)
+MAX_POOLED_STUDENTS = 1024
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS abilities (
+        student_id TEXT NOT NULL,
+        subject TEXT NOT NULL,
+        rating REAL NOT NULL,
+        answers INTEGER NOT NULL,
+        updated_at REAL NOT NULL,
+        PRIMARY KEY (student_id, subject)
+    );
+    CREATE TABLE IF NOT EXISTS item_ratings (
+        question_id TEXT PRIMARY KEY,
+        subject TEXT NOT NULL,
+        rating REAL NOT NULL,
+        answers INTEGER NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS seen (
+        student_id TEXT NOT NULL,
+        subject TEXT NOT NULL,
+        question_id TEXT NOT NULL,
+        served_at REAL NOT NULL,
+        PRIMARY KEY (student_id, subject, question_id)
+    ) WITHOUT ROWID;
+'''
+
+def expected_score(ability: float, difficulty: float) -> float:
+    """Probability of a correct answer (Rasch model)"""
+    return 1.0 / (1.0 + math.exp(difficulty - ability))
+
+def target_difficulty(ability: float, success: float = TARGET_SUCCESS) -> float:
+    """Question difficulty a student of `ability` answers correctly with probability `success`"""
+    success = min(max(success, 0.05), 0.95)
+    return ability - math.log(success / (1.0 - success))
+
+def difficulty_label(rating: float) -> str:
+    """Nearest beginner/intermediate/advanced label for a difficulty rating"""
+    return min(DIFFICULTY_RATINGS, key=lambda label: abs(DIFFICULTY_RATINGS[label] - rating))
+
+def _step(answers: int, start: float, floor: float, decay: float) -> float:
+    """Update size shrinking with the number of answers seen, so estimates settle but keep tracking"""
+    return max(floor, start / (1.0 + decay * answers))
+
+def student_step(answers: int) -> float:
+    return _step(answers, 1.2, 0.3, 0.1)
+
+def item_step(answers: int) -> float:
+    return _step(answers, 0.4, 0.05, 0.05)
+
+def _bucket(rating: float) -> int:
+    return int(round(rating / BUCKET_WIDTH))
+
+class _IndexSet:
+    """Bank indices with O(1) add, discard and uniform random choice"""
+
+    def __init__(self, indices: Iterable[int] = ()):
+        self.items: List[int] = []
+        self._positions: Dict[int, int] = {}
+        for index in indices:
+            self.add(index)
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+    def __contains__(self, index: int) -> bool:
+        return index in self._positions
+
+    def add(self, index: int):
+        if index not in self._positions:
+            self._positions[index] = len(self.items)
+            self.items.append(index)
+
+    def discard(self, index: int):
+        position = self._positions.pop(index, None)
+        if position is None:
+            return
+        last = self.items.pop()
+        if last != index:
+            # Move the last item into the freed slot
+            self.items[position] = last
+            self._positions[last] = position
+
+    def choice(self, rng: random.Random) -> int:
+        return self.items[rng.randrange(len(self.items))]
+
+class DifficultyIndex:
+    """Bank questions of one subject (and optional topic) bucketed by difficulty rating.
+
+    Questions without a learned rating stay as bank index ranges in the bucket of
+    their label; rated questions are listed individually in their own bucket. Bucket
+    keys are kept sorted, so the bucket nearest a target difficulty is found by
+    bisection and an unseen question inside it by a few random draws. When the draws
+    only find seen questions, the student's unseen questions in that bucket are kept
+    as a set, so later picks there are one draw instead of another search.
+    """
+
+    def __init__(self, bank, subject: str, topic: Optional[str], ratings: Dict[int, float]):
+        self.bank = bank
+        self.subject = subject
+        self.topic = topic
+        self._ratings = ratings
+        self._spans = bank.ranges(subject, None, topic)
+        self._buckets: Dict[int, Dict[str, Any]] = {}
+        # student -> bucket key -> that student's unseen questions in the bucket
+        self._unseen: 'OrderedDict[str, Dict[int, _IndexSet]]' = OrderedDict()
+        for label in bank.tables['difficulty']:
+            for start, end in bank.ranges(subject, label, topic):
+                self._add_range(_bucket(DIFFICULTY_RATINGS.get(label, 0.0)), start, end)
+        for index, rating in ratings.items():
+            if self._matches(index):
+                self._entry(_bucket(rating))['indices'].add(index)
+        self._keys = sorted(self._buckets)
+
+    def _entry(self, key: int) -> Dict[str, Any]:
+        entry = self._buckets.get(key)
+        if entry is None:
+            entry = self._buckets[key] = {'ranges': [], 'cumulative': [], 'indices': _IndexSet()}
+        return entry
+
+    def _add_range(self, key: int, start: int, end: int):
+        entry = self._entry(key)
+        entry['ranges'].append((start, end))
+        entry['cumulative'].append((entry['cumulative'][-1] if entry['cumulative'] else 0) + end - start)
+
+    def _matches(self, index: int) -> bool:
+        return any(start <= index < end for start, end in self._spans)
+
+    def move(self, index: int, old_rating: Optional[float], new_rating: float):
+        """Re-bucket a question after its rating changed (old_rating None: it had no learned rating)"""
+        if not self._matches(index):
+            return
+        old_key = _bucket(old_rating) if old_rating is not None else \
+            _bucket(DIFFICULTY_RATINGS.get(self.bank.difficulty(index), 0.0))
+        new_key = _bucket(new_rating)
+        if old_key == new_key and old_rating is not None:
+            return
+        if old_rating is not None:
+            self._buckets[old_key]['indices'].discard(index)
+        if new_key not in self._buckets:
+            insort(self._keys, new_key)
+        self._entry(new_key)['indices'].add(index)
+        # Unseen sets hold candidates; whether the student has seen one is checked when it is drawn
+        for sets in self._unseen.values():
+            if old_key in sets:
+                sets[old_key].discard(index)
+            if new_key in sets:
+                sets[new_key].add(index)
+
+    def _member(self, entry: Dict[str, Any], position: int) -> Optional[int]:
+        """Question at `position` in a bucket: ranges first, then rated questions"""
+        ranged = entry['cumulative'][-1] if entry['cumulative'] else 0
+        if position >= ranged:
+            return entry['indices'].items[position - ranged]
+        slot = bisect_right(entry['cumulative'], position)
+        before = entry['cumulative'][slot - 1] if slot else 0
+        index = entry['ranges'][slot][0] + position - before
+        # Range members with a learned rating live in another bucket now
+        return index if self._ratings.get(index) is None else None
+
+    def _members(self, entry: Dict[str, Any]) -> Iterator[int]:
+        for start, end in entry['ranges']:
+            for index in range(start, end):
+                if self._ratings.get(index) is None:
+                    yield index
+        yield from entry['indices'].items
+
+    def _student_sets(self, student_id: str) -> Dict[int, _IndexSet]:
+        sets = self._unseen.get(student_id)
+        if sets is None:
+            sets = self._unseen[student_id] = {}
+            if len(self._unseen) > MAX_POOLED_STUDENTS:
+                self._unseen.popitem(last=False)
+        else:
+            self._unseen.move_to_end(student_id)
+        return sets
+
+    def _pick_in_bucket(self, key: int, student_id: str, is_seen: Callable[[int], bool],
+                        rng: random.Random) -> Optional[int]:
+        entry = self._buckets[key]
+        sets = self._student_sets(student_id)
+        unseen = sets.get(key)
+        if unseen is None:
+            total = (entry['cumulative'][-1] if entry['cumulative'] else 0) + len(entry['indices'])
+            if not total:
+                return None
+            for _ in range(min(PROBES, total)):
+                index = self._member(entry, rng.randrange(total))
+                if index is not None and not is_seen(index):
+                    return index
+            # Mostly seen: check each member once and keep the rest for this student
+            unseen = sets[key] = _IndexSet(index for index in self._members(entry) if not is_seen(index))
+        while unseen:
+            index = unseen.choice(rng)
+            if not is_seen(index):
+                return index
+            unseen.discard(index)
+        return None
+
+    def nearest_unseen(self, target: float, student_id: str, is_seen: Callable[[int], bool],
+                       rng: random.Random) -> Optional[int]:
+        """Bank index of a question the student has not seen, in the non-empty bucket nearest `target`"""
+        keys = self._keys
+        wanted = _bucket(target)
+        right = bisect_left(keys, wanted)
+        left = right - 1
+        while left >= 0 or right < len(keys):
+            # Take whichever neighbouring bucket is closer to the target
+            if right >= len(keys) or (left >= 0 and wanted - keys[left] <= keys[right] - wanted):
+                key, left = keys[left], left - 1
+            else:
+                key, right = keys[right], right + 1
+            index = self._pick_in_bucket(key, student_id, is_seen, rng)
+            if index is not None:
+                return index
+        return None
+
+class AbilitySelector:
+    """Per-student ability estimates and next-question selection, stored in SQLite.
+
+    Each graded answer moves the student's ability and the question's difficulty
+    by an Elo-style update on a logit scale. The next question is the unseen bank
+    question whose difficulty is nearest the level the student should answer
+    correctly TUTOR_TARGET_SUCCESS of the time, so prompts no longer need the list
+    of previously asked questions.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, bank=None, target_success: float = TARGET_SUCCESS,
+                 rng: Optional[random.Random] = None):
+        self.db_path = db_path
+        self.target_success = target_success
+        self._bank = bank
+        self._rng = rng or random.Random()
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=10.0)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        self._conn.commit()
+        self._indexes: Dict[Tuple[str, Optional[str]], DifficultyIndex] = {}
+        self._item_ratings: Optional[Dict[int, float]] = None
+
+    @property
+    def bank(self):
+        if self._bank is None:
+            from question_bank_binary import get_binary_bank
+            self._bank = get_binary_bank()
+        return self._bank
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _ratings(self) -> Dict[int, float]:
+        """Learned question ratings by bank index (loaded once; called with the lock held)"""
+        if self._item_ratings is None:
+            ratings = {}
+            for question_id, rating in self._conn.execute('SELECT question_id, rating FROM item_ratings'):
+                index = self.bank.index_of(question_id)
+                if index is not None:
+                    ratings[index] = rating
+            self._item_ratings = ratings
+        return self._item_ratings
+
+    def _index(self, subject: str, topic: Optional[str]) -> DifficultyIndex:
+        index = self._indexes.get((subject, topic))
+        if index is None:
+            index = self._indexes[(subject, topic)] = DifficultyIndex(self.bank, subject, topic, self._ratings())
+        return index
+
+    def _ability(self, student_id: str, subject: str) -> Tuple[float, int]:
+        row = self._conn.execute('SELECT rating, answers FROM abilities WHERE student_id = ? AND subject = ?',
+                                 (student_id, subject)).fetchone()
+        return (row[0], row[1]) if row else (0.0, 0)
+
+    def ability(self, student_id: str, subject: str) -> Dict[str, Any]:
+        """Current estimate: rating (logits), answers seen and the matching difficulty label"""
+        with self._lock:
+            rating, answers = self._ability(str(student_id), subject.lower())
+        target = target_difficulty(rating, self.target_success)
+        return {'rating': round(rating, 3), 'answers': answers, 'target_difficulty': round(target, 3),
+                'difficulty': difficulty_label(target)}
+
+    def next_question(self, student_id: str, subject: str, topic: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """The unseen bank question best matching the student's ability (None when none is left)"""
+        student_id, subject = str(student_id), subject.lower()
+        with self._lock:
+            rating, answers = self._ability(student_id, subject)
+            target = target_difficulty(rating, self.target_success)
+
+            def is_seen(index: int) -> bool:
+                return self._conn.execute(
+                    'SELECT 1 FROM seen WHERE student_id = ? AND subject = ? AND question_id = ?',
+                    (student_id, subject, self.bank.question_id(index))).fetchone() is not None
+
+            index = self._index(subject, topic).nearest_unseen(target, student_id, is_seen, self._rng)
+            if index is None:
+                return None
+            question = self.bank.get(index)
+            self._conn.execute('INSERT OR IGNORE INTO seen (student_id, subject, question_id, served_at) '
+                               'VALUES (?, ?, ?, ?)', (student_id, subject, question['id'], time.time()))
+            self._conn.commit()
+            question_rating = self._ratings().get(index, DIFFICULTY_RATINGS.get(question['difficulty'], 0.0))
+        question.update({'ability': round(rating, 3), 'question_rating': round(question_rating, 3),
+                         'expected_success': round(expected_score(rating, question_rating), 3)})
+        return question
+
+    def record_answer(self, student_id: str, subject: str, question_id: Optional[str], correct: bool,
+                      difficulty: Optional[str] = None) -> Dict[str, Any]:
+        """Update the student's ability (and the question's rating, for bank questions) from one graded answer.
+
+        Questions outside the bank (e.g. LLM-generated) are rated by their `difficulty` label.
+        """
+        student_id, subject = str(student_id), subject.lower()
+        with self._lock:
+            rating, answers = self._ability(student_id, subject)
+            bank_index = self.bank.index_of(question_id) if question_id else None
+            item_row = None
+            if bank_index is not None:
+                item_row = self._conn.execute('SELECT rating, answers FROM item_ratings WHERE question_id = ?',
+                                              (question_id,)).fetchone()
+                label = self.bank.difficulty(bank_index)
+            else:
+                label = difficulty or 'intermediate'
+            item_rating, item_answers = item_row if item_row else (DIFFICULTY_RATINGS.get(label, 0.0), 0)
+
+            surprise = (1.0 if correct else 0.0) - expected_score(rating, item_rating)
+            new_rating = rating + student_step(answers) * surprise
+            now = time.time()
+            with self._conn:
+                self._conn.execute(
+                    'INSERT INTO abilities (student_id, subject, rating, answers, updated_at) VALUES (?, ?, ?, ?, ?) '
+                    'ON CONFLICT (student_id, subject) DO UPDATE SET rating = excluded.rating, '
+                    'answers = excluded.answers, updated_at = excluded.updated_at',
+                    (student_id, subject, new_rating, answers + 1, now))
+                if question_id:
+                    self._conn.execute('INSERT OR IGNORE INTO seen (student_id, subject, question_id, served_at) '
+                                       'VALUES (?, ?, ?, ?)', (student_id, subject, question_id, now))
+                if bank_index is not None:
+                    new_item_rating = item_rating - item_step(item_answers) * surprise
+                    self._conn.execute(
+                        'INSERT INTO item_ratings (question_id, subject, rating, answers) VALUES (?, ?, ?, ?) '
+                        'ON CONFLICT (question_id) DO UPDATE SET rating = excluded.rating, answers = excluded.answers',
+                        (question_id, subject, new_item_rating, item_answers + 1))
+            if bank_index is not None and self._item_ratings is not None:
+                old = self._item_ratings.get(bank_index)
+                self._item_ratings[bank_index] = new_item_rating
+                for (index_subject, _), index in self._indexes.items():
+                    if index_subject == subject:
+                        index.move(bank_index, old, new_item_rating)
+
+        target = target_difficulty(new_rating, self.target_success)
+        return {'rating': round(new_rating, 3), 'answers': answers + 1, 'change': round(new_rating - rating, 3),
+                'target_difficulty': round(target, 3), 'difficulty': difficulty_label(target)}
+
+_default_selector: Optional[AbilitySelector] = None
+_default_selector_lock = threading.Lock()
+
+def get_ability_selector() -> AbilitySelector:
+    """Process-wide selector stored at TUTOR_ABILITY_DB (default data/abilities.db)"""
+    global _default_selector
+    with _default_selector_lock:
+        if _default_selector is None:
+            _default_selector = AbilitySelector(os.getenv('TUTOR_ABILITY_DB', DEFAULT_DB_PATH))
+        return _default_selector
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+"""
+Provider Batch APIs
+Submits many LLM requests as one OpenAI or Anthropic batch job and replays bulk tutor work against the results
+"""
+
+import copy
+import hashlib
+import json
+import os
+import time
+import logging
+from abc import ABC, abstractmethod
+from contextvars import ContextVar
+from typing import Dict, Any, Callable, Iterable, Iterator, List, Optional, Tuple
+
+from llm_providers import LLMProvider, MockProvider
+
+logger = logging.getLogger(__name__)
+
+# Requests per submitted job; larger sets are split over several jobs
+MAX_REQUESTS = int(os.getenv('TUTOR_BATCH_API_MAX_REQUESTS', '10000'))
+POLL_SECONDS = float(os.getenv('TUTOR_BATCH_API_POLL_SECONDS', '30'))
+# Batch jobs complete within 24 hours
+TIMEOUT_SECONDS = float(os.getenv('TUTOR_BATCH_API_TIMEOUT', str(24 * 3600)))
+
+# Per-call arguments that do not change the answer, so do not belong in a request's identity
+_TRANSIENT_KWARGS = ('timeout', 'session_id', 'session_turn')
+
+BatchRequest = Tuple[str, str, Dict[str, Any]]  # (custom_id, prompt, provider kwargs)
+
+def request_key(prompt: str, kwargs: Dict[str, Any]) -> str:
+    """Stable custom_id for a provider call: identical calls across bulk items share one batch request"""
+    stable = {name: value for name, value in kwargs.items() if name not in _TRANSIENT_KWARGS}
+    raw = json.dumps([prompt, stable], sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]
+
+def _failure(provider: str, error: str) -> Dict[str, Any]:
+    return {'success': False, 'error': error, 'provider': provider}
+
+class BatchBackend(ABC):
+    """Batch endpoints of one provider; request bodies and results use the provider's own format"""
+
+    name = ''
+
+    def __init__(self, provider: LLMProvider):
+        self.provider = provider
+        self.session = provider.session
+        self.base_url = provider.base_url
+
+    @abstractmethod
+    def submit(self, requests: List[BatchRequest]) -> str:
+        """Create a batch job for the requests; returns its ID"""
+        pass
+
+    @abstractmethod
+    def poll(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        """The job's status when it has finished (None while it is still running)"""
+        pass
+
+    @abstractmethod
+    def fetch(self, batch_id: str, status: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """Provider results of a finished job by custom_id"""
+        pass
+
+    def _check(self, response, action: str):
+        if response.status_code >= 300:
+            raise RuntimeError(f"{self.name} batch {action} failed: {response.status_code} - {response.text[:200]}")
+        return response
+
+    def run(self, requests: List[BatchRequest], poll_seconds: Optional[float] = None,
+            timeout: Optional[float] = None, attached: Optional[Dict[str, List[str]]] = None,
+            on_submit: Optional[Callable[[str, List[str]], None]] = None) -> Dict[str, Dict[str, Any]]:
+        """Submit requests in jobs of MAX_REQUESTS, wait for every job and return results by custom_id.
+
+        `attached` maps already-submitted job IDs to their custom_ids (from an earlier,
+        interrupted run); those are waited for instead of resubmitted. `on_submit` is
+        told about each new job. Requests without a result get a failure result.
+        """
+        poll_seconds = POLL_SECONDS if poll_seconds is None else poll_seconds
+        timeout = TIMEOUT_SECONDS if timeout is None else timeout
+        jobs = dict(attached or {})
+        for start in range(0, len(requests), MAX_REQUESTS):
+            chunk = requests[start:start + MAX_REQUESTS]
+            batch_id = self.submit(chunk)
+            keys = [custom_id for custom_id, _, _ in chunk]
+            logger.info(f"Submitted {self.name} batch {batch_id} with {len(chunk)} requests")
+            jobs[batch_id] = keys
+            if on_submit:
+                on_submit(batch_id, keys)
+
+        results: Dict[str, Dict[str, Any]] = {}
+        waiting = dict(jobs)
+        deadline = time.monotonic() + timeout
+        while waiting:
+            for batch_id in list(waiting):
+                status = self.poll(batch_id)
+                if status is not None:
+                    results.update(self.fetch(batch_id, status))
+                    del waiting[batch_id]
+            if waiting:
+                if time.monotonic() >= deadline:
+                    logger.error(f"{self.name} batches still running after {timeout:.0f}s: {sorted(waiting)}")
+                    break
+                time.sleep(poll_seconds)
+
+        for keys in jobs.values():
+            for custom_id in keys:
+                results.setdefault(custom_id, _failure(self.name, 'no batch result'))
+        return results
+
+class OpenAIBatchBackend(BatchBackend):
+    """OpenAI Batch API: a JSONL file of /v1/chat/completions requests"""
+
+    name = 'openai'
+    ENDPOINT = '/v1/chat/completions'
+    FINISHED = ('completed', 'failed', 'expired', 'cancelled')
+
+    def submit(self, requests: List[BatchRequest]) -> str:
+        lines = [
+            json.dumps({'custom_id': custom_id, 'method': 'POST', 'url': self.ENDPOINT,
+                        'body': self.provider.build_payload(prompt, **kwargs)})
+            for custom_id, prompt, kwargs in requests
+        ]
+        upload = self._check(self.session.post(
+            f"{self.base_url}/files", data={'purpose': 'batch'},
+            files={'file': ('batch.jsonl', ('\n'.join(lines) + '\n').encode('utf-8'), 'application/jsonl')},
+            headers={'Content-Type': None}
+        ), 'upload')
+        job = self._check(self.session.post(f"{self.base_url}/batches", json={
+            'input_file_id': upload.json()['id'], 'endpoint': self.ENDPOINT, 'completion_window': '24h'
+        }), 'create')
+        return job.json()['id']
+
+    def poll(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        status = self._check(self.session.get(f"{self.base_url}/batches/{batch_id}"), 'status').json()
+        return status if status.get('status') in self.FINISHED else None
+
+    def _lines(self, file_id: Optional[str]) -> Iterator[Dict[str, Any]]:
+        if not file_id:
+            return
+        response = self._check(self.session.get(f"{self.base_url}/files/{file_id}/content"), 'download')
+        for line in response.text.splitlines():
+            if line.strip():
+                yield json.loads(line)
+
+    def fetch(self, batch_id: str, status: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        if status.get('status') != 'completed':
+            logger.error(f"OpenAI batch {batch_id} ended as {status.get('status')}")
+        results = {}
+        for line in list(self._lines(status.get('output_file_id'))) + list(self._lines(status.get('error_file_id'))):
+            response = line.get('response') or {}
+            if response.get('status_code') == 200 and not line.get('error'):
+                results[line['custom_id']] = self.provider.parse_result(response['body'])
+            else:
+                error = line.get('error') or response.get('body', {}).get('error') or response.get('status_code')
+                results[line['custom_id']] = _failure(self.name, f"Batch request failed: {error}")
+        return results
+
+class AnthropicBatchBackend(BatchBackend):
+    """Anthropic Message Batches API"""
+
+    name = 'anthropic'
+
+    def submit(self, requests: List[BatchRequest]) -> str:
+        job = self._check(self.session.post(f"{self.base_url}/messages/batches", json={'requests': [
+            {'custom_id': custom_id, 'params': self.provider.build_payload(prompt, **kwargs)}
+            for custom_id, prompt, kwargs in requests
+        ]}), 'create')
+        return job.json()['id']
+
+    def poll(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        status = self._check(self.session.get(f"{self.base_url}/messages/batches/{batch_id}"), 'status').json()
+        return status if status.get('processing_status') == 'ended' else None
+
+    def fetch(self, batch_id: str, status: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        url = status.get('results_url') or f"{self.base_url}/messages/batches/{batch_id}/results"
+        response = self._check(self.session.get(url), 'download')
+        results = {}
+        for line in response.text.splitlines():
+            if not line.strip():
+                continue
+            entry = json.loads(line)
+            result = entry.get('result') or {}
+            if result.get('type') == 'succeeded':
+                results[entry['custom_id']] = self.provider.parse_result(result['message'])
+            else:
+                error = result.get('error') or result.get('type')
+                results[entry['custom_id']] = _failure(self.name, f"Batch request failed: {error}")
+        return results
+
+BACKENDS = {'openai': OpenAIBatchBackend, 'anthropic': AnthropicBatchBackend}
+
+def create_backend(name: str, llm_manager=None) -> BatchBackend:
+    """Batch backend for a configured provider (OPENAI_/ANTHROPIC_ API key, model and base URL)"""
+    from llm_config import get_llm_manager
+    from llm_providers import LLMProviderFactory
+
+    if name not in BACKENDS:
+        raise ValueError(f"No batch API for provider {name!r} (available: {', '.join(BACKENDS)})")
+    config = (llm_manager or get_llm_manager()).get_config(name)
+    if config is None:
+        raise ValueError(f"Provider {name!r} is not configured")
+    return BACKENDS[name](LLMProviderFactory.create_provider(name, config))
+
+_pending: ContextVar[Optional[Dict[str, BatchRequest]]] = ContextVar('tutor_batch_pending', default=None)
+
+class DeferredProvider(LLMProvider):
+    """Stands in for a batch backend's provider: answers from batch results, records calls it has none for"""
+
+    def __init__(self, backend: BatchBackend):
+        self.backend = backend
+        self.config = backend.provider.config
+        self.supports_structured_output = backend.provider.supports_structured_output
+        self.supports_images = backend.provider.supports_images
+        self.results: Dict[str, Dict[str, Any]] = {}
+
+    def is_available(self) -> bool:
+        return True
+
+    def generate_response(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        key = request_key(prompt, kwargs)
+        result = self.results.get(key)
+        if result is not None:
+            return dict(result)
+        pending = _pending.get()
+        if pending is not None:
+            pending[key] = (key, prompt, {name: value for name, value in kwargs.items()
+                                          if name not in _TRANSIENT_KWARGS})
+        return _failure(self.backend.name, 'deferred to a batch job')
+
+def _read_journal(path: Optional[str]) -> Dict[str, List[str]]:
+    jobs: Dict[str, List[str]] = {}
+    if path and os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue
+                if entry.get('done'):
+                    jobs.pop(entry['batch_id'], None)
+                else:
+                    jobs[entry['batch_id']] = entry['keys']
+    return jobs
+
+def _append_journal(path: Optional[str], entry: Dict[str, Any]):
+    if path:
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry) + '\n')
+
+def run_deferred(tutor, backend: BatchBackend, items: Iterable[Any], call: Callable[[Any, Any], Any],
+                 max_rounds: int = 4, journal_path: Optional[str] = None,
+                 poll_seconds: Optional[float] = None) -> Iterator[Tuple[Any, Any, Optional[Exception]]]:
+    """Run `call(tutor, item)` for bulk items with their LLM calls answered by batch jobs.
+
+    Each round runs the unfinished items on a shallow copy of the tutor whose
+    providers are a DeferredProvider (and the mock), so the shared tutor keeps
+    serving other callers unchanged; `call` must use the tutor it is given.
+    Calls without a batch result are recorded, and their items finish with
+    throwaway mock output. The recorded calls are then
+    submitted as batch jobs, and the items are run again against the results.
+    Items with several dependent calls take one round per step, up to `max_rounds`.
+    Yields (item, result, error) as items finish.
+
+    Submitted job IDs go to `journal_path`, so an interrupted run waits for its
+    jobs instead of resubmitting them. Items run once per round, so calls should be
+    free of side effects other than their result (e.g. no conversation sessions).
+    """
+    deferred = DeferredProvider(backend)
+    batch_tutor = copy.copy(tutor)
+    batch_tutor.providers = {backend.name: deferred, 'mock': MockProvider()}
+    # A summarizer made by the original tutor would call back into its providers
+    batch_tutor._summarizer = None
+    yield from _deferred_rounds(batch_tutor, backend, deferred, list(items), call, max_rounds, journal_path,
+                                poll_seconds)
+
+def _deferred_rounds(tutor, backend: BatchBackend, deferred: DeferredProvider, remaining: List[Any],
+                     call: Callable[[Any, Any], Any], max_rounds: int, journal_path: Optional[str],
+                     poll_seconds: Optional[float]) -> Iterator[Tuple[Any, Any, Optional[Exception]]]:
+    for round_number in range(max_rounds + 1):
+        final = round_number == max_rounds
+        requests: Dict[str, BatchRequest] = {}
+        unfinished = []
+        for item in remaining:
+            pending: Dict[str, BatchRequest] = {}
+            token = _pending.set(None if final else pending)
+            try:
+                result, error = call(tutor, item), None
+            except Exception as e:
+                result, error = None, e
+            finally:
+                _pending.reset(token)
+            if pending:
+                requests.update(pending)
+                unfinished.append(item)
+            else:
+                yield item, result, error
+        if not unfinished:
+            return
+
+        journal = _read_journal(journal_path)
+        journaled = {key for keys in journal.values() for key in keys}
+        attached = {batch_id: keys for batch_id, keys in journal.items() if set(keys) & set(requests)}
+        new_requests = [request for key, request in requests.items() if key not in journaled]
+        logger.info(f"Batch round {round_number + 1}: {len(new_requests)} new requests for {len(unfinished)} items")
+
+        submitted = list(attached)
+
+        def on_submit(batch_id, keys):
+            submitted.append(batch_id)
+            _append_journal(journal_path, {'batch_id': batch_id, 'keys': keys})
+
+        deferred.results.update(backend.run(new_requests, poll_seconds=poll_seconds, attached=attached,
+                                            on_submit=on_submit))
+        for batch_id in submitted:
+            _append_journal(journal_path, {'batch_id': batch_id, 'done': True})
+        remaining = unfinished
@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+Batch Runner
+Runs a JSON-lines file of tutor requests in one process with bounded concurrency, resumable after interruption
+"""
+
+import argparse
+import json
+import logging
+import os
+import time
+from typing import Dict, Any, Iterator, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CONCURRENCY = int(os.getenv('TUTOR_BATCH_CONCURRENCY', '4'))
+
+def request_id(request: Optional[Dict[str, Any]], line_number: int) -> str:
+    """A request's `id`, or its line number in the input file"""
+    if isinstance(request, dict) and request.get('id') is not None:
+        return str(request['id'])
+    return str(line_number)
+
+def iter_requests(path: str) -> Iterator[Tuple[int, Optional[Dict[str, Any]], Optional[str]]]:
+    """(line number, request, parse error) for each non-blank input line"""
+    with open(path, encoding='utf-8') as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                request = json.loads(line)
+            except ValueError as e:
+                yield line_number, None, f"Invalid JSON: {e}"
+                continue
+            if not isinstance(request, dict):
+                yield line_number, None, 'Request must be a JSON object'
+                continue
+            yield line_number, request, None
+
+def is_fallback(result: Any) -> bool:
+    """Whether a tutor result is a stand-in rather than a real answer (an error, or the mock provider's)"""
+    return isinstance(result, dict) and ('error' in result or result.get('provider') == 'mock')
+
+def completed_ids(path: str) -> Set[str]:
+    """IDs that already have a successful result in an output file (failed and fallback ones are retried)"""
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                # A torn final line from an interrupted run; that request is simply redone
+                continue
+            if record.get('status') == 'ok':
+                done.add(str(record.get('id')))
+            else:
+                done.discard(str(record.get('id')))
+    return done
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b'\n'
+
+def run_batch(tutor, input_path: str, output_path: str, concurrency: int = DEFAULT_CONCURRENCY,
+              ordered: bool = False, batch_backend=None) -> Dict[str, int]:
+    """Run every request in `input_path` that has no successful result in `output_path` yet.
+
+    Requests have the shape main() accepts and run through handle_request, at
+    background priority unless they set `priority`. At most `concurrency` run at
+    a time. Each result is appended to the output as one JSON line carrying the
+    request's `id` (default: its line number), as soon as it finishes or, with
+    `ordered`, in input order. The output is the checkpoint: rerunning the same
+    command skips requests that already succeeded. Results that are only a
+    fallback (an `error` key, or the mock provider's canned answer) are written
+    with status `fallback` and retried by the next run, like failures.
+
+    With a `batch_backend` (see batch_api.py) the LLM calls of all requests are
+    sent as provider batch jobs instead, and job IDs are kept next to the output
+    in `<output>.batches` so a rerun picks up jobs that are still running.
+    """
+    from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+    from enhanced_ai_agent import handle_request
+
+    concurrency = max(1, concurrency)
+    done = completed_ids(output_path)
+    stats = {'total': 0, 'skipped': 0, 'succeeded': 0, 'fallback': 0, 'failed': 0}
+    started = time.time()
+
+    def execute(request, error, runner=tutor):
+        if error:
+            raise ValueError(error)
+        return handle_request(runner, dict(request, priority=request.get('priority', 'background')))
+
+    def todo():
+        sequence = 0
+        for line_number, request, error in iter_requests(input_path):
+            stats['total'] += 1
+            item_id = request_id(request, line_number)
+            if item_id in done:
+                stats['skipped'] += 1
+                continue
+            yield sequence, item_id, line_number, request, error
+            sequence += 1
+
+    with open(output_path, 'a', encoding='utf-8') as out:
+        if out.tell() and not _ends_with_newline(output_path):
+            out.write('\n')  # terminate a line torn by an interrupted run
+        finished_records: Dict[int, Dict[str, Any]] = {}
+        next_sequence = 0
+
+        def write(record):
+            out.write(json.dumps(record, separators=(',', ':'), default=str) + '\n')
+            out.flush()
+
+        def record(item, result, error):
+            # Runs on this thread only, so writes and counters need no locking
+            nonlocal next_sequence
+            sequence, item_id, line_number = item[:3]
+            if error is None and is_fallback(result):
+                # Kept for inspection, but not a checkpoint: the next run retries it
+                logger.warning(f"Batch request {item_id} (line {line_number}) got a fallback result")
+                entry = {'id': item_id, 'line': line_number, 'status': 'fallback', 'result': result}
+                stats['fallback'] += 1
+            elif error is None:
+                entry = {'id': item_id, 'line': line_number, 'status': 'ok', 'result': result}
+                stats['succeeded'] += 1
+            else:
+                logger.error(f"Batch request {item_id} (line {line_number}) failed: {error}")
+                entry = {'id': item_id, 'line': line_number, 'status': 'error', 'error': str(error)}
+                stats['failed'] += 1
+            if not ordered:
+                write(entry)
+                return
+            finished_records[sequence] = entry
+            while next_sequence in finished_records:
+                write(finished_records.pop(next_sequence))
+                next_sequence += 1
+
+        if batch_backend is not None:
+            from batch_api import run_deferred
+
+            for item, result, error in run_deferred(tutor, batch_backend, list(todo()),
+                                                    lambda batch_tutor, item: execute(*item[3:], batch_tutor),
+                                                    journal_path=output_path + '.batches'):
+                record(item, result, error)
+        else:
+            with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                in_flight = {}
+
+                def drain():
+                    finished, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                    for future in sorted(finished, key=lambda f: in_flight[f][0]):
+                        item = in_flight.pop(future)
+                        try:
+                            record(item, future.result(), None)
+                        except Exception as e:
+                            record(item, None, e)
+
+                for item in todo():
+                    in_flight[pool.submit(execute, *item[3:])] = item
+                    # Results held back for ordering count against the window too, so memory stays bounded
+                    while len(in_flight) + len(finished_records) >= concurrency * 2 and in_flight:
+                        drain()
+                while in_flight:
+                    drain()
+
+    stats['seconds'] = round(time.time() - started, 1)
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a JSON-lines file of tutor requests')
+    parser.add_argument('input', help='requests, one JSON object per line (same shape as enhanced_ai_agent.py)')
+    parser.add_argument('output', help='results file (JSON lines); also the checkpoint for resuming')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help='requests run at once')
+    parser.add_argument('--ordered', action='store_true', help='write results in input order')
+    parser.add_argument('--batch-api', choices=['openai', 'anthropic'],
+                        help='send LLM calls as provider batch jobs (slower, for non-interactive work)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    from enhanced_ai_agent import EnhancedAITutor
+
+    backend = None
+    if args.batch_api:
+        from batch_api import create_backend
+        backend = create_backend(args.batch_api)
+    print(json.dumps(run_batch(EnhancedAITutor(), args.input, args.output, args.concurrency, args.ordered, backend)))
+
+if __name__ == '__main__':
+    main()
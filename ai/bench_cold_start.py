@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+"""
+Cold-Start Benchmark
+Measures per-process startup cost of the agent entry points against a fixed budget
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, Any, List
+
+AI_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Budgets are milliseconds above a bare `python -c pass` on the same host
+COLD_START_BUDGET_MS = {
+    'import_agent': 75.0,
+    'cached_provider_status': 100.0
+}
+
+# Modules that must not be loaded just by importing the agent
+LAZY_MODULES = ['requests', 'urllib3', 'llm_providers']
+
+def _time_command(args: List[str], env: Dict[str, str], runs: int) -> List[float]:
+    """Wall-clock milliseconds for each of `runs` fresh interpreter launches"""
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(args, cwd=AI_DIR, env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+def _summary(timings: List[float]) -> Dict[str, float]:
+    ordered = sorted(timings)
+    return {
+        'median_ms': round(statistics.median(ordered), 2),
+        'p90_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.9))], 2),
+        'min_ms': round(ordered[0], 2)
+    }
+
+def run_benchmark(runs: int = 20) -> Dict[str, Any]:
+    """Run all cold-start scenarios and compare medians with the budget"""
+    python = sys.executable
+    cache_dir = tempfile.mkdtemp(prefix='ai_tutor_bench_')
+    env = dict(os.environ, PROVIDER_STATUS_CACHE=os.path.join(cache_dir, 'provider_status.json'))
+    status_request = json.dumps({'action': 'get_provider_status'})
+
+    # Prime the provider status cache once so the measured runs take the cached path
+    subprocess.run([python, 'enhanced_ai_agent.py', status_request], cwd=AI_DIR, env=env,
+                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    baseline = _summary(_time_command([python, '-c', 'pass'], env, runs))
+    scenarios = {
+        'import_agent': _summary(_time_command([python, '-c', 'import enhanced_ai_agent'], env, runs)),
+        'cached_provider_status': _summary(_time_command([python, 'enhanced_ai_agent.py', status_request], env, runs))
+    }
+
+    probe = subprocess.run(
+        [python, '-c', 'import sys, json, enhanced_ai_agent; '
+                       f'print(json.dumps([m for m in {LAZY_MODULES!r} if m in sys.modules]))'],
+        cwd=AI_DIR, env=env, check=True, capture_output=True, text=True
+    )
+    eagerly_loaded = json.loads(probe.stdout.strip() or '[]')
+
+    within_budget = not eagerly_loaded
+    for name, summary in scenarios.items():
+        overhead = summary['median_ms'] - baseline['median_ms']
+        summary['overhead_ms'] = round(overhead, 2)
+        summary['budget_ms'] = COLD_START_BUDGET_MS[name]
+        summary['within_budget'] = overhead <= COLD_START_BUDGET_MS[name]
+        within_budget = within_budget and summary['within_budget']
+
+    return {
+        'runs': runs,
+        'baseline_interpreter': baseline,
+        'scenarios': scenarios,
+        'eagerly_loaded_modules': eagerly_loaded,
+        'within_budget': within_budget
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure agent cold-start time against the documented budget')
+    parser.add_argument('--runs', type=int, default=20, help='interpreter launches per scenario')
+    args = parser.parse_args()
+
+    report = run_benchmark(args.runs)
+    print(json.dumps(report, indent=2))
+    sys.exit(0 if report['within_budget'] else 1)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""
+Content-Addressed Cache
+Small LRU cache of JSON-serializable values with optional SQLite persistence
+"""
+
+import json
+import os
+import threading
+import time
+import logging
+from collections import OrderedDict
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_ENTRIES = int(os.getenv('TUTOR_CACHE_MAX_ENTRIES', '2048'))
+
+class ContentCache:
+    """LRU cache for values keyed by content hash.
+
+    Entries live in memory up to `max_entries`; when `db_path` is set they are also
+    written to a shared SQLite table (partitioned by `namespace`) so that other
+    processes and later runs can reuse them.
+    """
+
+    def __init__(self, namespace: str, max_entries: int = DEFAULT_MAX_ENTRIES, db_path: Optional[str] = None):
+        self.namespace = namespace
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+
+        if db_path:
+            self._open_db()
+
+    def _open_db(self):
+        import sqlite3
+
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5.0)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.execute('''
+            CREATE TABLE IF NOT EXISTS cache_entries (
+                namespace TEXT NOT NULL,
+                key TEXT NOT NULL,
+                value TEXT NOT NULL,
+                created REAL NOT NULL,
+                PRIMARY KEY (namespace, key)
+            )
+        ''')
+        self._conn.commit()
+
+    def _remember(self, key: str, value: Any):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return the cached value or None"""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+
+            if self._conn is not None:
+                row = self._conn.execute(
+                    'SELECT value FROM cache_entries WHERE namespace = ? AND key = ?',
+                    (self.namespace, key)
+                ).fetchone()
+                if row is not None:
+                    value = json.loads(row[0])
+                    self._remember(key, value)
+                    self.hits += 1
+                    return value
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: Any):
+        """Store a value (must be JSON-serializable when persistence is enabled)"""
+        with self._lock:
+            self._remember(key, value)
+            if self._conn is not None:
+                try:
+                    self._conn.execute(
+                        'INSERT OR REPLACE INTO cache_entries (namespace, key, value, created) VALUES (?, ?, ?, ?)',
+                        (self.namespace, key, json.dumps(value), time.time())
+                    )
+                    self._conn.commit()
+                except Exception as e:
+                    logger.warning(f"Cache write to {self.db_path} failed: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'namespace': self.namespace,
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+_caches: Dict[str, ContentCache] = {}
+_caches_lock = threading.Lock()
+
+def get_content_cache(namespace: str, max_entries: int = DEFAULT_MAX_ENTRIES) -> ContentCache:
+    """Process-wide cache for a namespace.
+
+    TUTOR_CACHE_DB selects the shared SQLite file (default: a file in the temp
+    directory); set it to an empty string to keep caches in memory only.
+    """
+    with _caches_lock:
+        cache = _caches.get(namespace)
+        if cache is None:
+            db_path = os.getenv('TUTOR_CACHE_DB')
+            if db_path is None:
+                import tempfile
+                db_path = os.path.join(tempfile.gettempdir(), 'ai_tutor_cache.db')
+            cache = _caches[namespace] = ContentCache(namespace, max_entries, db_path or None)
+        return cache
@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+"""
+Shared test helpers
+Importable from test modules (`from conftest import fill_schema`)
+"""
+
+def fill_schema(schema, text, number=None):
+    """Smallest object matching a response schema, with every string set to `text`.
+
+    Numbers are `number` when given, else the schema minimum (or 1).
+    """
+    if 'enum' in schema:
+        return schema['enum'][0]
+    kind = schema.get('type')
+    if kind == 'object':
+        return {name: fill_schema(sub, text, number) for name, sub in schema.get('properties', {}).items()}
+    if kind == 'array':
+        return [fill_schema(schema.get('items', {}), text, number)]
+    if kind in ('integer', 'number'):
+        return schema.get('minimum', 1) if number is None else number
+    if kind == 'boolean':
+        return True
+    return text
@@ -0,0 +1,213 @@
+#!/usr/bin/env python3
+"""
+Rolling Conversation Summaries
+Folds older tutoring turns into a cached summary so prompts stay constant-size
+"""
+
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Callable
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TOKEN_THRESHOLD = int(os.getenv('TUTOR_SUMMARY_TOKEN_THRESHOLD', '1200'))
+DEFAULT_KEEP_RECENT = int(os.getenv('TUTOR_SUMMARY_KEEP_RECENT', '4'))
+# A detached fold younger than this is assumed to still be running and is not started again
+FOLD_CLAIM_TTL = float(os.getenv('TUTOR_SUMMARY_CLAIM_TTL', '120'))
+
+def estimate_tokens(text: str) -> int:
+    """Rough token estimate (~4 characters per token) good enough for budgeting"""
+    return (len(text or '') + 3) // 4
+
+def _turn_tokens(turn: Dict[str, str]) -> int:
+    return estimate_tokens(turn.get('student', '')) + estimate_tokens(turn.get('tutor', ''))
+
+def prefix_keys(history: List[Dict[str, str]], base_summary: str = '') -> List[str]:
+    """Chained hashes where keys[i] identifies base_summary plus the first i turns"""
+    digest = hashlib.sha256(('summary:' + (base_summary or '')).encode('utf-8')).hexdigest()
+    keys = [digest]
+    for turn in history:
+        payload = json.dumps([turn.get('student', ''), turn.get('tutor', '')], ensure_ascii=False)
+        digest = hashlib.sha256((digest + payload).encode('utf-8')).hexdigest()
+        keys.append(digest)
+    return keys
+
+def extractive_summary(previous_summary: str, turns: List[Dict[str, str]], max_chars: int = 600) -> str:
+    """Local fallback: keep the student's questions, newest last, within a size cap"""
+    topics = [turn.get('student', '').strip() for turn in turns if turn.get('student', '').strip()]
+    parts = ([previous_summary] if previous_summary else []) + [f"Student asked: {t[:120]}" for t in topics]
+    text = ' '.join(parts)
+    return text[-max_chars:] if len(text) > max_chars else text
+
+@dataclass
+class PreparedHistory:
+    """History ready for prompting: a summary plus the turns to include verbatim"""
+    summary: str
+    recent: List[Dict[str, str]]
+    covered: int
+    covered_summary: str
+
+class RollingSummarizer:
+    """Keeps long conversations at a constant prompt size.
+
+    Once the history exceeds `token_threshold`, everything except the last
+    `keep_recent` turns is folded into a summary. Summaries are cached under the
+    hash of the history prefix they cover and computed in the background: a call
+    uses the longest prefix that already has a summary and schedules the fold for
+    the current prefix, so no request waits on summarization and no prefix is
+    summarized twice.
+
+    With `background=False` no threads are started; folds are recorded instead
+    and handed out by `take_deferred`, for one-shot processes that must not
+    wait on them before exiting (see `spawn_fold_process`).
+    """
+
+    def __init__(self, summarize_fn: Callable[[str, List[Dict[str, str]]], Optional[str]], cache,
+                 token_threshold: int = DEFAULT_TOKEN_THRESHOLD, keep_recent: int = DEFAULT_KEEP_RECENT,
+                 background: bool = True):
+        self.summarize_fn = summarize_fn
+        self.cache = cache
+        self.token_threshold = token_threshold
+        self.keep_recent = keep_recent
+        self.background = background
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._pending: Dict[str, Any] = {}
+        self._deferred: Dict[str, Dict[str, Any]] = {}
+        # Re-entrant: a done-callback can fire synchronously while _schedule holds the lock
+        self._lock = threading.RLock()
+
+    def prepare(self, history: List[Dict[str, str]], base_summary: str = '') -> PreparedHistory:
+        """Split history into a summary plus the recent turns to send verbatim"""
+        history = history or []
+        total = estimate_tokens(base_summary) + sum(_turn_tokens(turn) for turn in history)
+        target = len(history) - self.keep_recent
+        if total <= self.token_threshold or target <= 0:
+            return PreparedHistory(base_summary, history, 0, base_summary)
+
+        keys = prefix_keys(history[:target], base_summary)
+
+        covered, summary = 0, base_summary
+        for i in range(target, 0, -1):
+            cached = self.cache.get(keys[i])
+            if cached is not None:
+                covered, summary = i, cached
+                break
+
+        prompt_summary = summary
+        if covered < target:
+            # Cached both under the whole prefix (for callers that resend the full history) and
+            # relative to the summary it extends (for callers that fold `covered` turns away and
+            # pass that summary as their next base, like the session store)
+            fold_key = prefix_keys(history[covered:target], summary)[-1]
+            aliases = [keys[target]] if keys[target] != fold_key else []
+            self._schedule(fold_key, summary, history[covered:target], aliases)
+            # Until the fold lands, cover the gap with a bounded extractive summary
+            prompt_summary = extractive_summary(summary, history[covered:target])
+
+        return PreparedHistory(prompt_summary, history[target:], covered, summary)
+
+    def _schedule(self, key: str, previous_summary: str, turns: List[Dict[str, str]], aliases: List[str] = ()):
+        with self._lock:
+            if key in self._pending or key in self._deferred:
+                return
+            if not self.background:
+                self._deferred[key] = {'key': key, 'previous_summary': previous_summary, 'turns': list(turns),
+                                       'aliases': list(aliases)}
+                return
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='summary')
+            future = self._executor.submit(self._fold, key, previous_summary, list(turns), list(aliases))
+            self._pending[key] = future
+            future.add_done_callback(lambda _f, k=key: self._done(k))
+
+    def _done(self, key: str):
+        with self._lock:
+            self._pending.pop(key, None)
+
+    def _fold(self, key: str, previous_summary: str, turns: List[Dict[str, str]], aliases: List[str] = ()):
+        try:
+            summary = self.summarize_fn(previous_summary, turns)
+        except Exception as e:
+            logger.error(f"Conversation summarization failed: {e}")
+            summary = None
+
+        # Only real summaries are cached; the extractive fallback is recomputed when needed
+        if summary:
+            for cache_key in [key, *aliases]:
+                self.cache.set(cache_key, summary)
+
+    def take_deferred(self) -> List[Dict[str, Any]]:
+        """Remove and return the folds recorded while background threads are off"""
+        with self._lock:
+            jobs = list(self._deferred.values())
+            self._deferred.clear()
+        return jobs
+
+    def run_folds(self, jobs: List[Dict[str, Any]]):
+        """Compute folds synchronously, skipping any that another process already cached"""
+        for job in jobs:
+            if self.cache.get(job['key']) is None:
+                self._fold(job['key'], job['previous_summary'], job['turns'], job.get('aliases', []))
+
+    def wait_for_pending(self, timeout: Optional[float] = None) -> bool:
+        """Block until scheduled folds finish (used by one-shot CLI processes)"""
+        with self._lock:
+            futures = list(self._pending.values())
+        if not futures:
+            return True
+        _, not_done = wait(futures, timeout=timeout)
+        return not not_done
+
+def spawn_fold_process(jobs: List[Dict[str, Any]], claims=None) -> Optional[int]:
+    """Compute folds in a detached process and return its pid without waiting for it.
+
+    The jobs are written to a temporary file that the child reads and removes.
+    The child gets its own session and no inherited stdio, so a caller waiting
+    for this process's output to close is not held up by it. With a `claims`
+    cache, folds another process started within FOLD_CLAIM_TTL are skipped.
+    """
+    if claims is not None:
+        now = time.time()
+        jobs = [job for job in jobs if (claims.get(job['key']) or 0) < now - FOLD_CLAIM_TTL]
+        for job in jobs:
+            claims.set(job['key'], now)
+    if not jobs:
+        return None
+
+    try:
+        fd, path = tempfile.mkstemp(prefix='tutor-folds-', suffix='.json')
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(jobs, f, ensure_ascii=False)
+        process = subprocess.Popen(
+            [sys.executable, os.path.abspath(__file__), path],
+            stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            close_fds=True, start_new_session=True
+        )
+    except OSError as e:
+        logger.warning(f"Could not start conversation summary process: {e}")
+        return None
+    return process.pid
+
+def main():
+    """Detached fold process: summarize the jobs in the given file into the shared cache"""
+    if len(sys.argv) != 2:
+        sys.exit('usage: conversation_summary.py JOBS_FILE')
+
+    with open(sys.argv[1], encoding='utf-8') as f:
+        jobs = json.load(f)
+    os.unlink(sys.argv[1])
+
+    from enhanced_ai_agent import EnhancedAITutor
+    EnhancedAITutor().summarizer.run_folds(jobs)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""
+Dynamic Request Batching
+Groups concurrent inference requests into length-bucketed batches for a single model worker
+"""
+
+import threading
+import time
+import logging
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+from typing import Dict, Any, List, Callable, Hashable, Optional
+
+logger = logging.getLogger(__name__)
+
+class _PendingRequest:
+    __slots__ = ('payload', 'future', 'enqueued')
+
+    def __init__(self, payload: Any):
+        self.payload = payload
+        self.future: Future = Future()
+        self.enqueued = time.monotonic()
+
+class DynamicBatcher:
+    """Collects concurrent requests and runs them through `process_batch` together.
+
+    Requests are grouped by `bucket_key(payload)` (e.g. padded-length bucket plus
+    generation settings) so each batch only pads to the longest sequence of
+    similar-length inputs. A bucket is dispatched as soon as it holds
+    `max_batch_size` requests or its oldest request has waited `max_wait`
+    seconds; a lone request under light load therefore waits at most `max_wait`.
+    `process_batch` receives a list of payloads and must return one result per
+    payload, in order. Batches run one at a time on a single background thread.
+    """
+
+    def __init__(self, process_batch: Callable[[List[Any]], List[Any]], max_batch_size: int = 8,
+                 max_wait: float = 0.02, bucket_key: Optional[Callable[[Any], Hashable]] = None,
+                 name: str = 'dynamic-batcher'):
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait
+        self.bucket_key = bucket_key or (lambda payload: None)
+        self._buckets: Dict[Hashable, List[_PendingRequest]] = {}
+        self._cond = threading.Condition()
+        self._closed = False
+        self._stats = {'batches': 0, 'requests': 0, 'largest_batch': 0}
+        self._thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self._thread.start()
+
+    def submit(self, payload: Any) -> Future:
+        """Queue one request; the returned future resolves to its result"""
+        request = _PendingRequest(payload)
+        key = self.bucket_key(payload)
+        with self._cond:
+            if self._closed:
+                raise RuntimeError('Batcher is closed')
+            self._buckets.setdefault(key, []).append(request)
+            self._cond.notify()
+        return request.future
+
+    def __call__(self, payload: Any, timeout: Optional[float] = None) -> Any:
+        """Submit a request and block until its result is ready.
+
+        On timeout the request is cancelled, so it is dropped if it has not been
+        batched yet instead of computing a result nobody will read.
+        """
+        future = self.submit(payload)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise
+
+    def _next_batch(self) -> Optional[List[_PendingRequest]]:
+        """Wait for a bucket that is full or has timed out, and take a batch from it"""
+        with self._cond:
+            while True:
+                if not self._buckets:
+                    if self._closed:
+                        return None
+                    self._cond.wait()
+                    continue
+
+                ready_key, oldest_key, oldest = None, None, None
+                for key, requests in self._buckets.items():
+                    if len(requests) >= self.max_batch_size or self._closed:
+                        ready_key = key
+                        break
+                    if oldest is None or requests[0].enqueued < oldest:
+                        oldest_key, oldest = key, requests[0].enqueued
+
+                if ready_key is None:
+                    wait = oldest + self.max_wait - time.monotonic()
+                    if wait > 0:
+                        self._cond.wait(wait)
+                        continue
+                    ready_key = oldest_key
+
+                requests = self._buckets[ready_key]
+                batch = requests[:self.max_batch_size]
+                del requests[:self.max_batch_size]
+                if not requests:
+                    del self._buckets[ready_key]
+                return batch
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+            # Drop requests whose callers gave up while they were queued
+            batch = [request for request in batch if request.future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                results = self.process_batch([request.payload for request in batch])
+                if len(results) != len(batch):
+                    raise RuntimeError(f'process_batch returned {len(results)} results for {len(batch)} requests')
+            except Exception as e:
+                logger.error(f"Batch of {len(batch)} failed: {e}")
+                for request in batch:
+                    request.future.set_exception(e)
+                continue
+
+            for request, result in zip(batch, results):
+                request.future.set_result(result)
+
+            with self._cond:
+                self._stats['batches'] += 1
+                self._stats['requests'] += len(batch)
+                self._stats['largest_batch'] = max(self._stats['largest_batch'], len(batch))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            stats = dict(self._stats)
+            stats['queued'] = sum(len(requests) for requests in self._buckets.values())
+        stats['mean_batch_size'] = round(stats['requests'] / stats['batches'], 2) if stats['batches'] else 0.0
+        return stats
+
+    def close(self, timeout: Optional[float] = None):
+        """Flush queued requests, then stop the background thread"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self._thread.join(timeout)
@@ -5,48 +5,103 @@ Integrates multiple LLM providers with advanced educational features
 """
 
 import json
+import os
 import sys
 import logging
+import threading
 import time
 from typing import Dict, Any, List, Optional
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
-# Import our modules
-from llm_config import llm_manager
-from llm_providers import LLMProviderFactory
+# Import our modules (provider implementations are loaded on first use)
+import request_context
+from llm_config import get_llm_manager
 from prompt_templates import PromptTemplates
+from response_schemas import RESPONSE_SCHEMAS, validate_response
+from tracing import span, annotate, traced
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+PROVIDER_STATUS_TTL = int(os.getenv('PROVIDER_STATUS_TTL', '300'))
+HISTORY_WINDOW = int(os.getenv('TUTOR_HISTORY_WINDOW', '5'))
+BACKGROUND_WAIT = float(os.getenv('TUTOR_BACKGROUND_WAIT', '10'))
+ERROR_HISTORY_LIMIT = int(os.getenv('TUTOR_ERROR_HISTORY_LIMIT', '500'))
+
 class EnhancedAITutor:
-    """Enhanced AI Tutor with multi-provider LLM integration"""
+    """Enhanced AI Tutor with multi-provider LLM integration
+    
+    One instance can serve many threads at once. Its configuration and provider
+    map are replaced, never mutated, after initialization; lazy initialization
+    runs once under a lock; providers keep one HTTP session per thread; and the
+    caches, stores and schedulers it uses are locked process-wide singletons.
+    """
+    
+    def __init__(self, background_summaries: bool = True):
+        self.difficulty_levels = ('beginner', 'intermediate', 'advanced')
+        self.llm_manager = get_llm_manager()
+        self.background_summaries = background_summaries
+        self._providers = None
+        self._summarizer = None
+        self._init_lock = threading.Lock()
+    
+    @property
+    def providers(self) -> Dict[str, Any]:
+        """Provider instances, initialized on first use rather than at construction"""
+        providers = self._providers
+        if providers is None:
+            with self._init_lock:
+                if self._providers is None:
+                    self._initialize_providers()
+                providers = self._providers
+        return providers
     
-    def __init__(self):
-        self.difficulty_levels = ['beginner', 'intermediate', 'advanced']
-        self.llm_manager = llm_manager
-        self.providers = {}
-        self._initialize_providers()
+    @providers.setter
+    def providers(self, value: Dict[str, Any]):
+        self._providers = value
+    
+    @property
+    def summarizer(self):
+        """Rolling conversation summarizer, created on first long conversation"""
+        summarizer = self._summarizer
+        if summarizer is None:
+            from cache_store import get_content_cache
+            from conversation_summary import RollingSummarizer
+            with self._init_lock:
+                if self._summarizer is None:
+                    self._summarizer = RollingSummarizer(
+                        self._summarize_conversation,
+                        get_content_cache('conversation_summaries'),
+                        background=self.background_summaries
+                    )
+                summarizer = self._summarizer
+        return summarizer
         
     def _initialize_providers(self):
         """Initialize available LLM providers"""
+        from llm_providers import LLMProviderFactory
+        
+        providers = {}
         available_providers = self.llm_manager.get_available_providers()
         
         for provider_name in available_providers:
             config = self.llm_manager.get_config(provider_name)
             if config:
-                provider = LLMProviderFactory.create_provider(provider_name, config)
+                try:
+                    provider = LLMProviderFactory.create_provider(provider_name, config)
+                except Exception as e:
+                    logger.warning(f"⚠️ {provider_name} provider failed to initialize: {e}")
+                    continue
                 if provider.is_available():
-                    self.providers[provider_name] = provider
+                    providers[provider_name] = provider
                     logger.info(f"✅ Initialized {provider_name} provider")
                 else:
                     logger.warning(f"⚠️ {provider_name} provider not available")
         
         # Always add mock provider as fallback
-        if 'mock' not in self.providers:
-            self.providers['mock'] = LLMProviderFactory.create_provider('mock', None)
+        if 'mock' not in providers:
+            providers['mock'] = LLMProviderFactory.create_provider('mock', None)
             logger.info("✅ Added mock provider as fallback")
+        
+        self._providers = providers
     
     def _get_best_provider(self, task_type: str, force_provider: str = None) -> str:
         """Get the best provider for a specific task"""
@@ -62,32 +117,116 @@ class EnhancedAITutor:
         available = list(self.providers.keys())
         return available[0] if available else 'mock'
     
-    def _call_llm_with_fallback(self, prompt: str, task_type: str, force_provider: str = None) -> Dict[str, Any]:
-        """Call LLM with automatic fallback to other providers"""
+    def _call_llm_with_fallback(self, prompt: str, task_type: str, force_provider: str = None,
+                                schema_name: str = None, **provider_kwargs) -> Dict[str, Any]:
+        """Call LLM with automatic fallback to other providers
+        
+        With a schema_name, providers that support structured output are sent the
+        matching JSON Schema (and the prompt without its inline JSON example), every
+        response is validated, and an invalid response falls through to the next
+        provider. Validated results carry the decoded object under 'parsed'.
+        Extra provider_kwargs are passed through to every provider; calls with
+        `images` skip providers that cannot see them. Under a request
+        deadline each attempt is given the remaining budget as `timeout`, and once
+        too little is left the chain goes straight to the mock fallback. The chain
+        runs in a slot from the process-wide scheduler (see scheduler.py), so
+        interactive calls are not queued behind background work.
+        """
+        from scheduler import get_scheduler, current_priority, current_tenant
+        
+        # Wait for an LLM slot in line with the request's priority class, tenant and deadline
+        scheduler = get_scheduler()
+        deadline = request_context.deadline()
+        if deadline is not None:
+            deadline -= request_context.MIN_ATTEMPT_SECONDS
+        with span('scheduler.wait', priority=current_priority()):
+            granted = scheduler.acquire(current_priority(), current_tenant(), deadline)
+            annotate(granted=granted)
+        if granted:
+            try:
+                result = self._try_providers(prompt, task_type, force_provider, schema_name, provider_kwargs)
+            finally:
+                scheduler.release()
+            if result is not None:
+                return result
+        else:
+            logger.warning("⏱️ Request deadline reached while waiting for an LLM slot")
+        
+        # Final fallback to mock provider
+        logger.warning("🔄 Falling back to mock provider")
+        with span('provider.attempt', provider='mock', outcome='fallback'):
+            return self.providers['mock'].generate_response(prompt)
+    
+    def _try_providers(self, prompt: str, task_type: str, force_provider: Optional[str], schema_name: Optional[str],
+                       provider_kwargs: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Try each provider in fallback order; None when none of them succeeded"""
         primary_provider = self._get_best_provider(task_type, force_provider)
         providers_to_try = [primary_provider] + [p for p in self.providers.keys() if p != primary_provider and p != 'mock']
+        structured_prompt = None
         
         for provider_name in providers_to_try:
-            try:
-                provider = self.providers[provider_name]
-                logger.info(f"🔄 Trying {provider_name} for {task_type}")
-                
-                result = provider.generate_response(prompt)
-                
-                if result['success']:
-                    logger.info(f"✅ Success with {provider_name}")
-                    return result
-                else:
-                    logger.warning(f"❌ {provider_name} failed: {result.get('error', 'Unknown error')}")
-                    
-            except Exception as e:
-                logger.error(f"❌ {provider_name} exception: {e}")
+            # Each attempt only gets what is left of the request deadline
+            budget = request_context.remaining()
+            if budget is not None and budget < request_context.MIN_ATTEMPT_SECONDS:
+                logger.warning(f"⏱️ Request deadline reached before trying {provider_name}")
+                break
+            attempt_kwargs = provider_kwargs if budget is None else dict(provider_kwargs, timeout=budget)
+            if provider_kwargs.get('images') and not getattr(self.providers[provider_name], 'supports_images', False):
                 continue
-        
-        # Final fallback to mock provider
-        logger.warning("🔄 Falling back to mock provider")
-        return self.providers['mock'].generate_response(prompt)
+            
+            with span('provider.attempt', provider=provider_name, timeout=budget):
+                try:
+                    provider = self.providers[provider_name]
+                    logger.info(f"🔄 Trying {provider_name} for {task_type}")
+                    
+                    structured = bool(schema_name) and getattr(provider, 'supports_structured_output', False)
+                    if structured:
+                        if structured_prompt is None:
+                            structured_prompt = PromptTemplates.without_inline_schema(prompt)
+                        result = provider.generate_response(
+                            structured_prompt, response_schema=RESPONSE_SCHEMAS[schema_name], schema_name=schema_name,
+                            **attempt_kwargs
+                        )
+                    elif schema_name:
+                        # The prompt carries the schema; providers with a JSON mode still switch it on
+                        result = provider.generate_response(prompt, schema_name=schema_name, **attempt_kwargs)
+                    else:
+                        result = provider.generate_response(prompt, **attempt_kwargs)
+                    
+                    if result['success']:
+                        if schema_name and provider_name != 'mock':
+                            with span('validate_response', schema=schema_name):
+                                parsed = self._parse_json_response(result['content'])
+                                if 'error' in parsed:
+                                    errors = [parsed['error']]
+                                else:
+                                    errors = validate_response(schema_name, parsed, strict=structured)
+                            if errors:
+                                logger.warning(f"❌ {provider_name} returned an invalid {schema_name} response: {errors[:3]}")
+                                annotate(outcome='invalid')
+                                continue
+                            result['parsed'] = parsed
+                        logger.info(f"✅ Success with {provider_name}")
+                        annotate(outcome='success')
+                        return result
+                    else:
+                        logger.warning(f"❌ {provider_name} failed: {result.get('error', 'Unknown error')}")
+                        annotate(outcome='failed')
+                        
+                except Exception as e:
+                    logger.error(f"❌ {provider_name} exception: {e}")
+                    annotate(outcome='exception')
+                    continue
+        
+        return None
+    
+    def _response_content(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Decoded JSON for an LLM result, reusing the schema-validated object when present"""
+        if 'parsed' in result:
+            return result['parsed']
+        return self._parse_json_response(result['content'])
     
+    @traced(name='parse_json_response')
     def _parse_json_response(self, content: str) -> Dict[str, Any]:
         """Parse JSON response from LLM, with error handling"""
         try:
@@ -135,10 +274,10 @@ class EnhancedAITutor:
         )
         
         # Call LLM
-        result = self._call_llm_with_fallback(prompt, 'tutoring')
+        result = self._call_llm_with_fallback(prompt, 'tutoring', schema_name='answer_evaluation')
         
         if result['success']:
-            parsed_response = self._parse_json_response(result['content'])
+            parsed_response = self._response_content(result)
             
             if 'error' not in parsed_response:
                 return {
@@ -156,43 +295,75 @@ class EnhancedAITutor:
         return self._generate_fallback_response('multiple-choice')
     
     def evaluate_essay(self, content: str, context: Dict[str, Any] = None) -> Dict[str, Any]:
-        """Evaluate essay using advanced LLM analysis"""
-        topic = context.get('topic', 'general') if context else 'general'
-        word_count = len(content.split())
+        """Evaluate essay using advanced LLM analysis
         
-        # Create prompt using template
-        prompt = PromptTemplates.essay_evaluation(
-            essay_content=content,
-            topic=topic,
-            word_count=word_count
-        )
-        
-        # Call LLM (prefer Claude for essay evaluation)
-        result = self._call_llm_with_fallback(prompt, 'essay_evaluation', 'anthropic')
+        Rubric dimensions are evaluated as concurrent calls, and long essays part by
+        part (see essay_pipeline.py), so the whole essay is assessed without truncation.
+        Part analyses are cached, so a resubmitted draft only re-evaluates the
+        stretches that changed.
+        """
+        from essay_pipeline import PARAGRAPH_CACHE, EssayPipeline
         
-        if result['success']:
-            parsed_response = self._parse_json_response(result['content'])
-            
-            if 'error' not in parsed_response:
-                return {
-                    'correct': parsed_response.get('score', 70) >= 70,
-                    'feedback': parsed_response.get('feedback', ''),
-                    'score': parsed_response.get('score', 70),
-                    'nextDifficulty': parsed_response.get('nextDifficulty', 'intermediate'),
-                    'suggestions': parsed_response.get('suggestions', []),
-                    'strengths': parsed_response.get('strengths', []),
-                    'areas_for_improvement': parsed_response.get('areas_for_improvement', []),
-                    'detailed_analysis': parsed_response.get('detailed_analysis', {}),
-                    'provider': result['provider'],
-                    'usage': result.get('usage', {})
-                }
+        topic = context.get('topic', 'general') if context else 'general'
+        cache = None
+        if PARAGRAPH_CACHE:
+            from cache_store import get_content_cache
+            cache = get_content_cache('essay_paragraphs')
+        evaluation = EssayPipeline(self, cache=cache).evaluate(content, topic)
+        if evaluation is not None:
+            return evaluation
         
         # Fallback response
         return self._generate_fallback_response('essay')
     
+    def evaluate_image_answer(self, image: bytes, question: str, student_answer: str) -> Dict[str, Any]:
+        """Evaluate an answer to a question about an image (diagram, chart, screenshot)
+        
+        The image is downscaled to a bounded size, described once by a provider with
+        vision input, and the answer is evaluated against that description (see
+        image_pipeline.py). Descriptions and evaluations are cached by content hash.
+        Without a provider that produces a usable result, an error is returned.
+        """
+        from cache_store import get_content_cache
+        from image_pipeline import ImagePipeline
+        
+        pipeline = ImagePipeline(self, get_content_cache('image_descriptions'), get_content_cache('image_evaluations'))
+        try:
+            evaluation = pipeline.evaluate(image, question, student_answer)
+        except ValueError as e:
+            return {'error': str(e)}
+        if evaluation is not None:
+            return evaluation
+        
+        # No canned grade: the answer was never checked against the image
+        return {'error': 'No provider with image input could evaluate this answer', 'provider': 'mock'}
+    
     def generate_adaptive_question(self, subject: str, difficulty: str, topic: str = None, 
-                                 previous_questions: List[str] = None) -> Dict[str, Any]:
-        """Generate adaptive question using LLM"""
+                                 previous_questions: List[str] = None, student_id: str = None) -> Dict[str, Any]:
+        """Generate adaptive question using LLM
+        
+        With a student_id, bank subjects are served the unseen bank question nearest
+        the student's ability estimate (see ability_selector.py) without an LLM call,
+        and other subjects are generated at the difficulty that estimate suggests.
+        """
+        if student_id:
+            from ability_selector import get_ability_selector
+            selector = get_ability_selector()
+            if self._is_bank_subject(subject):
+                try:
+                    with span('ability.select'):
+                        question = selector.next_question(student_id, subject, topic)
+                        if question is None and topic:
+                            question = selector.next_question(student_id, subject)
+                except (OSError, ValueError) as e:
+                    logger.warning(f"Question bank unavailable: {e}")
+                    question = None
+                if question:
+                    return dict(question, provider='ability_selector')
+            ability = selector.ability(student_id, subject)
+            if ability['answers']:
+                difficulty = ability['difficulty']
+        
         prompt = PromptTemplates.adaptive_question_generation(
             subject=subject,
             difficulty=difficulty,
@@ -200,10 +371,10 @@ class EnhancedAITutor:
             previous_questions=previous_questions
         )
         
-        result = self._call_llm_with_fallback(prompt, 'tutoring')
+        result = self._call_llm_with_fallback(prompt, 'tutoring', schema_name='question')
         
         if result['success']:
-            parsed_response = self._parse_json_response(result['content'])
+            parsed_response = self._response_content(result)
             
             if 'error' not in parsed_response:
                 return {
@@ -225,17 +396,29 @@ class EnhancedAITutor:
     
     def provide_tutoring_explanation(self, question: str, student_answer: str, 
                                    correct_answer: str = None) -> Dict[str, Any]:
-        """Provide detailed tutoring explanation"""
+        """Provide detailed tutoring explanation
+        
+        Wrong options of question-bank questions are answered from the precomputed
+        lookup file (see precompute_explanations.py) without an LLM call.
+        """
+        from precompute_explanations import lookup_explanation
+        
+        with span('cache.precomputed'):
+            precomputed = lookup_explanation(question, student_answer)
+            annotate(hit=bool(precomputed))
+        if precomputed:
+            return dict(precomputed, provider='precomputed')
+        
         prompt = PromptTemplates.tutoring_explanation(
             question=question,
             student_answer=student_answer,
             correct_answer=correct_answer
         )
         
-        result = self._call_llm_with_fallback(prompt, 'tutoring')
+        result = self._call_llm_with_fallback(prompt, 'tutoring', schema_name='explanation')
         
         if result['success']:
-            parsed_response = self._parse_json_response(result['content'])
+            parsed_response = self._response_content(result)
             
             if 'error' not in parsed_response:
                 return {
@@ -260,20 +443,73 @@ class EnhancedAITutor:
         }
     
     def conversational_tutoring(self, student_message: str, 
-                              conversation_history: List[Dict] = None) -> Dict[str, Any]:
-        """Provide conversational tutoring response"""
+                              conversation_history: List[Dict] = None,
+                              session_id: str = None,
+                              history_window: int = None,
+                              subject: str = None) -> Dict[str, Any]:
+        """Provide conversational tutoring response
+        
+        With a session_id the history is kept server-side, so callers only send the
+        new message; any conversation_history passed for a new session seeds it.
+        Messages without prior context are answered from the per-subject similarity
+        cache when a close enough question was answered before.
+        """
+        if history_window is None:
+            history_window = HISTORY_WINDOW
+        
+        store = None
+        session_kwargs = {}
+        if session_id:
+            from session_store import get_session_store
+            store = get_session_store()
+            stored_history = store.get_history(session_id)
+            if not stored_history and conversation_history:
+                store.seed_history(session_id, conversation_history)
+                stored_history = store.get_history(session_id)
+            conversation_history = stored_history
+            # Lets providers that keep per-session model context (Ollama) send only the new message
+            session_kwargs = {
+                'session_id': session_id,
+                'session_turn': store.get_turn_count(session_id),
+                'followup_prompt': PromptTemplates.conversation_followup(student_message)
+            }
+        
+        base_summary = store.get_summary(session_id) if store is not None else ''
+        with span('history.prepare', turns=len(conversation_history or [])):
+            prepared = self.summarizer.prepare(conversation_history or [], base_summary)
+        if store is not None and prepared.covered:
+            store.fold(session_id, prepared.covered_summary, prepared.covered)
+        
+        similarity_cache = None
+        if not prepared.recent and not prepared.summary:
+            from similarity_cache import get_similarity_cache
+            similarity_cache = get_similarity_cache()
+            with span('cache.similarity'):
+                cached = similarity_cache.lookup(subject or 'general', student_message)
+                annotate(hit=bool(cached))
+            if cached:
+                response = dict(cached['response'], provider='similarity_cache',
+                                cache_similarity=cached['similarity'])
+                if store is not None:
+                    store.append_turn(session_id, student_message, response['response'])
+                    response['session_id'] = session_id
+                return response
+        
         prompt = PromptTemplates.conversation_tutoring(
             student_message=student_message,
-            conversation_history=conversation_history
+            conversation_history=prepared.recent,
+            history_window=history_window,
+            summary=prepared.summary
         )
         
-        result = self._call_llm_with_fallback(prompt, 'tutoring')
+        result = self._call_llm_with_fallback(prompt, 'tutoring', schema_name='conversation', **session_kwargs)
         
+        response = None
         if result['success']:
-            parsed_response = self._parse_json_response(result['content'])
+            parsed_response = self._response_content(result)
             
             if 'error' not in parsed_response:
-                return {
+                response = {
                     'response': parsed_response.get('response', ''),
                     'response_type': parsed_response.get('response_type', 'explanation'),
                     'suggested_questions': parsed_response.get('suggested_questions', []),
@@ -282,17 +518,66 @@ class EnhancedAITutor:
                     'next_topic_suggestion': parsed_response.get('next_topic_suggestion', ''),
                     'provider': result['provider']
                 }
+                if similarity_cache is not None and result['provider'] != 'mock':
+                    similarity_cache.store(subject or 'general', student_message, dict(response))
+        
+        if response is None:
+            # Fallback response
+            response = {
+                'response': 'I understand your question. Let me help you with that.',
+                'response_type': 'explanation',
+                'suggested_questions': ['Can you tell me more about what you\'re working on?'],
+                'resources': ['Textbook chapter on this topic'],
+                'confidence_level': 'medium',
+                'next_topic_suggestion': 'Continue with current topic',
+                'provider': 'mock'
+            }
         
-        # Fallback response
-        return {
-            'response': 'I understand your question. Let me help you with that.',
-            'response_type': 'explanation',
-            'suggested_questions': ['Can you tell me more about what you\'re working on?'],
-            'resources': ['Textbook chapter on this topic'],
-            'confidence_level': 'medium',
-            'next_topic_suggestion': 'Continue with current topic',
-            'provider': 'mock'
-        }
+        if store is not None:
+            store.append_turn(session_id, student_message, response['response'])
+            response['session_id'] = session_id
+        
+        return response
+    
+    def warm_up(self):
+        """Preload local models so the first request does not pay the load time"""
+        for provider_name, provider in self.providers.items():
+            warm_up = getattr(provider, 'warm_up', None)
+            if warm_up is not None:
+                logger.info(f"🔥 Warming up {provider_name}")
+                warm_up()
+    
+    def _summarize_conversation(self, previous_summary: str, turns: List[Dict]) -> Optional[str]:
+        """Fold conversation turns into a summary; None when no real provider answered"""
+        from scheduler import schedule_scope
+        
+        prompt = PromptTemplates.conversation_summary(previous_summary, turns)
+        with schedule_scope('background'):
+            result = self._call_llm_with_fallback(prompt, 'tutoring', schema_name='conversation_summary')
+        
+        if result['success'] and result.get('provider') != 'mock':
+            parsed_response = self._response_content(result)
+            summary = parsed_response.get('summary') if 'error' not in parsed_response else None
+            if isinstance(summary, str) and summary.strip():
+                return summary.strip()
+        return None
+    
+    def wait_for_background_work(self, timeout: float = None) -> bool:
+        """Wait for background work such as conversation summaries to finish"""
+        if self._summarizer is None:
+            return True
+        return self._summarizer.wait_for_pending(timeout)
+    
+    def detach_background_work(self) -> Optional[int]:
+        """Hand deferred conversation summaries to a detached process; returns its pid if one started"""
+        if self._summarizer is None:
+            return None
+        jobs = self._summarizer.take_deferred()
+        if not jobs:
+            return None
+        from cache_store import get_content_cache
+        from conversation_summary import spawn_fold_process
+        return spawn_fold_process(jobs, get_content_cache('conversation_summary_claims'))
     
     def analyze_learning_path(self, student_progress: Dict[str, Any], 
                             subjects: List[str]) -> Dict[str, Any]:
@@ -302,10 +587,10 @@ class EnhancedAITutor:
             subjects=subjects
         )
         
-        result = self._call_llm_with_fallback(prompt, 'tutoring')
+        result = self._call_llm_with_fallback(prompt, 'tutoring', schema_name='learning_path')
         
         if result['success']:
-            parsed_response = self._parse_json_response(result['content'])
+            parsed_response = self._response_content(result)
             
             if 'error' not in parsed_response:
                 return {
@@ -319,7 +604,8 @@ class EnhancedAITutor:
         
         # Fallback learning path
         return {
-            'recommended_subjects': [{'subject': subjects[0], 'priority': 'high', 'reason': 'Good starting point'}],
+            'recommended_subjects': [{'subject': subject, 'priority': 'high', 'reason': 'Good starting point'}
+                                     for subject in subjects[:1]],
             'learning_sequence': [{'topic': 'Basic concepts', 'difficulty': 'beginner', 'estimated_time': '1 hour'}],
             'goals': ['Master basic concepts'],
             'study_tips': ['Practice regularly', 'Review previous material'],
@@ -327,17 +613,23 @@ class EnhancedAITutor:
             'provider': 'mock'
         }
     
-    def analyze_errors(self, student_errors: List[str], subject: str) -> Dict[str, Any]:
-        """Analyze student errors and provide targeted help"""
+    def analyze_errors(self, student_errors: List[Any], subject: str) -> Dict[str, Any]:
+        """Analyze student errors and provide targeted help
+        
+        Errors (strings or stored result dicts) are clustered locally first, so the
+        prompt carries one exemplar per cluster with its count instead of every entry.
+        """
+        from error_clustering import error_exemplars
+        
         prompt = PromptTemplates.error_analysis(
-            student_errors=student_errors,
+            student_errors=error_exemplars(student_errors),
             subject=subject
         )
         
-        result = self._call_llm_with_fallback(prompt, 'tutoring')
+        result = self._call_llm_with_fallback(prompt, 'tutoring', schema_name='error_analysis')
         
         if result['success']:
-            parsed_response = self._parse_json_response(result['content'])
+            parsed_response = self._response_content(result)
             
             if 'error' not in parsed_response:
                 return {
@@ -380,8 +672,32 @@ class EnhancedAITutor:
                 'provider': 'mock'
             }
     
+    def _is_bank_subject(self, subject: str) -> bool:
+        from question_bank import list_subject_files, subject_from_filename
+        
+        return (subject or '').lower() in {subject_from_filename(path) for path in list_subject_files()}
+    
+    def _bank_question(self, subject: str, difficulty: str) -> Optional[Dict[str, Any]]:
+        """A random question from the compiled question bank for bank subjects (dsa, os, ...)"""
+        if not self._is_bank_subject(subject):
+            return None
+        
+        from question_bank_binary import get_binary_bank
+        key = subject.lower()
+        try:
+            bank = get_binary_bank()
+        except (OSError, ValueError) as e:
+            logger.warning(f"Question bank unavailable: {e}")
+            return None
+        questions = bank.sample(1, key, difficulty) or bank.sample(1, key)
+        return dict(questions[0], provider='question_bank') if questions else None
+    
     def _generate_fallback_question(self, subject: str, difficulty: str) -> Dict[str, Any]:
         """Generate fallback question when LLM fails"""
+        bank_question = self._bank_question(subject, difficulty)
+        if bank_question:
+            return bank_question
+        
         fallback_questions = {
             'Mathematics': {
                 'beginner': {
@@ -417,70 +733,217 @@ class EnhancedAITutor:
             'provider': 'mock'
         }
     
-    def get_provider_status(self) -> Dict[str, Any]:
-        """Get status of all providers"""
+    def get_provider_status(self, use_cache: bool = True) -> Dict[str, Any]:
+        """Get status of all providers, served from a short-lived on-disk cache when fresh"""
+        fingerprint = self.llm_manager.config_fingerprint()
+        
+        if use_cache:
+            cached = _load_cached_provider_status(fingerprint)
+            if cached is not None:
+                return cached
+        
         status = {}
         for name, provider in self.providers.items():
             status[name] = {
                 'available': provider.is_available(),
                 'type': type(provider).__name__
             }
+        
+        _store_cached_provider_status(fingerprint, status)
         return status
 
+def _provider_status_cache_path() -> str:
+    """Location of the shared provider status cache file"""
+    path = os.getenv('PROVIDER_STATUS_CACHE')
+    if not path:
+        import tempfile
+        path = os.path.join(tempfile.gettempdir(), 'ai_tutor_provider_status.json')
+    return path
+
+def _load_cached_provider_status(fingerprint: str) -> Optional[Dict[str, Any]]:
+    """Return cached provider status if it matches the current config and is within the TTL"""
+    try:
+        with open(_provider_status_cache_path(), encoding='utf-8') as f:
+            cached = json.load(f)
+    except (OSError, ValueError):
+        return None
+    
+    if cached.get('fingerprint') != fingerprint:
+        return None
+    if time.time() - cached.get('timestamp', 0) > PROVIDER_STATUS_TTL:
+        return None
+    return cached.get('status')
+
+def _store_cached_provider_status(fingerprint: str, status: Dict[str, Any]):
+    """Persist provider status so later processes can skip provider initialization"""
+    try:
+        cache_path = _provider_status_cache_path()
+        tmp_path = f"{cache_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({'fingerprint': fingerprint, 'timestamp': time.time(), 'status': status}, f)
+        os.replace(tmp_path, cache_path)
+    except OSError as e:
+        logger.warning(f"Could not write provider status cache: {e}")
+
+def handle_request(tutor: EnhancedAITutor, input_data: Dict[str, Any]) -> Dict[str, Any]:
+    """Dispatch a single JSON request (as accepted by main) to the tutor
+    
+    The request runs under a deadline: `deadlineMs` from the caller, or the
+    action's default (see request_context.py). Its LLM calls are scheduled by the
+    action's priority class (or `priority`) and its tenant (`tenantId` or `userId`).
+    With `trace: true` the response carries a `trace` of stage timings, under the
+    caller's `traceId` if given (see tracing.py).
+    """
+    from request_context import action_deadline_ms, deadline_scope
+    from scheduler import request_class, schedule_scope
+    from tracing import start_trace, sink_enabled
+    
+    action = input_data.get('action', 'evaluate_answer')
+    priority, tenant = request_class(input_data)
+    trace_requested = bool(input_data.get('trace'))
+    with start_trace(input_data.get('traceId'), enabled=trace_requested or sink_enabled()) as trace, \
+            deadline_scope(action_deadline_ms(action, input_data.get('deadlineMs')) / 1000.0), \
+            schedule_scope(priority, tenant):
+        with span('request', action=action, priority=priority):
+            result = _dispatch_request(tutor, action, input_data)
+    if trace_requested and isinstance(result, dict):
+        result['trace'] = trace.to_dict()
+    return result
+
+def _dispatch_request(tutor: EnhancedAITutor, action: str, input_data: Dict[str, Any]) -> Dict[str, Any]:
+    if action == 'evaluate_answer':
+        question = input_data.get('question', '')
+        answer = input_data.get('answer', '')
+        question_type = input_data.get('type', 'multiple-choice')
+        context = input_data.get('context', {})
+        return tutor.evaluate_answer(question, answer, question_type, context)
+        
+    elif action == 'generate_adaptive_question':
+        subject = input_data.get('subject', 'Mathematics')
+        difficulty = input_data.get('difficulty', 'intermediate')
+        topic = input_data.get('topic')
+        previous_questions = input_data.get('previousQuestions', [])
+        return tutor.generate_adaptive_question(subject, difficulty, topic, previous_questions,
+                                                input_data.get('userId'))
+        
+    elif action == 'evaluate_image_answer':
+        image_path = input_data.get('imagePath')
+        try:
+            if image_path:
+                with open(image_path, 'rb') as f:
+                    image = f.read()
+            else:
+                import base64
+                image = str(input_data.get('image') or '')
+                # Accept a data URL as well as bare base64
+                image = base64.b64decode(image.split(',', 1)[-1] if image.startswith('data:') else image,
+                                         validate=True)
+        except (OSError, ValueError) as e:
+            return {'error': f'Invalid image: {e}'}
+        return tutor.evaluate_image_answer(image, input_data.get('question', ''), input_data.get('answer', ''))
+        
+    elif action == 'provide_tutoring_explanation':
+        question = input_data.get('question', '')
+        student_answer = input_data.get('studentAnswer', '')
+        correct_answer = input_data.get('correctAnswer')
+        return tutor.provide_tutoring_explanation(question, student_answer, correct_answer)
+        
+    elif action == 'conversational_tutoring':
+        student_message = input_data.get('studentMessage', '')
+        conversation_history = input_data.get('conversationHistory', [])
+        session_id = input_data.get('sessionId')
+        history_window = input_data.get('historyWindow')
+        subject = input_data.get('subject')
+        return tutor.conversational_tutoring(student_message, conversation_history, session_id, history_window,
+                                             subject)
+        
+    elif action == 'analyze_learning_path':
+        student_progress = input_data.get('studentProgress', {})
+        subjects = input_data.get('subjects', [])
+        user_id = input_data.get('userId')
+        if user_id and not student_progress:
+            from results_store import get_results_store
+            student_progress = get_results_store().student_progress(user_id)
+            subjects = subjects or list(student_progress)
+        if not subjects:
+            # A new student has no attempts yet, so offer every subject in the bank
+            from question_bank import list_subject_files, subject_from_filename
+            subjects = [subject_from_filename(path) for path in list_subject_files()]
+        return tutor.analyze_learning_path(student_progress, subjects)
+        
+    elif action == 'analyze_errors':
+        student_errors = input_data.get('studentErrors', [])
+        subject = input_data.get('subject', 'general')
+        user_id = input_data.get('userId')
+        if user_id and not student_errors:
+            from results_store import get_results_store
+            student_errors = get_results_store().recent_errors(
+                user_id, None if subject == 'general' else subject, limit=ERROR_HISTORY_LIMIT
+            )
+        return tutor.analyze_errors(student_errors, subject)
+        
+    elif action == 'record_result':
+        from results_store import get_results_store
+        attempt_id = get_results_store().add_attempt(input_data.get('result', {}))
+        if attempt_id is not None:
+            from review_scheduler import get_review_scheduler
+            get_review_scheduler().sync()
+        return {'success': True, 'attemptId': attempt_id, 'duplicate': attempt_id is None}
+        
+    elif action == 'get_due_reviews':
+        user_id = input_data.get('userId')
+        if not user_id:
+            return {'error': 'userId is required'}
+        from review_scheduler import get_review_scheduler
+        scheduler = get_review_scheduler()
+        return {'reviews': scheduler.due_reviews(user_id, int(input_data.get('limit', 10)), input_data.get('subject')),
+                'totalDue': scheduler.count_due(user_id)}
+        
+    elif action == 'record_answer':
+        user_id = input_data.get('userId')
+        if not user_id:
+            return {'error': 'userId is required'}
+        from ability_selector import get_ability_selector
+        ability = get_ability_selector().record_answer(user_id, input_data.get('subject', 'general'),
+                                                       input_data.get('questionId'), bool(input_data.get('correct')),
+                                                       input_data.get('difficulty'))
+        return dict(ability, success=True)
+        
+    elif action == 'similarity_cache_stats':
+        from similarity_cache import get_similarity_cache
+        cache = get_similarity_cache()
+        return {'stats': cache.stats(), 'audit': cache.audit_log(int(input_data.get('limit', 50)))}
+        
+    elif action == 'similarity_cache_feedback':
+        from similarity_cache import get_similarity_cache
+        recorded = get_similarity_cache().record_verdict(int(input_data.get('auditId', 0)),
+                                                         bool(input_data.get('correct')))
+        return {'success': recorded}
+        
+    elif action == 'get_provider_status':
+        return tutor.get_provider_status()
+        
+    return {'error': f'Unknown action: {action}'}
+
 def main():
     """Main function to handle command line input"""
     if len(sys.argv) != 2:
         print(json.dumps({'error': 'Invalid arguments'}))
         sys.exit(1)
     
+    logging.basicConfig(level=logging.INFO)
+    
     try:
         input_data = json.loads(sys.argv[1])
-        action = input_data.get('action', 'evaluate_answer')
         
-        tutor = EnhancedAITutor()
-        
-        if action == 'evaluate_answer':
-            question = input_data.get('question', '')
-            answer = input_data.get('answer', '')
-            question_type = input_data.get('type', 'multiple-choice')
-            context = input_data.get('context', {})
-            result = tutor.evaluate_answer(question, answer, question_type, context)
-            
-        elif action == 'generate_adaptive_question':
-            subject = input_data.get('subject', 'Mathematics')
-            difficulty = input_data.get('difficulty', 'intermediate')
-            topic = input_data.get('topic')
-            previous_questions = input_data.get('previousQuestions', [])
-            result = tutor.generate_adaptive_question(subject, difficulty, topic, previous_questions)
-            
-        elif action == 'provide_tutoring_explanation':
-            question = input_data.get('question', '')
-            student_answer = input_data.get('studentAnswer', '')
-            correct_answer = input_data.get('correctAnswer')
-            result = tutor.provide_tutoring_explanation(question, student_answer, correct_answer)
-            
-        elif action == 'conversational_tutoring':
-            student_message = input_data.get('studentMessage', '')
-            conversation_history = input_data.get('conversationHistory', [])
-            result = tutor.conversational_tutoring(student_message, conversation_history)
-            
-        elif action == 'analyze_learning_path':
-            student_progress = input_data.get('studentProgress', {})
-            subjects = input_data.get('subjects', [])
-            result = tutor.analyze_learning_path(student_progress, subjects)
-            
-        elif action == 'analyze_errors':
-            student_errors = input_data.get('studentErrors', [])
-            subject = input_data.get('subject', 'general')
-            result = tutor.analyze_errors(student_errors, subject)
-            
-        elif action == 'get_provider_status':
-            result = tutor.get_provider_status()
-            
-        else:
-            result = {'error': f'Unknown action: {action}'}
+        # Summaries are not computed here: the caller waits for this process to exit
+        tutor = EnhancedAITutor(background_summaries=False)
+        result = handle_request(tutor, input_data)
         
         print(json.dumps(result))
+        sys.stdout.flush()
+        
+        tutor.detach_background_work()
         
     except json.JSONDecodeError:
         print(json.dumps({'error': 'Invalid JSON input'}))
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Student Error Clustering
+Normalizes, de-duplicates and clusters error logs so analyze_errors sends exemplars, not every entry
+"""
+
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Union
+
+from text_similarity import ngram_vector, cosine, Vector
+
+DEFAULT_SIMILARITY = float(os.getenv('TUTOR_ERROR_SIMILARITY', '0.55'))
+DEFAULT_MAX_EXEMPLARS = int(os.getenv('TUTOR_ERROR_MAX_EXEMPLARS', '12'))
+MAX_LEADERS = 200
+MAX_EXEMPLAR_CHARS = 300
+
+ErrorEntry = Union[str, Dict[str, Any]]
+
+_PUNCTUATION = re.compile(r"[^\w\s#]")
+_NUMBER = re.compile(r"\d+(\.\d+)?")
+_SPACE = re.compile(r"\s+")
+
+def normalize_error(text: str) -> str:
+    """Canonical form used for de-duplication: lowercase, numbers masked, punctuation and spacing collapsed"""
+    text = _NUMBER.sub('#', text.lower())
+    text = _PUNCTUATION.sub(' ', text)
+    return _SPACE.sub(' ', text).strip()
+
+def _error_text(entry: ErrorEntry) -> str:
+    """Display text for an error; stored results are rendered as question plus answers"""
+    if not isinstance(entry, dict):
+        return '' if entry is None else str(entry).strip()
+    if entry.get('error'):
+        return str(entry['error']).strip()
+    text = str(entry.get('question', '')).strip()
+    if 'userAnswer' in entry or 'correctAnswer' in entry:
+        text += f" (answered {entry.get('userAnswer', '?')}, correct: {entry.get('correctAnswer', '?')}"
+        text += f" - {entry['correctAnswerText']})" if entry.get('correctAnswerText') else ')'
+    return text
+
+@dataclass
+class ErrorCluster:
+    """A group of similar errors, represented by its most frequent member"""
+    representative: str
+    count: int
+    topic: Optional[str] = None
+    question_ids: List[str] = field(default_factory=list)
+    variants: int = 1
+
+    def describe(self) -> str:
+        text = self.representative
+        if len(text) > MAX_EXEMPLAR_CHARS:
+            text = text[:MAX_EXEMPLAR_CHARS] + '...'
+        details = [f"seen {self.count} time{'s' if self.count != 1 else ''}"]
+        if self.variants > 1:
+            details.append(f"{self.variants} similar variants")
+        if self.topic:
+            details.append(f"topic: {self.topic}")
+        return f"{text} [{'; '.join(details)}]"
+
+def cluster_errors(errors: List[ErrorEntry], threshold: float = DEFAULT_SIMILARITY) -> List[ErrorCluster]:
+    """Cluster errors, most frequent first.
+
+    Entries are strings or result dicts (question, questionId, userAnswer,
+    correctAnswerText, optional topic). Identical errors (same question ID, or same
+    normalized text) are merged first; the distinct errors are then grouped per
+    topic by greedy leader clustering on character n-gram cosine similarity.
+    Only the first MAX_LEADERS clusters are compared against, so cost stays linear
+    in the number of distinct errors; later rare errors become their own clusters.
+    """
+    groups: Dict[str, Dict[str, Any]] = {}
+    for entry in errors:
+        text = _error_text(entry)
+        if not text:
+            continue
+        question_id = entry.get('questionId') if isinstance(entry, dict) else None
+        topic = entry.get('topic') if isinstance(entry, dict) else None
+        normalized = normalize_error(text)
+        key = f"id:{question_id}" if question_id else f"text:{normalized}"
+
+        group = groups.get(key)
+        if group is None:
+            groups[key] = {'text': text, 'normalized': normalized, 'count': 1, 'topic': topic,
+                           'question_id': question_id}
+        else:
+            group['count'] += 1
+
+    clusters: List[ErrorCluster] = []
+    leaders: List[Vector] = []
+    for group in sorted(groups.values(), key=lambda g: -g['count']):
+        vector = ngram_vector(group['normalized'])
+        best, best_score = None, threshold
+        for index, cluster in enumerate(clusters[:MAX_LEADERS]):
+            if cluster.topic != group['topic']:
+                continue
+            score = cosine(vector, leaders[index])
+            if score >= best_score:
+                best, best_score = index, score
+
+        if best is None:
+            clusters.append(ErrorCluster(representative=group['text'], count=group['count'], topic=group['topic'],
+                                         question_ids=[group['question_id']] if group['question_id'] else []))
+            leaders.append(vector)
+        else:
+            cluster = clusters[best]
+            cluster.count += group['count']
+            cluster.variants += 1
+            if group['question_id']:
+                cluster.question_ids.append(group['question_id'])
+
+    clusters.sort(key=lambda c: -c.count)
+    return clusters
+
+def error_exemplars(errors: List[ErrorEntry], max_exemplars: int = DEFAULT_MAX_EXEMPLARS,
+                    threshold: float = DEFAULT_SIMILARITY) -> List[str]:
+    """Prompt-ready error lines: one exemplar per cluster with counts, capped at max_exemplars"""
+    clusters = cluster_errors(errors, threshold)
+    lines = [cluster.describe() for cluster in clusters[:max_exemplars]]
+    remaining = clusters[max_exemplars:]
+    if remaining:
+        lines.append(f"...plus {sum(c.count for c in remaining)} less frequent errors in {len(remaining)} other groups")
+    return lines
@@ -0,0 +1,317 @@
+#!/usr/bin/env python3
+"""
+Essay Evaluation Pipeline
+Evaluates rubric dimensions concurrently and long essays part by part, merged into one evaluation
+"""
+
+import contextvars
+import hashlib
+import json
+import os
+import re
+import logging
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Tuple
+
+from prompt_templates import PromptTemplates
+from tracing import annotate, span
+
+logger = logging.getLogger(__name__)
+
+# Rubric dimensions, keyed like the detailed_analysis of an essay evaluation
+DIMENSIONS = {
+    'content': 'ideas and argumentation: thesis, reasoning, evidence and examples',
+    'organization': 'structure and flow: introduction, paragraphing, transitions and conclusion',
+    'language': 'vocabulary, tone and style',
+    'mechanics': 'grammar, spelling and punctuation'
+}
+
+CHUNK_CHARS = int(os.getenv('TUTOR_ESSAY_CHUNK_CHARS', '6000'))
+CONCURRENCY = int(os.getenv('TUTOR_ESSAY_CONCURRENCY', '4'))
+PARAGRAPH_CACHE = os.getenv('TUTOR_ESSAY_PARAGRAPH_CACHE', '1') != '0'
+MAX_LIST_ITEMS = 6
+OUTLINE_CHARS = 1500
+OUTLINE_SENTENCE_CHARS = 120
+
+_PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+def split_paragraphs(content: str) -> List[str]:
+    return [p.strip() for p in _PARAGRAPH_BREAK.split(content or '') if p.strip()]
+
+def _split_oversized(paragraph: str, max_chars: int) -> List[str]:
+    """Split a paragraph longer than max_chars at sentence ends, slicing sentences that are still too long"""
+    pieces = []
+    for sentence in _SENTENCE_END.split(paragraph):
+        while len(sentence) > max_chars:
+            pieces.append(sentence[:max_chars])
+            sentence = sentence[max_chars:]
+        if sentence:
+            pieces.append(sentence)
+    return pieces
+
+def chunk_essay(content: str, max_chars: int = CHUNK_CHARS) -> List[str]:
+    """Split an essay into parts of at most max_chars, keeping paragraphs together where they fit.
+
+    Joining the parts gives back every paragraph; nothing is dropped.
+    """
+    parts: List[str] = []
+    current = ''
+    for paragraph in split_paragraphs(content):
+        if len(paragraph) <= max_chars:
+            units = [(paragraph, '\n\n')]
+        else:
+            # Sentences of one paragraph stay in one paragraph when they share a part
+            pieces = _split_oversized(paragraph, max_chars)
+            units = [(piece, '\n\n' if i == 0 else ' ') for i, piece in enumerate(pieces)]
+        for text, separator in units:
+            if current and len(current) + len(separator) + len(text) > max_chars:
+                parts.append(current)
+                current = ''
+            current = current + separator + text if current else text
+    if current:
+        parts.append(current)
+    return parts
+
+def analysis_key(dimension: str, part: str, topic: str, context: str = '') -> str:
+    """Content hash identifying one (dimension, part) analysis"""
+    raw = json.dumps([dimension, topic, context, part], ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+def _layout_key(paragraph: str) -> str:
+    """Cache key recording how many paragraphs the evaluated part starting with this paragraph had"""
+    return analysis_key('layout', paragraph, '')
+
+def essay_outline(content: str, max_chars: int = OUTLINE_CHARS) -> str:
+    """First sentence of each paragraph, so a part can be judged against the whole essay's structure"""
+    lines = []
+    size = 0
+    for number, paragraph in enumerate(split_paragraphs(content), 1):
+        sentence = _SENTENCE_END.split(paragraph, 1)[0]
+        if len(sentence) > OUTLINE_SENTENCE_CHARS:
+            sentence = sentence[:OUTLINE_SENTENCE_CHARS] + '...'
+        line = f"{number}. {sentence}"
+        if size + len(line) > max_chars:
+            lines.append('...')
+            break
+        lines.append(line)
+        size += len(line) + 1
+    return '\n'.join(lines)
+
+def _merge_lists(results: List[Dict[str, Any]], key: str, limit: int = MAX_LIST_ITEMS) -> List[str]:
+    """Interleave a list field across results (one item from each in turn), dropping repeats"""
+    merged, seen = [], set()
+    columns = [[item for item in result.get(key, []) if isinstance(item, str)] for result in results]
+    for row in range(max((len(column) for column in columns), default=0)):
+        for column in columns:
+            if row < len(column):
+                normalized = ' '.join(column[row].lower().split())
+                if normalized and normalized not in seen:
+                    seen.add(normalized)
+                    merged.append(column[row])
+                    if len(merged) >= limit:
+                        return merged
+    return merged
+
+def _next_difficulty(score: int) -> str:
+    if score >= 85:
+        return 'advanced'
+    if score >= 70:
+        return 'intermediate'
+    return 'beginner'
+
+def merge_evaluations(parts: Dict[Tuple[str, int], Dict[str, Any]], part_words: List[int]) -> Dict[str, Any]:
+    """Reduce per-(dimension, part) evaluations into the evaluate_essay output shape.
+
+    A dimension's score is the word-weighted mean over the parts that were evaluated;
+    the overall score is the mean over dimensions. Feedback uses, per dimension, the
+    summary of its weakest part.
+    """
+    dimension_scores: Dict[str, int] = {}
+    detailed_analysis: Dict[str, str] = {}
+    feedback = []
+    for dimension in DIMENSIONS:
+        evaluated = [(index, parts[(dimension, index)]) for index in range(len(part_words))
+                     if (dimension, index) in parts]
+        if not evaluated:
+            detailed_analysis[dimension] = ''
+            continue
+        weight = sum(part_words[index] or 1 for index, _ in evaluated)
+        dimension_scores[dimension] = round(
+            sum(result['score'] * (part_words[index] or 1) for index, result in evaluated) / weight
+        )
+        if len(part_words) == 1:
+            detailed_analysis[dimension] = evaluated[0][1].get('analysis', '')
+        else:
+            detailed_analysis[dimension] = '\n'.join(
+                f"Part {index + 1}: {result.get('analysis', '')}" for index, result in evaluated
+            )
+        weakest = min(evaluated, key=lambda item: item[1]['score'])[1]
+        if weakest.get('summary'):
+            feedback.append(weakest['summary'])
+
+    ordered = [parts[key] for key in sorted(parts, key=lambda key: (key[1], list(DIMENSIONS).index(key[0])))]
+    score = round(sum(dimension_scores.values()) / len(dimension_scores))
+    return {
+        'correct': score >= 70,
+        'feedback': ' '.join(feedback),
+        'score': score,
+        'nextDifficulty': _next_difficulty(score),
+        'suggestions': _merge_lists(ordered, 'suggestions'),
+        'strengths': _merge_lists(ordered, 'strengths'),
+        'areas_for_improvement': _merge_lists(ordered, 'areas_for_improvement'),
+        'detailed_analysis': detailed_analysis,
+        'dimension_scores': dimension_scores
+    }
+
+class EssayPipeline:
+    """Map-reduce essay evaluation over rubric dimensions and essay parts.
+
+    Each (dimension, part) pair is a separate, smaller LLM call; at most
+    `concurrency` run at once. Essays longer than `chunk_chars` are split at
+    paragraph boundaries, and each part is evaluated with an outline of the whole
+    essay. Results are merged locally, so no call sees a truncated essay.
+
+    With a `cache` (a ContentCache), each (dimension, part) analysis is stored
+    under a hash of the part's text, along with where the part started. A
+    resubmitted draft is split along the parts of the cached version, so
+    unchanged parts are merged from the cache and only the changed stretches are
+    chunked and sent. Organization depends on the essay's structure, so its
+    analyses are also keyed on the outline and the part's position.
+    """
+
+    def __init__(self, tutor, concurrency: int = CONCURRENCY, chunk_chars: int = CHUNK_CHARS, cache=None):
+        self.tutor = tutor
+        self.concurrency = max(1, concurrency)
+        self.chunk_chars = chunk_chars
+        self.cache = cache
+
+    def _evaluate_part(self, dimension: str, part: str, part_index: int, part_count: int,
+                       topic: str, outline: str) -> Optional[Dict[str, Any]]:
+        with span('essay.part', dimension=dimension, part=part_index + 1):
+            return self._evaluate_part_call(dimension, part, part_index, part_count, topic, outline)
+
+    def _evaluate_part_call(self, dimension: str, part: str, part_index: int, part_count: int,
+                            topic: str, outline: str) -> Optional[Dict[str, Any]]:
+        prompt = PromptTemplates.essay_dimension_evaluation(
+            essay_part=part,
+            dimension=dimension,
+            focus=DIMENSIONS[dimension],
+            topic=topic,
+            word_count=len(part.split()),
+            part_index=part_index + 1,
+            part_count=part_count,
+            outline=outline
+        )
+        result = self.tutor._call_llm_with_fallback(prompt, 'essay_evaluation', 'anthropic',
+                                                    schema_name='essay_dimension')
+        if not result['success'] or result.get('provider') == 'mock':
+            return None
+        parsed = self.tutor._response_content(result)
+        if 'error' in parsed or not isinstance(parsed.get('score'), (int, float)):
+            return None
+        return dict(parsed, provider=result['provider'], usage=result.get('usage', {}))
+
+    def _split(self, content: str, topic: str) -> List[str]:
+        """Chunk the essay, keeping parts of an earlier evaluated version whole where they are unchanged"""
+        if self.cache is None:
+            return chunk_essay(content, self.chunk_chars)
+        paragraphs = split_paragraphs(content)
+        parts: List[str] = []
+        changed: List[str] = []
+        index = 0
+        while index < len(paragraphs):
+            count = self.cache.get(_layout_key(paragraphs[index]))
+            if count:
+                candidate = '\n\n'.join(paragraphs[index:index + count])
+                if any(self.cache.get(analysis_key(dimension, candidate, topic)) is not None
+                       for dimension in DIMENSIONS if dimension != 'organization'):
+                    parts.extend(chunk_essay('\n\n'.join(changed), self.chunk_chars))
+                    parts.append(candidate)
+                    changed = []
+                    index += count
+                    continue
+            changed.append(paragraphs[index])
+            index += 1
+        parts.extend(chunk_essay('\n\n'.join(changed), self.chunk_chars))
+        return parts
+
+    def evaluate(self, content: str, topic: str = 'general') -> Optional[Dict[str, Any]]:
+        """Evaluate an essay; None when no provider produced a usable result for any dimension.
+
+        When some (dimension, part) calls fail, the evaluation is merged from the
+        rest and marked `incomplete`, with the failed calls in `parts_missing`.
+        """
+        parts = self._split(content, topic)
+        if not parts:
+            return None
+        outline = essay_outline(content) if len(parts) > 1 else ''
+        tasks = [(dimension, index) for index in range(len(parts)) for dimension in DIMENSIONS]
+
+        results: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        # Tasks to evaluate, grouped by analysis key so repeated paragraphs cost one call
+        pending: Dict[Any, List[Tuple[str, int]]] = {}
+        for task in tasks:
+            if self.cache is None:
+                pending[task] = [task]
+                continue
+            dimension, index = task
+            context = f"{index + 1}/{len(parts)}\n{outline}" if dimension == 'organization' else ''
+            key = analysis_key(dimension, parts[index], topic, context)
+            cached = self.cache.get(key)
+            if cached is not None:
+                results[task] = dict(cached, usage={})
+            else:
+                pending.setdefault(key, []).append(task)
+        reused = len(results)
+        annotate(reused=reused)
+
+        if pending:
+            with ThreadPoolExecutor(max_workers=min(self.concurrency, len(pending))) as pool:
+                # Each call runs in a copy of this context so it sees the request deadline and trace
+                futures = {
+                    key: pool.submit(contextvars.copy_context().run, self._evaluate_part,
+                                     group[0][0], parts[group[0][1]], group[0][1], len(parts), topic, outline)
+                    for key, group in pending.items()
+                }
+                for key, future in futures.items():
+                    dimension, index = pending[key][0]
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        logger.error(f"Essay {dimension} evaluation failed for part {index + 1}: {e}")
+                        continue
+                    if result is None:
+                        continue
+                    if self.cache is not None:
+                        self.cache.set(key, result)
+                    results[pending[key][0]] = result
+                    for task in pending[key][1:]:
+                        results[task] = dict(result, usage={})
+
+        if not results:
+            return None
+        missing = [{'dimension': dimension, 'part': index + 1} for dimension, index in tasks
+                   if (dimension, index) not in results]
+        if missing:
+            logger.warning(f"Essay evaluation merged {len(results)} of {len(tasks)} parts")
+        if self.cache is not None:
+            for part in parts:
+                paragraphs = split_paragraphs(part)
+                self.cache.set(_layout_key(paragraphs[0]), len(paragraphs))
+
+        with span('essay.merge', results=len(results)):
+            evaluation = merge_evaluations(results, [len(part.split()) for part in parts])
+        usage: Dict[str, Any] = {}
+        for result in results.values():
+            for key, value in (result.get('usage') or {}).items():
+                if isinstance(value, (int, float)):
+                    usage[key] = usage.get(key, 0) + value
+        evaluation['provider'] = Counter(r['provider'] for r in results.values()).most_common(1)[0][0]
+        evaluation['usage'] = usage
+        evaluation['parts'] = len(parts)
+        evaluation['reused'] = reused
+        evaluation['incomplete'] = bool(missing)
+        evaluation['parts_missing'] = missing
+        return evaluation
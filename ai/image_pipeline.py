@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+"""
+Image Answer Pipeline
+Bounds uploaded images in size and evaluates answers about them, caching descriptions and evaluations by content hash
+"""
+
+import base64
+import hashlib
+import io
+import json
+import os
+import logging
+from typing import Dict, Any, Optional
+
+from prompt_templates import PromptTemplates
+from tracing import annotate, span
+
+logger = logging.getLogger(__name__)
+
+MAX_SIDE = int(os.getenv('TUTOR_IMAGE_MAX_SIDE', '1024'))
+MAX_BYTES = int(os.getenv('TUTOR_IMAGE_MAX_BYTES', str(1024 * 1024)))
+JPEG_QUALITY = int(os.getenv('TUTOR_IMAGE_JPEG_QUALITY', '85'))
+# Images with at most this many colours (diagrams, charts, screenshots) are kept lossless
+DIAGRAM_COLORS = 256
+MIN_SIDE = 64
+
+_SIGNATURES = [
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'GIF87a', 'image/gif'),
+    (b'GIF89a', 'image/gif')
+]
+
+def image_hash(data: bytes) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+def sniff_media_type(data: bytes) -> Optional[str]:
+    """Media type of image formats the providers accept, from the file signature"""
+    for signature, media_type in _SIGNATURES:
+        if data.startswith(signature):
+            return media_type
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP':
+        return 'image/webp'
+    return None
+
+def _encode(image) -> Dict[str, Any]:
+    """PNG for images with few colours, where JPEG would blur lines and text; JPEG otherwise"""
+    out = io.BytesIO()
+    if image.getcolors(DIAGRAM_COLORS) is not None:
+        if image.mode not in ('1', 'L', 'LA', 'P', 'RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        image.save(out, format='PNG', optimize=True)
+        media_type = 'image/png'
+    else:
+        if image.mode != 'RGB':
+            image = image.convert('RGB')
+        image.save(out, format='JPEG', quality=JPEG_QUALITY, optimize=True)
+        media_type = 'image/jpeg'
+    return {'media_type': media_type, 'bytes': out.getvalue()}
+
+def prepare_image(data: bytes, max_side: int = MAX_SIDE, max_bytes: int = MAX_BYTES) -> Dict[str, Any]:
+    """The form of an image that is sent to providers: at most max_side pixels a side and max_bytes.
+
+    Images already within both limits are sent unchanged. Larger ones are
+    downscaled and re-encoded with Pillow; without Pillow they are rejected.
+    Raises ValueError for data that is not a usable image.
+    """
+    if not data:
+        raise ValueError('Image is empty')
+    media_type = sniff_media_type(data)
+    try:
+        from PIL import Image
+    except ImportError:
+        Image = None
+
+    if Image is None:
+        if media_type is None:
+            raise ValueError('Unsupported image format (PNG, JPEG, GIF or WebP expected)')
+        if len(data) > max_bytes:
+            raise ValueError(f"Image is {len(data)} bytes (limit {max_bytes}); install Pillow to downscale it")
+        encoded = {'media_type': media_type, 'bytes': data}
+        resized = False
+    else:
+        try:
+            image = Image.open(io.BytesIO(data))
+            image.load()
+        except Exception as e:
+            raise ValueError(f"Unreadable image: {e}")
+        if media_type is not None and len(data) <= max_bytes and max(image.size) <= max_side:
+            encoded = {'media_type': media_type, 'bytes': data}
+            resized = False
+        else:
+            if getattr(image, 'is_animated', False):
+                image.seek(0)
+            image.thumbnail((max_side, max_side))
+            encoded = _encode(image)
+            # Photos with much detail can still be too large; keep halving until they fit
+            while len(encoded['bytes']) > max_bytes and max(image.size) > MIN_SIDE:
+                image.thumbnail((max(image.size) // 2, max(image.size) // 2))
+                encoded = _encode(image)
+            if len(encoded['bytes']) > max_bytes:
+                raise ValueError(f"Image does not fit in {max_bytes} bytes")
+            resized = True
+
+    return {
+        'media_type': encoded['media_type'],
+        'data': base64.b64encode(encoded['bytes']).decode('ascii'),
+        'bytes': len(encoded['bytes']),
+        'original_bytes': len(data),
+        'resized': resized
+    }
+
+def evaluation_key(digest: str, question: str, student_answer: str) -> str:
+    """Content hash of one (image, question, answer) evaluation"""
+    normalized = ' '.join((student_answer or '').lower().split())
+    raw = json.dumps([digest, (question or '').strip(), normalized], ensure_ascii=False)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+class ImagePipeline:
+    """Two-step evaluation of answers to image-based questions.
+
+    The image is described once by a provider with vision input, and the
+    description is cached under the hash of the image bytes, so a diagram shared
+    by a whole class is only uploaded and analysed once. Answers are then
+    evaluated as text against the description, and evaluations are cached under
+    the image hash, the question and the normalized answer.
+    """
+
+    def __init__(self, tutor, description_cache=None, evaluation_cache=None):
+        self.tutor = tutor
+        self.description_cache = description_cache
+        self.evaluation_cache = evaluation_cache
+
+    def describe(self, data: bytes, digest: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """Description of an image (cached); None when no provider with vision input answered"""
+        digest = digest or image_hash(data)
+        if self.description_cache is not None:
+            cached = self.description_cache.get(digest)
+            if cached is not None:
+                return dict(cached, cached=True)
+
+        with span('image.prepare'):
+            image = prepare_image(data)
+            annotate(bytes=image['bytes'], original_bytes=image['original_bytes'], resized=image['resized'])
+        result = self.tutor._call_llm_with_fallback(
+            PromptTemplates.image_description(), 'image_analysis', schema_name='image_description',
+            images=[{'media_type': image['media_type'], 'data': image['data']}]
+        )
+        if not result['success'] or result.get('provider') == 'mock':
+            return None
+        parsed = self.tutor._response_content(result)
+        if 'error' in parsed or not isinstance(parsed.get('description'), str):
+            return None
+        description = {
+            'description': parsed['description'],
+            'key_elements': parsed.get('key_elements', []),
+            'provider': result['provider'],
+            'usage': result.get('usage', {})
+        }
+        if self.description_cache is not None:
+            self.description_cache.set(digest, description)
+        return dict(description, cached=False)
+
+    def evaluate(self, data: bytes, question: str, student_answer: str) -> Optional[Dict[str, Any]]:
+        """Evaluate an answer about an image; None when no provider produced a usable result"""
+        digest = image_hash(data)
+        key = evaluation_key(digest, question, student_answer)
+        if self.evaluation_cache is not None:
+            cached = self.evaluation_cache.get(key)
+            if cached is not None:
+                annotate(cache='evaluation')
+                return dict(cached, usage={}, cached=True)
+
+        description = self.describe(data, digest)
+        if description is None:
+            return None
+        if description['cached']:
+            annotate(cache='description')
+        text = description['description']
+        if description['key_elements']:
+            text += '\nKey elements: ' + '; '.join(str(item) for item in description['key_elements'])
+
+        prompt = PromptTemplates.image_analysis_question(text, question, student_answer)
+        result = self.tutor._call_llm_with_fallback(prompt, 'tutoring', schema_name='image_evaluation')
+        if not result['success'] or result.get('provider') == 'mock':
+            return None
+        parsed = self.tutor._response_content(result)
+        if 'error' in parsed or not isinstance(parsed.get('score'), (int, float)):
+            return None
+
+        usage: Dict[str, Any] = {} if description['cached'] else dict(description['usage'])
+        for name, value in (result.get('usage') or {}).items():
+            if isinstance(value, (int, float)):
+                usage[name] = usage.get(name, 0) + value
+        evaluation = {
+            'correct': bool(parsed.get('correct', False)),
+            'feedback': parsed.get('feedback', ''),
+            'score': parsed['score'],
+            'visual_analysis': parsed.get('visual_analysis', ''),
+            'suggestions': parsed.get('suggestions', []),
+            'key_visual_elements': parsed.get('key_visual_elements', []),
+            'image_description': description['description'],
+            'provider': result['provider']
+        }
+        if self.evaluation_cache is not None:
+            self.evaluation_cache.set(key, evaluation)
+        return dict(evaluation, usage=usage, cached=False)
@@ -5,12 +5,14 @@ Manages API keys, model configurations, and provider settings
 """
 
 import os
-from typing import Dict, Any, Optional
+import threading
+from types import MappingProxyType
+from typing import Dict, Any, Mapping, Optional
 from dataclasses import dataclass
 
-@dataclass
+@dataclass(frozen=True)
 class LLMConfig:
-    """Configuration for different LLM providers"""
+    """Configuration for different LLM providers (immutable, so it can be shared between threads)"""
     provider: str
     model: str
     api_key: str
@@ -18,12 +20,17 @@ class LLMConfig:
     max_tokens: int = 2000
     temperature: float = 0.7
     timeout: int = 30
+    keep_alive: Optional[str] = None
 
 class LLMManager:
-    """Manages LLM configurations and provider selection"""
+    """Manages LLM configurations and provider selection
+    
+    The configuration is a read-only snapshot of the environment taken at
+    construction; later environment changes need a new LLMManager.
+    """
     
     def __init__(self):
-        self.configs = self._load_configs()
+        self.configs: Mapping[str, LLMConfig] = MappingProxyType(self._load_configs())
         self.default_provider = os.getenv('DEFAULT_LLM_PROVIDER', 'openai')
     
     def _load_configs(self) -> Dict[str, LLMConfig]:
@@ -36,6 +43,7 @@ class LLMManager:
                 provider='openai',
                 model=os.getenv('OPENAI_MODEL', 'gpt-4'),
                 api_key=os.getenv('OPENAI_API_KEY'),
+                base_url=os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1'),
                 max_tokens=int(os.getenv('OPENAI_MAX_TOKENS', '2000')),
                 temperature=float(os.getenv('OPENAI_TEMPERATURE', '0.7'))
             )
@@ -46,6 +54,7 @@ class LLMManager:
                 provider='anthropic',
                 model=os.getenv('ANTHROPIC_MODEL', 'claude-3-sonnet-20240229'),
                 api_key=os.getenv('ANTHROPIC_API_KEY'),
+                base_url=os.getenv('ANTHROPIC_BASE_URL', 'https://api.anthropic.com/v1'),
                 max_tokens=int(os.getenv('ANTHROPIC_MAX_TOKENS', '2000')),
                 temperature=float(os.getenv('ANTHROPIC_TEMPERATURE', '0.7'))
             )
@@ -58,7 +67,8 @@ class LLMManager:
                 api_key='',  # Ollama doesn't require API key
                 base_url=os.getenv('OLLAMA_BASE_URL', 'http://localhost:11434'),
                 max_tokens=int(os.getenv('OLLAMA_MAX_TOKENS', '2000')),
-                temperature=float(os.getenv('OLLAMA_TEMPERATURE', '0.7'))
+                temperature=float(os.getenv('OLLAMA_TEMPERATURE', '0.7')),
+                keep_alive=os.getenv('OLLAMA_KEEP_ALIVE', '30m')
             )
         
         # Hugging Face Configuration
@@ -72,6 +82,17 @@ class LLMManager:
                 temperature=float(os.getenv('HUGGINGFACE_TEMPERATURE', '0.7'))
             )
         
+        # In-process transformers model (CPU, privacy-preserving)
+        if os.getenv('TRANSFORMERS_MODEL_PATH'):
+            configs['transformers'] = LLMConfig(
+                provider='transformers',
+                model=os.getenv('TRANSFORMERS_MODEL_PATH'),
+                api_key='',
+                max_tokens=int(os.getenv('TRANSFORMERS_MAX_TOKENS', '256')),
+                temperature=float(os.getenv('TRANSFORMERS_TEMPERATURE', '0.7')),
+                timeout=int(os.getenv('TRANSFORMERS_TIMEOUT', '120'))
+            )
+        
         return configs
     
     def get_config(self, provider: Optional[str] = None) -> Optional[LLMConfig]:
@@ -109,15 +130,50 @@ class LLMManager:
             elif 'anthropic' in available:
                 return 'anthropic'
         
+        elif task_type == 'image_analysis':
+            # Providers with vision input; Ollama only with a multimodal model
+            for name in ('openai', 'anthropic', 'ollama'):
+                if name in available:
+                    return name
+        
         elif task_type == 'privacy_sensitive':
             # Use local models for privacy
             if 'ollama' in available:
                 return 'ollama'
+            elif 'transformers' in available:
+                return 'transformers'
             elif 'huggingface' in available:
                 return 'huggingface'
         
         # Default to first available provider
         return available[0]
 
-# Global instance
-llm_manager = LLMManager()
+    def config_fingerprint(self) -> str:
+        """Stable hash of the configured providers, used to key cached provider state"""
+        import hashlib
+        
+        parts = []
+        for name in sorted(self.configs):
+            config = self.configs[name]
+            key_hash = hashlib.sha256(config.api_key.encode('utf-8')).hexdigest()[:12] if config.api_key else ''
+            parts.append(f"{name}|{config.model}|{config.base_url or ''}|{key_hash}")
+        return hashlib.sha256('\n'.join(parts).encode('utf-8')).hexdigest()
+
+# Global instance, built on first use so importing this module stays cheap
+_llm_manager: Optional[LLMManager] = None
+_llm_manager_lock = threading.Lock()
+
+def get_llm_manager() -> LLMManager:
+    """Return the process-wide LLMManager, reading the environment on first call"""
+    global _llm_manager
+    if _llm_manager is None:
+        with _llm_manager_lock:
+            if _llm_manager is None:
+                _llm_manager = LLMManager()
+    return _llm_manager
+
+def __getattr__(name: str):
+    # Keep `from llm_config import llm_manager` working without eager construction
+    if name == 'llm_manager':
+        return get_llm_manager()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -5,18 +5,59 @@ Handles different LLM services with unified interface
 """
 
 import json
+import os
 import time
 import logging
-from typing import Dict, Any, Optional, List
-import requests
+import threading
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Dict, Any, Optional, List, Tuple
 from abc import ABC, abstractmethod
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+class PerThreadSession:
+    """HTTP session with one requests.Session (and connection pool) per thread.
+
+    A requests.Session is not safe to share between threads (its cookie jar and
+    adapter state are mutated per request), so each calling thread gets its own,
+    created on first use with the same default headers. requests is imported
+    only when a provider first makes a call.
+    """
+
+    def __init__(self, headers: Optional[Dict[str, str]] = None):
+        self.headers = MappingProxyType(dict(headers or {}))
+        self._local = threading.local()
+
+    def _session(self):
+        session = getattr(self._local, 'session', None)
+        if session is None:
+            import requests
+            session = requests.Session()
+            session.headers.update(self.headers)
+            self._local.session = session
+        return session
+
+    def get(self, url: str, **kwargs):
+        return self._session().get(url, **kwargs)
+
+    def post(self, url: str, **kwargs):
+        return self._session().post(url, **kwargs)
+
+def _create_session(headers: Optional[Dict[str, str]] = None) -> PerThreadSession:
+    """Create an HTTP session for a provider; headers are fixed for its lifetime"""
+    return PerThreadSession(headers)
+
 class LLMProvider(ABC):
     """Abstract base class for LLM providers"""
+
+    # Providers that can constrain output to a JSON Schema accept `response_schema`
+    # (and an optional `schema_name`) in generate_response kwargs. Others may get
+    # `schema_name` alone, meaning JSON output is expected (see OpenAIProvider)
+    supports_structured_output = False
+    # Providers that can see images accept `images`: a list of
+    # {'media_type': ..., 'data': <base64>} dicts sent along with the prompt
+    supports_images = False
     
     @abstractmethod
     def generate_response(self, prompt: str, **kwargs) -> Dict[str, Any]:
@@ -27,17 +68,42 @@ class LLMProvider(ABC):
     def is_available(self) -> bool:
         """Check if the provider is available"""
         pass
+    
+    def _request_timeout(self, kwargs: Dict[str, Any]) -> float:
+        """Configured timeout, shortened to the caller's remaining deadline (`timeout` kwarg)"""
+        timeout = kwargs.get('timeout')
+        return self.config.timeout if timeout is None else min(self.config.timeout, timeout)
+
+def _model_matches(model: str, prefixes: Tuple[str, ...], excluded: Tuple[str, ...] = ()) -> bool:
+    name = (model or '').lower().rsplit('/', 1)[-1]
+    return name.startswith(prefixes) and not name.startswith(excluded)
+
+# OpenAI models that accept response_format json_schema; older ones (gpt-4, gpt-3.5) only json_object
+OPENAI_JSON_SCHEMA_MODELS = ('gpt-4o', 'gpt-4.1', 'gpt-4.5', 'gpt-5', 'o1', 'o3', 'o4')
+OPENAI_JSON_SCHEMA_EXCLUDED = ('gpt-4o-2024-05-13', 'o1-mini', 'o1-preview')
+# OpenAI models that accept image input; gpt-4, gpt-3.5 and the mini reasoning models are text only
+OPENAI_VISION_MODELS = ('gpt-4o', 'gpt-4-turbo', 'gpt-4-vision', 'gpt-4-1106-vision', 'gpt-4.1', 'gpt-4.5',
+                        'gpt-5', 'o1', 'o3', 'o4')
+OPENAI_VISION_EXCLUDED = ('gpt-4o-audio', 'gpt-4o-realtime', 'gpt-4-turbo-preview', 'o1-mini', 'o1-preview',
+                          'o3-mini')
 
 class OpenAIProvider(LLMProvider):
-    """OpenAI GPT provider implementation"""
+    """OpenAI GPT provider implementation
+    
+    Structured output (response_format json_schema in strict mode) is used only
+    with models that support it; other models are asked for a JSON object and
+    their output is validated by the caller. Images are sent only to vision models.
+    """
     
     def __init__(self, config):
         self.config = config
         self.api_key = config.api_key
         self.model = config.model
-        self.base_url = "https://api.openai.com/v1"
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.supports_structured_output = _model_matches(self.model, OPENAI_JSON_SCHEMA_MODELS,
+                                                         OPENAI_JSON_SCHEMA_EXCLUDED)
+        self.supports_images = _model_matches(self.model, OPENAI_VISION_MODELS, OPENAI_VISION_EXCLUDED)
+        self.base_url = (config.base_url or "https://api.openai.com/v1").rstrip('/')
+        self.session = _create_session({
             'Authorization': f'Bearer {self.api_key}',
             'Content-Type': 'application/json'
         })
@@ -51,30 +117,54 @@ class OpenAIProvider(LLMProvider):
             logger.error(f"OpenAI availability check failed: {e}")
             return False
     
+    def build_payload(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        """Chat completions request body (also used for batch jobs, see batch_api.py)"""
+        content: Any = prompt
+        if kwargs.get('images'):
+            content = [{"type": "text", "text": prompt}] + [
+                {"type": "image_url", "image_url": {"url": f"data:{image['media_type']};base64,{image['data']}"}}
+                for image in kwargs['images']
+            ]
+        payload = {
+            "model": self.model,
+            "messages": [{"role": "user", "content": content}],
+            "max_tokens": kwargs.get('max_tokens', self.config.max_tokens),
+            "temperature": kwargs.get('temperature', self.config.temperature)
+        }
+        if kwargs.get('response_schema') and self.supports_structured_output:
+            payload["response_format"] = {
+                "type": "json_schema",
+                "json_schema": {
+                    "name": kwargs.get('schema_name') or 'tutor_response',
+                    "schema": kwargs['response_schema'],
+                    "strict": True
+                }
+            }
+        elif kwargs.get('response_schema') or kwargs.get('schema_name'):
+            # JSON mode: a syntactically valid object, shaped only by the prompt
+            payload["response_format"] = {"type": "json_object"}
+        return payload
+    
+    def parse_result(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Provider result for a chat completions response body"""
+        return {
+            'success': True,
+            'content': result['choices'][0]['message']['content'],
+            'usage': result.get('usage', {}),
+            'provider': 'openai'
+        }
+    
     def generate_response(self, prompt: str, **kwargs) -> Dict[str, Any]:
         """Generate response using OpenAI API"""
         try:
-            payload = {
-                "model": self.model,
-                "messages": [{"role": "user", "content": prompt}],
-                "max_tokens": kwargs.get('max_tokens', self.config.max_tokens),
-                "temperature": kwargs.get('temperature', self.config.temperature)
-            }
-            
             response = self.session.post(
                 f"{self.base_url}/chat/completions",
-                json=payload,
-                timeout=self.config.timeout
+                json=self.build_payload(prompt, **kwargs),
+                timeout=self._request_timeout(kwargs)
             )
             
             if response.status_code == 200:
-                result = response.json()
-                return {
-                    'success': True,
-                    'content': result['choices'][0]['message']['content'],
-                    'usage': result.get('usage', {}),
-                    'provider': 'openai'
-                }
+                return self.parse_result(response.json())
             else:
                 logger.error(f"OpenAI API error: {response.status_code} - {response.text}")
                 return {
@@ -93,14 +183,16 @@ class OpenAIProvider(LLMProvider):
 
 class AnthropicProvider(LLMProvider):
     """Anthropic Claude provider implementation"""
+
+    supports_structured_output = True
+    supports_images = True
     
     def __init__(self, config):
         self.config = config
         self.api_key = config.api_key
         self.model = config.model
-        self.base_url = "https://api.anthropic.com/v1"
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.base_url = (config.base_url or "https://api.anthropic.com/v1").rstrip('/')
+        self.session = _create_session({
             'x-api-key': self.api_key,
             'Content-Type': 'application/json',
             'anthropic-version': '2023-06-01'
@@ -115,30 +207,59 @@ class AnthropicProvider(LLMProvider):
             logger.error(f"Anthropic availability check failed: {e}")
             return False
     
+    def build_payload(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        """Messages request body (also used for batch jobs, see batch_api.py)"""
+        content: Any = prompt
+        if kwargs.get('images'):
+            # Images go before the text that refers to them
+            content = [
+                {"type": "image", "source": {"type": "base64", "media_type": image['media_type'], "data": image['data']}}
+                for image in kwargs['images']
+            ] + [{"type": "text", "text": prompt}]
+        payload = {
+            "model": self.model,
+            "max_tokens": kwargs.get('max_tokens', self.config.max_tokens),
+            "temperature": kwargs.get('temperature', self.config.temperature),
+            "messages": [{"role": "user", "content": content}]
+        }
+        if kwargs.get('response_schema'):
+            # Forcing a single tool call makes the tool input the structured response
+            tool_name = kwargs.get('schema_name') or 'tutor_response'
+            payload["tools"] = [{
+                "name": tool_name,
+                "description": "Return the tutor response in the required structure",
+                "input_schema": kwargs['response_schema']
+            }]
+            payload["tool_choice"] = {"type": "tool", "name": tool_name}
+        return payload
+    
+    def parse_result(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Provider result for a Messages response body"""
+        content = ''
+        for block in result.get('content', []):
+            if block.get('type') == 'tool_use':
+                content = json.dumps(block.get('input', {}))
+                break
+            if block.get('type') == 'text' and not content:
+                content = block.get('text', '')
+        return {
+            'success': True,
+            'content': content,
+            'usage': result.get('usage', {}),
+            'provider': 'anthropic'
+        }
+    
     def generate_response(self, prompt: str, **kwargs) -> Dict[str, Any]:
         """Generate response using Anthropic API"""
         try:
-            payload = {
-                "model": self.model,
-                "max_tokens": kwargs.get('max_tokens', self.config.max_tokens),
-                "temperature": kwargs.get('temperature', self.config.temperature),
-                "messages": [{"role": "user", "content": prompt}]
-            }
-            
             response = self.session.post(
                 f"{self.base_url}/messages",
-                json=payload,
-                timeout=self.config.timeout
+                json=self.build_payload(prompt, **kwargs),
+                timeout=self._request_timeout(kwargs)
             )
             
             if response.status_code == 200:
-                result = response.json()
-                return {
-                    'success': True,
-                    'content': result['content'][0]['text'],
-                    'usage': result.get('usage', {}),
-                    'provider': 'anthropic'
-                }
+                return self.parse_result(response.json())
             else:
                 logger.error(f"Anthropic API error: {response.status_code} - {response.text}")
                 return {
@@ -156,13 +277,27 @@ class AnthropicProvider(LLMProvider):
             }
 
 class OllamaProvider(LLMProvider):
-    """Ollama local model provider implementation"""
+    """Ollama local model provider implementation
+    
+    Keeps the model resident with `keep_alive` and, for conversational sessions,
+    reuses the `context` tokens Ollama returns so a follow-up turn only has to
+    process the new message instead of the whole prompt. Images need a
+    multimodal model (e.g. llava); other models answer with an error.
+    """
+
+    supports_structured_output = True
+    supports_images = True
     
     def __init__(self, config):
         self.config = config
         self.model = config.model
         self.base_url = config.base_url
-        self.session = requests.Session()
+        self.keep_alive = getattr(config, 'keep_alive', None)
+        self.max_context_sessions = int(os.getenv('OLLAMA_CONTEXT_SESSIONS', '256'))
+        self.max_context_tokens = int(os.getenv('OLLAMA_CONTEXT_MAX_TOKENS', '3072'))
+        self._contexts: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._contexts_lock = threading.Lock()
+        self.session = _create_session()
     
     def is_available(self) -> bool:
         """Check if Ollama is available"""
@@ -173,32 +308,96 @@ class OllamaProvider(LLMProvider):
             logger.error(f"Ollama availability check failed: {e}")
             return False
     
+    def warm_up(self) -> bool:
+        """Load the model into memory ahead of the first request"""
+        payload = {"model": self.model, "prompt": "", "stream": False}
+        if self.keep_alive:
+            payload["keep_alive"] = self.keep_alive
+        try:
+            response = self.session.post(f"{self.base_url}/api/generate", json=payload, timeout=self.config.timeout)
+            if response.status_code == 200:
+                logger.info(f"🔥 Ollama model {self.model} loaded")
+                return True
+            logger.warning(f"Ollama warm-up failed: {response.status_code} - {response.text}")
+        except Exception as e:
+            logger.warning(f"Ollama warm-up failed: {e}")
+        return False
+    
+    def _cached_context(self, session_id: Optional[str], session_turn: Optional[int]) -> Optional[List[int]]:
+        """Context tokens for a session, if they cover exactly the turns before this one"""
+        if not session_id or session_turn is None:
+            return None
+        with self._contexts_lock:
+            entry = self._contexts.get(session_id)
+            if entry is None:
+                return None
+            if entry['turn'] != session_turn:
+                # A turn was answered elsewhere (or the session restarted); start over
+                del self._contexts[session_id]
+                return None
+            self._contexts.move_to_end(session_id)
+            return entry['context']
+    
+    def _remember_context(self, session_id: str, session_turn: int, context: List[int]):
+        with self._contexts_lock:
+            if len(context) > self.max_context_tokens:
+                # Too close to the model window; the next turn re-sends the summarized prompt
+                self._contexts.pop(session_id, None)
+                return
+            self._contexts[session_id] = {'turn': session_turn + 1, 'context': context}
+            self._contexts.move_to_end(session_id)
+            while len(self._contexts) > self.max_context_sessions:
+                self._contexts.popitem(last=False)
+    
     def generate_response(self, prompt: str, **kwargs) -> Dict[str, Any]:
-        """Generate response using Ollama API"""
+        """Generate response using Ollama API
+        
+        Optional kwargs for conversation reuse: `session_id`, `session_turn` (turns
+        already in the session) and `followup_prompt`, which replaces `prompt` when
+        the session's previous context can be continued.
+        """
         try:
+            session_id = kwargs.get('session_id')
+            session_turn = kwargs.get('session_turn')
+            context = self._cached_context(session_id, session_turn) if kwargs.get('followup_prompt') else None
+            
             payload = {
                 "model": self.model,
-                "prompt": prompt,
+                "prompt": kwargs['followup_prompt'] if context else prompt,
                 "stream": False,
                 "options": {
                     "temperature": kwargs.get('temperature', self.config.temperature),
                     "num_predict": kwargs.get('max_tokens', self.config.max_tokens)
                 }
             }
+            if context:
+                payload["context"] = context
+            if self.keep_alive:
+                payload["keep_alive"] = self.keep_alive
+            if kwargs.get('response_schema'):
+                payload["format"] = kwargs['response_schema']
+            if kwargs.get('images'):
+                payload["images"] = [image['data'] for image in kwargs['images']]
             
             response = self.session.post(
                 f"{self.base_url}/api/generate",
                 json=payload,
-                timeout=self.config.timeout
+                timeout=self._request_timeout(kwargs)
             )
             
             if response.status_code == 200:
                 result = response.json()
+                if session_id and session_turn is not None and result.get('context'):
+                    self._remember_context(session_id, session_turn, result['context'])
                 return {
                     'success': True,
                     'content': result['response'],
-                    'usage': {'total_tokens': result.get('eval_count', 0)},
-                    'provider': 'ollama'
+                    'usage': {
+                        'total_tokens': result.get('eval_count', 0),
+                        'prompt_tokens': result.get('prompt_eval_count', 0)
+                    },
+                    'provider': 'ollama',
+                    'context_reused': bool(context)
                 }
             else:
                 logger.error(f"Ollama API error: {response.status_code} - {response.text}")
@@ -224,8 +423,7 @@ class HuggingFaceProvider(LLMProvider):
         self.api_key = config.api_key
         self.model = config.model
         self.base_url = config.base_url
-        self.session = requests.Session()
-        self.session.headers.update({
+        self.session = _create_session({
             'Authorization': f'Bearer {self.api_key}',
             'Content-Type': 'application/json'
         })
@@ -254,7 +452,7 @@ class HuggingFaceProvider(LLMProvider):
             response = self.session.post(
                 f"{self.base_url}/models/{self.model}",
                 json=payload,
-                timeout=self.config.timeout
+                timeout=self._request_timeout(kwargs)
             )
             
             if response.status_code == 200:
@@ -287,6 +485,128 @@ class HuggingFaceProvider(LLMProvider):
                 'provider': 'huggingface'
             }
 
+class TransformersProvider(LLMProvider):
+    """In-process Hugging Face transformers provider (CPU)
+    
+    Loads a causal LM once per process and runs concurrent generate_response
+    calls through a DynamicBatcher. Inputs are bucketed by token length and
+    left-padded to the longest sequence in their bucket, so throughput grows with
+    load instead of requests queueing one by one.
+    """
+    
+    def __init__(self, config):
+        import torch
+        from transformers import AutoModelForCausalLM, AutoTokenizer
+        from dynamic_batcher import DynamicBatcher
+        
+        self.config = config
+        self.model_name = config.model
+        self._torch = torch
+        
+        num_threads = int(os.getenv('TRANSFORMERS_NUM_THREADS', '0'))
+        if num_threads > 0:
+            torch.set_num_threads(num_threads)
+        
+        self.tokenizer = AutoTokenizer.from_pretrained(config.model)
+        self.tokenizer.padding_side = 'left'  # generation continues from the right edge
+        if self.tokenizer.pad_token is None:
+            self.tokenizer.pad_token = self.tokenizer.eos_token
+        
+        self.model = AutoModelForCausalLM.from_pretrained(config.model, torch_dtype=torch.float32)
+        self.model.to('cpu')
+        self.model.eval()
+        
+        positions = getattr(self.model.config, 'max_position_embeddings', None) or getattr(self.model.config, 'n_positions', 1024)
+        self.max_input_tokens = int(os.getenv('TRANSFORMERS_MAX_INPUT_TOKENS', str(positions)))
+        self.bucket_width = int(os.getenv('TRANSFORMERS_BUCKET_WIDTH', '64'))
+        self.batcher = DynamicBatcher(
+            self._generate_batch,
+            max_batch_size=int(os.getenv('TRANSFORMERS_BATCH_SIZE', '8')),
+            max_wait=float(os.getenv('TRANSFORMERS_BATCH_WAIT_MS', '20')) / 1000.0,
+            bucket_key=self._bucket_key,
+            name='transformers-batcher'
+        )
+    
+    def is_available(self) -> bool:
+        """The model is loaded in-process, so it is available once constructed"""
+        return True
+    
+    def warm_up(self) -> bool:
+        """Run one tiny generation so kernels and caches are initialized before traffic"""
+        result = self.generate_response('Hello', max_tokens=1, temperature=0)
+        return result['success']
+    
+    def _bucket_key(self, request: Dict[str, Any]):
+        length_bucket = -(-len(request['input_ids']) // self.bucket_width)
+        return (length_bucket, request['max_new_tokens'], request['temperature'])
+    
+    def _generate_batch(self, requests: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Generate for one bucket: pad to its longest input and decode only the new tokens"""
+        torch = self._torch
+        batch = self.tokenizer.pad({'input_ids': [r['input_ids'] for r in requests]}, return_tensors='pt')
+        temperature = requests[0]['temperature']
+        
+        generate_kwargs = {
+            'max_new_tokens': requests[0]['max_new_tokens'],
+            'pad_token_id': self.tokenizer.pad_token_id,
+            'do_sample': temperature > 0
+        }
+        if temperature > 0:
+            generate_kwargs['temperature'] = temperature
+        
+        with torch.inference_mode():
+            output = self.model.generate(
+                input_ids=batch['input_ids'], attention_mask=batch['attention_mask'], **generate_kwargs
+            )
+        
+        new_tokens = output[:, batch['input_ids'].shape[1]:]
+        texts = self.tokenizer.batch_decode(new_tokens, skip_special_tokens=True)
+        results = []
+        for request, text, tokens in zip(requests, texts, new_tokens):
+            completion_tokens = int((tokens != self.tokenizer.pad_token_id).sum())
+            results.append({
+                'text': text,
+                'prompt_tokens': len(request['input_ids']),
+                'completion_tokens': completion_tokens,
+                'batch_size': len(requests)
+            })
+        return results
+    
+    def generate_response(self, prompt: str, **kwargs) -> Dict[str, Any]:
+        """Generate response with the local model, batched with concurrent callers"""
+        try:
+            max_new_tokens = int(kwargs.get('max_tokens', self.config.max_tokens))
+            input_ids = self.tokenizer(prompt)['input_ids']
+            # Keep the end of long prompts (the instructions and latest message live there)
+            budget = max(1, self.max_input_tokens - max_new_tokens)
+            input_ids = input_ids[-budget:]
+            
+            result = self.batcher({
+                'input_ids': input_ids,
+                'max_new_tokens': max_new_tokens,
+                'temperature': float(kwargs.get('temperature', self.config.temperature))
+            }, timeout=self._request_timeout(kwargs))
+            
+            return {
+                'success': True,
+                'content': result['text'],
+                'usage': {
+                    'prompt_tokens': result['prompt_tokens'],
+                    'completion_tokens': result['completion_tokens'],
+                    'total_tokens': result['prompt_tokens'] + result['completion_tokens'],
+                    'batch_size': result['batch_size']
+                },
+                'provider': 'transformers'
+            }
+            
+        except Exception as e:
+            logger.error(f"Transformers generation failed: {e}")
+            return {
+                'success': False,
+                'error': str(e),
+                'provider': 'transformers'
+            }
+
 class MockProvider(LLMProvider):
     """Mock provider for fallback and testing"""
     
@@ -335,6 +655,7 @@ class LLMProviderFactory:
             'anthropic': AnthropicProvider,
             'ollama': OllamaProvider,
             'huggingface': HuggingFaceProvider,
+            'transformers': TransformersProvider,
             'mock': MockProvider
         }
         
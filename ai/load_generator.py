@@ -0,0 +1,426 @@
+#!/usr/bin/env python3
+"""
+Load Generator for the Enhanced AI Tutor
+Drives tutor actions at a target arrival rate or concurrency and reports throughput
+"""
+
+import argparse
+import json
+import logging
+import math
+import os
+import random
+import resource
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Any, List, Optional, Callable, Tuple
+
+from question_bank import load_question_bank, RESULTS_PATH
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MIX = {
+    'evaluate_answer': 40,
+    'conversational_tutoring': 25,
+    'provide_tutoring_explanation': 15,
+    'generate_adaptive_question': 10,
+    'analyze_errors': 5,
+    'analyze_learning_path': 4,
+    'evaluate_essay': 1
+}
+
+def load_request_mix(path: Optional[str]) -> Dict[str, float]:
+    """Load an action -> weight mix file, falling back to the default mix"""
+    if not path:
+        return dict(DEFAULT_MIX)
+
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+
+    # Accept either {"action": weight} or [{"action": ..., "weight": ...}]
+    if isinstance(data, list):
+        data = {entry['action']: entry.get('weight', 1) for entry in data}
+
+    mix = {action: float(weight) for action, weight in data.items() if float(weight) > 0}
+    if not mix:
+        raise ValueError(f"Request mix {path} has no positive weights")
+    return mix
+
+def load_results(path: Optional[str] = None, max_records: int = 5000) -> List[Dict[str, Any]]:
+    """Load recorded quiz attempts used to shape synthetic traffic
+    
+    The export is streamed and reservoir-sampled down to max_records, so large
+    exports do not have to fit in memory.
+    """
+    from results_stream import iter_attempts
+    
+    path = path or RESULTS_PATH
+    if not os.path.exists(path):
+        return []
+    
+    sample: List[Dict[str, Any]] = []
+    rng = random.Random(0)
+    for seen, attempt in enumerate(iter_attempts(path)):
+        if seen < max_records:
+            sample.append(attempt)
+        else:
+            slot = rng.randint(0, seen)
+            if slot < max_records:
+                sample[slot] = attempt
+    return sample
+
+class RequestSynthesizer:
+    """Builds realistic tutor requests from the question bank and recorded results"""
+
+    def __init__(self, bank: Dict[str, List[Dict[str, Any]]], results: List[Dict[str, Any]],
+                 mix: Dict[str, float], seed: Optional[int] = None):
+        self.questions = [q for questions in bank.values() for q in questions]
+        self.subjects = sorted(bank.keys()) or ['general']
+        self.results = results
+        self.wrong_answers = [
+            detail for attempt in results
+            for detail in attempt.get('detailedResults', [])
+            if not detail.get('isCorrect', False)
+        ]
+        self.actions = list(mix.keys())
+        self.weights = [mix[action] for action in self.actions]
+        self.random = random.Random(seed)
+        self._lock = threading.Lock()
+
+        if not self.questions:
+            raise ValueError("Question bank is empty; cannot synthesize traffic")
+
+        self._builders: Dict[str, Callable[[], Dict[str, Any]]] = {
+            'evaluate_answer': self._evaluate_answer,
+            'evaluate_essay': self._evaluate_essay,
+            'generate_adaptive_question': self._generate_adaptive_question,
+            'provide_tutoring_explanation': self._provide_tutoring_explanation,
+            'conversational_tutoring': self._conversational_tutoring,
+            'analyze_learning_path': self._analyze_learning_path,
+            'analyze_errors': self._analyze_errors,
+            'get_provider_status': lambda: {'action': 'get_provider_status'}
+        }
+        unknown = [action for action in self.actions if action not in self._builders]
+        if unknown:
+            raise ValueError(f"Unknown actions in request mix: {', '.join(unknown)}")
+
+    def next_labeled(self) -> Tuple[str, Dict[str, Any]]:
+        """Draw the next request according to the mix, with the mix entry it was drawn for"""
+        with self._lock:
+            action = self.random.choices(self.actions, weights=self.weights)[0]
+            return action, self._builders[action]()
+
+    def next_request(self) -> Dict[str, Any]:
+        """Draw the next request according to the mix"""
+        return self.next_labeled()[1]
+
+    def _question(self) -> Dict[str, Any]:
+        return self.random.choice(self.questions)
+
+    def _evaluate_answer(self) -> Dict[str, Any]:
+        question = self._question()
+        options = question['options'] or ['']
+        return {
+            'action': 'evaluate_answer',
+            'question': question['question'],
+            'answer': self.random.choice(options),
+            'type': 'multiple-choice',
+            'context': {'options': options, 'correct_answer': question['correctAnswer']}
+        }
+
+    def _evaluate_essay(self) -> Dict[str, Any]:
+        paragraphs = [q['explanation'] for q in self.random.sample(self.questions, min(8, len(self.questions)))]
+        question = self._question()
+        return {
+            'action': 'evaluate_answer',
+            'question': f"Write an essay about {question['topic']}",
+            'answer': '\n\n'.join(paragraphs),
+            'type': 'essay',
+            'context': {'topic': question['topic']}
+        }
+
+    def _generate_adaptive_question(self) -> Dict[str, Any]:
+        question = self._question()
+        previous = [q['question'] for q in self.random.sample(self.questions, min(3, len(self.questions)))]
+        return {
+            'action': 'generate_adaptive_question',
+            'subject': question['subject'],
+            'difficulty': question['difficulty'],
+            'topic': question['topic'],
+            'previousQuestions': previous
+        }
+
+    def _provide_tutoring_explanation(self) -> Dict[str, Any]:
+        if self.wrong_answers:
+            detail = self.random.choice(self.wrong_answers)
+            return {
+                'action': 'provide_tutoring_explanation',
+                'question': detail.get('question', ''),
+                'studentAnswer': detail.get('userAnswer', ''),
+                'correctAnswer': detail.get('correctAnswerText') or detail.get('correctAnswer')
+            }
+
+        question = self._question()
+        options = question['options'] or ['']
+        return {
+            'action': 'provide_tutoring_explanation',
+            'question': question['question'],
+            'studentAnswer': self.random.choice(options),
+            'correctAnswer': options[question['correctAnswer']] if question['correctAnswer'] < len(options) else None
+        }
+
+    def _conversational_tutoring(self) -> Dict[str, Any]:
+        question = self._question()
+        turns = self.random.randint(0, 6)
+        history = [
+            {'student': q['question'], 'tutor': q['explanation']}
+            for q in self.random.sample(self.questions, min(turns, len(self.questions)))
+        ]
+        return {
+            'action': 'conversational_tutoring',
+            'studentMessage': f"Can you explain {question['topic']}? {question['question']}",
+            'conversationHistory': history
+        }
+
+    def _analyze_learning_path(self) -> Dict[str, Any]:
+        attempts = self.random.sample(self.results, min(3, len(self.results))) if self.results else []
+        total = sum(a.get('totalQuestions', 0) for a in attempts) or 10
+        correct = sum(a.get('correctCount', 0) for a in attempts)
+        scores = [a.get('score', 0) for a in attempts] or [50]
+        return {
+            'action': 'analyze_learning_path',
+            'studentProgress': {
+                'totalQuestions': total,
+                'correctAnswers': correct,
+                'averageScore': sum(scores) / len(scores),
+                'subjects': {a.get('subject', 'general'): {'progress': a.get('score', 0)} for a in attempts}
+            },
+            'subjects': self.subjects
+        }
+
+    def _analyze_errors(self) -> Dict[str, Any]:
+        if self.wrong_answers:
+            sample = self.random.sample(self.wrong_answers, min(self.random.randint(1, 10), len(self.wrong_answers)))
+            errors = [
+                f"Answered {d.get('userAnswer')} to '{d.get('question')}' (correct: {d.get('correctAnswerText')})"
+                for d in sample
+            ]
+        else:
+            errors = [f"Misunderstood {self._question()['topic']}"]
+        return {
+            'action': 'analyze_errors',
+            'studentErrors': errors,
+            'subject': self.random.choice(self.subjects)
+        }
+
+def _percentile(sorted_values: List[float], pct: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct * len(sorted_values) / 100.0) - 1))
+    return sorted_values[rank]
+
+def _current_rss_bytes() -> int:
+    """Resident set size of this process (Linux /proc, else peak RSS)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+class LoadStats:
+    """Thread-safe collector for per-request outcomes"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.samples: List[Dict[str, Any]] = []
+
+    def record(self, action: str, latency: float, error: bool, fallback: bool):
+        with self._lock:
+            self.samples.append({'action': action, 'latency': latency, 'error': error, 'fallback': fallback})
+
+    @staticmethod
+    def _summarize(samples: List[Dict[str, Any]], elapsed: float) -> Dict[str, Any]:
+        latencies = sorted(s['latency'] for s in samples)
+        count = len(samples)
+        return {
+            'requests': count,
+            'throughput_rps': round(count / elapsed, 3) if elapsed > 0 else 0.0,
+            'latency_ms': {
+                'p50': round(_percentile(latencies, 50) * 1000, 2),
+                'p90': round(_percentile(latencies, 90) * 1000, 2),
+                'p95': round(_percentile(latencies, 95) * 1000, 2),
+                'p99': round(_percentile(latencies, 99) * 1000, 2),
+                'max': round((latencies[-1] if latencies else 0.0) * 1000, 2),
+                'mean': round((sum(latencies) / count if count else 0.0) * 1000, 2)
+            },
+            'error_rate': round(sum(s['error'] for s in samples) / count, 4) if count else 0.0,
+            'fallback_rate': round(sum(s['fallback'] for s in samples) / count, 4) if count else 0.0
+        }
+
+    def report(self, elapsed: float, cpu_seconds: float) -> Dict[str, Any]:
+        with self._lock:
+            samples = list(self.samples)
+
+        report = self._summarize(samples, elapsed)
+        report['elapsed_s'] = round(elapsed, 3)
+        report['cpu'] = {
+            'cpu_seconds': round(cpu_seconds, 3),
+            'utilization_pct': round(100.0 * cpu_seconds / elapsed, 1) if elapsed > 0 else 0.0
+        }
+        report['memory'] = {
+            'rss_mb': round(_current_rss_bytes() / (1024 * 1024), 1),
+            'peak_rss_mb': round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+        }
+
+        by_action: Dict[str, List[Dict[str, Any]]] = {}
+        for sample in samples:
+            by_action.setdefault(sample['action'], []).append(sample)
+        report['by_action'] = {action: self._summarize(items, elapsed) for action, items in sorted(by_action.items())}
+        return report
+
+class LoadGenerator:
+    """Runs synthesized requests against EnhancedAITutor in open- or closed-loop mode"""
+
+    def __init__(self, synthesizer: RequestSynthesizer, tutor_factory: Optional[Callable[[], Any]] = None,
+                 socket_path: Optional[str] = None):
+        self.synthesizer = synthesizer
+        self.tutor_factory = tutor_factory or self._default_tutor_factory
+        self.socket_path = socket_path
+        self.stats = LoadStats()
+        self._local = threading.local()
+
+    @staticmethod
+    def _default_tutor_factory():
+        from enhanced_ai_agent import EnhancedAITutor
+        return EnhancedAITutor()
+
+    def _tutor(self):
+        """One tutor per driver thread so runs do not depend on shared-state safety"""
+        tutor = getattr(self._local, 'tutor', None)
+        if tutor is None:
+            tutor = self._local.tutor = self.tutor_factory()
+        return tutor
+
+    def _send(self, request: Dict[str, Any]) -> Dict[str, Any]:
+        """Run one request in-process, or against a worker pool when a socket is configured"""
+        if self.socket_path:
+            from worker_pool import send_request
+            return send_request(request, self.socket_path)
+
+        from enhanced_ai_agent import handle_request
+        return handle_request(self._tutor(), request)
+
+    def _execute(self, label: str, request: Dict[str, Any], started: float):
+        """Run one request and record it under its mix entry (essays go out as evaluate_answer)"""
+        error = False
+        fallback = False
+        try:
+            result = self._send(request)
+            error = not isinstance(result, dict) or 'error' in result
+            fallback = isinstance(result, dict) and result.get('provider') == 'mock'
+        except Exception as e:
+            logger.error(f"Request {request.get('action')} raised: {e}")
+            error = True
+        self.stats.record(label, time.perf_counter() - started, error, fallback)
+
+    def run_open_loop(self, rate: float, duration: float, ramp_up: float = 0.0, max_workers: int = 64):
+        """Issue requests at a fixed arrival rate regardless of completions.
+
+        Latency is measured from each request's scheduled arrival time, so time spent
+        queued behind a saturated pool is counted rather than hidden.
+        """
+        start = time.perf_counter()
+        arrival = 0
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            while True:
+                offset = self._arrival_offset(arrival, rate, ramp_up)
+                if offset >= duration:
+                    break
+                scheduled = start + offset
+                delay = scheduled - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(self._execute, *self.synthesizer.next_labeled(), scheduled)
+                arrival += 1
+        return time.perf_counter() - start
+
+    @staticmethod
+    def _arrival_offset(index: int, rate: float, ramp_up: float) -> float:
+        """Offset of the index-th arrival under a linear ramp from 0 to rate over ramp_up seconds"""
+        if ramp_up <= 0:
+            return index / rate
+        ramp_arrivals = rate * ramp_up / 2.0
+        if index <= ramp_arrivals:
+            return (2.0 * index * ramp_up / rate) ** 0.5
+        return ramp_up + (index - ramp_arrivals) / rate
+
+    def run_closed_loop(self, concurrency: int, duration: float, ramp_up: float = 0.0):
+        """Keep a fixed number of requests in flight, each worker issuing back to back"""
+        start = time.perf_counter()
+        stop_at = start + duration
+
+        def worker(index: int):
+            if ramp_up > 0:
+                time.sleep(ramp_up * index / concurrency)
+            while time.perf_counter() < stop_at:
+                self._execute(*self.synthesizer.next_labeled(), time.perf_counter())
+
+        threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(concurrency)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return time.perf_counter() - start
+
+def _cpu_seconds() -> float:
+    times = os.times()
+    return times.user + times.system
+
+def main():
+    """Command line entry point"""
+    parser = argparse.ArgumentParser(description='Drive EnhancedAITutor with synthetic production-like traffic')
+    mode = parser.add_mutually_exclusive_group(required=True)
+    mode.add_argument('--rate', type=float, help='open-loop arrival rate in requests/second')
+    mode.add_argument('--concurrency', type=int, help='closed-loop number of in-flight requests')
+    parser.add_argument('--duration', type=float, default=30.0, help='test duration in seconds')
+    parser.add_argument('--ramp-up', type=float, default=0.0, help='seconds to ramp linearly to the target load')
+    parser.add_argument('--mix', help='JSON request-mix file ({"action": weight, ...})')
+    parser.add_argument('--csv-dir', help='question bank directory (default: data/csv)')
+    parser.add_argument('--results', help='recorded results file (default: data/test_results.json)')
+    parser.add_argument('--max-workers', type=int, default=64, help='open-loop worker thread cap')
+    parser.add_argument('--seed', type=int, help='random seed for reproducible traffic')
+    parser.add_argument('--socket', help='drive a running worker_pool.py on this Unix socket instead of in-process')
+    parser.add_argument('--output', help='write the JSON report to this file instead of stdout')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    synthesizer = RequestSynthesizer(
+        load_question_bank(args.csv_dir),
+        load_results(args.results),
+        load_request_mix(args.mix),
+        seed=args.seed
+    )
+    generator = LoadGenerator(synthesizer, socket_path=args.socket)
+
+    cpu_before = _cpu_seconds()
+    if args.rate:
+        elapsed = generator.run_open_loop(args.rate, args.duration, args.ramp_up, args.max_workers)
+        mode_info = {'mode': 'open-loop', 'target_rate_rps': args.rate}
+    else:
+        elapsed = generator.run_closed_loop(args.concurrency, args.duration, args.ramp_up)
+        mode_info = {'mode': 'closed-loop', 'concurrency': args.concurrency}
+
+    report = dict(mode_info, ramp_up_s=args.ramp_up, **generator.stats.report(elapsed, _cpu_seconds() - cpu_before))
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Precomputed Distractor Explanations
+Offline job that explains every wrong option in the question bank, plus the request-time lookup
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from typing import Dict, Any, List, Optional, Tuple
+
+from question_bank import DATA_DIR, load_question_bank
+from scheduler import schedule_scope
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.getenv('TUTOR_EXPLANATIONS_PATH', os.path.join(DATA_DIR, 'precomputed_explanations.jsonl'))
+DEFAULT_CONCURRENCY = 4
+EXPLANATION_FIELDS = ('explanation', 'key_concepts', 'examples', 'common_mistakes', 'practice_tips', 'next_steps')
+
+_SPACE = re.compile(r'\s+')
+_LETTER = re.compile(r'^([A-Za-z])(?:[.):]\s*.*)?$')
+
+def normalize_text(text: str) -> str:
+    return _SPACE.sub(' ', (text or '').strip().lower())
+
+def question_key(question_text: str) -> str:
+    """Lookup key for a question, insensitive to case and whitespace"""
+    return hashlib.sha1(normalize_text(question_text).encode('utf-8')).hexdigest()[:16]
+
+def row_fingerprint(question: Dict[str, Any]) -> str:
+    """Hash of every CSV field that influences an explanation; changes mark entries stale"""
+    raw = json.dumps([question['question'], question['options'], question['correctAnswer'],
+                      question['explanation'], question['topic'], question['difficulty']])
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()[:16]
+
+def distractor_pairs(bank: Dict[str, List[Dict[str, Any]]]) -> List[Tuple[Dict[str, Any], int]]:
+    """Every (question, wrong option index) pair in the bank"""
+    return [
+        (question, index)
+        for questions in bank.values()
+        for question in questions
+        for index in range(len(question['options']))
+        if index != question['correctAnswer']
+    ]
+
+def read_entries(path: str) -> List[Dict[str, Any]]:
+    """Entries in a lookup file (later lines win for the same question/option/fingerprint)"""
+    if not os.path.exists(path):
+        return []
+    entries = []
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entries.append(json.loads(line))
+            except ValueError:
+                # A torn final line from an interrupted run; that pair is simply redone
+                logger.warning(f"Skipping unreadable line in {path}")
+    return entries
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, 'rb') as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b'\n'
+
+def precompute(tutor, bank: Dict[str, List[Dict[str, Any]]], path: str = DEFAULT_PATH,
+               concurrency: int = DEFAULT_CONCURRENCY, limit: Optional[int] = None,
+               batch_backend=None) -> Dict[str, int]:
+    """Explain every distractor not already in the lookup file.
+
+    Runs at most `concurrency` tutor calls at a time and appends each finished
+    explanation as one JSON line, so an interrupted run resumes where it stopped.
+    Mock-provider fallbacks are not stored. With a `batch_backend` (see
+    batch_api.py) the explanations are generated by provider batch jobs instead.
+    """
+    from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+    
+    done = {(e['key'], e['option'], e['fingerprint']) for e in read_entries(path)}
+    todo = [
+        (question, option) for question, option in distractor_pairs(bank)
+        if (question_key(question['question']), option, row_fingerprint(question)) not in done
+    ]
+    if limit is not None:
+        todo = todo[:limit]
+
+    stats = {'pending': len(todo), 'written': 0, 'skipped_mock': 0, 'failed': 0}
+
+    def explain(question, option, runner=tutor):
+        # Offline work: never take LLM capacity ahead of live requests in this process
+        with schedule_scope('background', 'precompute'):
+            return runner.provide_tutoring_explanation(
+                question['question'], question['options'][option], question['options'][question['correctAnswer']]
+            )
+
+    with open(path, 'a', encoding='utf-8') as out:
+        if out.tell() and not _ends_with_newline(path):
+            out.write('\n')  # terminate a line torn by an interrupted run
+
+        def record(question, option, result, error):
+            # Runs on this thread only, so writes and counters need no locking
+            if error is not None:
+                logger.error(f"Explanation failed for {question['id']} option {option}: {error}")
+                stats['failed'] += 1
+                return
+            if result.get('provider') in ('mock', 'precomputed'):
+                stats['skipped_mock'] += 1
+                return
+            entry = {
+                'key': question_key(question['question']),
+                'option': option,
+                'fingerprint': row_fingerprint(question),
+                'id': question['id'],
+                'subject': question['subject'],
+                'provider': result.get('provider'),
+                'explanation': {name: result.get(name) for name in EXPLANATION_FIELDS}
+            }
+            out.write(json.dumps(entry, separators=(',', ':')) + '\n')
+            out.flush()
+            stats['written'] += 1
+
+        if batch_backend is not None:
+            from batch_api import run_deferred
+            
+            for (question, option), result, error in run_deferred(tutor, batch_backend, todo,
+                                                                  lambda batch_tutor, pair: explain(*pair, batch_tutor),
+                                                                  journal_path=path + '.batches'):
+                record(question, option, result, error)
+            return stats
+
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            in_flight = {}
+
+            def drain():
+                finished, _ = wait(list(in_flight), return_when=FIRST_COMPLETED)
+                for future in finished:
+                    question, option = in_flight.pop(future)
+                    try:
+                        record(question, option, future.result(), None)
+                    except Exception as e:
+                        record(question, option, None, e)
+
+            for question, option in todo:
+                in_flight[pool.submit(explain, question, option)] = (question, option)
+                if len(in_flight) >= concurrency * 2:
+                    drain()
+            while in_flight:
+                drain()
+
+    return stats
+
+def stale_report(bank: Dict[str, List[Dict[str, Any]]], path: str = DEFAULT_PATH) -> Dict[str, Any]:
+    """Compare a lookup file with the current bank: stale, orphaned and missing entries"""
+    current = {}
+    for questions in bank.values():
+        for question in questions:
+            current[question_key(question['question'])] = question
+
+    stale, orphaned, fresh = [], [], set()
+    for entry in read_entries(path):
+        question = current.get(entry['key'])
+        if question is None:
+            orphaned.append({'id': entry.get('id'), 'option': entry['option']})
+        elif entry['fingerprint'] != row_fingerprint(question):
+            stale.append({'id': question['id'], 'option': entry['option']})
+        else:
+            fresh.add((entry['key'], entry['option']))
+
+    missing = [
+        {'id': question['id'], 'option': option}
+        for question, option in distractor_pairs(bank)
+        if (question_key(question['question']), option) not in fresh
+    ]
+    return {'fresh': len(fresh), 'stale': stale, 'orphaned': orphaned, 'missing': missing}
+
+def compact(bank: Dict[str, List[Dict[str, Any]]], path: str = DEFAULT_PATH) -> int:
+    """Rewrite the lookup file keeping only the latest fresh entry per (question, option)"""
+    fingerprints = {
+        question_key(q['question']): row_fingerprint(q) for questions in bank.values() for q in questions
+    }
+    latest = {}
+    for entry in read_entries(path):
+        if fingerprints.get(entry['key']) == entry['fingerprint']:
+            latest[(entry['key'], entry['option'])] = entry
+
+    temp_path = f"{path}.tmp"
+    with open(temp_path, 'w', encoding='utf-8') as out:
+        for entry in latest.values():
+            out.write(json.dumps(entry, separators=(',', ':')) + '\n')
+    os.replace(temp_path, path)
+    return len(latest)
+
+class ExplanationLookup:
+    """Request-time index of precomputed explanations for bank questions.
+
+    Only entries whose fingerprint matches the current CSV row are served, so an
+    edited question falls back to a live LLM call until it is recomputed.
+    """
+
+    def __init__(self, bank: Dict[str, List[Dict[str, Any]]], path: str = DEFAULT_PATH):
+        questions = {question_key(q['question']): q for qs in bank.values() for q in qs}
+        self._questions: Dict[str, Dict[str, Any]] = {}
+        self._explanations: Dict[Tuple[str, int], Dict[str, Any]] = {}
+        for entry in read_entries(path):
+            question = questions.get(entry['key'])
+            if question is not None and entry['fingerprint'] == row_fingerprint(question):
+                self._questions[entry['key']] = question
+                self._explanations[(entry['key'], entry['option'])] = entry['explanation']
+
+    def __len__(self) -> int:
+        return len(self._explanations)
+
+    def get(self, question_text: str, student_answer: str) -> Optional[Dict[str, Any]]:
+        """Explanation for a bank question and answer (option text or letter), if precomputed"""
+        key = question_key(question_text)
+        question = self._questions.get(key)
+        if question is None:
+            return None
+
+        answer = normalize_text(student_answer)
+        options = [normalize_text(option) for option in question['options']]
+        if answer in options:
+            index = options.index(answer)
+        else:
+            match = _LETTER.match((student_answer or '').strip())
+            if not match:
+                return None
+            index = ord(match.group(1).upper()) - ord('A')
+        return self._explanations.get((key, index))
+
+_lookup: Optional[ExplanationLookup] = None
+_lookup_lock = threading.Lock()
+
+def lookup_explanation(question_text: str, student_answer: str) -> Optional[Dict[str, Any]]:
+    """Process-wide lookup; returns None (without loading the bank) when no lookup file exists"""
+    global _lookup
+    if _lookup is None:
+        if not os.path.exists(DEFAULT_PATH):
+            return None
+        with _lookup_lock:
+            if _lookup is None:
+                _lookup = ExplanationLookup(load_question_bank(), DEFAULT_PATH)
+    return _lookup.get(question_text, student_answer)
+
+def main():
+    parser = argparse.ArgumentParser(description='Precompute explanations for question-bank distractors')
+    parser.add_argument('command', choices=['run', 'report', 'compact'], help='run the job, report staleness, or compact')
+    parser.add_argument('--output', default=DEFAULT_PATH, help='lookup file (JSON lines)')
+    parser.add_argument('--csv-dir', default=None, help='question bank directory (default: data/csv)')
+    parser.add_argument('--concurrency', type=int, default=DEFAULT_CONCURRENCY, help='concurrent LLM calls')
+    parser.add_argument('--limit', type=int, default=None, help='stop after this many new explanations')
+    parser.add_argument('--batch-api', choices=['openai', 'anthropic'],
+                        help='generate explanations with provider batch jobs (cheaper, completes within 24h)')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    bank = load_question_bank(args.csv_dir)
+
+    if args.command == 'report':
+        report = stale_report(bank, args.output)
+        print(json.dumps(report, indent=2))
+        sys.exit(1 if report['stale'] or report['missing'] else 0)
+
+    if args.command == 'compact':
+        print(json.dumps({'entries': compact(bank, args.output)}))
+        return
+
+    from enhanced_ai_agent import EnhancedAITutor
+
+    started = time.time()
+    backend = None
+    if args.batch_api:
+        from batch_api import create_backend
+        backend = create_backend(args.batch_api)
+    stats = precompute(EnhancedAITutor(), bank, args.output, args.concurrency, args.limit, backend)
+    stats['seconds'] = round(time.time() - started, 1)
+    print(json.dumps(stats))
+
+if __name__ == '__main__':
+    main()
@@ -4,8 +4,17 @@ Prompt Templates for Educational AI Tasks
 Provides structured prompts for consistent AI responses
 """
 
+import re
 from typing import Dict, Any, List
 
+from tracing import traced
+
+# The inline JSON example plus the "Respond ONLY with valid JSON" reminder that ends it
+_INLINE_SCHEMA_PATTERN = re.compile(
+    r'Please [^\n]*JSON format:\n\{.*?\n\}\n\nIMPORTANT: Respond ONLY with valid JSON\.[^\n]*',
+    re.DOTALL
+)
+
 class PromptTemplates:
     """Collection of prompt templates for different educational tasks"""
     
@@ -25,13 +34,13 @@ class PromptTemplates:
         return text.strip()
     
     @staticmethod
-    def _format_conversation_history(history: List[Dict]) -> str:
+    def _format_conversation_history(history: List[Dict], max_turns: int = 5) -> str:
         """Format conversation history safely"""
-        if not history:
+        if not history or max_turns <= 0:
             return ""
         
         formatted = []
-        for msg in history[-5:]:  # Last 5 exchanges
+        for msg in history[-max_turns:]:  # Last N exchanges
             student_msg = msg.get('student', '')[:500]  # Limit length
             tutor_msg = msg.get('tutor', '')[:500]      # Limit length
             if student_msg or tutor_msg:
@@ -40,6 +49,15 @@ class PromptTemplates:
         return "\n".join(formatted)
     
     @staticmethod
+    @traced
+    def without_inline_schema(prompt: str) -> str:
+        """Drop the inline JSON example from a prompt whose output shape is enforced by a response schema"""
+        return _INLINE_SCHEMA_PATTERN.sub(
+            'Respond with a JSON object that follows the provided response schema.', prompt, count=1
+        )
+    
+    @staticmethod
+    @traced
     def multiple_choice_evaluation(question: str, student_answer: str, correct_answer: int, options: List[str]) -> str:
         """Template for evaluating multiple choice answers"""
         # Validate inputs
@@ -81,6 +99,7 @@ IMPORTANT: Respond ONLY with valid JSON. Do not include any additional text befo
 Focus on being encouraging and educational. If the answer is incorrect, explain the concept clearly and provide helpful guidance."""
 
     @staticmethod
+    @traced
     def essay_evaluation(essay_content: str, topic: str = "general", word_count: int = None) -> str:
         """Template for evaluating essays"""
         # Validate inputs
@@ -130,6 +149,60 @@ IMPORTANT: Respond ONLY with valid JSON. Do not include any additional text befo
 Be constructive and encouraging. Focus on both strengths and areas for improvement. Provide specific, actionable feedback."""
 
     @staticmethod
+    @traced
+    def essay_dimension_evaluation(essay_part: str, dimension: str, focus: str, topic: str = "general",
+                                   word_count: int = None, part_index: int = 1, part_count: int = 1,
+                                   outline: str = "") -> str:
+        """Template for evaluating one rubric dimension of an essay, or of one part of a long essay"""
+        # The pipeline sizes parts itself, so the essay text is never truncated here
+        essay_part = PromptTemplates._validate_input(essay_part, len(essay_part or ''))
+        topic = PromptTemplates._validate_input(topic, 200)
+        outline = PromptTemplates._validate_input(outline, 2000)
+        
+        if word_count is None:
+            word_count = len(essay_part.split())
+        
+        if part_count > 1:
+            scope = f"""This is part {part_index} of {part_count} of a long essay. Judge only this part, using the outline for context.
+
+Essay Outline (first sentence of each paragraph):
+{outline}
+
+Essay Part {part_index}:"""
+        else:
+            scope = "Essay Content:"
+        
+        return f"""You are an expert writing instructor evaluating one aspect of a student's essay.
+
+Topic: {topic}
+Word Count: {word_count}
+Aspect: {dimension} - {focus}
+
+{scope}
+{essay_part}
+
+Please evaluate ONLY this aspect in the following JSON format:
+{{
+    "score": 0-100,
+    "summary": "One sentence on this aspect of the essay",
+    "analysis": "Analysis of this aspect",
+    "strengths": [
+        "Specific strength in this aspect"
+    ],
+    "areas_for_improvement": [
+        "Specific area that needs work"
+    ],
+    "suggestions": [
+        "Actionable suggestion for improvement"
+    ]
+}}
+
+IMPORTANT: Respond ONLY with valid JSON. Do not include any additional text before or after the JSON response.
+
+Be constructive and encouraging. Quote or point to specific passages where possible."""
+
+    @staticmethod
+    @traced
     def tutoring_explanation(question: str, student_answer: str, correct_answer: str = None) -> str:
         """Template for providing tutoring explanations"""
         return f"""You are a patient and knowledgeable tutor helping a student understand a concept.
@@ -165,6 +238,7 @@ IMPORTANT: Respond ONLY with valid JSON. Do not include any additional text befo
 Make the explanation accessible and engaging. Use analogies and examples when helpful. Encourage the student's learning journey."""
 
     @staticmethod
+    @traced
     def adaptive_question_generation(subject: str, difficulty: str, topic: str = None, previous_questions: List[str] = None) -> str:
         """Template for generating adaptive questions"""
         context = ""
@@ -207,13 +281,18 @@ IMPORTANT: Respond ONLY with valid JSON. Do not include any additional text befo
 The question should be appropriate for the specified difficulty level and build upon previous learning. Make it engaging and educational."""
 
     @staticmethod
-    def conversation_tutoring(student_message: str, conversation_history: List[Dict] = None) -> str:
+    @traced
+    def conversation_tutoring(student_message: str, conversation_history: List[Dict] = None,
+                              history_window: int = 5, summary: str = "") -> str:
         """Template for conversational tutoring"""
         # Validate inputs
         student_message = PromptTemplates._validate_input(student_message, 2000)
-        history = PromptTemplates._format_conversation_history(conversation_history or [])
+        history = PromptTemplates._format_conversation_history(conversation_history or [], history_window)
+        summary = PromptTemplates._validate_input(summary, 2000)
         
         history_text = f"\nConversation History:\n{history}" if history else ""
+        if summary:
+            history_text = f"\nSummary of Earlier Conversation:\n{summary}\n{history_text}"
         
         return f"""You are a friendly, knowledgeable tutor having a conversation with a student.
 
@@ -242,8 +321,66 @@ IMPORTANT: Respond ONLY with valid JSON. Do not include any additional text befo
 Be conversational, encouraging, and educational. Ask follow-up questions to ensure understanding. Keep responses concise but helpful."""
 
     @staticmethod
+    @traced
+    def conversation_followup(student_message: str) -> str:
+        """Template for the next turn of a conversation whose earlier turns the model already holds in context"""
+        student_message = PromptTemplates._validate_input(student_message, 2000)
+        
+        return f"""Student's New Message: {student_message}
+
+Continue as the same tutor and respond in the same JSON format as your previous reply. Respond ONLY with valid JSON."""
+
+    @staticmethod
+    @traced
+    def conversation_summary(previous_summary: str, turns: List[Dict]) -> str:
+        """Template for folding older conversation turns into a running summary"""
+        previous_summary = PromptTemplates._validate_input(previous_summary, 2000)
+        history = PromptTemplates._format_conversation_history(turns, len(turns))
+        previous_text = f"\nExisting Summary:\n{previous_summary}\n" if previous_summary else ""
+        
+        return f"""You are summarizing a tutoring conversation so it can continue without the full transcript.
+{previous_text}
+New Conversation Turns:
+{history}
+
+Please respond in the following JSON format:
+{{
+    "summary": "Updated summary in at most 120 words"
+}}
+
+IMPORTANT: Respond ONLY with valid JSON. Do not include any additional text before or after the JSON response.
+
+Merge the existing summary with the new turns. Keep the topics covered, what the student understood or struggled with, and any open questions. Omit greetings and filler."""
+
+    @staticmethod
+    @traced
+    def image_description() -> str:
+        """Template for describing an attached image once, independent of any question about it"""
+        return """You are an expert tutor preparing to grade questions about the attached image (a diagram, chart, graph, table, code screenshot or photo).
+
+Describe the image so that someone who cannot see it could grade answers about it. Include all visible text, labels, numbers and units, the structure (nodes, edges, axes, rows and columns) and the relationships shown.
+
+Please respond in the following JSON format:
+{
+    "description": "Complete, factual description of the image",
+    "key_elements": [
+        "Important element of the image",
+        "Another element"
+    ]
+}
+
+IMPORTANT: Respond ONLY with valid JSON. Do not include any additional text before or after the JSON response.
+
+Describe only what is shown. Do not solve any problem the image poses."""
+
+    @staticmethod
+    @traced
     def image_analysis_question(image_description: str, question: str, student_answer: str) -> str:
         """Template for analyzing image-based questions"""
+        image_description = PromptTemplates._validate_input(image_description, 6000)
+        question = PromptTemplates._validate_input(question, 2000)
+        student_answer = PromptTemplates._validate_input(student_answer, 2000)
+        
         return f"""You are an expert tutor evaluating a student's answer to an image-based question.
 
 Image Description: {image_description}
@@ -271,6 +408,7 @@ IMPORTANT: Respond ONLY with valid JSON. Do not include any additional text befo
 Focus on both the accuracy of the answer and the student's ability to analyze visual information."""
 
     @staticmethod
+    @traced
     def learning_path_recommendation(student_progress: Dict[str, Any], subjects: List[str]) -> str:
         """Template for generating personalized learning paths"""
         return f"""You are an expert educational advisor creating personalized learning paths.
@@ -314,12 +452,13 @@ IMPORTANT: Respond ONLY with valid JSON. Do not include any additional text befo
 Base recommendations on the student's current progress and learning patterns. Be encouraging and realistic."""
 
     @staticmethod
+    @traced
     def error_analysis(student_errors: List[str], subject: str) -> str:
         """Template for analyzing student errors and providing targeted help"""
         return f"""You are an expert educational diagnostician analyzing student errors.
 
 Subject: {subject}
-Student Errors:
+Student Errors (similar errors are grouped; counts show how often each occurred):
 {chr(10).join([f"- {error}" for error in student_errors])}
 
 Please provide an error analysis in the following JSON format:
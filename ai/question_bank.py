@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Question Bank Loader
+Reads the subject MCQ CSVs under data/csv into plain question records
+"""
+
+import csv
+import hashlib
+import os
+import re
+from typing import Dict, Any, List, Optional, Tuple
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'data')
+CSV_DIR = os.path.join(DATA_DIR, 'csv')
+RESULTS_PATH = os.path.join(DATA_DIR, 'test_results.json')
+
+# Bank question IDs are SUBJECT-Q<12 hex digits>, so they never collide with the app's SUBJECT-NNN IDs
+_QUESTION_ID = re.compile(r'^([A-Za-z0-9_]+)-Q([0-9a-f]{12})$')
+
+def subject_from_filename(filename: str) -> str:
+    """Derive the subject key from a bank file name (dsa_mcq.csv -> dsa)"""
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    return stem[:-4] if stem.endswith('_mcq') else stem
+
+def question_key(subject: str, question: str) -> int:
+    """48-bit content hash of a question's text, stable across reordering and edits to other rows"""
+    normalized = ' '.join(question.split()).lower()
+    digest = hashlib.sha256(f"{subject.lower()}\n{normalized}".encode('utf-8')).digest()
+    return int.from_bytes(digest[:6], 'big')
+
+def format_question_id(subject: str, key: int) -> str:
+    return f"{subject.upper()}-Q{key:012x}"
+
+def parse_question_id(question_id: Optional[str]) -> Optional[Tuple[str, int]]:
+    """(subject, key) of a bank question ID; None for anything else, such as the app's SUBJECT-NNN IDs"""
+    match = _QUESTION_ID.match(question_id or '')
+    if not match:
+        return None
+    return match.group(1).lower(), int(match.group(2), 16)
+
+def _parse_row(row: Dict[str, str], subject: str) -> Dict[str, Any]:
+    """Convert one CSV row into a question record"""
+    options = [option.strip() for option in (row.get('options') or '').split(',') if option.strip()]
+
+    try:
+        correct_answer = int(row.get('correctAnswer') or 0)
+    except ValueError:
+        correct_answer = 0
+
+    question = (row.get('question') or '').strip()
+    return {
+        'id': format_question_id(subject, question_key(subject, question)),
+        'subject': subject,
+        'question': question,
+        'type': row.get('type') or 'multiple-choice',
+        'options': options,
+        'correctAnswer': correct_answer,
+        'explanation': (row.get('explanation') or '').strip(),
+        'difficulty': (row.get('difficulty') or 'intermediate').strip(),
+        'topic': (row.get('topic') or 'general').strip()
+    }
+
+def load_subject_csv(path: str) -> List[Dict[str, Any]]:
+    """Load all questions from a single subject CSV"""
+    subject = subject_from_filename(path)
+    questions = []
+
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            question = _parse_row(row, subject)
+            if question['question']:
+                questions.append(question)
+
+    return questions
+
+def list_subject_files(csv_dir: Optional[str] = None) -> List[str]:
+    """List the subject CSV files in a bank directory"""
+    csv_dir = csv_dir or CSV_DIR
+    if not os.path.isdir(csv_dir):
+        return []
+    return sorted(
+        os.path.join(csv_dir, name)
+        for name in os.listdir(csv_dir)
+        if name.endswith('.csv')
+    )
+
+def load_question_bank(csv_dir: Optional[str] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """Load every subject CSV, keyed by subject"""
+    bank = {}
+    for path in list_subject_files(csv_dir):
+        bank[subject_from_filename(path)] = load_subject_csv(path)
+    return bank
@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Binary Question Bank
+Compiles the subject CSVs into one columnar file that every worker maps read-only and shares
+"""
+
+import argparse
+import json
+import mmap
+import os
+import random
+import struct
+import sys
+import threading
+import time
+import logging
+from array import array
+from bisect import bisect_left, bisect_right
+from typing import Dict, Any, List, Optional, Tuple
+
+from question_bank import (DATA_DIR, CSV_DIR, format_question_id, list_subject_files, load_subject_csv,
+                           parse_question_id, subject_from_filename)
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PATH = os.getenv('TUTOR_QUESTION_BANK_BIN', os.path.join(DATA_DIR, 'question_bank.bin'))
+
+MAGIC = b'TQBANK\x00\x01'
+VERSION = 3
+# magic, version, question count, metadata offset, metadata length
+HEADER = struct.Struct('<8sIIQQ')
+HEADER_SIZE = 64
+ALIGN = 8
+OPTION_SEPARATOR = '\x1f'
+
+# Fixed-width columns, one entry per question: (name, array typecode)
+COLUMNS = (
+    ('subject', 'H'),
+    ('difficulty', 'B'),
+    ('topic', 'I'),
+    ('type', 'B'),
+    ('correct', 'B'),
+    ('key', 'Q')  # content hash the question ID is formed from
+)
+TEXT_FIELDS = 3  # question, explanation, options
+KEY_BITS = 48  # question_key width; ID lookups sort on subject code << KEY_BITS | key
+
+def source_fingerprint(csv_dir: Optional[str] = None) -> List[List[Any]]:
+    """Name, size and mtime of every source CSV; a change means the binary file is stale"""
+    fingerprint = []
+    for path in list_subject_files(csv_dir):
+        stat = os.stat(path)
+        fingerprint.append([os.path.basename(path), stat.st_size, int(stat.st_mtime)])
+    return fingerprint
+
+class _StringTable:
+    def __init__(self):
+        self.values: List[str] = []
+        self.codes: Dict[str, int] = {}
+
+    def code(self, value: str) -> int:
+        code = self.codes.get(value)
+        if code is None:
+            code = self.codes[value] = len(self.values)
+            self.values.append(value)
+        return code
+
+def compile_bank(csv_dir: Optional[str] = None, path: str = DEFAULT_PATH) -> Dict[str, Any]:
+    """Compile every subject CSV into the binary format at `path` (written atomically).
+
+    Questions are stored sorted by (subject, difficulty, topic), so each filter
+    combination is one contiguous range listed in the metadata; text lives in a
+    single UTF-8 blob addressed by 64-bit offsets. A sorted (subject, key) column
+    with matching bank indices lets index_of bisect instead of building a map.
+    """
+    started = time.time()
+    tables = {name: _StringTable() for name in ('subject', 'difficulty', 'topic', 'type')}
+    for difficulty in ('beginner', 'intermediate', 'advanced'):
+        tables['difficulty'].code(difficulty)
+
+    records = []
+    for csv_path in list_subject_files(csv_dir):
+        subject = subject_from_filename(csv_path)
+        subject_code = tables['subject'].code(subject)
+        for question in load_subject_csv(csv_path):
+            records.append((
+                subject_code,
+                tables['difficulty'].code(question['difficulty']),
+                tables['topic'].code(question['topic']),
+                tables['type'].code(question['type']),
+                min(max(question['correctAnswer'], 0), 255),
+                parse_question_id(question['id'])[1],
+                question['question'],
+                question['explanation'],
+                OPTION_SEPARATOR.join(question['options'])
+            ))
+    records.sort(key=lambda record: (record[0], record[1], record[2], record[5]))
+
+    columns = {name: array(code) for name, code in COLUMNS}
+    offsets = array('Q', [0])
+    blob = bytearray()
+    groups = []
+    for index, record in enumerate(records):
+        for (name, _), value in zip(COLUMNS, record[:6]):
+            columns[name].append(value)
+        for text in record[6:]:
+            blob += text.encode('utf-8')
+            offsets.append(len(blob))
+        key = list(record[:3])
+        if groups and groups[-1][:3] == key:
+            groups[-1][4] = index + 1
+        else:
+            groups.append(key + [index, index + 1])
+
+    # ID lookup: (subject, key) composites in sorted order, each with its bank index
+    by_id = sorted((record[0] << KEY_BITS | record[5], index) for index, record in enumerate(records))
+    id_keys = array('Q', (composite for composite, _ in by_id))
+    id_index = array('I', (index for _, index in by_id))
+
+    sections = [(name, columns[name].tobytes()) for name, _ in COLUMNS]
+    sections += [('id_keys', id_keys.tobytes()), ('id_index', id_index.tobytes()),
+                 ('offsets', offsets.tobytes()), ('text', bytes(blob))]
+
+    layout = {}
+    position = HEADER_SIZE
+    for name, data in sections:
+        layout[name] = [position, len(data)]
+        position += len(data) + (-len(data) % ALIGN)
+
+    metadata = json.dumps({
+        'byteorder': sys.byteorder,
+        'tables': {name: table.values for name, table in tables.items()},
+        'groups': groups,  # [subject, difficulty, topic, start, end]
+        'sections': layout,
+        'source': source_fingerprint(csv_dir),
+        'compiled_at': time.time()
+    }).encode('utf-8')
+
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    with open(temp_path, 'wb') as out:
+        out.write(HEADER.pack(MAGIC, VERSION, len(records), position, len(metadata)).ljust(HEADER_SIZE, b'\0'))
+        for _, data in sections:
+            out.write(data)
+            out.write(b'\0' * (-len(data) % ALIGN))
+        out.write(metadata)
+    # Replacing (not rewriting) the file leaves workers that mapped the old one unaffected
+    os.replace(temp_path, path)
+
+    return {'questions': len(records), 'groups': len(groups), 'bytes': position + len(metadata),
+            'seconds': round(time.time() - started, 3)}
+
+class BinaryQuestionBank:
+    """Read-only view of a compiled bank, backed by a shared memory mapping.
+
+    Columns are memoryviews over the mapping, so opening the bank costs one
+    metadata parse and pages are shared by every process that maps the file.
+    Records are decoded only when they are read.
+    """
+
+    def __init__(self, path: str = DEFAULT_PATH):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mmap)
+
+        magic, version, count, meta_offset, meta_length = HEADER.unpack_from(self._view, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} question bank")
+        self.metadata = json.loads(bytes(self._view[meta_offset:meta_offset + meta_length]))
+        if self.metadata['byteorder'] != sys.byteorder:
+            self.close()
+            raise ValueError(f"{path} was compiled on a {self.metadata['byteorder']}-endian machine")
+
+        self.count = count
+        self.tables: Dict[str, List[str]] = self.metadata['tables']
+        self._codes = {name: {value: code for code, value in enumerate(values)}
+                       for name, values in self.tables.items()}
+        sections = self.metadata['sections']
+
+        def section(name: str, typecode: Optional[str] = None) -> memoryview:
+            offset, length = sections[name]
+            view = self._view[offset:offset + length]
+            return view.cast(typecode) if typecode else view
+
+        self._columns = {name: section(name, typecode) for name, typecode in COLUMNS}
+        self._id_keys = section('id_keys', 'Q')
+        self._id_index = section('id_index', 'I')
+        self._offsets = section('offsets', 'Q')
+        self._text = section('text')
+        self._groups: List[Tuple[int, int, int, int, int]] = [tuple(group) for group in self.metadata['groups']]
+
+    def __len__(self) -> int:
+        return self.count
+
+    def close(self):
+        """Release the mapping (records already returned stay valid)"""
+        views = list(getattr(self, '_columns', {}).values())
+        views += [getattr(self, name, None) for name in ('_id_keys', '_id_index', '_offsets', '_text', '_view')]
+        for view in views:
+            if view is not None:
+                view.release()
+        self._mmap.close()
+
+    def _string(self, field: int) -> str:
+        return str(self._text[self._offsets[field]:self._offsets[field + 1]], 'utf-8')
+
+    def get(self, index: int) -> Dict[str, Any]:
+        """Question record at `index`, in the same shape as question_bank.load_subject_csv"""
+        columns = self._columns
+        subject = self.tables['subject'][columns['subject'][index]]
+        base = index * TEXT_FIELDS
+        options = self._string(base + 2)
+        return {
+            'id': format_question_id(subject, columns['key'][index]),
+            'subject': subject,
+            'question': self._string(base),
+            'type': self.tables['type'][columns['type'][index]],
+            'options': options.split(OPTION_SEPARATOR) if options else [],
+            'correctAnswer': columns['correct'][index],
+            'explanation': self._string(base + 1),
+            'difficulty': self.tables['difficulty'][columns['difficulty'][index]],
+            'topic': self.tables['topic'][columns['topic'][index]]
+        }
+
+    def question_id(self, index: int) -> str:
+        """ID of the question at `index`, without decoding its text"""
+        columns = self._columns
+        return format_question_id(self.tables['subject'][columns['subject'][index]], columns['key'][index])
+
+    def difficulty(self, index: int) -> str:
+        return self.tables['difficulty'][self._columns['difficulty'][index]]
+
+    def topic(self, index: int) -> str:
+        return self.tables['topic'][self._columns['topic'][index]]
+
+    def index_of(self, question_id: str) -> Optional[int]:
+        """Bank index of a question ID (None if unknown), by bisecting the mapped ID column"""
+        parsed = parse_question_id(question_id)
+        if parsed is None:
+            return None
+        subject, key = parsed
+        subject_code = self._codes['subject'].get(subject)
+        if subject_code is None:
+            return None
+        composite = subject_code << KEY_BITS | key
+        slot = bisect_left(self._id_keys, composite)
+        if slot == len(self._id_keys) or self._id_keys[slot] != composite:
+            return None
+        return self._id_index[slot]
+
+    def ranges(self, subject: Optional[str] = None, difficulty: Optional[str] = None,
+               topic: Optional[str] = None) -> List[Tuple[int, int]]:
+        """Index ranges [start, end) of the questions matching every given filter"""
+        wanted = []
+        for name, value in (('subject', subject), ('difficulty', difficulty), ('topic', topic)):
+            if value is None:
+                wanted.append(None)
+                continue
+            code = self._codes[name].get(value)
+            if code is None:
+                return []
+            wanted.append(code)
+        return [
+            (start, end) for subject_code, difficulty_code, topic_code, start, end in self._groups
+            if (wanted[0] is None or wanted[0] == subject_code)
+            and (wanted[1] is None or wanted[1] == difficulty_code)
+            and (wanted[2] is None or wanted[2] == topic_code)
+        ]
+
+    def count_matching(self, subject: Optional[str] = None, difficulty: Optional[str] = None,
+                       topic: Optional[str] = None) -> int:
+        return sum(end - start for start, end in self.ranges(subject, difficulty, topic))
+
+    def sample_indices(self, k: int, subject: Optional[str] = None, difficulty: Optional[str] = None,
+                       topic: Optional[str] = None, rng: Optional[random.Random] = None) -> List[int]:
+        """Up to k distinct matching indices, chosen uniformly without scanning the bank"""
+        ranges = self.ranges(subject, difficulty, topic)
+        cumulative, total = [], 0
+        for start, end in ranges:
+            total += end - start
+            cumulative.append(total)
+        picks = (rng or random).sample(range(total), min(k, total))
+        indices = []
+        for pick in picks:
+            slot = bisect_right(cumulative, pick)
+            before = cumulative[slot - 1] if slot else 0
+            indices.append(ranges[slot][0] + pick - before)
+        return indices
+
+    def sample(self, k: int, subject: Optional[str] = None, difficulty: Optional[str] = None,
+               topic: Optional[str] = None, rng: Optional[random.Random] = None) -> List[Dict[str, Any]]:
+        """Up to k distinct matching question records"""
+        return [self.get(index) for index in self.sample_indices(k, subject, difficulty, topic, rng)]
+
+    def is_stale(self, csv_dir: Optional[str] = None) -> bool:
+        """Whether the source CSVs changed since this file was compiled"""
+        return self.metadata['source'] != source_fingerprint(csv_dir)
+
+_bank: Optional[BinaryQuestionBank] = None
+_bank_lock = threading.Lock()
+
+def get_binary_bank(path: str = DEFAULT_PATH, csv_dir: Optional[str] = None) -> BinaryQuestionBank:
+    """Process-wide mapped bank, compiled first if the file is missing, in an older format or older than the CSVs"""
+    global _bank
+    with _bank_lock:
+        if _bank is None:
+            if not os.path.exists(path):
+                logger.info(f"Compiling question bank to {path}")
+                compile_bank(csv_dir or CSV_DIR, path)
+            try:
+                bank = BinaryQuestionBank(path)
+            except ValueError as e:
+                logger.info(f"{e}; recompiling")
+                compile_bank(csv_dir or CSV_DIR, path)
+                bank = BinaryQuestionBank(path)
+            if bank.is_stale(csv_dir):
+                bank.close()
+                logger.info(f"Question bank CSVs changed; recompiling {path}")
+                compile_bank(csv_dir or CSV_DIR, path)
+                bank = BinaryQuestionBank(path)
+            _bank = bank
+        return _bank
+
+def main():
+    parser = argparse.ArgumentParser(description='Compile and inspect the binary question bank')
+    subcommands = parser.add_subparsers(dest='command', required=True)
+
+    compile_cmd = subcommands.add_parser('compile', help='compile data/csv into the binary file')
+    compile_cmd.add_argument('--csv-dir', default=None, help='question bank directory (default: data/csv)')
+    compile_cmd.add_argument('--output', default=DEFAULT_PATH, help='binary bank path')
+
+    stats_cmd = subcommands.add_parser('stats', help='question counts per subject and difficulty')
+    stats_cmd.add_argument('--path', default=DEFAULT_PATH, help='binary bank path')
+
+    sample_cmd = subcommands.add_parser('sample', help='print random matching questions')
+    sample_cmd.add_argument('--path', default=DEFAULT_PATH, help='binary bank path')
+    sample_cmd.add_argument('--subject')
+    sample_cmd.add_argument('--difficulty')
+    sample_cmd.add_argument('--topic')
+    sample_cmd.add_argument('-n', type=int, default=5)
+    args = parser.parse_args()
+
+    if args.command == 'compile':
+        print(json.dumps(compile_bank(args.csv_dir, args.output)))
+        return
+
+    bank = BinaryQuestionBank(args.path)
+    if args.command == 'stats':
+        print(json.dumps({
+            'questions': len(bank),
+            'subjects': {
+                subject: {difficulty: bank.count_matching(subject, difficulty)
+                          for difficulty in bank.tables['difficulty'] if bank.count_matching(subject, difficulty)}
+                for subject in bank.tables['subject']
+            }
+        }, indent=2))
+    else:
+        print(json.dumps(bank.sample(args.n, args.subject, args.difficulty, args.topic), indent=2))
+    bank.close()
+
+if __name__ == '__main__':
+    main()
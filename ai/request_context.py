@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Request Deadlines
+Per-request time budget carried in a context variable, so every provider attempt gets only what is left
+"""
+
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+# Below the 30s after which the Node server kills the agent process
+DEFAULT_DEADLINE_MS = int(os.getenv('TUTOR_DEADLINE_MS', '25000'))
+
+# Interactive actions get a shorter budget than the default
+ACTION_DEADLINES_MS: Dict[str, int] = {
+    'conversational_tutoring': 15000,
+    'provide_tutoring_explanation': 15000
+}
+
+# Less than this left is not worth starting another provider call for
+MIN_ATTEMPT_SECONDS = float(os.getenv('TUTOR_MIN_ATTEMPT_SECONDS', '1.0'))
+
+_deadline: ContextVar[Optional[float]] = ContextVar('tutor_deadline', default=None)
+
+def action_deadline_ms(action: Optional[str], requested_ms: Optional[float] = None) -> float:
+    """Budget for a request: the caller's deadlineMs if given, otherwise the action default"""
+    if requested_ms is not None:
+        return float(requested_ms)
+    return float(ACTION_DEADLINES_MS.get(action, DEFAULT_DEADLINE_MS))
+
+@contextmanager
+def deadline_scope(seconds: Optional[float]):
+    """Run a block under a deadline `seconds` from now; nested scopes can only shorten it"""
+    if seconds is None:
+        yield
+        return
+    deadline = time.monotonic() + max(0.0, seconds)
+    current = _deadline.get()
+    if current is not None:
+        deadline = min(deadline, current)
+    token = _deadline.set(deadline)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+def deadline() -> Optional[float]:
+    """The current request's deadline on the time.monotonic() clock (None when there is none)"""
+    return _deadline.get()
+
+def remaining() -> Optional[float]:
+    """Seconds left before the current request's deadline (None when there is none)"""
+    deadline = _deadline.get()
+    if deadline is None:
+        return None
+    return max(0.0, deadline - time.monotonic())
+
+def expired(margin: float = 0.0) -> bool:
+    """Whether the deadline has passed, or is less than `margin` seconds away"""
+    left = remaining()
+    return left is not None and left <= margin
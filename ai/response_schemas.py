@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+"""
+Response Schemas for Tutor Actions
+JSON Schemas for structured LLM output, plus pre-compiled validators
+"""
+
+import copy
+from typing import Dict, Any, List, Callable
+
+from jsonschema import Draft7Validator
+
+def _string_list() -> Dict[str, Any]:
+    return {'type': 'array', 'items': {'type': 'string'}}
+
+DIFFICULTY = {'type': 'string', 'enum': ['beginner', 'intermediate', 'advanced']}
+SCORE = {'type': 'number', 'minimum': 0, 'maximum': 100}
+
+RESPONSE_SCHEMAS: Dict[str, Dict[str, Any]] = {
+    'answer_evaluation': {
+        'type': 'object',
+        'properties': {
+            'correct': {'type': 'boolean'},
+            'feedback': {'type': 'string'},
+            'score': SCORE,
+            'nextDifficulty': DIFFICULTY,
+            'suggestions': _string_list(),
+            'explanation': {'type': 'string'}
+        },
+        'required': ['correct', 'feedback', 'score', 'nextDifficulty', 'suggestions', 'explanation']
+    },
+    'essay_evaluation': {
+        'type': 'object',
+        'properties': {
+            'score': SCORE,
+            'feedback': {'type': 'string'},
+            'strengths': _string_list(),
+            'areas_for_improvement': _string_list(),
+            'suggestions': _string_list(),
+            'nextDifficulty': DIFFICULTY,
+            'detailed_analysis': {
+                'type': 'object',
+                'properties': {
+                    'content': {'type': 'string'},
+                    'organization': {'type': 'string'},
+                    'language': {'type': 'string'},
+                    'mechanics': {'type': 'string'}
+                },
+                'required': ['content', 'organization', 'language', 'mechanics']
+            }
+        },
+        'required': ['score', 'feedback', 'strengths', 'areas_for_improvement', 'suggestions',
+                     'nextDifficulty', 'detailed_analysis']
+    },
+    'essay_dimension': {
+        'type': 'object',
+        'properties': {
+            'score': SCORE,
+            'summary': {'type': 'string'},
+            'analysis': {'type': 'string'},
+            'strengths': _string_list(),
+            'areas_for_improvement': _string_list(),
+            'suggestions': _string_list()
+        },
+        'required': ['score', 'summary', 'analysis', 'strengths', 'areas_for_improvement', 'suggestions']
+    },
+    'question': {
+        'type': 'object',
+        'properties': {
+            'question': {'type': 'string'},
+            'type': {'type': 'string', 'enum': ['multiple-choice', 'essay']},
+            'subject': {'type': 'string'},
+            'difficulty': DIFFICULTY,
+            'topic': {'type': 'string'},
+            'options': _string_list(),
+            'correctAnswer': {'type': 'integer', 'minimum': 0},
+            'explanation': {'type': 'string'},
+            'learning_objectives': _string_list(),
+            'prerequisites': _string_list()
+        },
+        'required': ['question', 'type', 'subject', 'difficulty', 'topic', 'options', 'correctAnswer', 'explanation',
+                     'learning_objectives', 'prerequisites']
+    },
+    'explanation': {
+        'type': 'object',
+        'properties': {
+            'explanation': {'type': 'string'},
+            'key_concepts': _string_list(),
+            'examples': _string_list(),
+            'common_mistakes': _string_list(),
+            'practice_tips': _string_list(),
+            'next_steps': {'type': 'string'}
+        },
+        'required': ['explanation', 'key_concepts', 'examples', 'common_mistakes', 'practice_tips', 'next_steps']
+    },
+    'conversation': {
+        'type': 'object',
+        'properties': {
+            'response': {'type': 'string'},
+            'response_type': {'type': 'string', 'enum': ['explanation', 'question', 'encouragement', 'guidance']},
+            'suggested_questions': _string_list(),
+            'resources': _string_list(),
+            'confidence_level': {'type': 'string', 'enum': ['high', 'medium', 'low']},
+            'next_topic_suggestion': {'type': 'string'}
+        },
+        'required': ['response', 'response_type', 'suggested_questions', 'resources',
+                     'confidence_level', 'next_topic_suggestion']
+    },
+    'conversation_summary': {
+        'type': 'object',
+        'properties': {
+            'summary': {'type': 'string'}
+        },
+        'required': ['summary']
+    },
+    'learning_path': {
+        'type': 'object',
+        'properties': {
+            'recommended_subjects': {
+                'type': 'array',
+                'items': {
+                    'type': 'object',
+                    'properties': {
+                        'subject': {'type': 'string'},
+                        'priority': {'type': 'string', 'enum': ['high', 'medium', 'low']},
+                        'reason': {'type': 'string'}
+                    },
+                    'required': ['subject', 'priority', 'reason']
+                }
+            },
+            'learning_sequence': {
+                'type': 'array',
+                'items': {
+                    'type': 'object',
+                    'properties': {
+                        'topic': {'type': 'string'},
+                        'difficulty': DIFFICULTY,
+                        'estimated_time': {'type': 'string'},
+                        'prerequisites': _string_list()
+                    },
+                    'required': ['topic', 'difficulty', 'estimated_time', 'prerequisites']
+                }
+            },
+            'goals': _string_list(),
+            'study_tips': _string_list(),
+            'progress_milestones': _string_list()
+        },
+        'required': ['recommended_subjects', 'learning_sequence', 'goals', 'study_tips', 'progress_milestones']
+    },
+    'error_analysis': {
+        'type': 'object',
+        'properties': {
+            'error_patterns': {
+                'type': 'array',
+                'items': {
+                    'type': 'object',
+                    'properties': {
+                        'pattern': {'type': 'string'},
+                        'frequency': {'type': 'string'},
+                        'root_cause': {'type': 'string'}
+                    },
+                    'required': ['pattern', 'frequency', 'root_cause']
+                }
+            },
+            'targeted_remediation': {
+                'type': 'array',
+                'items': {
+                    'type': 'object',
+                    'properties': {
+                        'error_type': {'type': 'string'},
+                        'remediation_strategy': {'type': 'string'},
+                        'practice_exercises': _string_list()
+                    },
+                    'required': ['error_type', 'remediation_strategy', 'practice_exercises']
+                }
+            },
+            'learning_gaps': _string_list(),
+            'recommended_focus': _string_list(),
+            'encouragement': {'type': 'string'}
+        },
+        'required': ['error_patterns', 'targeted_remediation', 'learning_gaps', 'recommended_focus', 'encouragement']
+    },
+    'image_description': {
+        'type': 'object',
+        'properties': {
+            'description': {'type': 'string'},
+            'key_elements': _string_list()
+        },
+        'required': ['description', 'key_elements']
+    },
+    'image_evaluation': {
+        'type': 'object',
+        'properties': {
+            'correct': {'type': 'boolean'},
+            'feedback': {'type': 'string'},
+            'score': SCORE,
+            'visual_analysis': {'type': 'string'},
+            'suggestions': _string_list(),
+            'key_visual_elements': _string_list()
+        },
+        'required': ['correct', 'feedback', 'score', 'visual_analysis', 'suggestions', 'key_visual_elements']
+    }
+}
+
+# Keys each caller cannot fill in with a default. Responses from providers without
+# native structured output are only required to have these; the rest are type-checked
+# when present and otherwise defaulted by the caller.
+ESSENTIAL_KEYS: Dict[str, List[str]] = {
+    'answer_evaluation': ['correct', 'feedback', 'score'],
+    'essay_evaluation': ['score', 'feedback'],
+    'essay_dimension': ['score'],
+    'question': ['question', 'options', 'correctAnswer'],
+    'explanation': ['explanation'],
+    'conversation': ['response'],
+    'conversation_summary': ['summary'],
+    'learning_path': ['learning_sequence'],
+    'error_analysis': ['error_patterns'],
+    'image_description': ['description'],
+    'image_evaluation': ['correct', 'feedback', 'score']
+}
+
+def _close(schema: Dict[str, Any]):
+    """Disallow extra keys in every object, as strict structured output requires"""
+    if schema.get('type') == 'object':
+        schema['additionalProperties'] = False
+    for sub in schema.get('properties', {}).values():
+        _close(sub)
+    if 'items' in schema:
+        _close(schema['items'])
+
+# Every object lists all its properties as required, so the schemas are valid for
+# OpenAI strict mode and what the provider enforces is what validate_response checks
+for _schema in RESPONSE_SCHEMAS.values():
+    _close(_schema)
+
+Validator = Callable[[Any, str], List[str]]
+
+def _error_path(path: str, error) -> str:
+    for part in error.absolute_path:
+        path += f"[{part}]" if isinstance(part, int) else f".{part}"
+    return path
+
+def _error_message(path: str, error) -> str:
+    """Short message for a jsonschema error, e.g. `$.score: 150 > 100`"""
+    where = _error_path(path, error)
+    kind, expected = error.validator, error.validator_value
+    if kind == 'type':
+        return f"{where}: expected {expected}"
+    if kind == 'enum':
+        return f"{where}: {error.instance!r} not in {expected}"
+    if kind == 'minimum':
+        return f"{where}: {error.instance} < {expected}"
+    if kind == 'maximum':
+        return f"{where}: {error.instance} > {expected}"
+    if kind == 'additionalProperties':
+        extra = sorted(set(error.instance) - set(error.schema.get('properties', {})))
+        return f"{where}: unexpected {extra}"
+    return f"{where}: {error.message}"
+
+def compile_schema(schema: Dict[str, Any]) -> Validator:
+    """Compile a JSON Schema into a validator returning error messages (empty when valid)"""
+    Draft7Validator.check_schema(schema)
+    validator = Draft7Validator(schema)
+
+    def validate(value, path='$'):
+        errors = []
+        for error in sorted(validator.iter_errors(value), key=lambda e: list(map(str, e.absolute_path))):
+            if error.validator == 'required':
+                # One jsonschema error per missing key; report each key separately
+                errors.extend(f"{_error_path(path, error)}.{name}: missing"
+                              for name in error.validator_value
+                              if name not in error.instance and f"'{name}'" in error.message)
+            else:
+                errors.append(_error_message(path, error))
+        return errors
+
+    return validate
+
+def lenient_schema(schema_name: str) -> Dict[str, Any]:
+    """A named schema that only requires its ESSENTIAL_KEYS, with no nested required lists"""
+    def relax(schema):
+        schema.pop('required', None)
+        # Free-text providers may add keys of their own; only the known ones are checked
+        schema.pop('additionalProperties', None)
+        for sub in schema.get('properties', {}).values():
+            relax(sub)
+        if 'items' in schema:
+            relax(schema['items'])
+        return schema
+
+    schema = relax(copy.deepcopy(RESPONSE_SCHEMAS[schema_name]))
+    schema['required'] = list(ESSENTIAL_KEYS.get(schema_name, []))
+    return schema
+
+_validators: Dict[Any, Validator] = {}
+
+def get_validator(schema_name: str, strict: bool = True) -> Validator:
+    """Return the compiled validator for a named schema (compiled once per process)"""
+    validator = _validators.get((schema_name, strict))
+    if validator is None:
+        schema = RESPONSE_SCHEMAS[schema_name] if strict else lenient_schema(schema_name)
+        # Threads racing here may both compile; setdefault makes them all use the first one
+        validator = _validators.setdefault((schema_name, strict), compile_schema(schema))
+    return validator
+
+def validate_response(schema_name: str, value: Any, strict: bool = True) -> List[str]:
+    """Validate a parsed response against a named schema.
+
+    Strict validation (every schema key required) is for providers that were given
+    the schema natively; pass strict=False for free-text JSON from other providers.
+    """
+    return get_validator(schema_name, strict)(value, '$')
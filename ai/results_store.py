@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+"""
+Quiz Results Store
+SQLite-backed attempts and per-question results, with an importer for data/test_results.json
+"""
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, Any, List, Iterable, Optional
+
+from question_bank import DATA_DIR, RESULTS_PATH
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_DB_PATH = os.path.join(DATA_DIR, 'test_results.db')
+DEFAULT_BATCH_SIZE = 500
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS attempts (
+        id INTEGER PRIMARY KEY,
+        source_key TEXT NOT NULL UNIQUE,
+        user_id TEXT NOT NULL,
+        subject TEXT NOT NULL,
+        score REAL NOT NULL,
+        correct_count INTEGER NOT NULL,
+        total_questions INTEGER NOT NULL,
+        time_spent REAL NOT NULL,
+        timestamp TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS question_results (
+        attempt_id INTEGER NOT NULL REFERENCES attempts (id),
+        position INTEGER NOT NULL,
+        user_id TEXT NOT NULL,
+        subject TEXT NOT NULL,
+        timestamp TEXT NOT NULL,
+        question_id TEXT NOT NULL,
+        question TEXT NOT NULL,
+        user_answer TEXT NOT NULL,
+        correct_answer TEXT NOT NULL,
+        correct_answer_text TEXT NOT NULL,
+        is_correct INTEGER NOT NULL,
+        topic TEXT NOT NULL DEFAULT '',
+        PRIMARY KEY (attempt_id, position)
+    );
+    CREATE INDEX IF NOT EXISTS idx_attempts_user_subject_time ON attempts (user_id, subject, timestamp);
+    CREATE INDEX IF NOT EXISTS idx_question_results_question ON question_results (question_id);
+    CREATE INDEX IF NOT EXISTS idx_question_results_user_time ON question_results (user_id, subject, timestamp);
+'''
+
+def attempt_key(attempt: Dict[str, Any]) -> str:
+    """Stable identity for an attempt, so re-importing the same file does not duplicate rows"""
+    raw = f"{attempt.get('userId', '')}|{attempt.get('subject', '')}|{attempt.get('timestamp', '')}"
+    return hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+class ResultsStore:
+    """Quiz attempts and per-question results in SQLite (WAL mode).
+
+    Attempts are indexed by (user_id, subject, timestamp) and question results by
+    question_id, so per-student analytics never scan the whole history. Inserts are
+    batched with executemany inside one transaction per `batch_size` attempts.
+
+    A result's topic is stored when the attempt carries one. It is not inferred from
+    the question ID, since the app's IDs are not question bank IDs.
+    """
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, batch_size: int = DEFAULT_BATCH_SIZE):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=10.0)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(SCHEMA)
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(question_results)')}
+        if 'topic' not in columns:
+            self._conn.execute("ALTER TABLE question_results ADD COLUMN topic TEXT NOT NULL DEFAULT ''")
+        self._conn.commit()
+
+    def add_attempt(self, attempt: Dict[str, Any]) -> Optional[int]:
+        """Store one attempt; returns its row id (None if it was already stored)"""
+        ids = self._insert_batch([attempt])
+        return ids[0] if ids else None
+
+    def add_attempts(self, attempts: Iterable[Dict[str, Any]]) -> int:
+        """Store many attempts in batches; returns the number of new attempts"""
+        inserted = 0
+        batch = []
+        for attempt in attempts:
+            batch.append(attempt)
+            if len(batch) >= self.batch_size:
+                inserted += len(self._insert_batch(batch))
+                batch = []
+        if batch:
+            inserted += len(self._insert_batch(batch))
+        return inserted
+
+    def _insert_batch(self, attempts: List[Dict[str, Any]]) -> List[int]:
+        keyed = {attempt_key(a): a for a in attempts}
+        with self._lock, self._conn:
+            placeholders = ','.join('?' * len(keyed))
+            existing = {row[0] for row in self._conn.execute(
+                f'SELECT source_key FROM attempts WHERE source_key IN ({placeholders})', list(keyed)
+            )}
+            new = {key: a for key, a in keyed.items() if key not in existing}
+            if not new:
+                return []
+
+            self._conn.executemany(
+                'INSERT INTO attempts (source_key, user_id, subject, score, correct_count, total_questions, '
+                'time_spent, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                [
+                    (key, str(a.get('userId', '')), str(a.get('subject', '')), float(a.get('score') or 0),
+                     int(a.get('correctCount') or 0), int(a.get('totalQuestions') or 0),
+                     float(a.get('timeSpent') or 0), str(a.get('timestamp', '')))
+                    for key, a in new.items()
+                ]
+            )
+            placeholders = ','.join('?' * len(new))
+            ids = dict(self._conn.execute(
+                f'SELECT source_key, id FROM attempts WHERE source_key IN ({placeholders})', list(new)
+            ))
+
+            rows = []
+            for key, a in new.items():
+                for position, detail in enumerate(a.get('detailedResults') or []):
+                    rows.append((
+                        ids[key], position, str(a.get('userId', '')), str(a.get('subject', '')),
+                        str(a.get('timestamp', '')), str(detail.get('questionId', '')),
+                        str(detail.get('question', '')), str(detail.get('userAnswer', '')),
+                        str(detail.get('correctAnswer', '')), str(detail.get('correctAnswerText', '')),
+                        1 if detail.get('isCorrect') else 0, str(detail.get('topic') or '')
+                    ))
+            self._conn.executemany(
+                'INSERT INTO question_results (attempt_id, position, user_id, subject, timestamp, question_id, '
+                'question, user_answer, correct_answer, correct_answer_text, is_correct, topic) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                rows
+            )
+            return [ids[key] for key in new]
+
+    def import_json(self, path: str = RESULTS_PATH) -> int:
+        """Import attempts from a results export; returns the number of new attempts
+        
+        The file is streamed (JSON array or JSON lines, optionally gzipped), so memory
+        use does not grow with the export size.
+        """
+        from results_stream import iter_attempts
+        
+        inserted = self.add_attempts(iter_attempts(path))
+        logger.info(f"Imported {inserted} new attempts from {path}")
+        return inserted
+
+    def count_attempts(self) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM attempts').fetchone()[0]
+
+    def get_attempts(self, user_id: str, subject: Optional[str] = None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent attempts for a student, newest first"""
+        query = ('SELECT subject, score, correct_count, total_questions, time_spent, timestamp '
+                 'FROM attempts WHERE user_id = ?')
+        params: List[Any] = [user_id]
+        if subject:
+            query += ' AND subject = ?'
+            params.append(subject)
+        query += ' ORDER BY timestamp DESC LIMIT ?'
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [
+            {'subject': s, 'score': score, 'correctCount': correct, 'totalQuestions': total,
+             'timeSpent': spent, 'timestamp': ts}
+            for s, score, correct, total, spent, ts in rows
+        ]
+
+    def student_progress(self, user_id: str) -> Dict[str, Any]:
+        """Per-subject progress summary for a student, in the shape the learning-path prompt expects"""
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT subject, COUNT(*), AVG(score), MAX(score), MAX(timestamp), SUM(correct_count), '
+                'SUM(total_questions) FROM attempts WHERE user_id = ? GROUP BY subject ORDER BY subject',
+                (user_id,)
+            ).fetchall()
+            latest = dict(self._conn.execute(
+                'SELECT subject, score FROM attempts a WHERE user_id = ? AND timestamp = '
+                '(SELECT MAX(timestamp) FROM attempts WHERE user_id = a.user_id AND subject = a.subject)',
+                (user_id,)
+            ).fetchall())
+
+        progress = {}
+        for subject, attempts, average, best, last_at, correct, total in rows:
+            progress[subject] = {
+                'attempts': attempts,
+                'average_score': round(average, 1),
+                'best_score': round(best, 1),
+                'latest_score': round(latest[subject], 1) if subject in latest else None,
+                'last_attempt': last_at,
+                'accuracy': round(100.0 * correct / total, 1) if total else 0.0
+            }
+        return progress
+
+    def recent_errors(self, user_id: str, subject: Optional[str] = None, limit: int = 20) -> List[Dict[str, Any]]:
+        """A student's most recent incorrect answers, newest first, each with its topic (None if unknown)"""
+        query = ('SELECT subject, question_id, question, user_answer, correct_answer, correct_answer_text, timestamp, '
+                 'topic FROM question_results WHERE user_id = ?')
+        params: List[Any] = [user_id]
+        if subject:
+            query += ' AND subject = ?'
+            params.append(subject)
+        query += ' AND is_correct = 0 ORDER BY timestamp DESC, position LIMIT ?'
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [
+            {'subject': s, 'questionId': qid, 'question': q, 'userAnswer': ua, 'correctAnswer': ca,
+             'correctAnswerText': cat, 'timestamp': ts, 'topic': topic or None}
+            for s, qid, q, ua, ca, cat, ts, topic in rows
+        ]
+
+    def question_stats(self, question_id: str) -> Dict[str, Any]:
+        """How often a question has been answered, and how often correctly"""
+        with self._lock:
+            answered, correct = self._conn.execute(
+                'SELECT COUNT(*), COALESCE(SUM(is_correct), 0) FROM question_results WHERE question_id = ?',
+                (question_id,)
+            ).fetchone()
+        return {
+            'questionId': question_id,
+            'answered': answered,
+            'correct': correct,
+            'accuracy': round(100.0 * correct / answered, 1) if answered else 0.0
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+_default_store: Optional[ResultsStore] = None
+_default_store_lock = threading.Lock()
+
+def get_results_store() -> ResultsStore:
+    """Process-wide results store at TUTOR_RESULTS_DB (default data/test_results.db).
+
+    A freshly created database is seeded once from data/test_results.json when present.
+    """
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            store = ResultsStore(os.getenv('TUTOR_RESULTS_DB', DEFAULT_DB_PATH))
+            if store.count_attempts() == 0 and os.path.exists(RESULTS_PATH):
+                store.import_json(RESULTS_PATH)
+            _default_store = store
+        return _default_store
+
+def main():
+    parser = argparse.ArgumentParser(description='Quiz results store')
+    parser.add_argument('--db', default=os.getenv('TUTOR_RESULTS_DB', DEFAULT_DB_PATH), help='SQLite database path')
+    subcommands = parser.add_subparsers(dest='command', required=True)
+
+    import_cmd = subcommands.add_parser('import', help='import a test_results.json file')
+    import_cmd.add_argument('path', nargs='?', default=RESULTS_PATH,
+                            help='results file: JSON array or JSON lines, optionally gzipped')
+
+    progress_cmd = subcommands.add_parser('progress', help='show a student\'s progress and recent errors')
+    progress_cmd.add_argument('user_id')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    store = ResultsStore(args.db)
+
+    if args.command == 'import':
+        inserted = store.import_json(args.path)
+        print(json.dumps({'imported': inserted, 'total': store.count_attempts()}))
+    else:
+        print(json.dumps({
+            'progress': store.student_progress(args.user_id),
+            'recent_errors': store.recent_errors(args.user_id, limit=10)
+        }, indent=2))
+    store.close()
+
+if __name__ == '__main__':
+    main()
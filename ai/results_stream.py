@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Streaming Results Reader
+Yields quiz attempts one at a time from JSON-array, JSON-lines and gzip exports in bounded memory
+"""
+
+import argparse
+import gzip
+import json
+import logging
+import multiprocessing
+from collections import deque
+from typing import Dict, Any, Iterator, List, Optional, TextIO
+
+from question_bank import RESULTS_PATH
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHUNK_SIZE = 64 * 1024
+DEFAULT_AGGREGATE_BATCH = 1000
+DEFAULT_MAX_RECORD = 16 * 1024 * 1024
+GZIP_MAGIC = b'\x1f\x8b'
+
+_decoder = json.JSONDecoder()
+
+def open_results(path: str) -> TextIO:
+    """Open a results export as text, transparently decompressing gzip files"""
+    with open(path, 'rb') as f:
+        compressed = f.read(2) == GZIP_MAGIC
+    if compressed:
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+def _iter_json_values(f: TextIO, chunk_size: int, max_record: int = DEFAULT_MAX_RECORD) -> Iterator[Any]:
+    """Decode consecutive JSON values from a stream, optionally wrapped in one top-level array.
+
+    Only the current record plus one read chunk are held in memory. Values may be
+    separated by whitespace, newlines (JSON lines) or commas (array elements). A
+    malformed record, or one longer than max_record characters, is logged and skipped
+    up to the next line break.
+    """
+    buffer = ''
+    base = 0  # stream offset of buffer[0], for reporting bad records
+    pos = 0
+    eof = False
+    in_array = None
+    read_size = chunk_size
+
+    while True:
+        # Skip separators between values
+        while True:
+            while pos < len(buffer) and buffer[pos] in ' \t\r\n,':
+                pos += 1
+            if pos < len(buffer) or eof:
+                break
+            base += len(buffer)
+            buffer, pos = '', 0
+            chunk = f.read(read_size)
+            eof = not chunk
+            buffer += chunk
+
+        if pos >= len(buffer):
+            return
+
+        if in_array is None:
+            in_array = buffer[pos] == '['
+            if in_array:
+                pos += 1
+                continue
+        if in_array and buffer[pos] == ']':
+            return
+
+        try:
+            value, end = _decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError as error:
+            # A record that is only cut off by the chunk boundary fails in its last token,
+            # which runs to the end of the buffer; JSON strings cannot hold a raw line break,
+            # so an error with a line break after it is a bad record rather than a short read
+            newline = buffer.find('\n', error.pos)
+            if newline < 0 and not eof and len(buffer) - pos <= max_record:
+                # Incomplete record: read more (growing the read so huge records stay linear)
+                chunk = f.read(read_size)
+                eof = not chunk
+                base += pos
+                buffer = buffer[pos:] + chunk
+                pos = 0
+                read_size = min(read_size * 2, 64 * chunk_size)
+                continue
+
+            logger.warning(f"Skipping malformed record at character {base + pos}: {error.msg}")
+            read_size = chunk_size
+            if newline >= 0:
+                pos = newline + 1
+                continue
+            # Resync at the next line break without holding the rest of the record
+            base += len(buffer)
+            buffer, pos = '', 0
+            while not eof:
+                chunk = f.read(chunk_size)
+                eof = not chunk
+                newline = chunk.find('\n')
+                if newline >= 0:
+                    base += newline + 1
+                    buffer = chunk[newline + 1:]
+                    break
+                base += len(chunk)
+            continue
+
+        read_size = chunk_size
+        yield value
+        pos = end
+        if pos > chunk_size:
+            base += pos
+            buffer, pos = buffer[pos:], 0
+
+def iter_attempts(path: str = RESULTS_PATH, chunk_size: int = DEFAULT_CHUNK_SIZE,
+                  max_record: int = DEFAULT_MAX_RECORD) -> Iterator[Dict[str, Any]]:
+    """Yield attempt records (with their detailedResults) one at a time.
+
+    Accepts a JSON array (test_results.json), JSON lines, or either one gzip-compressed.
+    """
+    with open_results(path) as f:
+        for value in _iter_json_values(f, chunk_size, max_record):
+            if isinstance(value, dict):
+                yield value
+            else:
+                logger.warning(f"Skipping non-object record in {path}")
+
+def iter_batches(records: Iterator[Dict[str, Any]], batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    """Group a record stream into lists of at most batch_size"""
+    batch = []
+    for record in records:
+        batch.append(record)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+def _empty_aggregate() -> Dict[str, Any]:
+    return {'attempts': 0, 'answers': 0, 'subjects': {}, 'users': {}, 'questions': {}}
+
+def aggregate_batch(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Aggregate one batch of attempts into per-subject, per-user and per-question counters"""
+    aggregate = _empty_aggregate()
+    for record in records:
+        subject = str(record.get('subject', ''))
+        user_id = str(record.get('userId', ''))
+        details = record.get('detailedResults') or []
+        score = float(record.get('score') or 0)
+
+        aggregate['attempts'] += 1
+        aggregate['answers'] += len(details)
+
+        subject_stats = aggregate['subjects'].setdefault(subject, {'attempts': 0, 'score_sum': 0.0})
+        subject_stats['attempts'] += 1
+        subject_stats['score_sum'] += score
+
+        user_stats = aggregate['users'].setdefault(user_id, {})
+        user_subject = user_stats.setdefault(subject, {'attempts': 0, 'score_sum': 0.0, 'best_score': 0.0})
+        user_subject['attempts'] += 1
+        user_subject['score_sum'] += score
+        user_subject['best_score'] = max(user_subject['best_score'], score)
+
+        for detail in details:
+            question = aggregate['questions'].setdefault(str(detail.get('questionId', '')), [0, 0])
+            question[0] += 1
+            question[1] += 1 if detail.get('isCorrect') else 0
+    return aggregate
+
+def merge_aggregates(total: Dict[str, Any], part: Dict[str, Any]) -> Dict[str, Any]:
+    """Fold a partial aggregate into a running total (in place)"""
+    total['attempts'] += part['attempts']
+    total['answers'] += part['answers']
+
+    for subject, stats in part['subjects'].items():
+        target = total['subjects'].setdefault(subject, {'attempts': 0, 'score_sum': 0.0})
+        target['attempts'] += stats['attempts']
+        target['score_sum'] += stats['score_sum']
+
+    for user_id, subjects in part['users'].items():
+        user_stats = total['users'].setdefault(user_id, {})
+        for subject, stats in subjects.items():
+            target = user_stats.setdefault(subject, {'attempts': 0, 'score_sum': 0.0, 'best_score': 0.0})
+            target['attempts'] += stats['attempts']
+            target['score_sum'] += stats['score_sum']
+            target['best_score'] = max(target['best_score'], stats['best_score'])
+
+    for question_id, (answered, correct) in part['questions'].items():
+        target = total['questions'].setdefault(question_id, [0, 0])
+        target[0] += answered
+        target[1] += correct
+    return total
+
+def aggregate_results(path: str = RESULTS_PATH, workers: int = 0,
+                      batch_size: int = DEFAULT_AGGREGATE_BATCH) -> Dict[str, Any]:
+    """Aggregate a results export in one streaming pass.
+
+    With workers > 0, batches are fanned out to a process pool. At most two batches
+    per worker are in flight, so memory stays bounded by batch size rather than file
+    size; the parent only parses and merges.
+    """
+    total = _empty_aggregate()
+    batches = iter_batches(iter_attempts(path), batch_size)
+
+    if workers <= 0:
+        for batch in batches:
+            merge_aggregates(total, aggregate_batch(batch))
+        return total
+
+    with multiprocessing.Pool(workers) as pool:
+        pending = deque()
+        for batch in batches:
+            pending.append(pool.apply_async(aggregate_batch, (batch,)))
+            if len(pending) >= workers * 2:
+                merge_aggregates(total, pending.popleft().get())
+        while pending:
+            merge_aggregates(total, pending.popleft().get())
+    return total
+
+def summarize_aggregate(aggregate: Dict[str, Any], top_questions: int = 10) -> Dict[str, Any]:
+    """Readable summary: per-subject averages and the most-missed questions"""
+    subjects = {
+        subject: {'attempts': stats['attempts'], 'average_score': round(stats['score_sum'] / stats['attempts'], 1)}
+        for subject, stats in sorted(aggregate['subjects'].items())
+    }
+    hardest = sorted(
+        ((qid, answered, correct) for qid, (answered, correct) in aggregate['questions'].items() if answered),
+        key=lambda item: (item[2] / item[1], -item[1])
+    )[:top_questions]
+    return {
+        'attempts': aggregate['attempts'],
+        'answers': aggregate['answers'],
+        'students': len(aggregate['users']),
+        'subjects': subjects,
+        'most_missed_questions': [
+            {'questionId': qid, 'answered': answered, 'accuracy': round(100.0 * correct / answered, 1)}
+            for qid, answered, correct in hardest
+        ]
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description='Stream and aggregate quiz results exports')
+    parser.add_argument('path', nargs='?', default=RESULTS_PATH, help='JSON array, JSON lines, optionally gzipped')
+    parser.add_argument('--workers', type=int, default=0, help='aggregate batches in this many processes')
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_AGGREGATE_BATCH, help='attempts per batch')
+    args = parser.parse_args()
+
+    aggregate = aggregate_results(args.path, args.workers, args.batch_size)
+    print(json.dumps(summarize_aggregate(aggregate), indent=2))
+
+if __name__ == '__main__':
+    main()
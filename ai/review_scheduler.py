@@ -0,0 +1,253 @@
+#!/usr/bin/env python3
+"""
+Spaced-Repetition Review Scheduler
+SM-2 memory state per (user, question), updated incrementally from the results store and indexed by due date
+"""
+
+import argparse
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+from typing import Dict, Any, List, Optional, Tuple
+
+from results_store import SCHEMA as RESULTS_SCHEMA
+
+logger = logging.getLogger(__name__)
+
+DAY = 86400
+
+# SM-2 grades (0-5) for answers that only record correctness
+CORRECT_GRADE = 4
+INCORRECT_GRADE = 2
+
+MIN_EASINESS = 1.3
+INITIAL_EASINESS = 2.5
+
+SYNC_CHUNK = int(os.getenv('TUTOR_REVIEW_SYNC_CHUNK', '5000'))
+
+SCHEMA = '''
+    CREATE TABLE IF NOT EXISTS review_state (
+        user_id TEXT NOT NULL,
+        question_id TEXT NOT NULL,
+        subject TEXT NOT NULL,
+        easiness REAL NOT NULL,
+        interval_days REAL NOT NULL,
+        repetitions INTEGER NOT NULL,
+        lapses INTEGER NOT NULL,
+        reviewed_at INTEGER NOT NULL,
+        due_at INTEGER NOT NULL,
+        PRIMARY KEY (user_id, question_id)
+    ) WITHOUT ROWID;
+    CREATE INDEX IF NOT EXISTS idx_review_state_due ON review_state (user_id, due_at);
+    CREATE TABLE IF NOT EXISTS review_sync (
+        id INTEGER PRIMARY KEY CHECK (id = 0),
+        last_attempt_id INTEGER NOT NULL
+    );
+'''
+
+def parse_timestamp(value: Any) -> Optional[int]:
+    """Epoch seconds for an ISO-8601 timestamp such as 2025-08-25T01:48:14.780Z (None if unparseable)"""
+    try:
+        parsed = datetime.fromisoformat(str(value).replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return int(parsed.timestamp())
+
+def sm2(state: Optional[Tuple[float, float, int, int]], grade: int) -> Tuple[float, float, int, int]:
+    """Next (easiness, interval_days, repetitions, lapses) after one review graded 0-5 (SM-2)"""
+    easiness, interval, repetitions, lapses = state or (INITIAL_EASINESS, 0.0, 0, 0)
+    if grade >= 3:
+        if repetitions == 0:
+            interval = 1.0
+        elif repetitions == 1:
+            interval = 6.0
+        else:
+            interval = round(interval * easiness, 2)
+        repetitions += 1
+    else:
+        # A lapse starts the item over, but keeps its (lowered) easiness
+        interval, repetitions, lapses = 1.0, 0, lapses + 1
+    easiness = max(MIN_EASINESS, easiness + 0.1 - (5 - grade) * (0.08 + (5 - grade) * 0.02))
+    return easiness, interval, repetitions, lapses
+
+class ReviewScheduler:
+    """Per-(user, question) SM-2 state kept next to the results store, in SQLite.
+
+    State rows are keyed by (user_id, question_id) without a rowid and indexed by
+    (user_id, due_at), so "the N most overdue items for a user" is one index range
+    scan however many pairs are stored. sync() folds in only question results added
+    since the last sync, in attempt order.
+
+    Every process that records or reads results syncs, so each chunk runs in a
+    BEGIN IMMEDIATE transaction: the write lock is taken before the watermark is
+    read, and concurrent syncs apply each result exactly once.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        # Transactions are managed explicitly; the sqlite3 module would only BEGIN at the first write
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, timeout=10.0, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript(RESULTS_SCHEMA + SCHEMA)
+        self._conn.commit()
+
+    def _last_synced(self) -> int:
+        row = self._conn.execute('SELECT last_attempt_id FROM review_sync WHERE id = 0').fetchone()
+        return row[0] if row else 0
+
+    def _apply(self, reviews: List[Tuple[str, str, str, int, int]]) -> int:
+        """Fold (user, question, subject, reviewed_at, grade) reviews into the state (called in a transaction)"""
+        applied = 0
+        updates: Dict[Tuple[str, str], Tuple] = {}
+        for user_id, question_id, subject, reviewed_at, grade in sorted(reviews, key=lambda r: r[3]):
+            key = (user_id, question_id)
+            current = updates.get(key)
+            if current is None:
+                current = self._conn.execute(
+                    'SELECT subject, easiness, interval_days, repetitions, lapses, reviewed_at FROM review_state '
+                    'WHERE user_id = ? AND question_id = ?', key
+                ).fetchone()
+            if current is not None and reviewed_at < current[5]:
+                # Older than the state's last review: SM-2 updates do not commute, so skip it
+                continue
+            easiness, interval, repetitions, lapses = sm2(current[1:5] if current else None, grade)
+            updates[key] = (subject, easiness, interval, repetitions, lapses, reviewed_at)
+            applied += 1
+        self._conn.executemany(
+            'INSERT OR REPLACE INTO review_state (user_id, question_id, subject, easiness, interval_days, '
+            'repetitions, lapses, reviewed_at, due_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            [(user_id, question_id, subject, easiness, interval, repetitions, lapses, reviewed_at,
+              reviewed_at + int(interval * DAY))
+             for (user_id, question_id), (subject, easiness, interval, repetitions, lapses, reviewed_at)
+             in updates.items()]
+        )
+        return applied
+
+    def sync(self) -> int:
+        """Fold question results stored since the last sync into the review state; returns reviews applied"""
+        applied = 0
+        with self._lock:
+            while True:
+                self._conn.execute('BEGIN IMMEDIATE')
+                try:
+                    chunk = self._sync_chunk()
+                    self._conn.execute('COMMIT')
+                except BaseException:
+                    self._conn.execute('ROLLBACK')
+                    raise
+                if chunk is None:
+                    break
+                applied += chunk
+        if applied:
+            logger.info(f"Applied {applied} reviews to the review schedule")
+        return applied
+
+    def _sync_chunk(self) -> Optional[int]:
+        """Apply the next SYNC_CHUNK attempts after the watermark (called in a write transaction)"""
+        last = self._last_synced()
+        ids = [row[0] for row in self._conn.execute(
+            'SELECT id FROM attempts WHERE id > ? ORDER BY id LIMIT ?', (last, SYNC_CHUNK)
+        )]
+        if not ids:
+            return None
+        rows = self._conn.execute(
+            'SELECT user_id, question_id, subject, timestamp, is_correct FROM question_results '
+            'WHERE attempt_id BETWEEN ? AND ? AND question_id != \'\'', (ids[0], ids[-1])
+        ).fetchall()
+        reviews = []
+        for user_id, question_id, subject, timestamp, is_correct in rows:
+            reviewed_at = parse_timestamp(timestamp)
+            if reviewed_at is not None:
+                reviews.append((user_id, question_id, subject, reviewed_at,
+                                CORRECT_GRADE if is_correct else INCORRECT_GRADE))
+        applied = self._apply(reviews)
+        self._conn.execute('INSERT OR REPLACE INTO review_sync (id, last_attempt_id) VALUES (0, ?)', (ids[-1],))
+        return applied
+
+    @staticmethod
+    def _item(row: Tuple, now: float) -> Dict[str, Any]:
+        question_id, subject, easiness, interval, repetitions, lapses, due_at = row
+        return {
+            'questionId': question_id,
+            'subject': subject,
+            'dueAt': datetime.fromtimestamp(due_at, timezone.utc).isoformat().replace('+00:00', 'Z'),
+            'overdueDays': round((now - due_at) / DAY, 2),
+            'intervalDays': interval,
+            'easiness': round(easiness, 2),
+            'repetitions': repetitions,
+            'lapses': lapses
+        }
+
+    def due_reviews(self, user_id: str, limit: int = 10, subject: Optional[str] = None,
+                    now: Optional[float] = None) -> List[Dict[str, Any]]:
+        """The user's `limit` most overdue items (earliest due first), optionally for one subject"""
+        now = now if now is not None else time.time()
+        query = ('SELECT question_id, subject, easiness, interval_days, repetitions, lapses, due_at '
+                 'FROM review_state WHERE user_id = ? AND due_at <= ?')
+        params: List[Any] = [str(user_id), int(now)]
+        if subject:
+            query += ' AND subject = ?'
+            params.append(subject)
+        query += ' ORDER BY due_at LIMIT ?'
+        params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(query, params).fetchall()
+        return [self._item(row, now) for row in rows]
+
+    def count_due(self, user_id: str, now: Optional[float] = None) -> int:
+        with self._lock:
+            return self._conn.execute('SELECT COUNT(*) FROM review_state WHERE user_id = ? AND due_at <= ?',
+                                      (str(user_id), int(now if now is not None else time.time()))).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+_default_scheduler: Optional[ReviewScheduler] = None
+_default_scheduler_lock = threading.Lock()
+
+def get_review_scheduler() -> ReviewScheduler:
+    """Process-wide scheduler in the results store's database (TUTOR_RESULTS_DB), synced on creation"""
+    global _default_scheduler
+    with _default_scheduler_lock:
+        if _default_scheduler is None:
+            from results_store import get_results_store
+            scheduler = ReviewScheduler(get_results_store().db_path)
+            scheduler.sync()
+            _default_scheduler = scheduler
+        return _default_scheduler
+
+def main():
+    from results_store import DEFAULT_DB_PATH
+    
+    parser = argparse.ArgumentParser(description='Spaced-repetition review scheduler')
+    parser.add_argument('--db', default=os.getenv('TUTOR_RESULTS_DB', DEFAULT_DB_PATH), help='results database path')
+    subcommands = parser.add_subparsers(dest='command', required=True)
+    subcommands.add_parser('sync', help='fold new question results into the review schedule')
+    due_cmd = subcommands.add_parser('due', help='show a user\'s most overdue items')
+    due_cmd.add_argument('user_id')
+    due_cmd.add_argument('-n', type=int, default=10, help='number of items')
+    due_cmd.add_argument('--subject')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    scheduler = ReviewScheduler(args.db)
+    applied = scheduler.sync()
+    if args.command == 'sync':
+        print(json.dumps({'applied': applied}))
+    else:
+        print(json.dumps({'due': scheduler.due_reviews(args.user_id, args.n, args.subject),
+                          'total_due': scheduler.count_due(args.user_id)}, indent=2))
+    scheduler.close()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+LLM Call Scheduler
+Admits work by priority class, weighted fair share across tenants, and earliest deadline first
+"""
+
+import heapq
+import itertools
+import os
+import threading
+import time
+import logging
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Highest priority first
+PRIORITIES = ('interactive', 'standard', 'background')
+
+ACTION_PRIORITIES: Dict[str, str] = {
+    'conversational_tutoring': 'interactive',
+    'evaluate_answer': 'interactive',
+    'evaluate_image_answer': 'interactive',
+    'provide_tutoring_explanation': 'interactive',
+    'generate_adaptive_question': 'standard',
+    'analyze_learning_path': 'background',
+    'analyze_errors': 'background'
+}
+
+DEFAULT_CAPACITY = int(os.getenv('TUTOR_LLM_CONCURRENCY', '8'))
+# Slots only interactive work may use, so background work can never fill every slot
+DEFAULT_RESERVED = int(os.getenv('TUTOR_INTERACTIVE_RESERVED_SLOTS', '2'))
+
+def parse_weights(spec: str) -> Dict[str, float]:
+    """Tenant weights from "school-a:2,school-b:1" (unlisted tenants weigh 1)"""
+    weights = {}
+    for item in (spec or '').split(','):
+        name, _, weight = item.strip().rpartition(':')
+        if name:
+            try:
+                weights[name] = max(float(weight), 0.01)
+            except ValueError:
+                logger.warning(f"Ignoring invalid tenant weight: {item}")
+    return weights
+
+_priority: ContextVar[str] = ContextVar('tutor_priority', default='standard')
+_tenant: ContextVar[str] = ContextVar('tutor_tenant', default='default')
+
+@contextmanager
+def schedule_scope(priority: Optional[str] = None, tenant: Optional[str] = None):
+    """Run a block with the given priority class and tenant for its LLM calls"""
+    tokens = []
+    if priority is not None:
+        tokens.append((_priority, _priority.set(priority if priority in PRIORITIES else 'standard')))
+    if tenant is not None:
+        tokens.append((_tenant, _tenant.set(str(tenant))))
+    try:
+        yield
+    finally:
+        for var, token in reversed(tokens):
+            var.reset(token)
+
+def current_priority() -> str:
+    return _priority.get()
+
+def current_tenant() -> str:
+    return _tenant.get()
+
+def request_class(input_data: Dict[str, Any]) -> Tuple[str, str]:
+    """(priority, tenant) for a JSON request: explicit `priority`, else by action; tenant from tenantId/userId"""
+    priority = input_data.get('priority')
+    if priority not in PRIORITIES:
+        action = input_data.get('action', 'evaluate_answer')
+        priority = ACTION_PRIORITIES.get(action, 'standard')
+        if action == 'evaluate_answer' and input_data.get('type') == 'essay':
+            priority = 'standard'
+    tenant = input_data.get('tenantId') or input_data.get('userId') or 'default'
+    return priority, str(tenant)
+
+class _Waiter:
+    __slots__ = ('priority', 'tenant', 'granted', 'enqueued')
+
+    def __init__(self, priority: str, tenant: str):
+        self.priority = priority
+        self.tenant = tenant
+        self.granted = False
+        self.enqueued = time.monotonic()
+
+class _ClassQueue:
+    """Waiters of one priority class: self-clocked fair queuing across tenants, EDF within a tenant"""
+
+    def __init__(self, weights: Dict[str, float]):
+        self.weights = weights
+        self.virtual_time = 0.0
+        self.tenants: Dict[str, Dict[str, Any]] = {}
+        self.size = 0
+
+    def push(self, waiter: _Waiter, deadline: Optional[float], seq: int):
+        state = self.tenants.get(waiter.tenant)
+        if state is None:
+            state = self.tenants[waiter.tenant] = {'heap': [], 'tags': deque(), 'finish': 0.0}
+        # Each queued request advances its tenant's finish tag by 1/weight
+        state['finish'] = max(state['finish'], self.virtual_time) + 1.0 / self.weights.get(waiter.tenant, 1.0)
+        state['tags'].append(state['finish'])
+        heapq.heappush(state['heap'], (deadline if deadline is not None else float('inf'), seq, waiter))
+        self.size += 1
+
+    def pop(self) -> _Waiter:
+        tenant, state = min(self.tenants.items(), key=lambda item: item[1]['tags'][0])
+        self.virtual_time = state['tags'].popleft()
+        _, _, waiter = heapq.heappop(state['heap'])
+        if not state['heap']:
+            del self.tenants[tenant]
+        self.size -= 1
+        return waiter
+
+    def remove(self, waiter: _Waiter):
+        state = self.tenants[waiter.tenant]
+        state['heap'] = [entry for entry in state['heap'] if entry[2] is not waiter]
+        heapq.heapify(state['heap'])
+        # Give back the tenant's newest tag so a timed-out request does not count against it
+        state['tags'].pop()
+        state['finish'] = state['tags'][-1] if state['tags'] else self.virtual_time
+        if not state['heap']:
+            del self.tenants[waiter.tenant]
+        self.size -= 1
+
+class FairScheduler:
+    """Bounds concurrent work to `capacity` slots and decides who gets the next free one.
+
+    Waiting work is served strictly by priority class (interactive, standard,
+    background). Within a class, tenants share slots in proportion to their
+    weights (weighted fair queuing), and each tenant's own requests go earliest
+    deadline first. `reserved` slots are kept for interactive work, so a live
+    chat never waits behind a full house of background calls. A waiter whose
+    deadline passes gives up its place.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, reserved: int = DEFAULT_RESERVED,
+                 weights: Optional[Dict[str, float]] = None):
+        self.capacity = max(1, capacity)
+        self.reserved = max(0, min(reserved, self.capacity - 1))
+        self._queues = {priority: _ClassQueue(weights or {}) for priority in PRIORITIES}
+        self._active = 0
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._stats = {priority: {'granted': 0, 'timed_out': 0, 'wait_seconds': 0.0, 'max_wait_seconds': 0.0}
+                       for priority in PRIORITIES}
+
+    def _limit(self, priority: str) -> int:
+        return self.capacity if priority == 'interactive' else self.capacity - self.reserved
+
+    def _grant(self):
+        """Hand free slots to waiters, highest class first (called with the lock held)"""
+        for priority in PRIORITIES:
+            queue = self._queues[priority]
+            while queue.size and self._active < self._limit(priority):
+                waiter = queue.pop()
+                waiter.granted = True
+                self._active += 1
+                waited = time.monotonic() - waiter.enqueued
+                stats = self._stats[priority]
+                stats['granted'] += 1
+                stats['wait_seconds'] += waited
+                stats['max_wait_seconds'] = max(stats['max_wait_seconds'], waited)
+            if queue.size:
+                # Lower classes may not overtake a class that is still waiting
+                break
+
+    def acquire(self, priority: str = 'standard', tenant: str = 'default', deadline: Optional[float] = None) -> bool:
+        """Wait for a slot; False if `deadline` (time.monotonic()) passes first. Pair with release()"""
+        if priority not in PRIORITIES:
+            priority = 'standard'
+        waiter = _Waiter(priority, tenant)
+        with self._cond:
+            self._queues[priority].push(waiter, deadline, next(self._seq))
+            self._grant()
+            self._cond.notify_all()
+            while not waiter.granted:
+                timeout = None if deadline is None else deadline - time.monotonic()
+                if timeout is not None and timeout <= 0:
+                    self._queues[priority].remove(waiter)
+                    self._stats[priority]['timed_out'] += 1
+                    # This waiter may have been what held lower classes back
+                    self._grant()
+                    self._cond.notify_all()
+                    return False
+                self._cond.wait(timeout)
+        return True
+
+    def release(self):
+        with self._cond:
+            self._active -= 1
+            self._grant()
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self, priority: str = 'standard', tenant: str = 'default', deadline: Optional[float] = None):
+        """Context manager form of acquire/release; yields whether a slot was granted"""
+        granted = self.acquire(priority, tenant, deadline)
+        try:
+            yield granted
+        finally:
+            if granted:
+                self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            classes = {}
+            for priority in PRIORITIES:
+                stats = dict(self._stats[priority])
+                stats['queued'] = self._queues[priority].size
+                stats['mean_wait_ms'] = round(1000 * stats.pop('wait_seconds') / stats['granted'], 1) \
+                    if stats['granted'] else 0.0
+                stats['max_wait_ms'] = round(1000 * stats.pop('max_wait_seconds'), 1)
+                classes[priority] = stats
+            return {'capacity': self.capacity, 'reserved': self.reserved, 'active': self._active, 'classes': classes}
+
+_default_scheduler: Optional[FairScheduler] = None
+_default_scheduler_lock = threading.Lock()
+
+def get_scheduler() -> FairScheduler:
+    """Process-wide scheduler for LLM calls (TUTOR_LLM_CONCURRENCY slots, TUTOR_TENANT_WEIGHTS)"""
+    global _default_scheduler
+    with _default_scheduler_lock:
+        if _default_scheduler is None:
+            _default_scheduler = FairScheduler(weights=parse_weights(os.getenv('TUTOR_TENANT_WEIGHTS', '')))
+        return _default_scheduler
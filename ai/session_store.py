@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Conversation Session Store
+Keeps bounded per-session tutoring history server-side, in memory with optional SQLite persistence
+"""
+
+import os
+import threading
+import time
+import logging
+from collections import OrderedDict, deque
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_TURNS = int(os.getenv('TUTOR_SESSION_MAX_TURNS', '20'))
+DEFAULT_IDLE_TTL = float(os.getenv('TUTOR_SESSION_IDLE_TTL', '1800'))
+DEFAULT_MAX_SESSIONS = int(os.getenv('TUTOR_SESSION_MAX_SESSIONS', '10000'))
+DEFAULT_MAX_CHARS_PER_MESSAGE = 2000
+
+class SessionStore:
+    """Bounded conversation history keyed by session ID.
+
+    Each session keeps at most `max_turns` turns (oldest dropped first) and every
+    message is capped at `max_chars_per_message`. Sessions idle for longer than
+    `idle_ttl` seconds are evicted, and the least recently used session is dropped
+    once `max_sessions` are held in memory. When `db_path` is set, turns are also
+    written to SQLite so separate processes can continue the same session: the
+    in-memory copy is checked against the database on every access, and turn
+    sequence numbers are allocated inside the write transaction.
+    """
+
+    def __init__(self, db_path: Optional[str] = None, max_turns: int = DEFAULT_MAX_TURNS,
+                 idle_ttl: float = DEFAULT_IDLE_TTL, max_sessions: int = DEFAULT_MAX_SESSIONS,
+                 max_chars_per_message: int = DEFAULT_MAX_CHARS_PER_MESSAGE):
+        self.db_path = db_path
+        self.max_turns = max_turns
+        self.idle_ttl = idle_ttl
+        self.max_sessions = max_sessions
+        self.max_chars_per_message = max_chars_per_message
+        self._sessions: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._last_sweep = time.time()
+
+        if db_path:
+            self._open_db()
+
+    def _open_db(self):
+        import sqlite3
+
+        # Autocommit mode: multi-statement writes use explicit BEGIN IMMEDIATE transactions
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5.0, isolation_level=None)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS sessions (
+                session_id TEXT PRIMARY KEY,
+                last_active REAL NOT NULL,
+                summary TEXT NOT NULL DEFAULT '',
+                next_seq INTEGER NOT NULL DEFAULT 0
+            );
+            CREATE TABLE IF NOT EXISTS session_turns (
+                session_id TEXT NOT NULL,
+                seq INTEGER NOT NULL,
+                student TEXT NOT NULL,
+                tutor TEXT NOT NULL,
+                PRIMARY KEY (session_id, seq)
+            );
+            CREATE INDEX IF NOT EXISTS idx_sessions_last_active ON sessions (last_active);
+        ''')
+        columns = {row[1] for row in self._conn.execute('PRAGMA table_info(sessions)')}
+        with self._transaction():
+            if 'summary' not in columns:
+                self._conn.execute("ALTER TABLE sessions ADD COLUMN summary TEXT NOT NULL DEFAULT ''")
+            if 'next_seq' not in columns:
+                self._conn.execute('ALTER TABLE sessions ADD COLUMN next_seq INTEGER NOT NULL DEFAULT 0')
+                self._conn.execute(
+                    'UPDATE sessions SET next_seq = COALESCE((SELECT MAX(seq) + 1 FROM session_turns '
+                    'WHERE session_turns.session_id = sessions.session_id), 0)'
+                )
+
+    @contextmanager
+    def _transaction(self):
+        """One write transaction, taken up front so reads inside it see the latest committed state"""
+        if self._conn is None:
+            yield
+            return
+        self._conn.execute('BEGIN IMMEDIATE')
+        try:
+            yield
+        except BaseException:
+            self._conn.execute('ROLLBACK')
+            raise
+        self._conn.execute('COMMIT')
+
+    def _sync_from_db(self, session_id: str, now: float) -> Optional[Dict[str, Any]]:
+        """The session as stored, reusing the in-memory copy while no other process has changed it"""
+        row = self._conn.execute(
+            'SELECT last_active, summary, next_seq FROM sessions WHERE session_id = ?', (session_id,)
+        ).fetchone()
+        if row is None:
+            self._sessions.pop(session_id, None)
+            return None
+        last_active, summary, next_seq = row
+        if now - last_active > self.idle_ttl:
+            self._drop(session_id)
+            return None
+
+        session = self._sessions.get(session_id)
+        if session is not None and session['next_seq'] == next_seq and session['summary'] == summary:
+            session['last_active'] = last_active
+            self._sessions.move_to_end(session_id)
+            return session
+
+        rows = self._conn.execute(
+            'SELECT student, tutor FROM session_turns WHERE session_id = ? ORDER BY seq DESC LIMIT ?',
+            (session_id, self.max_turns)
+        ).fetchall()
+        session = {
+            'turns': deque(({'student': s, 'tutor': t} for s, t in reversed(rows)), maxlen=self.max_turns),
+            'last_active': last_active,
+            'summary': summary,
+            'next_seq': next_seq
+        }
+        self._remember(session_id, session)
+        return session
+
+    def _get_session(self, session_id: str, now: float) -> Optional[Dict[str, Any]]:
+        if self._conn is not None:
+            return self._sync_from_db(session_id, now)
+
+        session = self._sessions.get(session_id)
+        if session is not None and now - session['last_active'] > self.idle_ttl:
+            self._drop(session_id)
+            session = None
+
+        if session is not None:
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def _remember(self, session_id: str, session: Dict[str, Any]):
+        self._sessions[session_id] = session
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            # Only the in-memory copy is dropped; persisted sessions reload on demand
+            self._sessions.popitem(last=False)
+
+    def _drop(self, session_id: str):
+        self._sessions.pop(session_id, None)
+        if self._conn is not None:
+            self._conn.execute('DELETE FROM session_turns WHERE session_id = ?', (session_id,))
+            self._conn.execute('DELETE FROM sessions WHERE session_id = ?', (session_id,))
+
+    def _maybe_sweep(self, now: float):
+        if now - self._last_sweep >= min(self.idle_ttl, 60.0):
+            with self._transaction():
+                self._evict_idle(now)
+
+    def _evict_idle(self, now: float) -> int:
+        self._last_sweep = now
+        cutoff = now - self.idle_ttl
+        expired = [sid for sid, session in self._sessions.items() if session['last_active'] < cutoff]
+        for session_id in expired:
+            self._sessions.pop(session_id, None)
+
+        removed = len(expired)
+        if self._conn is not None:
+            stale = [row[0] for row in self._conn.execute(
+                'SELECT session_id FROM sessions WHERE last_active < ?', (cutoff,)
+            )]
+            self._conn.executemany('DELETE FROM session_turns WHERE session_id = ?', [(s,) for s in stale])
+            self._conn.execute('DELETE FROM sessions WHERE last_active < ?', (cutoff,))
+            removed = max(removed, len(stale))
+        return removed
+
+    def get_history(self, session_id: str) -> List[Dict[str, str]]:
+        """Return the retained turns for a session (oldest first)"""
+        now = time.time()
+        with self._lock:
+            self._maybe_sweep(now)
+            with self._transaction():
+                session = self._get_session(session_id, now)
+            return list(session['turns']) if session else []
+
+    def append_turn(self, session_id: str, student_message: str, tutor_message: str):
+        """Record one student/tutor exchange, trimming the session to its bounds"""
+        now = time.time()
+        turn = {
+            'student': (student_message or '')[:self.max_chars_per_message],
+            'tutor': (tutor_message or '')[:self.max_chars_per_message]
+        }
+
+        with self._lock, self._transaction():
+            session = self._get_session(session_id, now)
+            if session is None:
+                session = {'turns': deque(maxlen=self.max_turns), 'last_active': now, 'summary': '', 'next_seq': 0}
+                self._remember(session_id, session)
+
+            session['turns'].append(turn)
+            session['last_active'] = now
+            seq = session['next_seq']
+            session['next_seq'] = seq + 1
+
+            if self._conn is not None:
+                self._conn.execute(
+                    'INSERT INTO sessions (session_id, last_active, next_seq) VALUES (?, ?, ?) '
+                    'ON CONFLICT(session_id) DO UPDATE SET last_active = excluded.last_active, '
+                    'next_seq = excluded.next_seq',
+                    (session_id, now, seq + 1)
+                )
+                self._conn.execute(
+                    'INSERT INTO session_turns (session_id, seq, student, tutor) VALUES (?, ?, ?, ?)',
+                    (session_id, seq, turn['student'], turn['tutor'])
+                )
+                self._conn.execute(
+                    'DELETE FROM session_turns WHERE session_id = ? AND seq <= ?',
+                    (session_id, seq - self.max_turns)
+                )
+
+    def get_turn_count(self, session_id: str) -> int:
+        """Total turns ever recorded for a session, including ones trimmed or folded away"""
+        now = time.time()
+        with self._lock, self._transaction():
+            session = self._get_session(session_id, now)
+            return session['next_seq'] if session else 0
+    
+    def get_summary(self, session_id: str) -> str:
+        """Return the rolling summary of turns already folded out of the session"""
+        now = time.time()
+        with self._lock, self._transaction():
+            session = self._get_session(session_id, now)
+            return session['summary'] if session else ''
+
+    def fold(self, session_id: str, summary: str, turn_count: int):
+        """Replace the oldest `turn_count` retained turns with a summary covering them"""
+        now = time.time()
+        with self._lock, self._transaction():
+            session = self._get_session(session_id, now)
+            if session is None or turn_count <= 0:
+                return
+
+            turn_count = min(turn_count, len(session['turns']))
+            for _ in range(turn_count):
+                session['turns'].popleft()
+            session['summary'] = summary
+
+            if self._conn is not None:
+                # Retained turns always occupy the highest sequence numbers
+                first_kept = session['next_seq'] - len(session['turns'])
+                self._conn.execute(
+                    'DELETE FROM session_turns WHERE session_id = ? AND seq < ?',
+                    (session_id, first_kept)
+                )
+                self._conn.execute(
+                    'UPDATE sessions SET summary = ? WHERE session_id = ?', (summary, session_id)
+                )
+
+    def seed_history(self, session_id: str, history: List[Dict[str, str]]):
+        """Initialize an empty session from client-supplied history (migration path for old clients)"""
+        for turn in history[-self.max_turns:]:
+            self.append_turn(session_id, turn.get('student', ''), turn.get('tutor', ''))
+
+    def clear(self, session_id: str):
+        """Forget a session entirely"""
+        with self._lock, self._transaction():
+            self._drop(session_id)
+
+    def evict_idle(self) -> int:
+        """Evict sessions idle past the TTL; returns the number removed"""
+        with self._lock, self._transaction():
+            return self._evict_idle(time.time())
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+_default_store: Optional[SessionStore] = None
+_default_store_lock = threading.Lock()
+
+def get_session_store() -> SessionStore:
+    """Process-wide session store configured from the environment.
+
+    TUTOR_SESSION_DB selects the SQLite file (default: a file in the temp directory,
+    so one-process-per-request callers still share sessions); set it to an empty
+    string to keep sessions in memory only.
+    """
+    global _default_store
+    with _default_store_lock:
+        if _default_store is None:
+            db_path = os.getenv('TUTOR_SESSION_DB')
+            if db_path is None:
+                import tempfile
+                db_path = os.path.join(tempfile.gettempdir(), 'ai_tutor_sessions.db')
+            _default_store = SessionStore(db_path=db_path or None)
+        return _default_store
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Similarity Cache for Tutoring Questions
+Reuses answers to reworded context-free questions, matched by character n-gram similarity
+"""
+
+import json
+import os
+import random
+import re
+import threading
+import time
+import logging
+from collections import OrderedDict, deque
+from typing import Dict, Any, List, Optional
+
+from text_similarity import ngram_vector, cosine
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_THRESHOLD = float(os.getenv('TUTOR_SIMILARITY_CACHE_THRESHOLD', '0.9'))
+DEFAULT_MAX_ENTRIES = int(os.getenv('TUTOR_SIMILARITY_CACHE_MAX_ENTRIES', '512'))
+DEFAULT_AUDIT_RATE = float(os.getenv('TUTOR_SIMILARITY_CACHE_AUDIT_RATE', '0.05'))
+AUDIT_LOG_SIZE = 200
+
+# Words that change how a question is phrased but not what it asks
+QUESTION_FILLER = frozenset(
+    'a an the what whats is are explain pls please plz can could would you me tell about i define '
+    'definition meaning mean means describe give us'.split()
+)
+
+_NON_WORD = re.compile(r'[^\w\s]')
+
+def normalize_question(text: str) -> str:
+    """Lowercase, strip punctuation and filler words ("explain deadlock pls" -> "deadlock")"""
+    words = _NON_WORD.sub(' ', (text or '').lower()).split()
+    content = [word for word in words if word not in QUESTION_FILLER]
+    return ' '.join(content or words)
+
+# Words ignored when two questions are compared token by token. Question words such as
+# "how" and "why" are not among them: "how does TCP work" and "why does TCP work" differ
+CONNECTIVES = frozenset('of in on to for and or with vs versus by from between into at as do does'.split())
+# "don't" normalizes to "don t", so the bare "t" counts as a negation too
+NEGATIONS = frozenset('not no never without nor cannot cant dont doesnt isnt arent didnt wont t'.split())
+ANTONYM_PREFIXES = ('dis', 'un', 'in', 'im', 'ir', 'il', 'non', 'anti')
+
+def _stem(token: str) -> str:
+    return token[:-1] if len(token) > 3 and token.endswith('s') and not token.endswith('ss') else token
+
+def _one_edit_apart(a: str, b: str) -> bool:
+    """Typo tolerance for longer words: one insertion, deletion or substitution"""
+    if min(len(a), len(b)) < 5 or abs(len(a) - len(b)) > 1 or any(c.isdigit() for c in a + b):
+        return False
+    if len(a) > len(b):
+        a, b = b, a
+    i = 0
+    while i < len(a) and a[i] == b[i]:
+        i += 1
+    return a[i + (len(a) == len(b)):] == b[i + 1:]
+
+def questions_compatible(a: str, b: str) -> bool:
+    """Whether two normalized questions can share an answer, judged on their words.
+
+    Character n-gram similarity scores "best case ..." against "worst case ..."
+    or "advantages ..." against "disadvantages ..." as near-identical. Apart from
+    connectives, every word must appear in both questions, up to a plural "s", a
+    one-letter typo in a word of five or more letters, or a split compound
+    ("quick sort" / "quicksort"). A negation present in only one of them, or a
+    word that is the other's antonym by prefix, always rejects the pair.
+    """
+    a_tokens = [_stem(token) for token in a.split() if token not in CONNECTIVES]
+    b_tokens = [_stem(token) for token in b.split() if token not in CONNECTIVES]
+    if NEGATIONS.intersection(a_tokens) != NEGATIONS.intersection(b_tokens):
+        return False
+
+    a_only = [token for token in a_tokens if token not in b_tokens]
+    b_only = [token for token in b_tokens if token not in a_tokens]
+    if not a_only and not b_only:
+        return True
+    for x in a_only:
+        for y in b_only:
+            if any(x == prefix + y or y == prefix + x for prefix in ANTONYM_PREFIXES):
+                return False
+    if ''.join(a_only) == ''.join(b_only):
+        return True
+    return len(a_only) == len(b_only) and all(_one_edit_apart(x, y) for x, y in zip(a_only, b_only))
+
+class SimilarityCache:
+    """Per-namespace (subject) LRU cache of answers matched by question similarity.
+
+    A lookup scans the namespace for the most similar stored question and returns
+    its answer when the cosine similarity reaches `threshold` and the two questions
+    pass `questions_compatible`. Each namespace keeps
+    at most `max_entries` questions, evicting the least recently used. A fraction
+    (`audit_rate`) of hits is sampled into an audit log for review; verdicts recorded
+    against it give the observed false-positive rate. With `db_path` the entries and
+    the audit log are kept in SQLite so separate processes share them.
+    """
+
+    def __init__(self, threshold: float = DEFAULT_THRESHOLD, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 audit_rate: float = DEFAULT_AUDIT_RATE, db_path: Optional[str] = None, seed: Optional[int] = None):
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.audit_rate = audit_rate
+        self.db_path = db_path
+        self._namespaces: Dict[str, "OrderedDict[str, Dict[str, Any]]"] = {}
+        self._audit: deque = deque(maxlen=AUDIT_LOG_SIZE)
+        self._audit_ids = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._stats = {'lookups': 0, 'hits': 0, 'rejected': 0, 'stores': 0, 'evictions': 0}
+        self._conn = None
+
+        if db_path:
+            self._open_db()
+
+    def _open_db(self):
+        import sqlite3
+
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5.0)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._conn.executescript('''
+            CREATE TABLE IF NOT EXISTS similarity_entries (
+                namespace TEXT NOT NULL,
+                normalized TEXT NOT NULL,
+                question TEXT NOT NULL,
+                response TEXT NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (namespace, normalized)
+            );
+            CREATE TABLE IF NOT EXISTS similarity_audit (
+                id INTEGER PRIMARY KEY,
+                namespace TEXT NOT NULL,
+                query TEXT NOT NULL,
+                matched TEXT NOT NULL,
+                similarity REAL NOT NULL,
+                created REAL NOT NULL,
+                verdict INTEGER
+            );
+        ''')
+        self._conn.commit()
+
+    def _namespace(self, namespace: str) -> "OrderedDict[str, Dict[str, Any]]":
+        entries = self._namespaces.get(namespace)
+        if entries is None:
+            entries = self._namespaces[namespace] = OrderedDict()
+            if self._conn is not None:
+                rows = self._conn.execute(
+                    'SELECT normalized, question, response FROM similarity_entries WHERE namespace = ? '
+                    'ORDER BY last_used DESC LIMIT ?', (namespace, self.max_entries)
+                ).fetchall()
+                for normalized, question, response in reversed(rows):
+                    entries[normalized] = {'question': question, 'vector': ngram_vector(normalized),
+                                           'response': json.loads(response)}
+        return entries
+
+    def lookup(self, namespace: str, message: str) -> Optional[Dict[str, Any]]:
+        """Best cached answer for a question, or None below the similarity threshold"""
+        normalized = normalize_question(message)
+        if not normalized:
+            return None
+        vector = ngram_vector(normalized)
+
+        with self._lock:
+            self._stats['lookups'] += 1
+            entries = self._namespace(namespace)
+            best_key, best_score = None, 0.0
+            for key, entry in entries.items():
+                if key == normalized:
+                    best_key, best_score = key, 1.0
+                    break
+                score = cosine(vector, entry['vector'])
+                if score >= self.threshold and score > best_score:
+                    if questions_compatible(normalized, key):
+                        best_key, best_score = key, score
+                    else:
+                        self._stats['rejected'] += 1
+
+            if best_key is None:
+                return None
+
+            entry = entries[best_key]
+            entries.move_to_end(best_key)
+            self._stats['hits'] += 1
+            if self._conn is not None:
+                self._conn.execute(
+                    'UPDATE similarity_entries SET last_used = ? WHERE namespace = ? AND normalized = ?',
+                    (time.time(), namespace, best_key)
+                )
+                self._conn.commit()
+            if best_score < 1.0 and self._random.random() < self.audit_rate:
+                self._sample_for_audit(namespace, message, entry['question'], best_score)
+
+            return {'response': entry['response'], 'similarity': round(best_score, 4), 'matched': entry['question']}
+
+    def store(self, namespace: str, message: str, response: Dict[str, Any]):
+        """Cache the answer to a context-free question"""
+        normalized = normalize_question(message)
+        if not normalized:
+            return
+
+        with self._lock:
+            entries = self._namespace(namespace)
+            entries[normalized] = {'question': message, 'vector': ngram_vector(normalized), 'response': response}
+            entries.move_to_end(normalized)
+            self._stats['stores'] += 1
+            while len(entries) > self.max_entries:
+                entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+            if self._conn is not None:
+                self._conn.execute(
+                    'INSERT OR REPLACE INTO similarity_entries (namespace, normalized, question, response, last_used) '
+                    'VALUES (?, ?, ?, ?, ?)', (namespace, normalized, message, json.dumps(response), time.time())
+                )
+                self._conn.execute(
+                    'DELETE FROM similarity_entries WHERE namespace = ? AND normalized NOT IN ('
+                    'SELECT normalized FROM similarity_entries WHERE namespace = ? ORDER BY last_used DESC LIMIT ?)',
+                    (namespace, namespace, self.max_entries)
+                )
+                self._conn.commit()
+
+    def _sample_for_audit(self, namespace: str, query: str, matched: str, similarity: float):
+        record = {'namespace': namespace, 'query': query, 'matched': matched,
+                  'similarity': round(similarity, 4), 'created': time.time(), 'verdict': None}
+        if self._conn is not None:
+            cursor = self._conn.execute(
+                'INSERT INTO similarity_audit (namespace, query, matched, similarity, created) VALUES (?, ?, ?, ?, ?)',
+                (namespace, query, matched, record['similarity'], record['created'])
+            )
+            self._conn.commit()
+            record['id'] = cursor.lastrowid
+        else:
+            self._audit_ids += 1
+            record['id'] = self._audit_ids
+            self._audit.append(record)
+
+    def audit_log(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent sampled hits (query vs. the cached question it was answered with)"""
+        with self._lock:
+            if self._conn is None:
+                return [dict(record) for record in list(self._audit)[-limit:]][::-1]
+            rows = self._conn.execute(
+                'SELECT id, namespace, query, matched, similarity, created, verdict FROM similarity_audit '
+                'ORDER BY id DESC LIMIT ?', (limit,)
+            ).fetchall()
+        return [
+            {'id': i, 'namespace': ns, 'query': q, 'matched': m, 'similarity': s, 'created': c,
+             'verdict': None if v is None else bool(v)}
+            for i, ns, q, m, s, c, v in rows
+        ]
+
+    def record_verdict(self, audit_id: int, correct: bool) -> bool:
+        """Mark an audited hit as a correct reuse or a false positive"""
+        with self._lock:
+            if self._conn is not None:
+                cursor = self._conn.execute(
+                    'UPDATE similarity_audit SET verdict = ? WHERE id = ?', (1 if correct else 0, audit_id)
+                )
+                self._conn.commit()
+                return cursor.rowcount > 0
+            for record in self._audit:
+                if record['id'] == audit_id:
+                    record['verdict'] = correct
+                    return True
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+            stats['misses'] = stats['lookups'] - stats['hits']
+            stats['hit_rate'] = round(stats['hits'] / stats['lookups'], 4) if stats['lookups'] else 0.0
+            stats['threshold'] = self.threshold
+            stats['namespaces'] = {name: len(entries) for name, entries in self._namespaces.items()}
+
+            if self._conn is not None:
+                sampled, reviewed, false_positives = self._conn.execute(
+                    'SELECT COUNT(*), COUNT(verdict), COALESCE(SUM(verdict = 0), 0) FROM similarity_audit'
+                ).fetchone()
+            else:
+                sampled = len(self._audit)
+                reviewed = sum(1 for r in self._audit if r['verdict'] is not None)
+                false_positives = sum(1 for r in self._audit if r['verdict'] is False)
+
+        stats['audit'] = {
+            'sampled': sampled,
+            'reviewed': reviewed,
+            'false_positives': false_positives,
+            'false_positive_rate': round(false_positives / reviewed, 4) if reviewed else None
+        }
+        return stats
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+_default_cache: Optional[SimilarityCache] = None
+_default_cache_lock = threading.Lock()
+
+def get_similarity_cache() -> SimilarityCache:
+    """Process-wide similarity cache, stored in the shared TUTOR_CACHE_DB file (empty string: memory only)"""
+    global _default_cache
+    with _default_cache_lock:
+        if _default_cache is None:
+            db_path = os.getenv('TUTOR_CACHE_DB')
+            if db_path is None:
+                import tempfile
+                db_path = os.path.join(tempfile.gettempdir(), 'ai_tutor_cache.db')
+            _default_cache = SimilarityCache(db_path=db_path or None)
+        return _default_cache
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Tests for ability-targeted question selection
+Covers online ability updates, matching difficulty, never repeating a question and persistence
+"""
+
+import csv
+import os
+import random
+import tempfile
+
+from ability_selector import AbilitySelector, DifficultyIndex, expected_score, target_difficulty
+from question_bank import format_question_id, question_key
+from question_bank_binary import BinaryQuestionBank, compile_bank
+
+HEADER = ['question', 'type', 'options', 'correctAnswer', 'explanation', 'difficulty', 'topic']
+LEVELS = ['beginner', 'intermediate', 'advanced']
+
+def _bank(per_subject=30):
+    csv_dir = tempfile.mkdtemp()
+    with open(os.path.join(csv_dir, 'dsa_mcq.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(HEADER)
+        for i in range(per_subject):
+            writer.writerow([f"dsa question {i}", 'multiple-choice', 'A,B,C', 0, '', LEVELS[i % 3], f"Topic {i % 2}"])
+    path = os.path.join(csv_dir, 'bank.bin')
+    compile_bank(csv_dir, path)
+    return BinaryQuestionBank(path), os.path.join(csv_dir, 'abilities.db')
+
+def _qid(number):
+    """Bank ID of the number-th generated question"""
+    return format_question_id('dsa', question_key('dsa', f"dsa question {number}"))
+
+def test_ability_follows_answers():
+    """Correct answers raise the estimate, wrong ones lower it, and steps shrink as answers accumulate"""
+    bank, db_path = _bank()
+    selector = AbilitySelector(db_path, bank)
+    first = selector.record_answer('s1', 'dsa', _qid(0), True)
+    second = selector.record_answer('s1', 'dsa', _qid(3), True)
+    assert 0 < second['change'] < first['change']
+    assert selector.record_answer('s2', 'dsa', _qid(0), False)['rating'] < 0
+    # Questions outside the bank are rated by their label
+    assert selector.record_answer('s3', 'dsa', None, True, 'advanced')['change'] > first['change']
+    selector.close()
+
+def test_selection_targets_the_students_level():
+    """A strong student gets advanced questions, a new one questions at the target success rate"""
+    bank, db_path = _bank()
+    selector = AbilitySelector(db_path, bank, rng=random.Random(3))
+    assert selector.next_question('new', 'dsa')['difficulty'] == 'beginner'
+    assert 0.6 < expected_score(0.0, target_difficulty(0.0)) < 0.8
+
+    for i in range(8):
+        selector.record_answer('strong', 'dsa', _qid(i), True)
+    assert selector.ability('strong', 'dsa')['difficulty'] == 'advanced'
+    question = selector.next_question('strong', 'dsa', 'Topic 1')
+    assert question['difficulty'] == 'advanced' and question['topic'] == 'Topic 1'
+    selector.close()
+
+def test_questions_are_never_repeated_and_state_persists():
+    """Every question is served once before the bank runs dry, also across selector instances"""
+    bank, db_path = _bank(per_subject=12)
+    selector = AbilitySelector(db_path, bank, rng=random.Random(5))
+    served = [selector.next_question('s1', 'dsa')['id'] for _ in range(6)]
+    selector.record_answer('s1', 'dsa', served[0], False)
+    selector.close()
+
+    reopened = AbilitySelector(db_path, bank, rng=random.Random(6))
+    served += [reopened.next_question('s1', 'dsa')['id'] for _ in range(6)]
+    assert len(set(served)) == 12
+    assert reopened.next_question('s1', 'dsa') is None
+    assert reopened.ability('s1', 'dsa')['answers'] == 1
+    reopened.close()
+
+def test_learned_question_ratings_move_between_buckets():
+    """A beginner question that students keep missing is re-rated and served as a hard one"""
+    bank, db_path = _bank()
+    selector = AbilitySelector(db_path, bank, rng=random.Random(2))
+    selector.next_question('warmup', 'dsa')
+    for student in range(40):
+        selector.record_answer(f"s{student}", 'dsa', _qid(0), False)
+    rating = selector._ratings()[bank.index_of(_qid(0))]
+    assert rating > 0.5
+
+    index = selector._index('dsa', None)
+    rng = random.Random(1)
+    others = {bank.question_id(i) for i in range(len(bank))} - {_qid(0)}
+    assert bank.question_id(index.nearest_unseen(rating, 'a', lambda i: bank.question_id(i) in others, rng)) == \
+        _qid(0)
+    beginners = {bank.question_id(i) for i in range(len(bank)) if bank.difficulty(i) == 'beginner'}
+    assert all(bank.question_id(index.nearest_unseen(-1.0, 'b', lambda i: False, rng)) in beginners - {_qid(0)}
+               for _ in range(20))
+    # A fresh index built from the stored ratings agrees
+    fresh = DifficultyIndex(bank, 'dsa', None, {bank.index_of(_qid(0)): rating})
+    assert bank.question_id(fresh.nearest_unseen(rating, 'a', lambda i: bank.question_id(i) in others, rng)) == \
+        _qid(0)
+    selector.close()
+
+def test_generate_adaptive_question_uses_the_selector_for_bank_subjects(monkeypatch):
+    """With a userId, bank subjects are served by ability without calling a provider"""
+    import ability_selector
+    from enhanced_ai_agent import EnhancedAITutor, handle_request
+
+    selector = AbilitySelector(tempfile.mktemp(suffix='.db'), rng=random.Random(4))
+    monkeypatch.setattr(ability_selector, '_default_selector', selector)
+    tutor = EnhancedAITutor()
+    tutor.providers = {}
+
+    question = handle_request(tutor, {'action': 'generate_adaptive_question', 'subject': 'dsa', 'userId': 'u1'})
+    assert question['provider'] == 'ability_selector' and question['id'].startswith('DSA-')
+    recorded = handle_request(tutor, {'action': 'record_answer', 'userId': 'u1', 'subject': 'dsa',
+                                      'questionId': question['id'], 'correct': True})
+    assert recorded['success'] and recorded['answers'] == 1 and recorded['rating'] > 0
+    assert handle_request(tutor, {'action': 'record_answer', 'subject': 'dsa'})['error']
+    selector.close()
+
+def test_seen_questions_are_checked_per_candidate_and_not_rescanned():
+    """Seen checks are keyed per drawn question; a mostly-seen bucket is searched once per student"""
+    bank, db_path = _bank(per_subject=300)
+    index = DifficultyIndex(bank, 'dsa', None, {})
+    rng = random.Random(7)
+    beginners = [i for i in range(len(bank)) if bank.difficulty(i) == 'beginner']
+    unseen = set(beginners[-3:])
+    checked = []
+
+    def is_seen(i):
+        checked.append(i)
+        return i not in unseen
+
+    served = set()
+    for _ in range(3):
+        pick = index.nearest_unseen(-1.0, 's1', is_seen, rng)
+        assert pick in unseen
+        unseen.discard(pick)
+        served.add(pick)
+    assert served == set(beginners[-3:])
+    # One pass over the bucket builds the student's unseen set; later picks only draw from it
+    assert len(checked) < len(beginners) + 20
+    intermediate = next(i for i in range(len(bank)) if bank.difficulty(i) == 'intermediate')
+    unseen.add(intermediate)
+    assert index.nearest_unseen(-1.0, 's1', is_seen, rng) == intermediate
+    unseen.discard(intermediate)
+
+    # A question re-rated into the bucket joins the student's unseen set; a new bucket key is inserted in order
+    moved = next(i for i in range(len(bank)) if bank.difficulty(i) == 'advanced')
+    index._ratings[moved] = -1.0
+    index.move(moved, None, -1.0)
+    unseen.add(moved)
+    assert index.nearest_unseen(-1.0, 's1', is_seen, rng) == moved
+    index._ratings[moved] = 3.0
+    index.move(moved, -1.0, 3.0)
+    assert index._keys == sorted(index._keys) and index._keys[-1] == 12
+    assert index.nearest_unseen(3.0, 's1', is_seen, rng) == moved
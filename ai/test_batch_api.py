@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+"""
+Tests for the provider batch-API backends
+Runs bulk work against a local stand-in server implementing the OpenAI and Anthropic batch endpoints
+"""
+
+import email
+import json
+import os
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+pytest.importorskip('requests')
+
+import batch_api
+from batch_api import AnthropicBatchBackend, OpenAIBatchBackend
+from batch_runner import run_batch
+from conftest import fill_schema
+from enhanced_ai_agent import EnhancedAITutor
+from llm_config import LLMConfig
+from llm_providers import AnthropicProvider, OpenAIProvider
+from precompute_explanations import precompute, read_entries
+
+class StandIn:
+    """In-process server with the batch endpoints of both providers; jobs finish on the second poll"""
+
+    def __init__(self):
+        self.files = {}
+        self.batches = {}
+        self.submitted = []
+        state = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, body, status=200, content_type='application/json'):
+                data = body if isinstance(body, bytes) else json.dumps(body).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', content_type)
+                self.send_header('Content-Length', str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _body(self):
+                return self.rfile.read(int(self.headers.get('Content-Length', 0)))
+
+            def do_POST(self):
+                body = self._body()
+                if self.path == '/v1/files':
+                    message = email.message_from_bytes(
+                        b'Content-Type: ' + self.headers['Content-Type'].encode() + b'\r\n\r\n' + body)
+                    content = next(part.get_payload(decode=True) for part in message.get_payload()
+                                   if part.get_filename())
+                    file_id = f"file-{len(state.files)}"
+                    state.files[file_id] = content.decode('utf-8')
+                    return self._send({'id': file_id})
+                if self.path == '/v1/batches':
+                    lines = state.files[json.loads(body)['input_file_id']].splitlines()
+                    requests = [json.loads(line) for line in lines if line]
+                    return self._send(state.create('openai', [(r['custom_id'], r['body']) for r in requests]))
+                if self.path == '/v1/messages/batches':
+                    requests = json.loads(body)['requests']
+                    return self._send(state.create('anthropic', [(r['custom_id'], r['params']) for r in requests]))
+                self._send({'error': 'not found'}, 404)
+
+            def do_GET(self):
+                parts = self.path.strip('/').split('/')
+                if parts[:2] == ['v1', 'batches']:
+                    return self._send(state.poll(parts[2]))
+                if parts[:2] == ['v1', 'files'] and parts[-1] == 'content':
+                    return self._send(state.files[parts[2]].encode('utf-8'), content_type='application/jsonl')
+                if parts[:3] == ['v1', 'messages', 'batches']:
+                    if parts[-1] == 'results':
+                        return self._send(state.batches[parts[3]]['results'].encode('utf-8'),
+                                          content_type='application/jsonl')
+                    return self._send(state.poll(parts[3]))
+                self._send({'error': 'not found'}, 404)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f"http://127.0.0.1:{self.server.server_port}/v1"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def create(self, kind, requests):
+        batch_id = f"{kind}-batch-{len(self.batches)}"
+        self.submitted.append((batch_id, len(requests)))
+        lines = []
+        for custom_id, body in requests:
+            prompt = body['messages'][0]['content']
+            if kind == 'openai':
+                schema = (body.get('response_format') or {}).get('json_schema', {}).get('schema')
+                content = json.dumps(fill_schema(schema, prompt)) if schema else prompt
+                lines.append({'custom_id': custom_id, 'error': None, 'response': {'status_code': 200, 'body': {
+                    'choices': [{'message': {'content': content}}], 'usage': {'total_tokens': 7}}}})
+            else:
+                tools = body.get('tools') or []
+                block = {'type': 'tool_use', 'input': fill_schema(tools[0]['input_schema'], prompt)} if tools \
+                    else {'type': 'text', 'text': prompt}
+                lines.append({'custom_id': custom_id, 'result': {'type': 'succeeded', 'message': {
+                    'content': [block], 'usage': {'output_tokens': 7}}}})
+        results = ''.join(json.dumps(line) + '\n' for line in lines)
+        self.batches[batch_id] = {'kind': kind, 'polls': 0, 'results': results}
+        return self.status(batch_id)
+
+    def status(self, batch_id):
+        batch = self.batches[batch_id]
+        finished = batch['polls'] >= 2
+        if batch['kind'] == 'openai':
+            output_id = f"out-{batch_id}"
+            self.files[output_id] = batch['results']
+            return {'id': batch_id, 'status': 'completed' if finished else 'in_progress',
+                    'output_file_id': output_id if finished else None}
+        return {'id': batch_id, 'processing_status': 'ended' if finished else 'in_progress',
+                'results_url': f"{self.url}/messages/batches/{batch_id}/results" if finished else None}
+
+    def poll(self, batch_id):
+        self.batches[batch_id]['polls'] += 1
+        return self.status(batch_id)
+
+    def close(self):
+        self.server.shutdown()
+
+@pytest.fixture
+def stand_in(monkeypatch):
+    monkeypatch.setattr(batch_api, 'POLL_SECONDS', 0.01)
+    server = StandIn()
+    yield server
+    server.close()
+
+def _config(name, url, model='stand-in'):
+    return LLMConfig(provider=name, model=model, api_key='test', base_url=url)
+
+def _write_requests(path, questions):
+    with open(path, 'w', encoding='utf-8') as f:
+        for i, question in enumerate(questions):
+            f.write(json.dumps({'id': f"q{i}", 'action': 'provide_tutoring_explanation', 'question': question,
+                                'studentAnswer': 'a stack'}) + '\n')
+
+def test_batch_runner_sends_llm_calls_as_one_openai_batch(stand_in):
+    """Every request's call goes into one job; identical calls share a batch request"""
+    directory = tempfile.mkdtemp()
+    input_path, output_path = os.path.join(directory, 'in.jsonl'), os.path.join(directory, 'out.jsonl')
+    questions = ['Which structure is FIFO?', 'What does a mutex protect?', 'Which structure is FIFO?',
+                 'What is a page fault?']
+    _write_requests(input_path, questions)
+    backend = OpenAIBatchBackend(OpenAIProvider(_config('openai', stand_in.url, 'gpt-4o-mini')))
+    tutor = EnhancedAITutor()
+    providers = tutor.providers
+    # Live requests served by the same tutor meanwhile keep its own providers
+    during = []
+    create = stand_in.create
+    stand_in.create = lambda *args: during.append(tutor.providers is providers) or create(*args)
+
+    stats = run_batch(tutor, input_path, output_path, ordered=True, batch_backend=backend)
+    assert stats['succeeded'] == 4
+    assert stand_in.submitted == [('openai-batch-0', 3)]
+    assert during == [True] and tutor.providers is providers
+
+    with open(output_path, encoding='utf-8') as f:
+        records = [json.loads(line) for line in f]
+    for record, question in zip(records, questions):
+        assert record['result']['provider'] == 'openai'
+        assert question in record['result']['explanation']
+
+def test_interrupted_run_waits_for_its_submitted_job(stand_in):
+    """A job recorded in the journal is picked up instead of being submitted again"""
+    directory = tempfile.mkdtemp()
+    input_path, output_path = os.path.join(directory, 'in.jsonl'), os.path.join(directory, 'out.jsonl')
+    _write_requests(input_path, ['What is a deadlock?'])
+    backend = OpenAIBatchBackend(OpenAIProvider(_config('openai', stand_in.url, 'gpt-4o-mini')))
+    assert run_batch(EnhancedAITutor(), input_path, output_path, batch_backend=backend)['succeeded'] == 1
+
+    # Replay the run as if it was killed after submitting: the journal has the job but not its completion
+    with open(output_path + '.batches', encoding='utf-8') as f:
+        submitted = json.loads(f.readline())
+    assert submitted['batch_id'] == 'openai-batch-0'
+    rerun_path = os.path.join(directory, 'rerun.jsonl')
+    with open(rerun_path + '.batches', 'w', encoding='utf-8') as f:
+        f.write(json.dumps(submitted) + '\n')
+    stats = run_batch(EnhancedAITutor(), input_path, rerun_path, batch_backend=backend)
+    assert stats['succeeded'] == 1 and len(stand_in.submitted) == 1
+
+def test_precompute_with_anthropic_message_batches(stand_in):
+    """Distractor explanations are generated by a message batch and stored with the provider name"""
+    bank = {'os': [{'id': 'OS-001', 'subject': 'os', 'question': 'Which scheduler is preemptive?',
+                    'options': ['FCFS', 'Round robin', 'SJF'], 'correctAnswer': 1, 'explanation': '',
+                    'topic': 'Scheduling', 'difficulty': 'beginner'}]}
+    path = os.path.join(tempfile.mkdtemp(), 'explanations.jsonl')
+    backend = AnthropicBatchBackend(AnthropicProvider(_config('anthropic', stand_in.url)))
+
+    stats = precompute(EnhancedAITutor(), bank, path, batch_backend=backend)
+    assert stats['written'] == 2 and stats['skipped_mock'] == 0
+    assert stand_in.submitted == [('anthropic-batch-0', 2)]
+    entries = read_entries(path)
+    assert {entry['option'] for entry in entries} == {0, 2}
+    assert all(entry['provider'] == 'anthropic' and 'preemptive' in entry['explanation']['explanation']
+               for entry in entries)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Tests for the batch runner
+Covers bounded concurrency, ordered output, per-request failures and resuming
+"""
+
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+from batch_runner import completed_ids, run_batch
+from enhanced_ai_agent import EnhancedAITutor
+from llm_providers import LLMProvider, MockProvider
+
+class CountingProvider(LLMProvider):
+    """Provider stand-in that answers (or fails) after a short random delay, tracking calls and peak concurrency"""
+
+    def __init__(self, online=False):
+        self.online = online
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+        self._lock = threading.Lock()
+
+    def is_available(self) -> bool:
+        return True
+
+    def generate_response(self, prompt, **kwargs):
+        with self._lock:
+            self.calls += 1
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(random.uniform(0.001, 0.02))
+        with self._lock:
+            self.active -= 1
+        if self.online:
+            return {'success': True, 'content': json.dumps({'explanation': 'Because it divides by 2'}),
+                    'usage': {}, 'provider': 'openai'}
+        return {'success': False, 'error': 'offline', 'provider': 'openai'}
+
+class FlakyTutor(EnhancedAITutor):
+    def provide_tutoring_explanation(self, question, student_answer, correct_answer=None):
+        if question == 'boom':
+            raise RuntimeError('tutor crashed')
+        return super().provide_tutoring_explanation(question, student_answer, correct_answer)
+
+def _tutor(provider):
+    tutor = FlakyTutor()
+    tutor.providers = {'openai': provider, 'mock': MockProvider()}
+    return tutor
+
+def _write_requests(path, count, failing=()):
+    with open(path, 'w', encoding='utf-8') as f:
+        for i in range(count):
+            question = 'boom' if i in failing else f"Why is {i} even?"
+            f.write(json.dumps({'id': f"q{i}", 'action': 'provide_tutoring_explanation',
+                                'question': question, 'studentAnswer': 'no'}) + '\n')
+        f.write('\n{not json\n')
+
+def _read(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+def test_ordered_run_is_bounded_and_records_failures():
+    """Results come back in input order, at most `concurrency` at a time, failures recorded per request"""
+    directory = tempfile.mkdtemp()
+    input_path, output_path = os.path.join(directory, 'in.jsonl'), os.path.join(directory, 'out.jsonl')
+    _write_requests(input_path, 20, failing={3})
+    provider = CountingProvider()
+
+    stats = run_batch(_tutor(provider), input_path, output_path, concurrency=3, ordered=True)
+    assert stats['total'] == 21 and stats['succeeded'] == 0 and stats['fallback'] == 19 and stats['failed'] == 2
+    assert 1 < provider.peak <= 3
+
+    records = _read(output_path)
+    assert [r['id'] for r in records] == [f"q{i}" for i in range(20)] + ['22']
+    assert records[3]['status'] == 'error' and 'crashed' in records[3]['error']
+    assert records[-1]['status'] == 'error' and 'Invalid JSON' in records[-1]['error']
+    assert records[0]['status'] == 'fallback' and records[0]['result']['provider'] == 'mock'
+    assert completed_ids(output_path) == set()
+
+    # With the provider back, the rerun retries the fallbacks rather than skipping them
+    provider.online = True
+    again = run_batch(_tutor(provider), input_path, output_path, concurrency=3, ordered=True)
+    assert again['skipped'] == 0 and again['succeeded'] == 19 and again['failed'] == 2
+    assert completed_ids(output_path) == {f"q{i}" for i in range(20)} - {'q3'}
+
+def test_interrupted_run_resumes_without_redoing_completed_requests():
+    """A rerun skips successful results, retries failures and repairs a torn final line"""
+    directory = tempfile.mkdtemp()
+    input_path, output_path = os.path.join(directory, 'in.jsonl'), os.path.join(directory, 'out.jsonl')
+    _write_requests(input_path, 10)
+    with open(output_path, 'w', encoding='utf-8') as f:
+        for i in range(4):
+            f.write(json.dumps({'id': f"q{i}", 'status': 'ok', 'result': {}}) + '\n')
+        f.write(json.dumps({'id': 'q4', 'status': 'error', 'error': 'timeout'}) + '\n')
+        f.write('{"id": "q5", "sta')
+
+    provider = CountingProvider(online=True)
+    stats = run_batch(_tutor(provider), input_path, output_path, concurrency=4)
+    assert stats['skipped'] == 4 and stats['succeeded'] == 6
+    assert provider.calls == 6
+    assert completed_ids(output_path) == {f"q{i}" for i in range(10)}
+
+    again = run_batch(_tutor(provider), input_path, output_path)
+    assert again['skipped'] == 10 and provider.calls == 6
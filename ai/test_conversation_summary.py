@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""
+Tests for rolling conversation summaries
+Checks thresholding, background folding and prefix-hash caching
+"""
+
+from cache_store import ContentCache
+from conversation_summary import RollingSummarizer
+from session_store import SessionStore
+
+def _history(count, size=200):
+    return [{'student': f"question {i} " + 'x' * size, 'tutor': f"answer {i} " + 'y' * size} for i in range(count)]
+
+def test_short_history_is_untouched():
+    """Below the token threshold the history is passed through as-is"""
+    summarizer = RollingSummarizer(lambda prev, turns: 'unused', ContentCache('t'), token_threshold=10000)
+    history = _history(3)
+    prepared = summarizer.prepare(history)
+    assert prepared.summary == ''
+    assert prepared.recent == history
+    assert prepared.covered == 0
+
+def test_long_history_is_folded_once():
+    """Older turns are summarized in the background and the summary is reused from cache"""
+    calls = []
+
+    def summarize(previous_summary, turns):
+        calls.append(len(turns))
+        return f"summary of {len(turns)} turns"
+
+    summarizer = RollingSummarizer(summarize, ContentCache('t'), token_threshold=100, keep_recent=2)
+    history = _history(10)
+
+    first = summarizer.prepare(history)
+    assert first.covered == 0
+    assert 'Student asked: question 7' in first.summary
+    assert len(first.recent) == 2
+
+    assert summarizer.wait_for_pending(5)
+    second = summarizer.prepare(history)
+    assert second.covered == 8
+    assert second.summary == 'summary of 8 turns'
+    assert second.recent == history[-2:]
+    assert calls == [8]
+
+def test_growing_history_folds_incrementally():
+    """A longer conversation only summarizes the turns added since the last fold"""
+    calls = []
+
+    def summarize(previous_summary, turns):
+        calls.append((previous_summary, len(turns)))
+        return f"{previous_summary}+{len(turns)}"
+
+    summarizer = RollingSummarizer(summarize, ContentCache('t'), token_threshold=100, keep_recent=2)
+    history = _history(10)
+    summarizer.prepare(history)
+    summarizer.wait_for_pending(5)
+
+    history = history + _history(3)
+    prepared = summarizer.prepare(history)
+    assert prepared.covered == 8
+    summarizer.wait_for_pending(5)
+    assert calls[-1] == ('+8', 3)
+    assert summarizer.prepare(history).summary == '+8+3'
+
+def test_session_folds_summarize_each_turn_once():
+    """Turn by turn, with covered turns folded into the session, no turn is summarized twice"""
+    summarized = []
+
+    def summarize(previous_summary, turns):
+        summarized.extend(turn['student'] for turn in turns)
+        return f"{previous_summary}+{len(turns)}"
+
+    summarizer = RollingSummarizer(summarize, ContentCache('t'), token_threshold=100, keep_recent=2)
+    store = SessionStore()
+    covered = []
+    for turn in _history(12):
+        store.append_turn('s1', turn['student'], turn['tutor'])
+        prepared = summarizer.prepare(store.get_history('s1'), store.get_summary('s1'))
+        covered.append(prepared.covered)
+        if prepared.covered:
+            store.fold('s1', prepared.covered_summary, prepared.covered)
+        assert summarizer.wait_for_pending(5)
+
+    assert len(summarized) == len(set(summarized)) == 10
+    assert all(count <= 1 for count in covered[3:])
+    assert len(store.get_history('s1')) == 3 and store.get_summary('s1').count('+') == 9
+
+def test_deferred_folds_run_outside_the_request(monkeypatch, tmp_path):
+    """Without background threads a fold is only recorded, then computed by a detached process"""
+    import json
+    import subprocess
+    import conversation_summary
+
+    calls = []
+    cache = ContentCache('t')
+    summarizer = RollingSummarizer(lambda prev, turns: calls.append(len(turns)) or 'folded', cache,
+                                   token_threshold=100, keep_recent=2, background=False)
+    history = _history(10)
+    assert summarizer.prepare(history).covered == 0
+    summarizer.prepare(history)
+    assert summarizer.wait_for_pending(0) and calls == []
+
+    launched = []
+    monkeypatch.setattr(conversation_summary.tempfile, 'gettempdir', lambda: str(tmp_path))
+    monkeypatch.setattr(subprocess, 'Popen', lambda args, **kwargs: launched.append((args, kwargs))
+                        or type('Process', (), {'pid': 4242})())
+    jobs = summarizer.take_deferred()
+    assert len(jobs) == 1 and summarizer.take_deferred() == []
+
+    claims = ContentCache('claims')
+    assert conversation_summary.spawn_fold_process(jobs, claims) == 4242
+    assert conversation_summary.spawn_fold_process(jobs, claims) is None
+    args, kwargs = launched[0]
+    assert len(launched) == 1 and kwargs['start_new_session']
+    assert kwargs['stdout'] == kwargs['stderr'] == subprocess.DEVNULL
+    with open(args[-1], encoding='utf-8') as f:
+        assert json.load(f) == jobs
+
+    # What the detached process does with the file
+    summarizer.run_folds(jobs)
+    summarizer.run_folds(jobs)
+    assert calls == [8]
+    assert summarizer.prepare(history).summary == 'folded'
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Tests for dynamic request batching
+Covers batch formation, length buckets and the in-process transformers provider
+"""
+
+import threading
+import time
+
+import pytest
+
+from dynamic_batcher import DynamicBatcher
+
+def _run_concurrently(batcher, payloads):
+    results = [None] * len(payloads)
+
+    def call(index):
+        results[index] = batcher(payloads[index], timeout=10)
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(payloads))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+def test_concurrent_requests_share_batches_within_buckets():
+    """Concurrent calls are grouped per bucket and each caller gets its own result back"""
+    batches = []
+
+    def process(payloads):
+        batches.append(list(payloads))
+        return [p * 10 for p in payloads]
+
+    batcher = DynamicBatcher(process, max_batch_size=4, max_wait=0.2, bucket_key=lambda p: p % 2)
+    results = _run_concurrently(batcher, list(range(8)))
+    batcher.close()
+
+    assert results == [p * 10 for p in range(8)]
+    assert all(len({p % 2 for p in batch}) == 1 for batch in batches)
+    assert max(len(batch) for batch in batches) > 1
+    assert batcher.stats()['requests'] == 8
+
+def test_lone_request_waits_at_most_max_wait_and_errors_propagate():
+    """A single request is flushed after max_wait; a failing batch fails every caller in it"""
+    batcher = DynamicBatcher(lambda payloads: [p for p in payloads], max_batch_size=8, max_wait=0.05)
+    started = time.monotonic()
+    assert batcher('solo', timeout=5) == 'solo'
+    assert time.monotonic() - started < 1.0
+    batcher.close()
+
+    def fail(payloads):
+        raise ValueError('model crashed')
+
+    failing = DynamicBatcher(fail, max_wait=0.01)
+    with pytest.raises(ValueError):
+        failing('x', timeout=5)
+    failing.close()
+
+def test_timed_out_request_is_dropped_before_batching():
+    """A caller that gives up cancels its queued request, so the model never processes it"""
+    processed = []
+    batcher = DynamicBatcher(lambda payloads: processed.extend(payloads) or payloads, max_batch_size=8, max_wait=0.3)
+    with pytest.raises(TimeoutError):
+        batcher('abandoned', timeout=0.05)
+    assert batcher('kept', timeout=5) == 'kept'
+    batcher.close()
+    assert processed == ['kept']
+
+def test_transformers_provider_batches_tiny_local_model(tmp_path):
+    """A tiny randomly initialised GPT-2 saved locally answers concurrent prompts in shared batches"""
+    torch = pytest.importorskip('torch')
+    transformers = pytest.importorskip('transformers')
+    tokenizers = pytest.importorskip('tokenizers')
+
+    words = 'the a student tutor answer question explain fraction math is what why how good'.split()
+    vocab = {token: i for i, token in enumerate(['<unk>', '<pad>', '<eos>'] + words)}
+    backend = tokenizers.Tokenizer(tokenizers.models.WordLevel(vocab, unk_token='<unk>'))
+    backend.pre_tokenizer = tokenizers.pre_tokenizers.Whitespace()
+    tokenizer = transformers.PreTrainedTokenizerFast(tokenizer_object=backend, unk_token='<unk>',
+                                                     pad_token='<pad>', eos_token='<eos>')
+    tokenizer.save_pretrained(tmp_path)
+
+    torch.manual_seed(0)
+    model = transformers.GPT2LMHeadModel(transformers.GPT2Config(
+        vocab_size=len(vocab), n_positions=64, n_embd=16, n_layer=1, n_head=2,
+        eos_token_id=vocab['<eos>'], pad_token_id=vocab['<pad>']
+    ))
+    model.save_pretrained(tmp_path)
+
+    from llm_config import LLMConfig
+    from llm_providers import TransformersProvider
+
+    provider = TransformersProvider(LLMConfig(provider='transformers', model=str(tmp_path), api_key='',
+                                              max_tokens=4, temperature=0))
+    provider.batcher.max_wait = 0.2
+    assert provider.warm_up()
+
+    prompts = ['what is a fraction', 'explain the answer', 'why is math good', 'how good is the student']
+    results = [None] * len(prompts)
+
+    def call(index):
+        results[index] = provider.generate_response(prompts[index])
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(len(prompts))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert all(r['success'] and r['provider'] == 'transformers' for r in results)
+    assert max(r['usage']['batch_size'] for r in results) > 1
@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+"""
+Tests for student error clustering
+Covers de-duplication, similarity grouping and bounded prompt exemplars
+"""
+
+from error_clustering import cluster_errors, error_exemplars, normalize_error
+
+def test_duplicates_and_near_duplicates_collapse():
+    """Repeated and lightly reworded errors end up in one cluster with the combined count"""
+    errors = (
+        ['Forgot to carry the 1 when adding 27 + 15'] * 3
+        + ['forgot to carry the 1 when adding 38 + 46!']
+        + ['Forgot to carry the one when adding two-digit numbers']
+        + ['Confused the numerator with the denominator']
+    )
+    assert normalize_error(errors[0]) == normalize_error(errors[3])
+
+    clusters = cluster_errors(errors)
+    assert [c.count for c in clusters] == [5, 1]
+    assert clusters[0].variants == 2
+
+def test_stored_results_group_by_question_and_topic():
+    """Stored result dicts merge by question ID and never cluster across topics"""
+    wrong = {'question': 'What is a stack?', 'userAnswer': 'A', 'correctAnswer': 'B', 'correctAnswerText': 'LIFO'}
+    errors = [dict(wrong, questionId='DSA-001', topic='Stacks')] * 4 + [dict(wrong, questionId='DSA-900', topic='Queues')]
+    clusters = cluster_errors(errors)
+    assert [(c.count, c.topic) for c in clusters] == [(4, 'Stacks'), (1, 'Queues')]
+    assert clusters[0].representative == 'What is a stack? (answered A, correct: B - LIFO)'
+
+def test_exemplars_stay_bounded_as_logs_grow():
+    """A long error log yields at most max_exemplars lines plus one overflow line"""
+    errors = [f"Topic {i} mistake: {chr(97 + i % 26) * (5 + i % 7)} {i * 7919}" for i in range(2000)]
+    lines = error_exemplars(errors, max_exemplars=5)
+    assert len(lines) <= 6
+    assert sum(len(line) for line in lines) < 3000
+
+def test_entries_of_other_types_are_rendered_as_text():
+    """Numbers and other non-dict entries are stringified as before; None is skipped"""
+    clusters = cluster_errors([404, None, 'Off by one in loop bound', 404])
+    assert [(c.representative, c.count) for c in clusters] == [('404', 2), ('Off by one in loop bound', 1)]
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+"""
+Tests for the essay evaluation pipeline
+Covers chunking without truncation, concurrent dimension calls, the merged output and draft resubmission
+"""
+
+import json
+import re
+import threading
+import time
+
+from cache_store import ContentCache
+from essay_pipeline import DIMENSIONS, EssayPipeline, chunk_essay
+from enhanced_ai_agent import EnhancedAITutor
+
+class FakeTutor:
+    """Scores each (aspect, part) call from its prompt, after a short delay, and records what it saw"""
+
+    def __init__(self, delay=0.05, failing_dimension=None):
+        self.delay = delay
+        self.failing_dimension = failing_dimension
+        self.prompts = []
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def _call_llm_with_fallback(self, prompt, task_type, force_provider=None, schema_name=None, **kwargs):
+        with self.lock:
+            self.prompts.append(prompt)
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        time.sleep(self.delay)
+        with self.lock:
+            self.active -= 1
+
+        dimension = re.search(r'^Aspect: (\w+)', prompt, re.M).group(1)
+        if dimension == self.failing_dimension:
+            return {'success': True, 'provider': 'mock', 'content': 'not json'}
+        part = re.search(r'This is part (\d+)', prompt)
+        score = 60 if dimension == 'mechanics' else 80
+        return {'success': True, 'provider': 'anthropic', 'usage': {'total_tokens': 10}, 'content': json.dumps({
+            'score': score, 'summary': f"{dimension} summary", 'analysis': f"{dimension} analysis",
+            'strengths': [f"{dimension} strength", 'Clear thesis'], 'areas_for_improvement': [f"{dimension} gap"],
+            'suggestions': [f"{dimension} tip {part.group(1) if part else 1}"]
+        })}
+
+    def _response_content(self, result):
+        return EnhancedAITutor._parse_json_response(None, result['content'])
+
+def test_chunking_keeps_every_word():
+    """Parts stay under the size limit, keep paragraphs whole where they fit, and drop nothing"""
+    paragraphs = [' '.join(f"w{p}x{i}." for i in range(40)) for p in range(12)] + ['y' * 900]
+    essay = '\n\n'.join(paragraphs)
+    parts = chunk_essay(essay, max_chars=700)
+    assert len(parts) > 1 and all(len(part) <= 700 for part in parts)
+    assert ''.join(''.join(parts).split()) == ''.join(essay.split())
+    assert chunk_essay('Short essay.\n\nTwo paragraphs.', 700) == ['Short essay.\n\nTwo paragraphs.']
+
+def test_dimensions_run_concurrently_and_merge():
+    """Each rubric dimension is its own call, run in parallel, merged into the evaluate_essay shape"""
+    tutor = FakeTutor(delay=0.1)
+    started = time.time()
+    result = EssayPipeline(tutor, concurrency=4).evaluate('Intro paragraph.\n\nBody paragraph.', 'Climate')
+    elapsed = time.time() - started
+
+    assert len(tutor.prompts) == len(DIMENSIONS) and tutor.peak == len(DIMENSIONS)
+    assert elapsed < 0.3
+    assert result['score'] == 75 and result['correct'] and result['nextDifficulty'] == 'intermediate'
+    assert set(result['detailed_analysis']) == set(DIMENSIONS)
+    assert result['detailed_analysis']['mechanics'] == 'mechanics analysis'
+    assert result['strengths'].count('Clear thesis') == 1
+    assert result['provider'] == 'anthropic' and result['usage'] == {'total_tokens': 40} and result['parts'] == 1
+
+def test_long_essay_is_evaluated_part_by_part():
+    """A long essay is mapped over its parts with an outline; every part reaches a prompt untruncated"""
+    essay = '\n\n'.join(f"Paragraph {p} starts here. " + 'More words follow. ' * 60 for p in range(20))
+    tutor = FakeTutor(delay=0.0, failing_dimension='language')
+    result = EssayPipeline(tutor, concurrency=8, chunk_chars=3000).evaluate(essay)
+
+    parts = chunk_essay(essay, 3000)
+    assert len(parts) > 3 and len(tutor.prompts) == len(parts) * len(DIMENSIONS)
+    for part in parts:
+        assert any(part in prompt for prompt in tutor.prompts)
+    assert all('Essay Outline' in prompt and '20. Paragraph 19 starts here.' in prompt for prompt in tutor.prompts)
+
+    assert result['parts'] == len(parts)
+    assert result['detailed_analysis']['language'] == ''
+    assert result['detailed_analysis']['content'].startswith('Part 1: content analysis')
+    assert 'language' not in result['dimension_scores'] and result['score'] == round((80 + 80 + 60) / 3)
+    assert len(result['suggestions']) == 6
+    assert result['incomplete'] and result['parts_missing'] == [
+        {'dimension': 'language', 'part': index + 1} for index in range(len(parts))
+    ]
+
+def test_resubmitted_draft_only_reevaluates_changed_parts():
+    """A first draft is chunked as usual; later drafts reuse unchanged parts and redo organization on outline changes"""
+    paragraphs = [f"Paragraph {p} opens the point. " + 'It adds support. ' * 10 for p in range(5)]
+    cache = ContentCache('essay_paragraphs')
+    tutor = FakeTutor(delay=0.0)
+    first = EssayPipeline(tutor, chunk_chars=450, cache=cache).evaluate('\n\n'.join(paragraphs), 'Climate')
+    assert first['parts'] == len(chunk_essay('\n\n'.join(paragraphs), 450)) == 3
+    assert len(tutor.prompts) == 3 * len(DIMENSIONS) and first['reused'] == 0 and not first['incomplete']
+
+    # An edit inside one paragraph body keeps the outline, so only the part holding it is sent again
+    paragraphs[2] = paragraphs[2].replace('It adds support.', 'It adds evidence.', 1)
+    tutor.prompts.clear()
+    second = EssayPipeline(tutor, chunk_chars=450, cache=cache).evaluate('\n\n'.join(paragraphs), 'Climate')
+    assert len(tutor.prompts) == len(DIMENSIONS) and all(paragraphs[2].strip() in prompt for prompt in tutor.prompts)
+    assert second['parts'] == 3 and second['reused'] == 2 * len(DIMENSIONS)
+    assert second['usage'] == {'total_tokens': 40} and second['dimension_scores'] == first['dimension_scores']
+
+    # A new paragraph changes the outline: it is evaluated on its own, and organization is rechecked everywhere
+    paragraphs.append('A closing paragraph sums up.')
+    tutor.prompts.clear()
+    third = EssayPipeline(tutor, chunk_chars=450, cache=cache).evaluate('\n\n'.join(paragraphs), 'Climate')
+    aspects = [re.search(r'^Aspect: (\w+)', prompt, re.M).group(1) for prompt in tutor.prompts]
+    assert sorted(aspects) == sorted(['organization'] * 4 + ['content', 'language', 'mechanics'])
+    assert third['parts'] == 4 and third['reused'] == 3 * 3
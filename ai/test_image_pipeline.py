@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Tests for image-based answer evaluation
+Covers bounded image payloads, content-hash caching and the evaluate_image_answer action against a stand-in provider
+"""
+
+import base64
+import json
+import struct
+import sys
+import zlib
+
+import pytest
+
+import cache_store
+from cache_store import ContentCache
+from enhanced_ai_agent import EnhancedAITutor, handle_request
+from image_pipeline import ImagePipeline, prepare_image
+from llm_providers import LLMProvider, MockProvider
+
+def _png(width, height, rgb=(255, 255, 255)):
+    """A solid-colour PNG built without Pillow"""
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+    rows = b''.join(b'\x00' + bytes(rgb) * width for _ in range(height))
+    return (b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 2, 0, 0, 0))
+            + chunk(b'IDAT', zlib.compress(rows)) + chunk(b'IEND', b''))
+
+class VisionStandIn(LLMProvider):
+    """Provider stand-in with image input: describes any image as a tree, grades answers that name its root"""
+
+    name = 'openai'
+    supports_structured_output = True
+    supports_images = True
+
+    def __init__(self):
+        self.calls = []
+
+    def is_available(self):
+        return True
+
+    def generate_response(self, prompt, **kwargs):
+        self.calls.append((kwargs.get('schema_name'), kwargs.get('images')))
+        if kwargs.get('schema_name') == 'image_description':
+            content = {'description': 'A binary search tree with root 8 and children 3 and 10',
+                       'key_elements': ['root 8']}
+        else:
+            correct = 'root 8' in prompt.split("Student's Answer:", 1)[1].split('\n', 1)[0].lower()
+            content = {'correct': correct, 'feedback': 'Checked against the tree', 'score': 90 if correct else 30,
+                       'visual_analysis': 'Read the root', 'suggestions': [], 'key_visual_elements': ['root 8']}
+        return {'success': True, 'content': json.dumps(content), 'provider': self.name, 'usage': {'total_tokens': 5}}
+
+class TextOnly(VisionStandIn):
+    name = 'huggingface'
+    supports_images = False
+
+def _tutor():
+    tutor = EnhancedAITutor()
+    vision, text_only = VisionStandIn(), TextOnly()
+    tutor.providers = {'huggingface': text_only, 'openai': vision, 'mock': MockProvider()}
+    return tutor, vision, text_only
+
+def test_small_images_are_sent_unchanged_and_large_ones_need_pillow(monkeypatch):
+    """An image within the limits is passed through; without Pillow an oversized one is rejected"""
+    image = _png(4, 3)
+    prepared = prepare_image(image)
+    assert base64.b64decode(prepared['data']) == image
+    assert prepared['media_type'] == 'image/png' and not prepared['resized']
+
+    monkeypatch.setitem(sys.modules, 'PIL', None)
+    with pytest.raises(ValueError, match='Pillow'):
+        prepare_image(image, max_bytes=10)
+    with pytest.raises(ValueError, match='Unsupported'):
+        prepare_image(b'not an image')
+
+def test_large_images_are_downscaled():
+    """Oversized images are scaled to the side limit; diagrams stay PNG, photos become JPEG"""
+    Image = pytest.importorskip('PIL.Image')
+    import io
+    import os
+
+    diagram = Image.new('RGB', (3000, 1500), 'white')
+    diagram.paste((0, 0, 0), (100, 100, 2900, 140))
+    photo = Image.frombytes('RGB', (2400, 1600), os.urandom(2400 * 1600 * 3))
+    for image, media_type in ((diagram, 'image/png'), (photo, 'image/jpeg')):
+        out = io.BytesIO()
+        image.save(out, format='PNG')
+        prepared = prepare_image(out.getvalue(), max_side=1024, max_bytes=512 * 1024)
+        assert prepared['resized'] and prepared['media_type'] == media_type
+        assert prepared['bytes'] <= 512 * 1024
+        assert max(Image.open(io.BytesIO(base64.b64decode(prepared['data']))).size) <= 1024
+
+def test_shared_image_is_described_once_and_answers_are_cached():
+    """A class answering about one diagram costs one vision call; a repeated answer costs none"""
+    tutor, vision, text_only = _tutor()
+    pipeline = ImagePipeline(tutor, ContentCache('image_descriptions'), ContentCache('image_evaluations'))
+    image = _png(8, 8, (10, 120, 200))
+    question = 'What is the root of this tree?'
+
+    first = pipeline.evaluate(image, question, 'The root 8')
+    second = pipeline.evaluate(image, question, 'It is 3')
+    again = pipeline.evaluate(image, question, '  the ROOT 8 ')
+
+    # Only the description needs vision input; the answers are evaluated as text by any provider
+    assert len(vision.calls) == 1 and vision.calls[0][0] == 'image_description'
+    assert vision.calls[0][1][0]['media_type'] == 'image/png'
+    assert text_only.calls == [('image_evaluation', None), ('image_evaluation', None)]
+    assert first['correct'] and first['score'] == 90 and first['usage'] == {'total_tokens': 10}
+    assert not second['correct'] and second['usage'] == {'total_tokens': 5}
+    assert again['cached'] and again['correct'] and again['usage'] == {}
+    assert 'binary search tree' in first['image_description'] and first['provider'] == 'huggingface'
+
+def test_evaluate_image_answer_action(monkeypatch):
+    """The action takes base64 (or a data URL) and reports bad input as an error"""
+    monkeypatch.setenv('TUTOR_CACHE_DB', '')
+    monkeypatch.setattr(cache_store, '_caches', {})
+    tutor, vision, text_only = _tutor()
+    encoded = base64.b64encode(_png(2, 2)).decode('ascii')
+
+    result = handle_request(tutor, {'action': 'evaluate_image_answer', 'image': f"data:image/png;base64,{encoded}",
+                                    'question': 'Root?', 'answer': 'root 8'})
+    assert result['correct'] and len(vision.calls) == 1 and len(text_only.calls) == 1
+
+    assert 'error' in handle_request(tutor, {'action': 'evaluate_image_answer', 'image': '%%%', 'question': 'Root?'})
+    empty = handle_request(tutor, {'action': 'evaluate_image_answer', 'image': '', 'question': 'Root?'})
+    assert empty == {'error': 'Image is empty'}
+
+    # Without a provider that can see the image there is no grade, not a canned pass
+    tutor.providers = {'huggingface': text_only, 'mock': MockProvider()}
+    other = base64.b64encode(_png(3, 3)).decode('ascii')
+    ungraded = handle_request(tutor, {'action': 'evaluate_image_answer', 'image': other, 'question': 'Root?',
+                                      'answer': 'root 8'})
+    assert 'error' in ungraded and ungraded['provider'] == 'mock'
+    assert 'score' not in ungraded and 'correct' not in ungraded
+
+def test_openai_image_support_follows_the_model():
+    """Only OpenAI vision models are offered images; text-only ones are skipped for image work"""
+    from types import SimpleNamespace
+    from llm_providers import OpenAIProvider
+
+    def supports_images(model):
+        config = SimpleNamespace(api_key='key', model=model, base_url=None, max_tokens=100, temperature=0.0,
+                                 timeout=5)
+        return OpenAIProvider(config).supports_images
+
+    assert [supports_images(model) for model in ('gpt-4o-mini', 'gpt-4-turbo', 'gpt-4.1', 'o4-mini')] == [True] * 4
+    assert [supports_images(model) for model in ('gpt-4', 'gpt-3.5-turbo', 'o1-mini', 'o3-mini')] == [False] * 4
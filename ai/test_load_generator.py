@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Tests for the load generator
+Covers the request mix and its per-entry report, reproducible traffic, the arrival schedule and percentiles
+"""
+
+import json
+import os
+import tempfile
+from collections import Counter
+
+import pytest
+
+from load_generator import LoadGenerator, RequestSynthesizer, _percentile, load_request_mix
+
+BANK = {
+    'os': [
+        {'id': f"OS-{i:03d}", 'subject': 'os', 'question': f"Operating systems question {i}?",
+         'options': ['A', 'B', 'C', 'D'], 'correctAnswer': i % 4, 'explanation': f"Explanation {i}.",
+         'topic': 'Scheduling' if i % 2 else 'Memory', 'difficulty': 'beginner'}
+        for i in range(12)
+    ]
+}
+RESULTS = [{'subject': 'os', 'score': 50, 'totalQuestions': 2, 'correctCount': 1, 'detailedResults': [
+    {'question': 'Which scheduler is preemptive?', 'userAnswer': 'FCFS', 'correctAnswerText': 'Round robin',
+     'isCorrect': False},
+    {'question': 'What is paging?', 'userAnswer': 'A', 'isCorrect': True}
+]}]
+
+def test_requests_follow_the_mix_and_are_reproducible():
+    """Actions are drawn in proportion to their weights, and a seed fixes the whole request stream"""
+    mix = {'evaluate_answer': 3, 'analyze_errors': 1}
+    synthesizer = RequestSynthesizer(BANK, RESULTS, mix, seed=7)
+    drawn = [synthesizer.next_request() for _ in range(2000)]
+    counts = Counter(request['action'] for request in drawn)
+    assert set(counts) == {'evaluate_answer', 'analyze_errors'}
+    assert 0.7 < counts['evaluate_answer'] / len(drawn) < 0.8
+
+    again = RequestSynthesizer(BANK, RESULTS, mix, seed=7)
+    assert [again.next_request() for _ in range(2000)] == drawn
+
+    errors = next(request for request in drawn if request['action'] == 'analyze_errors')
+    assert all('Which scheduler is preemptive?' in error for error in errors['studentErrors'])
+
+def test_results_are_reported_per_mix_entry(monkeypatch):
+    """Essays are sent as evaluate_answer but reported under their own mix entry"""
+    synthesizer = RequestSynthesizer(BANK, RESULTS, {'evaluate_answer': 1, 'evaluate_essay': 1}, seed=3)
+    generator = LoadGenerator(synthesizer)
+    sent = []
+    monkeypatch.setattr(generator, '_send', lambda request: sent.append(request) or {'provider': 'openai'})
+    for _ in range(20):
+        generator._execute(*synthesizer.next_labeled(), 0.0)
+
+    assert {request['action'] for request in sent} == {'evaluate_answer'}
+    by_action = generator.stats.report(1.0, 0.0)['by_action']
+    assert set(by_action) == {'evaluate_answer', 'evaluate_essay'}
+    assert by_action['evaluate_essay']['requests'] == sum(request['type'] == 'essay' for request in sent)
+
+def test_mix_files_and_invalid_mixes():
+    """Both mix file layouts load; unknown actions and all-zero weights are rejected"""
+    directory = tempfile.mkdtemp()
+    path = os.path.join(directory, 'mix.json')
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump([{'action': 'evaluate_answer', 'weight': 2}, {'action': 'analyze_errors', 'weight': 0}], f)
+    assert load_request_mix(path) == {'evaluate_answer': 2.0}
+
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'evaluate_answer': 0}, f)
+    with pytest.raises(ValueError):
+        load_request_mix(path)
+    with pytest.raises(ValueError, match='Unknown actions'):
+        RequestSynthesizer(BANK, RESULTS, {'not_an_action': 1})
+
+def test_arrival_offsets_ramp_linearly_to_the_target_rate():
+    """Without ramp-up arrivals are evenly spaced; with it the rate climbs to the target and then holds"""
+    assert [LoadGenerator._arrival_offset(i, 10.0, 0.0) for i in range(3)] == [0.0, 0.1, 0.2]
+
+    # 10 req/s over a 4 s ramp: the first 20 arrivals fall inside the ramp
+    offsets = [LoadGenerator._arrival_offset(i, 10.0, 4.0) for i in range(41)]
+    assert offsets[0] == 0.0 and offsets[20] == pytest.approx(4.0)
+    gaps = [b - a for a, b in zip(offsets, offsets[1:])]
+    assert all(later <= earlier + 1e-9 for earlier, later in zip(gaps[:20], gaps[1:20]))
+    assert all(gap == pytest.approx(0.1) for gap in gaps[20:])
+
+def test_nearest_rank_percentiles():
+    values = [float(v) for v in range(1, 101)]
+    assert _percentile([], 50) == 0.0
+    assert _percentile([3.0], 99) == 3.0
+    assert _percentile(values, 50) == 50.0
+    assert _percentile(values, 99) == 99.0
+    assert _percentile(values, 100) == 100.0
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Tests for Ollama warm-model management
+Covers keep_alive, warm-up and per-session context reuse
+"""
+
+from llm_config import LLMConfig
+from llm_providers import OllamaProvider
+
+class FakeResponse:
+    def __init__(self, payload):
+        self.status_code = 200
+        self.text = ''
+        self._payload = payload
+
+    def json(self):
+        return self._payload
+
+class FakeSession:
+    """Records posted payloads and answers like /api/generate, growing the context each call"""
+
+    def __init__(self):
+        self.posts = []
+
+    def post(self, url, json=None, timeout=None):
+        self.posts.append(json)
+        context = list(json.get('context', [])) + [len(self.posts)] * 10
+        return FakeResponse({'response': '{"response": "ok"}', 'context': context, 'eval_count': 3})
+
+def _provider():
+    provider = OllamaProvider(LLMConfig(provider='ollama', model='llama2', api_key='',
+                                        base_url='http://ollama.test', keep_alive='1h'))
+    provider.session = FakeSession()
+    return provider
+
+def test_warm_up_and_keep_alive():
+    """Warm-up loads the model with an empty prompt and every request asks to keep it resident"""
+    provider = _provider()
+    assert provider.warm_up()
+    provider.generate_response('Explain fractions')
+    warm, request = provider.session.posts
+    assert warm['prompt'] == '' and warm['keep_alive'] == '1h'
+    assert request['keep_alive'] == '1h'
+    assert 'context' not in request
+
+def test_follow_up_turn_reuses_context():
+    """The next turn of a session sends only the follow-up prompt plus the returned context"""
+    provider = _provider()
+    first = provider.generate_response('full prompt', session_id='s1', session_turn=0, followup_prompt='next')
+    second = provider.generate_response('full prompt 2', session_id='s1', session_turn=1, followup_prompt='next 2')
+    assert not first['context_reused'] and second['context_reused']
+    assert provider.session.posts[1]['prompt'] == 'next 2'
+    assert provider.session.posts[1]['context'] == [1] * 10
+
+    # A turn answered by another provider leaves the cached context behind; it is discarded
+    third = provider.generate_response('full prompt 4', session_id='s1', session_turn=3, followup_prompt='next 4')
+    assert not third['context_reused']
+    assert provider.session.posts[2]['prompt'] == 'full prompt 4'
+
+def test_context_cache_is_bounded():
+    """Oversized contexts are not kept and old sessions are evicted first"""
+    provider = _provider()
+    provider.max_context_sessions = 2
+    for session_id in ('a', 'b', 'c'):
+        provider.generate_response('p', session_id=session_id, session_turn=0, followup_prompt='f')
+    assert list(provider._contexts) == ['b', 'c']
+
+    provider.max_context_tokens = 5
+    provider.generate_response('p', session_id='b', session_turn=1, followup_prompt='f')
+    assert 'b' not in provider._contexts
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Tests for precomputed distractor explanations
+Covers the resumable job, request-time lookup and stale detection
+"""
+
+import copy
+import os
+import tempfile
+import threading
+
+from precompute_explanations import precompute, stale_report, compact, ExplanationLookup
+
+BANK = {
+    'dsa': [
+        {'id': 'DSA-001', 'subject': 'dsa', 'question': 'Which data structure is LIFO?', 'type': 'multiple-choice',
+         'options': ['Queue', 'Stack', 'Tree'], 'correctAnswer': 1, 'explanation': 'Stacks are LIFO.',
+         'difficulty': 'beginner', 'topic': 'Stacks'},
+        {'id': 'DSA-002', 'subject': 'dsa', 'question': 'Binary search complexity?', 'type': 'multiple-choice',
+         'options': ['O(n)', 'O(log n)', 'O(1)', 'O(n^2)'], 'correctAnswer': 1, 'explanation': 'Halves each step.',
+         'difficulty': 'beginner', 'topic': 'Searching'}
+    ]
+}
+
+class FakeTutor:
+    """Answers explanation requests without an LLM and tracks peak concurrency"""
+
+    def __init__(self):
+        self.calls = 0
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+
+    def provide_tutoring_explanation(self, question, student_answer, correct_answer=None):
+        with self.lock:
+            self.calls += 1
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        threading.Event().wait(0.01)
+        with self.lock:
+            self.active -= 1
+        return {'explanation': f"{student_answer} is wrong; {correct_answer} is right", 'key_concepts': [],
+                'examples': [], 'common_mistakes': [], 'practice_tips': [], 'next_steps': '', 'provider': 'fake'}
+
+def test_job_is_bounded_and_resumable():
+    """The job respects its concurrency bound and a second run only does the remaining pairs"""
+    path = os.path.join(tempfile.mkdtemp(), 'explanations.jsonl')
+    tutor = FakeTutor()
+    assert precompute(tutor, BANK, path, concurrency=2, limit=2)['written'] == 2
+    assert precompute(tutor, BANK, path, concurrency=2)['written'] == 3
+    assert tutor.calls == 5 and tutor.peak <= 2
+    assert precompute(tutor, BANK, path)['pending'] == 0
+
+    lookup = ExplanationLookup(BANK, path)
+    assert len(lookup) == 5
+    assert lookup.get('which data structure is  LIFO?', 'Queue')['explanation'] == 'Queue is wrong; Stack is right'
+    assert lookup.get('Binary search complexity?', 'C')['explanation'].startswith('O(1) is wrong')
+    assert lookup.get('Binary search complexity?', 'O(log n)') is None
+    assert lookup.get('Unknown question', 'A') is None
+
+def test_edited_rows_are_reported_stale_and_not_served():
+    """Changing a CSV row marks its entries stale, hides them at request time, and compaction drops them"""
+    path = os.path.join(tempfile.mkdtemp(), 'explanations.jsonl')
+    precompute(FakeTutor(), BANK, path)
+
+    edited = copy.deepcopy(BANK)
+    edited['dsa'][0]['options'] = ['Queue', 'Stack', 'Heap']
+    report = stale_report(edited, path)
+    assert {e['id'] for e in report['stale']} == {'DSA-001'}
+    assert len(report['missing']) == 2
+    assert ExplanationLookup(edited, path).get('Which data structure is LIFO?', 'Queue') is None
+
+    assert compact(edited, path) == 3
+    assert stale_report(edited, path)['stale'] == []
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Tests for the binary question bank
+Covers round-tripping the CSVs, question IDs, filtered sampling and staleness
+"""
+
+import csv
+import os
+import random
+import tempfile
+
+from question_bank import load_question_bank
+from question_bank_binary import BinaryQuestionBank, compile_bank
+
+HEADER = ['question', 'type', 'options', 'correctAnswer', 'explanation', 'difficulty', 'topic']
+
+def _write_bank(csv_dir, subjects=('dsa', 'os'), per_subject=30):
+    for subject in subjects:
+        with open(os.path.join(csv_dir, f"{subject}_mcq.csv"), 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(HEADER)
+            for i in range(per_subject):
+                writer.writerow([f"{subject} question {i} – π?", 'multiple-choice', f"A{i},B{i},C{i}", i % 3,
+                                 f"Explanation {i}", ['beginner', 'intermediate', 'advanced'][i % 3], f"Topic {i % 4}"])
+
+def test_compiled_bank_round_trips_every_question():
+    """Every CSV question comes back unchanged (IDs, options, unicode text) from the mapped file"""
+    csv_dir = tempfile.mkdtemp()
+    _write_bank(csv_dir)
+    path = os.path.join(csv_dir, 'bank.bin')
+    assert compile_bank(csv_dir, path)['questions'] == 60
+
+    bank = BinaryQuestionBank(path)
+    expected = {q['id']: q for questions in load_question_bank(csv_dir).values() for q in questions}
+    assert len(bank) == len(expected)
+    assert {bank.get(i)['id']: bank.get(i) for i in range(len(bank))} == expected
+    bank.close()
+
+def test_question_ids_follow_content_not_row_position():
+    """IDs survive reordering the CSV and never resolve the app's SUBJECT-NNN IDs"""
+    csv_dir = tempfile.mkdtemp()
+    _write_bank(csv_dir, subjects=('dsa',), per_subject=5)
+    before = {q['question']: q['id'] for q in load_question_bank(csv_dir)['dsa']}
+    path = os.path.join(csv_dir, 'dsa_mcq.csv')
+    with open(path, encoding='utf-8') as f:
+        lines = f.readlines()
+    with open(path, 'w', encoding='utf-8') as f:
+        f.writelines(lines[:1] + lines[:0:-1])
+    assert {q['question']: q['id'] for q in load_question_bank(csv_dir)['dsa']} == before
+
+    compile_bank(csv_dir, os.path.join(csv_dir, 'bank.bin'))
+    bank = BinaryQuestionBank(os.path.join(csv_dir, 'bank.bin'))
+    assert all(bank.question_id(bank.index_of(question_id)) == question_id for question_id in before.values())
+    assert bank.index_of('DSA-001') is None and bank.index_of('DSA-Q00') is None
+    bank.close()
+
+def test_index_of_bisects_the_mapped_id_column():
+    """Every ID resolves through the sorted on-disk column; the same key under another subject does not"""
+    csv_dir = tempfile.mkdtemp()
+    _write_bank(csv_dir, subjects=('dsa', 'os'), per_subject=30)
+    compile_bank(csv_dir, os.path.join(csv_dir, 'bank.bin'))
+    bank = BinaryQuestionBank(os.path.join(csv_dir, 'bank.bin'))
+
+    assert list(bank._id_keys) == sorted(bank._id_keys)
+    assert [bank.index_of(bank.question_id(index)) for index in range(len(bank))] == list(range(len(bank)))
+    dsa_id = bank.question_id(bank.ranges('dsa')[0][0])
+    assert bank.index_of(dsa_id.replace('DSA-', 'OS-')) is None
+    assert bank.index_of(dsa_id.replace('DSA-', 'CN-')) is None
+    assert bank.index_of(dsa_id[:-1] + ('0' if dsa_id[-1] != '0' else '1')) is None
+    bank.close()
+
+def test_filtered_sampling_uses_matching_ranges_only():
+    """Samples are distinct and match every filter; unknown values match nothing"""
+    csv_dir = tempfile.mkdtemp()
+    _write_bank(csv_dir)
+    path = os.path.join(csv_dir, 'bank.bin')
+    compile_bank(csv_dir, path)
+    bank = BinaryQuestionBank(path)
+
+    assert bank.count_matching('os') == 30 and bank.count_matching('os', 'advanced') == 10
+    assert bank.count_matching('os', 'advanced', 'Topic 1') == 3
+    sample = bank.sample(50, 'dsa', 'beginner', rng=random.Random(1))
+    assert len(sample) == 10 and len({q['id'] for q in sample}) == 10
+    assert all(q['subject'] == 'dsa' and q['difficulty'] == 'beginner' for q in sample)
+    assert bank.sample(3, 'chemistry') == [] and bank.ranges(topic='Topic 9') == []
+    bank.close()
+
+def test_stale_after_csv_change():
+    """Editing a source CSV marks the compiled file stale"""
+    csv_dir = tempfile.mkdtemp()
+    _write_bank(csv_dir)
+    path = os.path.join(csv_dir, 'bank.bin')
+    compile_bank(csv_dir, path)
+    bank = BinaryQuestionBank(path)
+    assert not bank.is_stale(csv_dir)
+    _write_bank(csv_dir, subjects=('os',), per_subject=31)
+    assert bank.is_stale(csv_dir)
+    bank.close()
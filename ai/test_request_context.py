@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Tests for request deadlines
+Covers budget propagation through the provider fallback chain
+"""
+
+import time
+
+from enhanced_ai_agent import EnhancedAITutor, handle_request
+from llm_providers import LLMProvider, MockProvider
+from request_context import deadline_scope, remaining
+
+class SlowProvider(LLMProvider):
+    """Provider stand-in that hangs until its timeout and records the timeout it was given"""
+
+    def __init__(self):
+        self.timeouts = []
+
+    def is_available(self) -> bool:
+        return True
+
+    def generate_response(self, prompt, **kwargs):
+        self.timeouts.append(kwargs.get('timeout'))
+        time.sleep(min(kwargs.get('timeout') or 30, 30))
+        return {'success': False, 'error': 'timed out', 'provider': 'slow'}
+
+def test_nested_scopes_only_shorten_the_deadline():
+    """An inner scope cannot extend the outer budget; outside any scope there is no deadline"""
+    assert remaining() is None
+    with deadline_scope(0.5):
+        with deadline_scope(60):
+            assert remaining() <= 0.5
+        with deadline_scope(0.1):
+            assert remaining() <= 0.1
+    assert remaining() is None
+
+def test_fallback_chain_spends_only_the_remaining_budget():
+    """The first provider gets the whole budget, later ones are skipped once it runs out"""
+    first, second = SlowProvider(), SlowProvider()
+    tutor = EnhancedAITutor()
+    tutor.providers = {'first': first, 'second': second, 'mock': MockProvider()}
+
+    started = time.monotonic()
+    with deadline_scope(1.5):
+        result = tutor._call_llm_with_fallback('What is 2+2?', 'tutoring', 'first')
+    elapsed = time.monotonic() - started
+
+    assert result['provider'] == 'mock'
+    assert len(first.timeouts) == 1 and 1.0 < first.timeouts[0] <= 1.5
+    assert second.timeouts == []
+    assert elapsed < 2.5
+
+def test_deadline_ms_from_the_caller():
+    """An exhausted deadlineMs answers from the local fallback without calling a provider"""
+    slow = SlowProvider()
+    tutor = EnhancedAITutor()
+    tutor.providers = {'openai': slow, 'mock': MockProvider()}
+
+    started = time.monotonic()
+    result = handle_request(tutor, {'action': 'generate_adaptive_question', 'subject': 'Mathematics',
+                                    'deadlineMs': 0})
+    assert result['question'] and slow.timeouts == []
+    assert time.monotonic() - started < 1.0
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+"""
+Tests for structured tutor responses
+Covers the compiled validators and schema-aware provider fallback
+"""
+
+import json
+
+from enhanced_ai_agent import EnhancedAITutor
+from llm_providers import LLMProvider, MockProvider
+from response_schemas import validate_response
+
+VALID_EVALUATION = {
+    'correct': True, 'feedback': 'Well done', 'score': 90, 'nextDifficulty': 'advanced',
+    'suggestions': ['Try a harder one'], 'explanation': '2 + 2 = 4'
+}
+
+class RecordingProvider(LLMProvider):
+    """Provider stand-in that returns a canned response and records its calls"""
+
+    def __init__(self, content, structured=True):
+        self.content = content
+        self.supports_structured_output = structured
+        self.calls = []
+
+    def is_available(self) -> bool:
+        return True
+
+    def generate_response(self, prompt, **kwargs):
+        self.calls.append((prompt, kwargs))
+        return {'success': True, 'content': self.content, 'usage': {}, 'provider': 'recording'}
+
+def test_validator_reports_schema_violations():
+    """Missing keys, out-of-range scores, bad enums and wrong item types are all reported"""
+    assert validate_response('answer_evaluation', VALID_EVALUATION) == []
+
+    invalid = dict(VALID_EVALUATION, score=150, nextDifficulty='expert', suggestions=[1])
+    del invalid['feedback']
+    errors = validate_response('answer_evaluation', invalid)
+    assert any('feedback' in e for e in errors)
+    assert any('score' in e for e in errors)
+    assert any('nextDifficulty' in e for e in errors)
+    assert any('suggestions[0]' in e for e in errors)
+    assert validate_response('answer_evaluation', ['not', 'an', 'object']) == ['$: expected object']
+
+def test_invalid_structured_response_falls_through_to_next_provider():
+    """A schema-violating response is skipped; the next provider gets the schema and a shorter prompt"""
+    broken = RecordingProvider(json.dumps({'correct': 'yes'}))
+    valid = RecordingProvider(json.dumps(VALID_EVALUATION))
+    tutor = EnhancedAITutor()
+    tutor.providers = {'broken': broken, 'valid': valid, 'mock': MockProvider()}
+
+    result = tutor._call_llm_with_fallback('What is 2+2?', 'tutoring', 'broken', schema_name='answer_evaluation')
+    assert result['parsed'] == VALID_EVALUATION
+    prompt, kwargs = valid.calls[0]
+    assert kwargs['schema_name'] == 'answer_evaluation'
+    assert kwargs['response_schema']['required']
+
+    evaluation = tutor.evaluate_multiple_choice('What is 2+2?', 'B', {'options': ['3', '4'], 'correct_answer': 1})
+    assert evaluation['score'] == 90
+    structured_prompt = valid.calls[-1][0]
+    assert 'JSON format' not in structured_prompt
+    assert 'What is 2+2?' in structured_prompt
+
+def test_free_text_providers_are_held_only_to_essential_keys():
+    """Without native structured output a fractional score and missing optional lists are accepted"""
+    partial = {'correct': True, 'feedback': 'Close', 'score': 85.5}
+    assert validate_response('answer_evaluation', partial, strict=False) == []
+    assert any('suggestions' in e for e in validate_response('answer_evaluation', partial))
+    assert validate_response('answer_evaluation', {'correct': True, 'score': 85.5}, strict=False) == \
+        ['$.feedback: missing']
+    assert validate_response('answer_evaluation', dict(partial, suggestions='none'), strict=False) == \
+        ['$.suggestions: expected array']
+
+    free_text = RecordingProvider('Here you go: ' + json.dumps(partial), structured=False)
+    tutor = EnhancedAITutor()
+    tutor.providers = {'free_text': free_text, 'mock': MockProvider()}
+    evaluation = tutor.evaluate_multiple_choice('What is 2+2?', 'B', {'options': ['3', '4'], 'correct_answer': 1})
+    assert evaluation['provider'] == 'recording'
+    assert evaluation['score'] == 85.5 and evaluation['suggestions'] == []
+
+def test_schemas_are_strict_mode_compliant():
+    """Every object is closed to extra keys and requires all of its properties"""
+    from response_schemas import RESPONSE_SCHEMAS
+
+    def objects(schema):
+        if schema.get('type') == 'object':
+            yield schema
+        for sub in schema.get('properties', {}).values():
+            yield from objects(sub)
+        if 'items' in schema:
+            yield from objects(schema['items'])
+
+    for schema in RESPONSE_SCHEMAS.values():
+        for node in objects(schema):
+            assert node['additionalProperties'] is False
+            assert sorted(node['required']) == sorted(node['properties'])
+    assert validate_response('answer_evaluation', dict(VALID_EVALUATION, mood='happy')) == \
+        ["$: unexpected ['mood']"]
+
+def test_openai_json_schema_only_for_models_that_support_it():
+    """Older models get JSON mode and are validated leniently; newer ones get a strict json_schema"""
+    from types import SimpleNamespace
+    from llm_providers import OpenAIProvider
+    from response_schemas import RESPONSE_SCHEMAS
+
+    def provider(model):
+        return OpenAIProvider(SimpleNamespace(api_key='key', model=model, base_url=None, max_tokens=100,
+                                              temperature=0.0, timeout=5))
+
+    schema = RESPONSE_SCHEMAS['answer_evaluation']
+    legacy = provider('gpt-4')
+    assert not legacy.supports_structured_output
+    assert legacy.build_payload('Answer in JSON', schema_name='answer_evaluation')['response_format'] == \
+        {'type': 'json_object'}
+    assert 'response_format' not in legacy.build_payload('Hello')
+
+    current = provider('gpt-4o-mini')
+    assert current.supports_structured_output
+    response_format = current.build_payload('Hi', response_schema=schema, schema_name='answer_evaluation')[
+        'response_format']
+    assert response_format['type'] == 'json_schema' and response_format['json_schema']['strict'] is True
+    assert not provider('o1-mini').supports_structured_output
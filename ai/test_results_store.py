@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+"""
+Tests for the SQLite results store
+Covers JSON import, de-duplication and the per-student queries
+"""
+
+import json
+import os
+import tempfile
+
+from results_store import ResultsStore
+
+def _attempt(user_id, subject, timestamp, answers):
+    details = [
+        {'questionId': f"{subject.upper()}-{i:03d}", 'question': f"Question {i}", 'userAnswer': 'A',
+         'correctAnswer': 'A' if correct else 'B', 'correctAnswerText': f"Answer {i}", 'isCorrect': correct}
+        for i, correct in enumerate(answers)
+    ]
+    correct = sum(answers)
+    return {'userId': user_id, 'subject': subject, 'score': 100 * correct // len(answers), 'correctCount': correct,
+            'totalQuestions': len(answers), 'timeSpent': 30.0, 'timestamp': timestamp, 'detailedResults': details}
+
+def _store(batch_size=2):
+    return ResultsStore(os.path.join(tempfile.mkdtemp(), 'results.db'), batch_size=batch_size)
+
+def test_import_is_batched_and_idempotent():
+    """Importing the same file twice stores each attempt and question result once"""
+    attempts = [_attempt('u1', 'dsa', f"2025-08-2{i}T00:00:00.000Z", [True, False, i % 2 == 0]) for i in range(5)]
+    path = os.path.join(tempfile.mkdtemp(), 'test_results.json')
+    with open(path, 'w') as f:
+        json.dump(attempts, f)
+
+    store = _store()
+    assert store.import_json(path) == 5
+    assert store.import_json(path) == 0
+    assert store.count_attempts() == 5
+    assert store.question_stats('DSA-000') == {'questionId': 'DSA-000', 'answered': 5, 'correct': 5, 'accuracy': 100.0}
+    assert store.add_attempt(attempts[0]) is None
+
+def test_student_progress_and_recent_errors():
+    """Progress is aggregated per subject and errors come back newest first"""
+    store = _store()
+    store.add_attempts([
+        _attempt('u1', 'dsa', '2025-08-20T00:00:00.000Z', [True, False]),
+        _attempt('u1', 'dsa', '2025-08-21T00:00:00.000Z', [True, True]),
+        _attempt('u1', 'dbms', '2025-08-22T00:00:00.000Z', [False, False]),
+        _attempt('u2', 'dsa', '2025-08-22T00:00:00.000Z', [False, False])
+    ])
+
+    progress = store.student_progress('u1')
+    assert set(progress) == {'dsa', 'dbms'}
+    assert progress['dsa']['attempts'] == 2
+    assert progress['dsa']['average_score'] == 75.0
+    assert progress['dsa']['latest_score'] == 100
+    assert progress['dsa']['accuracy'] == 75.0
+
+    errors = store.recent_errors('u1')
+    assert [e['subject'] for e in errors] == ['dbms', 'dbms', 'dsa']
+    assert store.recent_errors('u1', 'dsa')[0]['questionId'] == 'DSA-001'
+
+def test_recent_errors_carry_topics_for_clustering():
+    """Stored topics are returned; results recorded without one have no topic, whatever their question ID"""
+    from error_clustering import cluster_errors
+
+    store = _store()
+    seeded = _attempt('u1', 'dsa', '2025-08-20T00:00:00.000Z', [False, False])
+    recorded = _attempt('u1', 'dsa', '2025-08-21T00:00:00.000Z', [False, False])
+    recorded['detailedResults'][0].update(questionId='7', topic='Stacks')
+    recorded['detailedResults'][1].update(topic='Stacks')
+    store.add_attempts([seeded, recorded])
+
+    errors = store.recent_errors('u1')
+    assert [(e['questionId'], e['topic']) for e in errors] == [
+        ('7', 'Stacks'), ('DSA-001', 'Stacks'), ('DSA-000', None), ('DSA-001', None)
+    ]
+    assert sorted((c.topic or '', c.count) for c in cluster_errors(errors, threshold=0.0)) == [
+        ('', 1), ('Stacks', 3)
+    ]
+
+def test_learning_path_for_a_student_without_attempts(monkeypatch):
+    """A userId with no stored attempts falls back to the bank's subjects instead of failing"""
+    import results_store
+    from enhanced_ai_agent import EnhancedAITutor, handle_request
+    from llm_providers import MockProvider
+    from question_bank import list_subject_files, subject_from_filename
+
+    monkeypatch.setattr(results_store, '_default_store', _store())
+    tutor = EnhancedAITutor()
+    tutor.providers = {'mock': MockProvider()}
+    result = handle_request(tutor, {'action': 'analyze_learning_path', 'userId': 'nobody'})
+    assert 'error' not in result
+    bank_subjects = [subject_from_filename(path) for path in list_subject_files()]
+    assert [entry['subject'] for entry in result['recommended_subjects']] == bank_subjects[:1]
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Tests for streaming results ingestion
+Covers JSON arrays, JSON lines, gzip and parallel aggregation
+"""
+
+import gzip
+import json
+import os
+import tempfile
+
+from results_stream import iter_attempts, aggregate_results, summarize_aggregate
+
+def _attempts(count):
+    return [
+        {'userId': f"u{i % 3}", 'subject': 'dsa' if i % 2 else 'dbms', 'score': i * 10, 'timestamp': str(i),
+         'detailedResults': [{'questionId': f"Q-{j}", 'question': 'x' * 50, 'isCorrect': (i + j) % 2 == 0}
+                             for j in range(4)]}
+        for i in range(count)
+    ]
+
+def _write(name, attempts, jsonl=False, compress=False):
+    path = os.path.join(tempfile.mkdtemp(), name)
+    if jsonl:
+        text = '\n'.join(json.dumps(a) for a in attempts) + '\n'
+    else:
+        text = json.dumps(attempts, indent=2)
+    opener = gzip.open if compress else open
+    with opener(path, 'wt', encoding='utf-8') as f:
+        f.write(text)
+    return path
+
+def test_all_formats_yield_the_same_records():
+    """Arrays, JSON lines and gzip are all decoded record by record, even with tiny read chunks"""
+    attempts = _attempts(25)
+    paths = [
+        _write('results.json', attempts),
+        _write('results.jsonl', attempts, jsonl=True),
+        _write('results.json.gz', attempts, compress=True),
+        _write('results.jsonl.gz', attempts, jsonl=True, compress=True)
+    ]
+    for path in paths:
+        assert list(iter_attempts(path, chunk_size=7)) == attempts
+    assert list(iter_attempts(_write('empty.json', []))) == []
+
+def test_parallel_aggregation_matches_serial():
+    """Fanning batches out to worker processes gives the same totals as a single pass"""
+    path = _write('results.jsonl.gz', _attempts(40), jsonl=True, compress=True)
+    serial = aggregate_results(path, workers=0, batch_size=7)
+    parallel = aggregate_results(path, workers=2, batch_size=7)
+    assert serial == parallel
+    assert serial['attempts'] == 40 and serial['answers'] == 160
+    summary = summarize_aggregate(serial)
+    assert summary['students'] == 3
+    assert summary['subjects']['dsa']['attempts'] == 20
+
+def test_malformed_records_are_reported_and_skipped(caplog):
+    """A bad or oversized line is logged and skipped without buffering the rest of the file"""
+    attempts = _attempts(4)
+    lines = [json.dumps(a) for a in attempts]
+    lines.insert(1, '{"userId": "u9", "score": oops}')
+    lines.insert(3, '{"padding": "' + 'x' * 5000)
+    path = _write('results.jsonl', [])
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write('\n'.join(lines) + '\n{"userId": "u8", "score": ')
+
+    with caplog.at_level('WARNING', logger='results_stream'):
+        assert list(iter_attempts(path, chunk_size=16, max_record=1000)) == attempts
+    skipped = [r.getMessage() for r in caplog.records if 'malformed record' in r.getMessage()]
+    assert len(skipped) == 3
+    assert skipped[0].startswith(f"Skipping malformed record at character {len(lines[0]) + 1}:")
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Tests for the spaced-repetition review scheduler
+Covers SM-2 intervals, incremental sync from the results store and overdue ordering
+"""
+
+import os
+import tempfile
+
+from results_store import ResultsStore
+from review_scheduler import DAY, INITIAL_EASINESS, ReviewScheduler, parse_timestamp, sm2
+
+def _attempt(user, timestamp, answers, subject='dsa'):
+    return {
+        'userId': user, 'subject': subject, 'score': 0, 'correctCount': 0, 'totalQuestions': len(answers),
+        'timeSpent': 10, 'timestamp': timestamp,
+        'detailedResults': [{'questionId': qid, 'question': qid, 'userAnswer': 'A', 'correctAnswer': 'A',
+                             'correctAnswerText': 'x', 'isCorrect': correct} for qid, correct in answers]
+    }
+
+def test_sm2_intervals_grow_and_lapses_reset():
+    """Correct answers space reviews 1, 6, then 6*EF days; a wrong answer starts over"""
+    state = sm2(None, 4)
+    assert state == (INITIAL_EASINESS, 1.0, 1, 0)
+    state = sm2(state, 4)
+    assert state[1:3] == (6.0, 2)
+    state = sm2(state, 4)
+    assert state[1] == 15.0 and state[2] == 3
+    easiness, interval, repetitions, lapses = sm2(state, 2)
+    assert (interval, repetitions, lapses) == (1.0, 0, 1) and easiness < INITIAL_EASINESS
+
+def test_sync_is_incremental_and_due_items_come_most_overdue_first():
+    """Only new attempts are folded in; due items are ordered by how overdue they are"""
+    db_path = os.path.join(tempfile.mkdtemp(), 'results.db')
+    store = ResultsStore(db_path)
+    store.add_attempt(_attempt('u1', '2025-01-01T00:00:00Z', [('DSA-001', True), ('DSA-002', False)]))
+    store.add_attempt(_attempt('u2', '2025-01-01T00:00:00Z', [('DSA-001', True)]))
+
+    scheduler = ReviewScheduler(db_path)
+    assert scheduler.sync() == 3
+    assert scheduler.sync() == 0
+
+    store.add_attempt(_attempt('u1', '2025-01-02T00:00:00Z', [('DSA-002', True)]))
+    store.add_attempt(_attempt('u1', '2025-01-02T00:00:00Z', [('OS-001', True)], 'os'))
+    assert scheduler.sync() == 2
+
+    now = parse_timestamp('2025-01-03T12:00:00Z')
+    due = scheduler.due_reviews('u1', now=now)
+    # DSA-001 was due on Jan 2, DSA-002 and OS-001 (reviewed Jan 2) on Jan 3
+    assert [item['questionId'] for item in due] == ['DSA-001', 'DSA-002', 'OS-001']
+    assert due[0]['overdueDays'] == 1.5 and due[1]['lapses'] == 1
+    assert [item['questionId'] for item in scheduler.due_reviews('u1', subject='os', now=now)] == ['OS-001']
+    assert scheduler.due_reviews('u1', limit=1, now=now)[0]['questionId'] == 'DSA-001'
+    assert scheduler.due_reviews('u1', now=parse_timestamp('2025-01-01T12:00:00Z')) == []
+    assert scheduler.count_due('u2', now=now) == 1
+    scheduler.close()
+    store.close()
+
+def test_out_of_order_results_do_not_rewind_the_state():
+    """A result older than the item's last review is skipped"""
+    db_path = os.path.join(tempfile.mkdtemp(), 'results.db')
+    store = ResultsStore(db_path)
+    store.add_attempt(_attempt('u1', '2025-01-05T00:00:00Z', [('DSA-001', True)]))
+    scheduler = ReviewScheduler(db_path)
+    scheduler.sync()
+
+    store.add_attempt(_attempt('u1', '2025-01-01T00:00:00Z', [('DSA-001', False)]))
+    assert scheduler.sync() == 0
+    item = scheduler.due_reviews('u1', now=parse_timestamp('2025-01-06T00:00:00Z'))[0]
+    assert item['lapses'] == 0 and item['intervalDays'] == 1.0
+    assert parse_timestamp(item['dueAt']) == parse_timestamp('2025-01-05T00:00:00Z') + DAY
+    scheduler.close()
+    store.close()
+
+def test_concurrent_syncs_apply_each_result_once():
+    """Two schedulers on one database (as in two processes) syncing at once do not double-apply results"""
+    import threading
+
+    db_path = os.path.join(tempfile.mkdtemp(), 'results.db')
+    store = ResultsStore(db_path)
+    store.add_attempt(_attempt('u1', '2025-01-01T00:00:00Z', [('DSA-001', True)]))
+    first, second = ReviewScheduler(db_path), ReviewScheduler(db_path)
+
+    # Hold the first sync inside its chunk until the second one has started
+    inside, started = threading.Event(), threading.Event()
+    apply = first._apply
+
+    def slow_apply(reviews):
+        inside.set()
+        started.wait(5)
+        threading.Event().wait(0.2)
+        return apply(reviews)
+
+    first._apply = slow_apply
+    results = {}
+    thread = threading.Thread(target=lambda: results.update(first=first.sync()))
+    thread.start()
+    assert inside.wait(5)
+    started.set()
+    results['second'] = second.sync()
+    thread.join()
+
+    assert sorted(results.values()) == [0, 1]
+    item = second.due_reviews('u1', now=parse_timestamp('2025-01-03T00:00:00Z'))[0]
+    assert item['repetitions'] == 1 and item['intervalDays'] == 1.0
+    first.close()
+    second.close()
+    store.close()
@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Tests for the LLM call scheduler
+Covers priority classes, reserved interactive slots, fair share across tenants and EDF
+"""
+
+import threading
+import time
+
+from scheduler import FairScheduler, request_class
+
+def _queued(scheduler):
+    return sum(c['queued'] for c in scheduler.stats()['classes'].values())
+
+def _run_in_grant_order(scheduler, requests):
+    """Queue (name, priority, tenant, deadline) requests behind a held slot; return the order they are served"""
+    order = []
+    assert scheduler.acquire('interactive')
+    threads = []
+    for name, priority, tenant, deadline in requests:
+        def work(name=name, priority=priority, tenant=tenant, deadline=deadline):
+            if scheduler.acquire(priority, tenant, deadline):
+                order.append(name)
+                scheduler.release()
+        thread = threading.Thread(target=work)
+        expected = _queued(scheduler) + 1
+        thread.start()
+        while _queued(scheduler) < expected:
+            time.sleep(0.001)
+        threads.append(thread)
+    scheduler.release()
+    for thread in threads:
+        thread.join(timeout=5)
+    return order
+
+def test_interactive_work_overtakes_queued_background_work():
+    """Whatever queued first, a waiting interactive call gets the next free slot"""
+    scheduler = FairScheduler(capacity=1, reserved=0)
+    order = _run_in_grant_order(scheduler, [
+        ('batch-1', 'background', 'class-7b', None),
+        ('batch-2', 'background', 'class-7b', None),
+        ('quiz', 'standard', 'alice', None),
+        ('chat', 'interactive', 'bob', None)
+    ])
+    assert order == ['chat', 'quiz', 'batch-1', 'batch-2']
+
+def test_reserved_slots_stay_free_for_interactive_work():
+    """Background work cannot fill the reserved slots, so a chat starts without waiting"""
+    scheduler = FairScheduler(capacity=3, reserved=1)
+    assert scheduler.acquire('background') and scheduler.acquire('background')
+    assert not scheduler.acquire('background', deadline=time.monotonic() + 0.05)
+    started = time.monotonic()
+    assert scheduler.acquire('interactive', deadline=time.monotonic() + 1)
+    assert time.monotonic() - started < 0.05
+    stats = scheduler.stats()
+    assert stats['active'] == 3 and stats['classes']['background']['timed_out'] == 1
+
+def test_tenants_share_by_weight_and_each_tenant_goes_earliest_deadline_first():
+    """A tenant with a backlog does not starve a later one; within a tenant the nearest deadline wins"""
+    now = time.monotonic()
+    scheduler = FairScheduler(capacity=1, reserved=0, weights={'district': 2})
+    requests = [(f"district-{i}", 'standard', 'district', None) for i in range(6)]
+    requests += [('school-0', 'standard', 'school', now + 30), ('school-1', 'standard', 'school', now + 10)]
+    order = _run_in_grant_order(scheduler, requests)
+
+    assert order.index('school-1') < order.index('school-0')
+    # Weight 2 vs 1: the small tenant is served after about two of the big tenant's requests, not six
+    assert order.index('school-1') <= 3 and order.index('school-0') <= 6
+    assert [name for name in order if name.startswith('district')] == [f"district-{i}" for i in range(6)]
+
+def test_request_class_from_action_and_overrides():
+    """Actions map to classes, explicit priority wins, tenant falls back to the user"""
+    assert request_class({'action': 'conversational_tutoring', 'userId': 'u1'}) == ('interactive', 'u1')
+    assert request_class({'action': 'evaluate_answer', 'type': 'essay'})[0] == 'standard'
+    assert request_class({'action': 'analyze_learning_path', 'tenantId': 'school-a'}) == ('background', 'school-a')
+    assert request_class({'action': 'conversational_tutoring', 'priority': 'background'})[0] == 'background'
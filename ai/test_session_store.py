@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Tests for the conversation session store
+Covers bounded history, idle eviction, SQLite persistence across instances and concurrent writers
+"""
+
+import os
+import tempfile
+import time
+
+from session_store import SessionStore
+
+def test_history_is_bounded():
+    """Only the most recent max_turns turns are retained"""
+    store = SessionStore(max_turns=3)
+    for i in range(5):
+        store.append_turn('s1', f"question {i}", f"answer {i}")
+
+    history = store.get_history('s1')
+    assert [turn['student'] for turn in history] == ['question 2', 'question 3', 'question 4']
+
+def test_messages_are_truncated():
+    """Individual messages are capped so one turn cannot blow up memory"""
+    store = SessionStore(max_chars_per_message=10)
+    store.append_turn('s1', 'x' * 100, 'y' * 100)
+    assert store.get_history('s1') == [{'student': 'x' * 10, 'tutor': 'y' * 10}]
+
+def test_idle_sessions_are_evicted():
+    """Sessions idle past the TTL disappear"""
+    store = SessionStore(idle_ttl=0.05)
+    store.append_turn('s1', 'hello', 'hi')
+    time.sleep(0.1)
+    assert store.get_history('s1') == []
+
+def test_lru_session_limit():
+    """The least recently used session is dropped from memory"""
+    store = SessionStore(max_sessions=2)
+    store.append_turn('a', '1', '1')
+    store.append_turn('b', '2', '2')
+    store.get_history('a')
+    store.append_turn('c', '3', '3')
+    assert store.get_history('b') == []
+    assert store.get_history('a') != []
+
+def test_sqlite_persistence_across_instances():
+    """A second store on the same database continues the session"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'sessions.db')
+        first = SessionStore(db_path=db_path, max_turns=2)
+        for i in range(3):
+            first.append_turn('s1', f"q{i}", f"a{i}")
+        first.close()
+
+        second = SessionStore(db_path=db_path, max_turns=2)
+        assert [turn['student'] for turn in second.get_history('s1')] == ['q1', 'q2']
+        second.append_turn('s1', 'q3', 'a3')
+        assert [turn['student'] for turn in second.get_history('s1')] == ['q2', 'q3']
+        second.close()
+
+def test_interleaved_writers_share_one_sequence():
+    """Two stores appending to the same session keep every turn, and folding everything keeps the count"""
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'sessions.db')
+        first = SessionStore(db_path=db_path, max_turns=10)
+        second = SessionStore(db_path=db_path, max_turns=10)
+        first.append_turn('s1', 'q0', 'a0')
+        second.append_turn('s1', 'q1', 'a1')
+        first.append_turn('s1', 'q2', 'a2')
+        assert [turn['student'] for turn in first.get_history('s1')] == ['q0', 'q1', 'q2']
+        assert [turn['student'] for turn in second.get_history('s1')] == ['q0', 'q1', 'q2']
+
+        second.fold('s1', 'summary of three', 3)
+        assert first.get_history('s1') == [] and first.get_summary('s1') == 'summary of three'
+        first.close()
+        second.close()
+
+        reopened = SessionStore(db_path=db_path, max_turns=10)
+        assert reopened.get_turn_count('s1') == 3
+        reopened.append_turn('s1', 'q3', 'a3')
+        assert reopened.get_turn_count('s1') == 4 and reopened.get_history('s1') == [{'student': 'q3', 'tutor': 'a3'}]
+        reopened.close()
@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+"""
+Tests for the tutoring similarity cache
+Covers rewording matches, namespaces, LRU eviction, audits and the tutor integration
+"""
+
+import os
+import tempfile
+
+from similarity_cache import DEFAULT_THRESHOLD, SimilarityCache, normalize_question, questions_compatible
+
+ANSWER = {'response': 'A deadlock is a cycle of processes each waiting on the next.', 'provider': 'openai'}
+
+def test_reworded_questions_hit_and_unrelated_miss():
+    """Filler words and punctuation do not matter; different topics and other subjects do"""
+    cache = SimilarityCache(threshold=0.85, audit_rate=0.0)
+    cache.store('os', 'What is a deadlock?', ANSWER)
+
+    assert normalize_question('Explain deadlock pls') == 'deadlock'
+    hit = cache.lookup('os', 'explain deadlock pls')
+    assert hit['response'] == ANSWER and hit['similarity'] == 1.0
+    assert cache.lookup('os', 'What is a semaphore?') is None
+    assert cache.lookup('dsa', 'What is a deadlock?') is None
+
+    cache.store('dsa', 'What is the time complexity of quicksort?', ANSWER)
+    assert cache.lookup('dsa', 'time complexity of quick sort?')['similarity'] >= 0.85
+    assert cache.lookup('dsa', 'what is the time complexity of mergesort') is None
+
+    stats = cache.stats()
+    assert stats['lookups'] == 5 and stats['hits'] == 2 and stats['hit_rate'] == 0.4
+    assert stats['namespaces'] == {'os': 1, 'dsa': 1}
+
+def test_opposite_questions_never_share_an_answer():
+    """Pairs that n-gram similarity scores at or above the old 0.85 default but that ask different things"""
+    opposites = [
+        ('advantages of linked list over array', 'disadvantages of linked list over array'),
+        ('worst case time complexity of quicksort', 'best case time complexity of quicksort'),
+        ('difference between tcp and udp', 'difference between udp and ip'),
+        ('is heap sort stable', "why isn't heap sort stable"),
+        ('searching a sorted array', 'searching an unsorted array'),
+        ('how does tcp congestion control work', 'why does tcp congestion control work'),
+        ('how does a hash table handle collisions', 'does a hash table handle collisions')
+    ]
+    assert DEFAULT_THRESHOLD > 0.85
+    cache = SimilarityCache(threshold=0.8, audit_rate=0.0)
+    for cached, asked in opposites:
+        assert not questions_compatible(normalize_question(cached), normalize_question(asked))
+        cache.store('dsa', cached, ANSWER)
+        assert cache.lookup('dsa', asked) is None
+    assert cache.stats()['rejected'] >= 3
+
+    for cached, asked in [('time complexity of quicksort', 'time complexity of quick sort'),
+                          ('what is a semaphore', 'semaphores'), ('explain deadlock', 'deadlok')]:
+        assert questions_compatible(normalize_question(cached), normalize_question(asked))
+
+def test_lru_eviction_and_persistence():
+    """Each namespace keeps its most recently used entries, also across processes via SQLite"""
+    db_path = os.path.join(tempfile.mkdtemp(), 'cache.db')
+    cache = SimilarityCache(max_entries=2, audit_rate=0.0, db_path=db_path)
+    cache.store('os', 'deadlock', ANSWER)
+    cache.store('os', 'semaphore', ANSWER)
+    assert cache.lookup('os', 'deadlock')
+    cache.store('os', 'paging', ANSWER)
+
+    assert cache.stats()['evictions'] == 1
+    assert cache.lookup('os', 'semaphore') is None
+    cache.close()
+
+    reopened = SimilarityCache(max_entries=2, audit_rate=0.0, db_path=db_path)
+    assert reopened.lookup('os', 'what is paging?')['response'] == ANSWER
+    assert reopened.lookup('os', 'deadlock') and reopened.lookup('os', 'semaphore') is None
+    reopened.close()
+
+def test_audit_sampling_and_false_positive_rate():
+    """Sampled near-matches can be marked wrong, which shows up as the false-positive rate"""
+    cache = SimilarityCache(threshold=0.85, audit_rate=1.0)
+    cache.store('dsa', 'time complexity of quicksort', ANSWER)
+    cache.lookup('dsa', 'time complexity of quick sort')
+    cache.lookup('dsa', 'time complexity of quick-sort?')
+
+    audit = cache.audit_log()
+    assert len(audit) == 2 and audit[0]['matched'] == 'time complexity of quicksort'
+    assert cache.record_verdict(audit[0]['id'], correct=False)
+    assert cache.record_verdict(audit[1]['id'], correct=True)
+    assert not cache.record_verdict(999, correct=True)
+    assert cache.stats()['audit'] == {'sampled': 2, 'reviewed': 2, 'false_positives': 1, 'false_positive_rate': 0.5}
+
+def test_tutor_answers_first_turn_from_cache(monkeypatch):
+    """A reworded first-turn question skips the LLM; follow-ups with history never use the cache"""
+    import similarity_cache
+    from enhanced_ai_agent import EnhancedAITutor
+
+    monkeypatch.setattr(similarity_cache, '_default_cache', SimilarityCache(audit_rate=0.0))
+    tutor = EnhancedAITutor()
+    calls = []
+
+    def fake_call(prompt, task_type, force_provider=None, schema_name=None, **kwargs):
+        calls.append(prompt)
+        return {'success': True, 'provider': 'openai', 'parsed': dict(ANSWER)}
+
+    monkeypatch.setattr(tutor, '_call_llm_with_fallback', fake_call)
+
+    first = tutor.conversational_tutoring('What is a deadlock?', subject='os')
+    assert first['provider'] == 'openai' and len(calls) == 1
+    cached = tutor.conversational_tutoring('explain deadlock pls', subject='os')
+    assert cached['provider'] == 'similarity_cache' and cached['response'] == ANSWER['response']
+    assert len(calls) == 1
+
+    history = [{'role': 'student', 'content': 'What is a deadlock?'}, {'role': 'tutor', 'content': 'A cycle.'}]
+    tutor.conversational_tutoring('explain deadlock pls', history, subject='os')
+    assert len(calls) == 2
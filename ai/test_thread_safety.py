@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""
+Stress tests for concurrent use of one EnhancedAITutor
+Covers one-time lazy initialization, per-thread HTTP sessions, read-only config and many mixed requests at once
+"""
+
+import dataclasses
+import json
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+import cache_store
+import session_store
+import similarity_cache
+from conftest import fill_schema
+from enhanced_ai_agent import EnhancedAITutor, handle_request
+from llm_config import LLMConfig, LLMManager
+from llm_providers import LLMProvider, MockProvider, PerThreadSession
+
+_TOKEN = re.compile(r'<tok-\d+>')
+
+class EchoProvider(LLMProvider):
+    """Answers every schema with the request tokens found in the prompt, after a short random delay"""
+
+    supports_structured_output = True
+
+    def is_available(self):
+        return True
+
+    def generate_response(self, prompt, **kwargs):
+        time.sleep(random.uniform(0, 0.005))
+        tokens = ' '.join(sorted(set(_TOKEN.findall(prompt))))
+        return {'success': True, 'provider': 'openai', 'usage': {'total_tokens': 1},
+                'content': json.dumps(fill_schema(kwargs['response_schema'], tokens, 80))}
+
+class SlowInitTutor(EnhancedAITutor):
+    """Counts provider initializations, which are slow enough for racing threads to overlap"""
+
+    initializations = 0
+
+    def _initialize_providers(self):
+        type(self).initializations += 1
+        time.sleep(0.05)
+        self._providers = {'openai': EchoProvider(), 'mock': MockProvider()}
+
+@pytest.fixture
+def isolated_stores(monkeypatch):
+    """In-memory caches and sessions, and a similarity cache that never matches"""
+    monkeypatch.setenv('TUTOR_CACHE_DB', '')
+    monkeypatch.setattr(cache_store, '_caches', {})
+    monkeypatch.setattr(session_store, '_default_store', session_store.SessionStore())
+    monkeypatch.setattr(similarity_cache, '_default_cache', similarity_cache.SimilarityCache(threshold=1.01))
+
+def test_lazy_provider_initialization_runs_once():
+    """Threads that all touch a fresh tutor's providers at once share one initialization"""
+    SlowInitTutor.initializations = 0
+    tutor = SlowInitTutor()
+    barrier = threading.Barrier(16)
+
+    def touch(_):
+        barrier.wait()
+        return tutor.providers
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        seen = list(pool.map(touch, range(16)))
+    assert SlowInitTutor.initializations == 1
+    assert all(providers is seen[0] for providers in seen)
+
+def test_http_sessions_are_per_thread():
+    """Each thread gets its own requests.Session, reused across its calls, with the provider headers"""
+    pytest.importorskip('requests')
+    shared = PerThreadSession({'Authorization': 'Bearer test'})
+    with pytest.raises(TypeError):
+        shared.headers['Authorization'] = 'changed'
+
+    barrier = threading.Barrier(8)
+
+    def sessions(_):
+        barrier.wait()
+        return shared._session(), shared._session()
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        pairs = list(pool.map(sessions, range(8)))
+    assert all(first is second for first, second in pairs)
+    assert len({id(first) for first, _ in pairs}) == 8
+    assert all(first.headers['Authorization'] == 'Bearer test' for first, _ in pairs)
+
+def test_config_snapshot_is_read_only():
+    """Provider configs and the manager's config map cannot be changed under running requests"""
+    config = LLMConfig(provider='openai', model='gpt-4', api_key='k')
+    with pytest.raises(dataclasses.FrozenInstanceError):
+        config.model = 'other'
+    manager = LLMManager()
+    with pytest.raises(TypeError):
+        manager.configs['openai'] = config
+
+def test_concurrent_mixed_requests_do_not_interfere(isolated_stores):
+    """Many threads share one tutor; every answer and session history belongs to its own request"""
+    tutor = EnhancedAITutor()
+    tutor.providers = {'openai': EchoProvider(), 'mock': MockProvider()}
+
+    def run(number):
+        token = f"<tok-{number}>"
+        kind = number % 4
+        if kind == 0:
+            result = handle_request(tutor, {'action': 'evaluate_answer', 'question': f"Pick {token}", 'answer': 'A',
+                                            'context': {'options': ['A', 'B'], 'correct_answer': 0}})
+            return token, result['feedback'], None
+        if kind == 1:
+            result = handle_request(tutor, {'action': 'provide_tutoring_explanation',
+                                            'question': f"Why {token}?", 'studentAnswer': 'no'})
+            return token, result['explanation'], None
+        if kind == 2:
+            essay = '\n\n'.join(f"Paragraph {p} about {token}." for p in range(3))
+            result = handle_request(tutor, {'action': 'evaluate_answer', 'type': 'essay', 'answer': essay,
+                                            'question': 'Essay', 'context': {'topic': 'Concurrency'}})
+            return token, result['feedback'], None
+        session_id = f"session-{number}"
+        replies = []
+        for turn in range(3):
+            result = handle_request(tutor, {'action': 'conversational_tutoring', 'sessionId': session_id,
+                                            'studentMessage': f"Turn {turn} of {token}"})
+            replies.append(result['response'])
+        return token, ' '.join(replies), session_id
+
+    with ThreadPoolExecutor(max_workers=32) as pool:
+        outcomes = list(pool.map(run, range(128)))
+
+    store = session_store.get_session_store()
+    for token, text, session_id in outcomes:
+        assert set(_TOKEN.findall(text)) == {token}
+        if session_id:
+            history = store.get_history(session_id)
+            assert [turn['student'] for turn in history] == [f"Turn {turn} of {token}" for turn in range(3)]
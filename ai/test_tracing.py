@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Tests for request tracing
+Covers span nesting, the trace returned by handle_request and the JSON-lines sink
+"""
+
+import json
+
+import tracing
+from enhanced_ai_agent import EnhancedAITutor, handle_request
+from llm_providers import LLMProvider, MockProvider
+from tracing import annotate, span, start_trace
+
+class FailingProvider(LLMProvider):
+    """Provider stand-in that always reports a failure"""
+
+    def is_available(self) -> bool:
+        return True
+
+    def generate_response(self, prompt, **kwargs):
+        return {'success': False, 'error': 'unavailable', 'provider': 'openai'}
+
+def _tutor():
+    tutor = EnhancedAITutor()
+    tutor.providers = {'openai': FailingProvider(), 'mock': MockProvider()}
+    return tutor
+
+def test_spans_nest_under_the_enclosing_span():
+    """Child spans point at their parent; attributes and errors are recorded"""
+    with start_trace('t-1') as trace:
+        with span('outer'):
+            with span('inner', part=1):
+                annotate(hit=True)
+        try:
+            with span('broken'):
+                raise ValueError('boom')
+        except ValueError:
+            pass
+
+    spans = {record['name']: record for record in trace.to_dict()['spans']}
+    assert spans['outer']['parent'] is None
+    assert spans['inner']['parent'] == spans['outer']['id']
+    assert spans['inner']['part'] == 1 and spans['inner']['hit'] is True
+    assert spans['broken']['error'] == 'ValueError'
+    assert spans['outer']['duration_ms'] >= spans['inner']['duration_ms']
+
+def test_spans_are_free_outside_a_trace():
+    """Without a trace, span() records nothing"""
+    with span('untraced') as record:
+        annotate(ignored=True)
+    assert record is None and tracing.current_trace() is None
+
+def test_handle_request_returns_the_trace_when_asked():
+    """trace: true returns stage timings under the caller's trace id"""
+    result = handle_request(_tutor(), {'action': 'generate_adaptive_question', 'subject': 'Mathematics',
+                                       'trace': True, 'traceId': 'node-abc'})
+    trace = result['trace']
+    assert trace['trace_id'] == 'node-abc'
+
+    names = [record['name'] for record in trace['spans']]
+    assert names[0] == 'request'
+    assert 'PromptTemplates.adaptive_question_generation' in names
+    assert 'scheduler.wait' in names
+    attempts = [record for record in trace['spans'] if record['name'] == 'provider.attempt']
+    assert [(a['provider'], a['outcome']) for a in attempts] == [('openai', 'failed'), ('mock', 'fallback')]
+
+    request_span = trace['spans'][0]
+    assert all(record['parent'] is not None for record in trace['spans'][1:])
+    assert request_span['action'] == 'generate_adaptive_question'
+
+def test_no_trace_unless_requested(tmp_path, monkeypatch):
+    """Untraced responses are unchanged; with TUTOR_TRACE_FILE every request is still written"""
+    sink = tmp_path / 'traces.jsonl'
+    monkeypatch.setattr(tracing, 'TRACE_FILE', str(sink))
+
+    result = handle_request(_tutor(), {'action': 'generate_adaptive_question', 'subject': 'Mathematics',
+                                       'traceId': 'node-def'})
+    assert 'trace' not in result
+
+    lines = sink.read_text().splitlines()
+    assert len(lines) == 1
+    written = json.loads(lines[0])
+    assert written['trace_id'] == 'node-def'
+    assert any(record['name'] == 'provider.attempt' for record in written['spans'])
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tests for the prefork worker pool
+Exercises sticky routing, recycling, reload and the Unix-socket front end
+"""
+
+import os
+import tempfile
+import threading
+
+from worker_pool import PreforkSupervisor, send_request
+
+def test_sticky_routing_recycling_and_reload():
+    """Session traffic sticks to one slot; workers are replaced after max_requests and on reload"""
+    supervisor = PreforkSupervisor(num_workers=2, max_requests=3)
+    supervisor.start()
+    try:
+        pids = [supervisor.dispatch({'action': 'worker_info', 'sessionId': 'student-1'})['pid'] for _ in range(3)]
+        assert len(set(pids)) == 1
+
+        # The fourth request for the same session lands on the recycled worker in the same slot
+        recycled = supervisor.dispatch({'action': 'worker_info', 'sessionId': 'student-1'})
+        assert recycled['pid'] != pids[0]
+        assert recycled['served'] == 0
+
+        before = {w['pid'] for w in supervisor.stats()['workers']}
+        supervisor.reload()
+        after = {w['pid'] for w in supervisor.stats()['workers']}
+        assert before.isdisjoint(after)
+        assert 'error' not in supervisor.dispatch({'action': 'worker_info'})
+    finally:
+        supervisor.shutdown()
+
+def test_unix_socket_round_trip():
+    """Requests sent over the socket are answered by a worker"""
+    socket_path = os.path.join(tempfile.mkdtemp(), 'pool.sock')
+    supervisor = PreforkSupervisor(num_workers=1)
+    supervisor.start()
+    server = threading.Thread(target=supervisor.serve, args=(socket_path,), daemon=True)
+    server.start()
+    try:
+        for _ in range(50):
+            if os.path.exists(socket_path):
+                break
+            threading.Event().wait(0.1)
+
+        result = send_request({'action': 'evaluate_answer', 'question': 'What is 2+2?', 'answer': '4',
+                               'context': {'options': ['3', '4'], 'correct_answer': 1}}, socket_path)
+        assert 'score' in result
+    finally:
+        supervisor.shutdown()
+        server.join(timeout=10)
+
+def test_racing_recycles_replace_a_worker_once():
+    """Dispatches that both see the same worker at max_requests must not retire its fresh replacement"""
+    supervisor = PreforkSupervisor(num_workers=1)
+    supervisor.start()
+    try:
+        old = supervisor.workers[0]
+        barrier = threading.Barrier(2)
+        replaced = []
+
+        def recycle():
+            barrier.wait()
+            replaced.append(supervisor._replace(0, expected=old))
+
+        threads = [threading.Thread(target=recycle) for _ in range(2)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sorted(replaced) == [False, True]
+        fresh = supervisor.workers[0]
+        assert fresh is not old and not fresh.draining
+        assert fresh.ready.wait(timeout=60)
+        assert supervisor.dispatch({'action': 'worker_info'})['pid'] == fresh.pid
+    finally:
+        supervisor.shutdown()
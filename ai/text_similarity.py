@@ -0,0 +1,30 @@
+#!/usr/bin/env python3
+"""
+Text Similarity Helpers
+Embedding-free hashed character n-gram vectors and cosine similarity
+"""
+
+import math
+import zlib
+from typing import Dict
+
+NGRAM = 3
+VECTOR_DIMS = 1 << 12
+
+Vector = Dict[int, float]
+
+def ngram_vector(text: str, n: int = NGRAM, dims: int = VECTOR_DIMS) -> Vector:
+    """Unit-length hashed character n-gram vector (sparse) of a normalized string"""
+    padded = f" {text} "
+    counts: Vector = {}
+    for i in range(max(1, len(padded) - n + 1)):
+        bucket = zlib.crc32(padded[i:i + n].encode('utf-8')) % dims
+        counts[bucket] = counts.get(bucket, 0.0) + 1.0
+    norm = math.sqrt(sum(v * v for v in counts.values())) or 1.0
+    return {k: v / norm for k, v in counts.items()}
+
+def cosine(a: Vector, b: Vector) -> float:
+    """Cosine similarity of two unit-length sparse vectors"""
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
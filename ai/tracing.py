@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Request Tracing
+Lightweight nested timing spans per request, returned to the caller or appended to a JSON-lines file
+"""
+
+import functools
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# Every traced request is appended here as one JSON line (empty: no sink)
+TRACE_FILE = os.getenv('TUTOR_TRACE_FILE', '')
+
+_sink_lock = threading.Lock()
+
+class Trace:
+    """Spans recorded for one request; spans may be added from several threads"""
+
+    def __init__(self, trace_id: Optional[str] = None):
+        self.trace_id = trace_id or uuid.uuid4().hex
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.spans: List[Dict[str, Any]] = []
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def next_id(self) -> int:
+        with self._lock:
+            return next(self._ids)
+
+    def add(self, record: Dict[str, Any]):
+        with self._lock:
+            self.spans.append(record)
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            spans = sorted(self.spans, key=lambda record: record['start_ms'])
+        return {
+            'trace_id': self.trace_id,
+            'started_at': self.started_at,
+            'duration_ms': round((time.perf_counter() - self.started) * 1000, 3),
+            'spans': spans
+        }
+
+_trace: ContextVar[Optional[Trace]] = ContextVar('tutor_trace', default=None)
+_span: ContextVar[Optional[Dict[str, Any]]] = ContextVar('tutor_span', default=None)
+
+def sink_enabled() -> bool:
+    return bool(TRACE_FILE)
+
+def current_trace() -> Optional[Trace]:
+    return _trace.get()
+
+def _write_sink(trace: Trace):
+    line = json.dumps(trace.to_dict(), default=str) + '\n'
+    try:
+        with _sink_lock, open(TRACE_FILE, 'a', encoding='utf-8') as f:
+            f.write(line)
+    except OSError as e:
+        logger.warning(f"Could not write trace {trace.trace_id}: {e}")
+
+@contextmanager
+def start_trace(trace_id: Optional[str] = None, enabled: bool = True):
+    """Trace the enclosed block; yields the Trace (None when disabled). Written to TUTOR_TRACE_FILE on exit"""
+    if not enabled:
+        yield None
+        return
+    trace = Trace(trace_id)
+    trace_token = _trace.set(trace)
+    span_token = _span.set(None)
+    try:
+        yield trace
+    finally:
+        _span.reset(span_token)
+        _trace.reset(trace_token)
+        if TRACE_FILE:
+            _write_sink(trace)
+
+@contextmanager
+def span(name: str, **attributes):
+    """Time the enclosed block as a child of the current span; a no-op outside a trace"""
+    trace = _trace.get()
+    if trace is None:
+        yield None
+        return
+    parent = _span.get()
+    record = {'id': trace.next_id(), 'parent': parent['id'] if parent else None, 'name': name}
+    record.update(attributes)
+    token = _span.set(record)
+    started = time.perf_counter()
+    try:
+        yield record
+    except BaseException as e:
+        record['error'] = type(e).__name__
+        raise
+    finally:
+        _span.reset(token)
+        record['start_ms'] = round((started - trace.started) * 1000, 3)
+        record['duration_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        trace.add(record)
+
+def annotate(**attributes):
+    """Add attributes (outcome, sizes, cache hits) to the current span, if any"""
+    record = _span.get()
+    if record is not None:
+        record.update(attributes)
+
+def traced(func=None, *, name: Optional[str] = None):
+    """Decorator form of span(), named after the function's qualified name by default"""
+    def decorate(f):
+        span_name = name or f.__qualname__
+
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            if _trace.get() is None:
+                return f(*args, **kwargs)
+            with span(span_name):
+                return f(*args, **kwargs)
+        return wrapper
+    return decorate(func) if func is not None else decorate
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+"""
+Prefork Worker Pool
+Serves tutor requests from N pre-forked EnhancedAITutor processes behind a Unix-domain socket
+"""
+
+import argparse
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+import zlib
+from concurrent.futures import Future
+from typing import Dict, Any, List, Optional
+
+from request_context import action_deadline_ms
+from scheduler import FairScheduler, parse_weights, request_class
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SOCKET_PATH = os.getenv('TUTOR_POOL_SOCKET', '/tmp/ai_tutor_pool.sock')
+DEFAULT_MAX_REQUESTS = int(os.getenv('TUTOR_POOL_MAX_REQUESTS', '1000'))
+DEFAULT_REQUEST_TIMEOUT = float(os.getenv('TUTOR_POOL_REQUEST_TIMEOUT', '60'))
+
+# Request fields used for sticky routing, in order of preference
+STICKY_KEYS = ('sessionId', 'userId')
+
+def _worker_main(conn):
+    """Worker process: build one tutor, then serve requests from the supervisor pipe"""
+    # The supervisor owns reload/shutdown signals; workers exit when told to
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    from enhanced_ai_agent import EnhancedAITutor, handle_request, BACKGROUND_WAIT
+
+    tutor = EnhancedAITutor()
+    tutor.warm_up()  # initialize providers and load local models before taking traffic
+    conn.send(('ready', os.getpid()))
+
+    served = 0
+    while True:
+        try:
+            message = conn.recv()
+        except (EOFError, OSError):
+            break
+        if message is None:
+            break
+
+        request_id, payload = message
+        if payload.get('action') == 'worker_info':
+            result = {'pid': os.getpid(), 'served': served}
+        else:
+            try:
+                result = handle_request(tutor, payload)
+            except Exception as e:
+                result = {'error': f'Processing error: {str(e)}'}
+        served += 1
+
+        try:
+            conn.send((request_id, result))
+        except (BrokenPipeError, OSError):
+            break
+
+    tutor.wait_for_background_work(BACKGROUND_WAIT)
+    conn.close()
+
+class WorkerHandle:
+    """Supervisor-side view of one worker process and its in-flight requests"""
+
+    def __init__(self, ctx, slot: int, on_exit):
+        parent_conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn,), daemon=True)
+        self.process.start()
+        child_conn.close()
+
+        self.slot = slot
+        self.conn = parent_conn
+        self.pending: Dict[int, Future] = {}
+        self.dispatched = 0
+        self.draining = False
+        self.ready = threading.Event()
+        self._on_exit = on_exit
+        self._lock = threading.Lock()
+        self._stopped = False
+        self._reader = threading.Thread(target=self._read_loop, name=f'worker-{slot}-reader', daemon=True)
+        self._reader.start()
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid
+
+    @property
+    def inflight(self) -> int:
+        return len(self.pending)
+
+    def submit(self, request_id: int, payload: Dict[str, Any]) -> Future:
+        future: Future = Future()
+        with self._lock:
+            if self._stopped:
+                future.set_result({'error': 'Worker is shutting down'})
+                return future
+            self.pending[request_id] = future
+            self.dispatched += 1
+            try:
+                self.conn.send((request_id, payload))
+            except (BrokenPipeError, OSError) as e:
+                self.pending.pop(request_id, None)
+                future.set_result({'error': f'Worker unavailable: {e}'})
+        return future
+
+    def drain(self):
+        """Stop taking new work; exit once in-flight requests have completed"""
+        with self._lock:
+            self.draining = True
+            idle = not self.pending
+        if idle:
+            self._stop()
+
+    def _stop(self):
+        with self._lock:
+            if self._stopped:
+                return
+            self._stopped = True
+            try:
+                self.conn.send(None)
+            except (BrokenPipeError, OSError):
+                pass
+
+    def _read_loop(self):
+        while True:
+            try:
+                message = self.conn.recv()
+            except (EOFError, OSError):
+                break
+
+            if message[0] == 'ready':
+                self.ready.set()
+                continue
+
+            request_id, result = message
+            with self._lock:
+                future = self.pending.pop(request_id, None)
+                finished_draining = self.draining and not self.pending
+            if future is not None:
+                future.set_result(result)
+            if finished_draining:
+                self._stop()
+
+        with self._lock:
+            self._stopped = True
+            orphaned = list(self.pending.values())
+            self.pending.clear()
+        for future in orphaned:
+            future.set_result({'error': 'Worker exited before responding'})
+
+        self.process.join(timeout=5)
+        self.ready.set()
+        self._on_exit(self)
+
+class PreforkSupervisor:
+    """Pre-forks tutor workers and routes requests between them.
+
+    Requests carrying a session or user ID stick to one worker slot so per-process
+    state (session store, caches, warm provider context) is reused; everything
+    else goes to the least-loaded worker. Workers are recycled after
+    `max_requests` requests, and `reload()` replaces every worker while the old
+    ones finish their in-flight requests. At most one request per worker is
+    dispatched at a time; the rest wait in a FairScheduler, so interactive
+    requests overtake queued background work.
+    """
+
+    def __init__(self, num_workers: Optional[int] = None, max_requests: int = DEFAULT_MAX_REQUESTS,
+                 request_timeout: float = DEFAULT_REQUEST_TIMEOUT):
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.max_requests = max_requests
+        self.request_timeout = request_timeout
+        self.workers: List[Optional[WorkerHandle]] = [None] * self.num_workers
+        self.retiring: List[WorkerHandle] = []
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+        self._closing = False
+        self._server: Optional[socketserver.BaseServer] = None
+        self.scheduler = FairScheduler(capacity=self.num_workers,
+                                       weights=parse_weights(os.getenv('TUTOR_TENANT_WEIGHTS', '')))
+
+        # Fork workers from a clean single-threaded server process that already has the
+        # agent imported, so code pages are shared and no supervisor threads are forked
+        self._ctx = multiprocessing.get_context('forkserver')
+        self._ctx.set_forkserver_preload(['enhanced_ai_agent', 'llm_providers', 'prompt_templates'])
+
+    def start(self, wait_ready: bool = True):
+        with self._lock:
+            for slot in range(self.num_workers):
+                self.workers[slot] = WorkerHandle(self._ctx, slot, self._worker_exited)
+        if wait_ready:
+            for worker in list(self.workers):
+                worker.ready.wait(timeout=60)
+
+    def _worker_exited(self, worker: WorkerHandle):
+        with self._lock:
+            if worker in self.retiring:
+                self.retiring.remove(worker)
+            replace = not self._closing and self.workers[worker.slot] is worker
+        if replace:
+            logger.warning(f"Worker {worker.pid} in slot {worker.slot} exited unexpectedly; restarting")
+            self._replace(worker.slot, expected=worker)
+
+    def _replace(self, slot: int, expected: Optional[WorkerHandle] = None) -> bool:
+        """Start a new worker in `slot` and drain the old one.
+
+        With `expected`, nothing happens unless that worker still holds the slot,
+        so racing callers that saw the same old worker replace it only once.
+        """
+        with self._lock:
+            old = self.workers[slot]
+            if expected is not None and old is not expected:
+                return False
+            self.workers[slot] = WorkerHandle(self._ctx, slot, self._worker_exited)
+            if old is not None:
+                self.retiring.append(old)
+        if old is not None:
+            old.drain()
+        return True
+
+    def _choose(self, payload: Dict[str, Any]) -> WorkerHandle:
+        with self._lock:
+            active = [w for w in self.workers if w is not None and not w.draining]
+            for key in STICKY_KEYS:
+                value = payload.get(key)
+                if value:
+                    worker = self.workers[zlib.crc32(str(value).encode('utf-8')) % self.num_workers]
+                    if worker is not None and not worker.draining:
+                        return worker
+                    break
+            candidates = active or [w for w in self.workers if w is not None]
+            return min(candidates, key=lambda w: (w.inflight, w.dispatched))
+
+    def dispatch(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """Route one request to a worker and wait for its result"""
+        if self._closing:
+            return {'error': 'Worker pool is shutting down'}
+
+        priority, tenant = request_class(payload)
+        budget = action_deadline_ms(payload.get('action', 'evaluate_answer'), payload.get('deadlineMs')) / 1000.0
+        started = time.monotonic()
+        if not self.scheduler.acquire(priority, tenant, started + budget):
+            return {'error': 'Request deadline passed while queued'}
+
+        try:
+            # The worker only gets what is left of the deadline after queuing here
+            left_ms = max(0.0, budget - (time.monotonic() - started)) * 1000
+            payload = dict(payload, deadlineMs=round(left_ms))
+            worker = self._choose(payload)
+            future = worker.submit(next(self._ids), payload)
+            if worker.dispatched >= self.max_requests and not worker.draining:
+                self._replace(worker.slot, expected=worker)
+
+            try:
+                return future.result(timeout=self.request_timeout)
+            except Exception:
+                return {'error': 'Worker timed out'}
+        finally:
+            self.scheduler.release()
+
+    def reload(self):
+        """Gracefully replace all workers (e.g. after a deploy or config change)"""
+        logger.info("Reloading worker pool")
+        for slot in range(self.num_workers):
+            self._replace(slot)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'workers': [
+                    {'slot': w.slot, 'pid': w.pid, 'inflight': w.inflight, 'dispatched': w.dispatched}
+                    for w in self.workers if w is not None
+                ],
+                'retiring': len(self.retiring),
+                'scheduler': self.scheduler.stats()
+            }
+
+    def serve(self, socket_path: str = DEFAULT_SOCKET_PATH):
+        """Accept newline-delimited JSON requests on a Unix-domain socket until shut down"""
+        if os.path.exists(socket_path):
+            os.unlink(socket_path)
+
+        supervisor = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    line = line.strip()
+                    if not line:
+                        continue
+                    try:
+                        payload = json.loads(line)
+                    except ValueError:
+                        result = {'error': 'Invalid JSON input'}
+                    else:
+                        if payload.get('action') == 'pool_stats':
+                            result = supervisor.stats()
+                        else:
+                            result = supervisor.dispatch(payload)
+                    self.wfile.write((json.dumps(result) + '\n').encode('utf-8'))
+                    self.wfile.flush()
+
+        class Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+            daemon_threads = True
+
+        self._server = Server(socket_path, Handler)
+        try:
+            self._server.serve_forever()
+        finally:
+            self._server.server_close()
+            if os.path.exists(socket_path):
+                os.unlink(socket_path)
+
+    def shutdown(self, timeout: float = 30.0):
+        """Stop accepting requests, let workers drain, then exit"""
+        with self._lock:
+            self._closing = True
+            workers = [w for w in self.workers if w is not None] + list(self.retiring)
+        if self._server is not None:
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+        for worker in workers:
+            worker.drain()
+        for worker in workers:
+            worker.process.join(timeout=timeout)
+            if worker.process.is_alive():
+                worker.process.terminate()
+
+def send_request(payload: Dict[str, Any], socket_path: str = DEFAULT_SOCKET_PATH,
+                 timeout: float = DEFAULT_REQUEST_TIMEOUT) -> Dict[str, Any]:
+    """Send one request to a running pool and return the decoded response"""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(socket_path)
+        sock.sendall((json.dumps(payload) + '\n').encode('utf-8'))
+        with sock.makefile('rb') as reader:
+            line = reader.readline()
+    return json.loads(line) if line else {'error': 'No response from worker pool'}
+
+def main():
+    parser = argparse.ArgumentParser(description='Prefork EnhancedAITutor worker pool')
+    subcommands = parser.add_subparsers(dest='command', required=True)
+
+    serve = subcommands.add_parser('serve', help='run the supervisor')
+    serve.add_argument('--socket', default=DEFAULT_SOCKET_PATH, help='Unix-domain socket path')
+    serve.add_argument('--workers', type=int, default=None, help='worker processes (default: CPU count)')
+    serve.add_argument('--max-requests', type=int, default=DEFAULT_MAX_REQUESTS,
+                       help='recycle a worker after this many requests')
+
+    request = subcommands.add_parser('request', help='send one JSON request to a running pool')
+    request.add_argument('payload', help='JSON request in the same shape enhanced_ai_agent.py accepts')
+    request.add_argument('--socket', default=DEFAULT_SOCKET_PATH, help='Unix-domain socket path')
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+
+    if args.command == 'request':
+        print(json.dumps(send_request(json.loads(args.payload), args.socket)))
+        return
+
+    supervisor = PreforkSupervisor(args.workers, args.max_requests)
+    supervisor.start()
+
+    signal.signal(signal.SIGHUP, lambda *_: threading.Thread(target=supervisor.reload, daemon=True).start())
+    signal.signal(signal.SIGTERM, lambda *_: supervisor.shutdown())
+    signal.signal(signal.SIGINT, lambda *_: supervisor.shutdown())
+
+    logger.info(f"Serving {supervisor.num_workers} workers on {args.socket}")
+    supervisor.serve(args.socket)
+    sys.exit(0)
+
+if __name__ == '__main__':
+    main()
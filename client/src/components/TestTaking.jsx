@@ -4,6 +4,7 @@ import { Button } from '@/components/ui/button';
 import { Badge } from '@/components/ui/badge';
 import { Progress } from '@/components/ui/progress';
 import { Clock, CheckCircle, AlertCircle, ArrowLeft, ArrowRight } from 'lucide-react';
+import { useAuth } from '@/contexts/AuthContext';
 
 export default function TestTaking({ test, onComplete, onExit }) {
   // Add error handling and debugging
@@ -42,6 +43,7 @@ export default function TestTaking({ test, onComplete, onExit }) {
   const [timeLeft, setTimeLeft] = useState(test.duration ? parseInt(test.duration) * 60 : 1800); // Default 30 minutes
   const [showResults, setShowResults] = useState(false);
   const [testResults, setTestResults] = useState(null);
+  const { currentUser } = useAuth();
 
   useEffect(() => {
     const timer = setInterval(() => {
@@ -95,7 +97,9 @@ export default function TestTaking({ test, onComplete, onExit }) {
         body: JSON.stringify({
           testResults: results,
           questions: test.questions,
-          userAnswers: answers
+          userAnswers: answers,
+          userId: currentUser?.uid,
+          subject: test.subject || test.topic
         }),
       });
 
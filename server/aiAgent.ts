@@ -1,14 +1,22 @@
 import { spawn } from 'child_process';
+import { randomUUID } from 'crypto';
+import { promises as fs } from 'fs';
+import os from 'os';
 import path from 'path';
 import { fileURLToPath } from 'url';
 
 const __filename = fileURLToPath(import.meta.url);
 const __dirname = path.dirname(__filename);
 
+// The agent process is killed after AI_TIMEOUT_MS; its own deadline leaves room for process startup
+const AI_TIMEOUT_MS = 30000;
+const AI_STARTUP_MARGIN_MS = 3000;
+
 export interface AIEvaluationRequest {
   action: string;
   question?: string;
   answer?: string;
+  imagePath?: string;
   type?: string;
   context?: any;
   subject?: string;
@@ -17,9 +25,18 @@ export interface AIEvaluationRequest {
   previousQuestions?: string[];
   studentMessage?: string;
   conversationHistory?: any[];
+  sessionId?: string;
   studentProgress?: any;
   subjects?: string[];
   studentErrors?: string[];
+  userId?: string;
+  result?: any;
+  questionId?: string;
+  correct?: boolean;
+  limit?: number;
+  deadlineMs?: number;
+  trace?: boolean;
+  traceId?: string;
 }
 
 export interface AIEvaluationResponse {
@@ -50,9 +67,17 @@ class AIAgent {
    */
   async callAI(request: AIEvaluationRequest): Promise<AIEvaluationResponse> {
     return new Promise((resolve, reject) => {
-      const requestJson = JSON.stringify(request);
+      // Without a deadlineMs the agent applies its per-action default (always below AI_TIMEOUT_MS)
+      const traceId = request.traceId ?? randomUUID();
+      const requestJson = JSON.stringify({
+        ...request,
+        traceId,
+        deadlineMs: request.deadlineMs === undefined
+          ? undefined
+          : Math.min(request.deadlineMs, AI_TIMEOUT_MS - AI_STARTUP_MARGIN_MS)
+      });
       
-      console.log(`🤖 Calling AI agent with action: ${request.action}`);
+      console.log(`🤖 Calling AI agent with action: ${request.action} (trace ${traceId})`);
       
       // Spawn Python process
       const pythonProcess = spawn(this.pythonPath, [this.scriptPath, requestJson], {
@@ -104,7 +129,7 @@ class AIAgent {
         pythonProcess.kill();
         console.error('❌ AI agent timeout');
         resolve(this.getFallbackResponse(request.action));
-      }, 30000); // 30 second timeout
+      }, AI_TIMEOUT_MS);
     });
   }
 
@@ -126,6 +151,25 @@ class AIAgent {
     });
   }
 
+  /**
+   * Evaluate an answer to a question about an image (diagram, chart, screenshot)
+   */
+  async evaluateImageAnswer(image: Buffer, question: string, answer: string): Promise<AIEvaluationResponse> {
+    // Images can exceed the limit for one command-line argument, so the agent reads them from a file
+    const imagePath = path.join(os.tmpdir(), `tutor-image-${randomUUID()}`);
+    await fs.writeFile(imagePath, image);
+    try {
+      return await this.callAI({
+        action: 'evaluate_image_answer',
+        imagePath,
+        question,
+        answer
+      });
+    } finally {
+      await fs.rm(imagePath, { force: true });
+    }
+  }
+
   /**
    * Generate an adaptive question
    */
@@ -133,14 +177,17 @@ class AIAgent {
     subject: string,
     difficulty: string,
     topic?: string,
-    previousQuestions?: string[]
+    previousQuestions?: string[],
+    userId?: string
   ): Promise<AIEvaluationResponse> {
+    // With a userId the agent picks by the student's ability estimate; prompts only use the last few questions
     return this.callAI({
       action: 'generate_adaptive_question',
       subject,
       difficulty,
       topic,
-      previousQuestions
+      previousQuestions: previousQuestions?.slice(-3),
+      userId
     });
   }
 
@@ -165,12 +212,17 @@ class AIAgent {
    */
   async conversationalTutoring(
     studentMessage: string,
-    conversationHistory?: any[]
+    conversationHistory?: any[],
+    sessionId?: string,
+    subject?: string
   ): Promise<AIEvaluationResponse> {
+    // With a sessionId the history lives server-side, so only the new message is sent
     return this.callAI({
       action: 'conversational_tutoring',
       studentMessage,
-      conversationHistory
+      conversationHistory: sessionId ? undefined : conversationHistory,
+      sessionId,
+      subject
     });
   }
 
@@ -179,12 +231,15 @@ class AIAgent {
    */
   async analyzeLearningPath(
     studentProgress: any,
-    subjects: string[]
+    subjects: string[],
+    userId?: string
   ): Promise<AIEvaluationResponse> {
+    // With a userId and no progress, the agent reads progress from the results store
     return this.callAI({
       action: 'analyze_learning_path',
       studentProgress,
-      subjects
+      subjects,
+      userId
     });
   }
 
@@ -193,11 +248,56 @@ class AIAgent {
    */
   async analyzeErrors(
     studentErrors: string[],
-    subject: string
+    subject: string,
+    userId?: string
   ): Promise<AIEvaluationResponse> {
+    // With a userId and no errors, the agent uses the student's recent wrong answers
     return this.callAI({
       action: 'analyze_errors',
       studentErrors,
+      subject,
+      userId
+    });
+  }
+
+  /**
+   * Record a completed quiz attempt in the results store
+   */
+  async recordResult(result: any): Promise<AIEvaluationResponse> {
+    return this.callAI({
+      action: 'record_result',
+      result
+    });
+  }
+
+  /**
+   * Update a student's ability estimate from one graded answer
+   */
+  async recordAnswer(
+    userId: string,
+    subject: string,
+    questionId: string | undefined,
+    correct: boolean,
+    difficulty?: string
+  ): Promise<AIEvaluationResponse> {
+    return this.callAI({
+      action: 'record_answer',
+      userId,
+      subject,
+      questionId,
+      correct,
+      difficulty
+    });
+  }
+
+  /**
+   * A student's most overdue spaced-repetition review items
+   */
+  async getDueReviews(userId: string, limit?: number, subject?: string): Promise<AIEvaluationResponse> {
+    return this.callAI({
+      action: 'get_due_reviews',
+      userId,
+      limit,
       subject
     });
   }
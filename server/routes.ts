@@ -1,4 +1,4 @@
-import type { Express } from "express";
+import express, { type Express } from "express";
 import { createServer, type Server } from "http";
 import { storage } from "./storage";
 import { chatWithAI } from "./openai";
@@ -197,6 +197,35 @@ export async function registerRoutes(app: Express): Promise<Server> {
         return res.status(400).json({ error: "Test results, questions, and user answers are required" });
       }
 
+      // Completed tests feed the results store (error analysis by userId, spaced-repetition reviews).
+      // Recording runs alongside the analysis and never fails the request.
+      const userId = req.body.userId || (req as any).user?.uid;
+      if (userId) {
+        const attempt = {
+          userId,
+          subject: req.body.subject || testResults.subject || questions[0]?.subject || 'general',
+          score: testResults.score,
+          correctCount: testResults.correctAnswers,
+          totalQuestions: testResults.totalQuestions,
+          timeSpent: testResults.timeTaken,
+          timestamp: testResults.completedAt || new Date().toISOString(),
+          detailedResults: questions.map((q: any) => ({
+            questionId: String(q.id),
+            question: q.question,
+            userAnswer: q.options?.[userAnswers[q.id]] ?? '',
+            correctAnswer: String(q.correctAnswer),
+            correctAnswerText: q.options?.[q.correctAnswer] ?? '',
+            isCorrect: userAnswers[q.id] === q.correctAnswer,
+            topic: q.topic || q.concepts?.[0] || ''
+          }))
+        };
+        aiAgent.recordResult(attempt)
+          .then(result => {
+            if (result.error) console.error("Record test result error:", result.error);
+          })
+          .catch(error => console.error("Record test result error:", error));
+      }
+
       // Generate AI analysis using the existing chatWithAI function
       const analysisPrompt = `
         Analyze this test performance and provide detailed feedback:
@@ -289,16 +318,37 @@ export async function registerRoutes(app: Express): Promise<Server> {
     }
   });
 
+  // The image is the raw request body (Content-Type image/*); question and answer are query parameters
+  app.post("/api/ai/evaluate-image-answer", express.raw({ type: 'image/*', limit: '20mb' }), async (req, res) => {
+    try {
+      const question = typeof req.query.question === 'string' ? req.query.question : '';
+      const answer = typeof req.query.answer === 'string' ? req.query.answer : '';
+      
+      if (!Buffer.isBuffer(req.body) || req.body.length === 0 || !question || !answer) {
+        return res.status(400).json({ error: "An image body, question and answer are required" });
+      }
+
+      console.log(`🤖 AI Evaluation: image question (${req.body.length} bytes)`);
+      const result = await aiAgent.evaluateImageAnswer(req.body, question, answer);
+      
+      res.json(result);
+    } catch (error) {
+      console.error("AI image evaluation error:", error);
+      res.status(500).json({ error: "Failed to evaluate image answer" });
+    }
+  });
+
   app.post("/api/ai/generate-question", async (req, res) => {
     try {
       const { subject, difficulty = 'intermediate', topic, previousQuestions } = req.body;
+      const userId = req.body.userId || (req as any).user?.uid;
       
       if (!subject) {
         return res.status(400).json({ error: "Subject is required" });
       }
 
       console.log(`🤖 Generating ${difficulty} question for ${subject}`);
-      const result = await aiAgent.generateAdaptiveQuestion(subject, difficulty, topic, previousQuestions);
+      const result = await aiAgent.generateAdaptiveQuestion(subject, difficulty, topic, previousQuestions, userId);
       
       res.json(result);
     } catch (error) {
@@ -307,6 +357,42 @@ export async function registerRoutes(app: Express): Promise<Server> {
     }
   });
 
+  app.post("/api/ai/due-reviews", async (req, res) => {
+    try {
+      const { limit = 10, subject } = req.body;
+      const userId = req.body.userId || (req as any).user?.uid;
+      
+      if (!userId) {
+        return res.status(400).json({ error: "userId is required" });
+      }
+
+      const result = await aiAgent.getDueReviews(userId, limit, subject);
+      
+      res.json(result);
+    } catch (error) {
+      console.error("AI review scheduling error:", error);
+      res.status(500).json({ error: "Failed to get due reviews" });
+    }
+  });
+
+  app.post("/api/ai/record-answer", async (req, res) => {
+    try {
+      const { subject, questionId, correct, difficulty } = req.body;
+      const userId = req.body.userId || (req as any).user?.uid;
+      
+      if (!userId || !subject || typeof correct !== 'boolean') {
+        return res.status(400).json({ error: "userId, subject and correct are required" });
+      }
+
+      const result = await aiAgent.recordAnswer(userId, subject, questionId, correct, difficulty);
+      
+      res.json(result);
+    } catch (error) {
+      console.error("AI answer recording error:", error);
+      res.status(500).json({ error: "Failed to record answer" });
+    }
+  });
+
   app.post("/api/ai/tutoring-explanation", async (req, res) => {
     try {
       const { question, studentAnswer, correctAnswer } = req.body;
@@ -327,14 +413,14 @@ export async function registerRoutes(app: Express): Promise<Server> {
 
   app.post("/api/ai/conversational-tutoring", async (req, res) => {
     try {
-      const { studentMessage, conversationHistory } = req.body;
+      const { studentMessage, conversationHistory, sessionId, subject } = req.body;
       
       if (!studentMessage) {
         return res.status(400).json({ error: "Student message is required" });
       }
 
       console.log(`🤖 Conversational tutoring session`);
-      const result = await aiAgent.conversationalTutoring(studentMessage, conversationHistory);
+      const result = await aiAgent.conversationalTutoring(studentMessage, conversationHistory, sessionId, subject);
       
       res.json(result);
     } catch (error) {
@@ -345,14 +431,14 @@ export async function registerRoutes(app: Express): Promise<Server> {
 
   app.post("/api/ai/learning-path", async (req, res) => {
     try {
-      const { studentProgress, subjects } = req.body;
+      const { studentProgress, subjects, userId } = req.body;
       
-      if (!studentProgress || !subjects) {
-        return res.status(400).json({ error: "Student progress and subjects are required" });
+      if (!userId && (!studentProgress || !subjects)) {
+        return res.status(400).json({ error: "Student progress and subjects (or a userId) are required" });
       }
 
       console.log(`🤖 Analyzing learning path`);
-      const result = await aiAgent.analyzeLearningPath(studentProgress, subjects);
+      const result = await aiAgent.analyzeLearningPath(studentProgress, subjects, userId);
       
       res.json(result);
     } catch (error) {
@@ -363,14 +449,14 @@ export async function registerRoutes(app: Express): Promise<Server> {
 
   app.post("/api/ai/error-analysis", async (req, res) => {
     try {
-      const { studentErrors, subject } = req.body;
+      const { studentErrors, subject, userId } = req.body;
       
-      if (!studentErrors || !subject) {
-        return res.status(400).json({ error: "Student errors and subject are required" });
+      if (!subject || (!studentErrors && !userId)) {
+        return res.status(400).json({ error: "Subject and student errors (or a userId) are required" });
       }
 
       console.log(`🤖 Analyzing student errors in ${subject}`);
-      const result = await aiAgent.analyzeErrors(studentErrors, subject);
+      const result = await aiAgent.analyzeErrors(studentErrors, subject, userId);
       
       res.json(result);
     } catch (error) {